@@ -0,0 +1,107 @@
+"""
+Bounded Connection Pool
+psycopg2's ThreadedConnectionPool raises PoolError the moment all maxconn
+connections are checked out, so a burst of webhooks turned into a burst of
+500s (and Slack notifications). BoundedPool puts a wait in front of it:
+
+- a checkout waits up to `timeout` seconds for a connection to be returned
+- at most `max_waiters` checkouts wait at once; beyond that, or once the
+  wait times out, getconn() raises PoolExhausted
+
+The receiver answers PoolExhausted with 503 + Retry-After (load shedding), so
+Coriunder retries the delivery later instead of recording a failure.
+
+pool_size() derives a worker's maxconn from Postgres max_connections, so N
+uvicorn workers never try to open more connections than the server allows.
+"""
+
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool as psycopg2_pool
+
+
+class PoolExhausted(Exception):
+    """No pooled connection became free in time; the caller should shed load."""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason  # 'timeout' or 'queue_full'
+
+
+def pool_size(max_connections, workers, reserved, cap):
+    """
+    Per-worker maxconn: an equal share of the connections left after
+    `reserved` (monitor, bot, reports, admin sessions), at most `cap` and at
+    least 1.
+    """
+    share = (max_connections - reserved) // max(1, workers)
+    return max(1, min(cap, share))
+
+
+def server_max_connections(db_config):
+    """SHOW max_connections, or None if the server cannot be asked."""
+    try:
+        conn = psycopg2.connect(**{'connect_timeout': 5, **db_config})
+    except psycopg2.Error:
+        return None
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SHOW max_connections")
+            return int(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+
+class BoundedPool:
+    """ThreadedConnectionPool with a bounded, timed wait for a free connection."""
+
+    def __init__(self, minconn, maxconn, timeout=2.0, max_waiters=32, **db_config):
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.max_waiters = max_waiters
+        self.in_use = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+        # Connections are opened on first use rather than here, so creating
+        # the pool never blocks on Postgres; once opened, minconn stay idle
+        self._pool = psycopg2_pool.ThreadedConnectionPool(minconn=0, maxconn=maxconn, **db_config)
+        self._pool.minconn = min(minconn, maxconn)
+
+    def getconn(self):
+        """A connection, waiting up to `timeout` seconds for one; raises PoolExhausted."""
+        with self._cond:
+            if self.in_use >= self.maxconn:
+                if self.waiting >= self.max_waiters:
+                    raise PoolExhausted('queue_full', f"{self.waiting} checkouts already waiting")
+                deadline = time.monotonic() + self.timeout
+                self.waiting += 1
+                try:
+                    while self.in_use >= self.maxconn:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolExhausted('timeout', f"no connection free after {self.timeout:g}s")
+                        self._cond.wait(remaining)
+                finally:
+                    self.waiting -= 1
+            self.in_use += 1
+        try:
+            return self._pool.getconn()
+        except Exception:
+            self._release()
+            raise
+
+    def putconn(self, conn, close=False):
+        try:
+            self._pool.putconn(conn, close=close)
+        finally:
+            self._release()
+
+    def _release(self):
+        with self._cond:
+            self.in_use -= 1
+            self._cond.notify()
+
+    def closeall(self):
+        self._pool.closeall()
@@ -0,0 +1,48 @@
+"""
+Duplicate Delivery Detection
+Coriunder retries webhook deliveries. A delivery is identified by
+(trans_order, trans_id, reply_code, signature); each worker remembers the
+most recent keys it has committed so exact retries can be answered without
+touching the database. The unique index on webhook_events.delivery_key
+catches the retries this worker has not seen (other workers, restarts).
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+DELIVERY_KEY_FIELDS = ('trans_order', 'trans_id', 'reply_code', 'signature')
+
+
+def delivery_key(data):
+    """md5 hex digest identifying one delivery of one transaction state."""
+    raw = '|'.join(str(data.get(field) or '') for field in DELIVERY_KEY_FIELDS)
+    return hashlib.md5(raw.encode('utf-8')).hexdigest()
+
+
+class DeliveryCache:
+    """Bounded LRU set of delivery keys."""
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def seen(self, key):
+        """True if key was recorded (and mark it most recently used)."""
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                return True
+            return False
+
+    def add(self, key):
+        """Record a committed delivery, evicting the least recently used key."""
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            if len(self._keys) > self.max_size:
+                self._keys.popitem(last=False)
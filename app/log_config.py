@@ -0,0 +1,144 @@
+"""
+Logging Configuration
+Sets up the receiver's log handlers from environment variables.
+
+    LOG_MODE=queue|sync          queue (default): the request path only enqueues
+                                 records; a listener thread formats them and
+                                 does the file/console I/O
+    LOG_FORMAT=json|text         json (default): one JSON object per line
+    LOG_SUCCESS_SAMPLE_RATE=0..1 fraction of successful webhooks that get an
+                                 INFO summary line (warnings/errors always logged)
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+from datetime import datetime, timezone
+
+LOG_MODE = os.getenv('LOG_MODE', 'queue').lower()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+LOG_SUCCESS_SAMPLE_RATE = float(os.getenv('LOG_SUCCESS_SAMPLE_RATE', '1.0'))
+LOG_QUEUE_SIZE = 10000
+
+# Attributes every LogRecord has - anything else was passed via `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message + extra fields."""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic format line, with any extra fields appended as key=value."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves all formatting to the listener thread and never
+    blocks a request on a full queue: records below WARNING are dropped
+    (counted), WARNING and above wait briefly for room and are otherwise
+    written straight to the `fallback` handlers, so errors are always logged.
+    """
+
+    URGENT_WAIT = 0.05  # seconds a WARNING+ record waits for room in the queue
+
+    def __init__(self, log_queue, fallback=()):
+        super().__init__(log_queue)
+        self.fallback = fallback
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+            return
+        except queue.Full:
+            if record.levelno < logging.WARNING:
+                self.dropped += 1
+                return
+        try:
+            self.queue.put(record, timeout=self.URGENT_WAIT)
+        except queue.Full:
+            for handler in self.fallback:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+
+
+def success_sampled():
+    """Decide once per request whether its INFO success line is logged."""
+    return LOG_SUCCESS_SAMPLE_RATE >= 1.0 or random.random() < LOG_SUCCESS_SAMPLE_RATE
+
+
+def configure_logging(log_file, level=logging.INFO, mode=None, fmt=None):
+    """
+    Install file + console handlers on the root logger.
+    Returns the handler attached to the root logger.
+    """
+    global _listener
+
+    mode = mode or LOG_MODE
+    fmt = fmt or LOG_FORMAT
+    formatter = JsonFormatter() if fmt == 'json' else TextFormatter()
+
+    handlers = [logging.FileHandler(log_file), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root = logging.getLogger()
+    root.setLevel(level)
+
+    if mode == 'queue':
+        root_handler = DeferredQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE), fallback=handlers)
+        _listener = logging.handlers.QueueListener(root_handler.queue, *handlers,
+                                                   respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)  # flush whatever is still queued
+        root.addHandler(root_handler)
+    else:
+        root_handler = handlers[0]
+        for handler in handlers:
+            root.addHandler(handler)
+
+    return root_handler
+
+
+def stop_logging():
+    """Stop the queue listener (flushing queued records), if one is running."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,351 @@
+"""
+Prometheus Metrics
+Minimal, dependency-free metrics for the webhook receiver, rendered in the
+Prometheus text exposition format at /metrics.
+
+Hot-path updates are lock-free: every thread writes to its own shard and the
+shards are only summed when /metrics is scraped. The shard of a thread that
+has exited (e.g. an idle anyio worker thread) is folded into a retired total
+and dropped, so short-lived threads do not pile up shards. With several
+uvicorn workers, set METRICS_MULTIPROC_DIR - each worker then dumps its totals
+there every few seconds and a scrape of any worker returns the sum over all
+workers. A dead worker's counters and histograms are folded into
+retired.json, so the summed totals never go backwards; its gauges are dropped.
+"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+METRICS_FLUSH_INTERVAL = 5  # seconds between multiprocess snapshots
+
+CONTENT_TYPE_LATEST = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds (1ms .. 10s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+_registry_lock = threading.Lock()
+
+
+def _add(totals, labels, value):
+    """Add one label set's value (a number, or a histogram's state list) into totals."""
+    merged = totals.get(labels)
+    if isinstance(value, list):
+        if merged is None:
+            totals[labels] = list(value)
+        else:
+            for i, v in enumerate(value):
+                merged[i] += v
+    else:
+        totals[labels] = (merged or 0) + value
+
+
+class _Metric:
+    """Base class: per-thread value shards keyed by label-value tuples."""
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = {}  # thread -> its value dict
+        self._retired = {}  # summed shards of threads that have exited
+        self._shards_lock = threading.Lock()
+        self._function = None
+        with _registry_lock:
+            _registry.append(self)
+
+    def _shard(self):
+        """This thread's private value dict (registered once per thread)."""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = {}
+            with self._shards_lock:
+                self._retire_dead_shards()
+                self._shards[threading.current_thread()] = values
+            self._local.values = values
+            return values
+
+    def _retire_dead_shards(self):
+        """Fold the shards of exited threads into _retired (caller holds _shards_lock)."""
+        for thread in [thread for thread in self._shards if not thread.is_alive()]:
+            for labels, value in self._shards.pop(thread).items():
+                _add(self._retired, labels, value)
+
+    def set_function(self, function):
+        """Report function() (unlabelled) instead of tracked increments."""
+        self._function = function
+
+    def collect(self):
+        """Sum all thread shards -> {labels: value}."""
+        if self._function is not None:
+            try:
+                return {(): self._function()}
+            except Exception:
+                return {}
+        totals = {}
+        with self._shards_lock:
+            self._retire_dead_shards()
+            for labels, value in self._retired.items():
+                _add(totals, labels, value)
+            shards = list(self._shards.values())
+        for shard in shards:
+            for labels, value in list(shard.items()):
+                _add(totals, labels, value)
+        return totals
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, tracked or read from a callback at scrape time."""
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, or is read from a callback at scrape time."""
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        values = self._shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class _Timer:
+    """Context manager observing elapsed time into a histogram."""
+    __slots__ = ('_histogram', '_labels', '_started')
+
+    def __init__(self, histogram, labels):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time.perf_counter() - self._started, *self._labels)
+        return False
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values. Each label set stores one count per bucket
+    (non-cumulative, the last slot is +Inf) followed by the running sum.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        values = self._shard()
+        state = values.get(labels)
+        if state is None:
+            state = values[labels] = [0] * (len(self.buckets) + 2)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def time(self, *labels):
+        """Time a block: `with HISTOGRAM.time('stage'):`"""
+        return _Timer(self, labels)
+
+
+# ---------------------------------------------------------------------------
+# Cross-worker aggregation
+# ---------------------------------------------------------------------------
+
+def _snapshot():
+    """Current totals of every registered metric, JSON-serialisable."""
+    with _registry_lock:
+        metrics = list(_registry)
+    return {
+        metric.name: [[list(labels), value] for labels, value in metric.collect().items()]
+        for metric in metrics
+    }
+
+
+def write_snapshot(directory=None):
+    """Atomically write this worker's totals to <directory>/<pid>.json."""
+    directory = directory or METRICS_MULTIPROC_DIR
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(_snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+RETIRED_FILE = 'retired.json'
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _retire_worker(directory, path):
+    """
+    Fold a dead worker's snapshot into retired.json: counters and histograms
+    only, as its gauges (connections in use, queue depths) ended with it.
+    """
+    claimed = f"{path}.{os.getpid()}.retiring"
+    try:
+        os.replace(path, claimed)  # only one scraping worker wins the file
+    except OSError:
+        return
+    with _registry_lock:
+        kinds = {metric.name: metric.kind for metric in _registry}
+    with open(os.path.join(directory, 'retired.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired_path = os.path.join(directory, RETIRED_FILE)
+        try:
+            retired = _load(retired_path)
+        except (OSError, ValueError):
+            retired = {}
+        try:
+            snapshot = _load(claimed)
+        except (OSError, ValueError):
+            snapshot = {}
+        for name, samples in snapshot.items():
+            if kinds.get(name) not in ('counter', 'histogram'):
+                continue
+            totals = {tuple(labels): value for labels, value in retired.get(name, [])}
+            for labels, value in samples:
+                _add(totals, tuple(labels), value)
+            retired[name] = [[list(labels), value] for labels, value in totals.items()]
+        tmp_path = f"{retired_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(retired, f)
+        os.replace(tmp_path, retired_path)
+        os.remove(claimed)
+
+
+def _read_other_workers(directory):
+    """Snapshots written recently by other worker processes, plus the retired totals of dead ones."""
+    own_file = f"{os.getpid()}.json"
+    cutoff = time.time() - 3 * METRICS_FLUSH_INTERVAL  # older files belong to dead workers
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json') or filename in (own_file, RETIRED_FILE):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                _retire_worker(directory, path)
+                continue
+            snapshots.append(_load(path))
+        except (OSError, ValueError):
+            continue  # file replaced or removed mid-read
+    try:
+        snapshots.append(_load(os.path.join(directory, RETIRED_FILE)))
+    except (OSError, ValueError):
+        pass
+    return snapshots
+
+
+_writer = None
+_writer_stop = threading.Event()
+_writer_lock = threading.Lock()
+
+
+def _flush_loop(stop):
+    """Background thread: publish this worker's totals for the other workers."""
+    while not stop.wait(METRICS_FLUSH_INTERVAL):
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def start_multiprocess_writer():
+    """Start publishing snapshots if METRICS_MULTIPROC_DIR is configured (once per process)."""
+    global _writer, _writer_stop
+    if not METRICS_MULTIPROC_DIR:
+        return
+    with _writer_lock:
+        if _writer is not None and _writer.is_alive():
+            return
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+        write_snapshot()
+        _writer_stop = threading.Event()
+        _writer = threading.Thread(target=_flush_loop, args=(_writer_stop,), daemon=True)
+        _writer.start()
+
+
+def stop_multiprocess_writer(timeout=None):
+    """Stop the snapshot thread, if running, after a final snapshot."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            return
+        _writer_stop.set()
+        _writer.join(timeout)
+        _writer = None
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+# ---------------------------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------------------------
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames, labels, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels)]
+    pairs.extend(f'{name}="{value}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def generate_latest():
+    """Render all metrics (summed over workers) in Prometheus text format."""
+    with _registry_lock:
+        metrics = list(_registry)
+
+    others = _read_other_workers(METRICS_MULTIPROC_DIR) if METRICS_MULTIPROC_DIR else []
+
+    lines = []
+    for metric in metrics:
+        totals = metric.collect()
+        for snapshot in others:
+            for labels, value in snapshot.get(metric.name, []):
+                _add(totals, tuple(labels), value)
+
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for labels, value in sorted(totals.items()):
+            if metric.kind == 'histogram':
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f"{metric.name}_bucket"
+                                 f"{_format_labels(metric.labelnames, labels, [('le', le)])} {cumulative}")
+                label_str = _format_labels(metric.labelnames, labels)
+                lines.append(f"{metric.name}_sum{label_str} {_format_value(value[-1])}")
+                lines.append(f"{metric.name}_count{label_str} {cumulative}")
+            else:
+                lines.append(f"{metric.name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+
+    return '\n'.join(lines) + '\n'
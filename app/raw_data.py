@@ -0,0 +1,130 @@
+"""
+Compact storage for webhook_events.raw_data.
+
+Every Coriunder field except the two amounts already has its own
+webhook_events column, so storing the whole payload again doubled each row.
+raw_data (JSONB) now keeps only what the columns cannot reproduce:
+
+    {"_v": 1, "_f": <bitmask of FIELDS present in the payload>,
+     "trans_amount": "12.5", ...any field not in FIELDS or not stored verbatim}
+
+expand_raw_data() rebuilds the original payload from that and the row's
+columns. It also reads rows written before the switch (Python repr text) and
+plain JSON payloads.
+
+FIELDS is append-only - a field's position is its bit in "_f". Columns listed
+here hold the payload value as received and must not be rewritten later.
+"""
+
+import ast
+import json
+
+FORMAT_VERSION = 1
+
+# (payload key, webhook_events column)
+FIELDS = (
+    ('trans_id', 'trans_id'),
+    ('trans_order', 'trans_order'),
+    ('reply_code', 'reply_code'),
+    ('reply_desc', 'reply_desc'),
+    ('trans_date', 'trans_date'),
+    ('otrans_currency', 'otrans_currency'),
+    ('trans_currency', 'trans_currency'),
+    ('merchant_id', 'merchant_id'),
+    ('client_fullname', 'client_fullname'),
+    ('client_phone', 'client_phone'),
+    ('client_email', 'client_email'),
+    ('payment_details', 'payment_details'),
+    ('exp_month', 'exp_month'),
+    ('exp_year', 'exp_year'),
+    ('trans_type', 'trans_type'),
+    ('signature', 'signature'),
+    ('system_reference', 'system_reference'),
+    ('debit_company', 'debit_company'),
+    ('debrefnum', 'debrefnum'),
+    ('debrefcode', 'debrefcode'),
+    ('debit_companyname', 'debit_companyname'),
+    ('is3d', 'is3d'),
+    ('isRefund', 'is_refund'),
+    ('client_address', 'client_address'),
+    ('client_address2', 'client_address2'),
+    ('client_zipcode', 'client_zipcode'),
+    ('client_country', 'client_country'),
+    ('client_city', 'client_city'),
+    ('bin_country', 'bin_country'),
+    ('pm', 'pm'),
+    ('ccBIN', 'cc_bin'),
+    ('plid', 'plid'),
+    ('StorageID', 'storage_id'),
+    ('MidID', 'mid_id'),
+    ('ReconID', 'recon_id'),
+    ('CP26', 'cp26'),
+    ('CP27', 'cp27'),
+    ('CP28', 'cp28'),
+    ('CP29', 'cp29'),
+    ('CP30', 'cp30'),
+)
+
+FIELD_COLUMNS = tuple(column for _, column in FIELDS)
+
+
+def compact_raw_data(data, row=None):
+    """
+    The raw_data document for payload `data`. A field is left out when its
+    column reproduces it: at insert time the columns are filled from `data`
+    itself; for existing rows pass the row's columns as `row` and only fields
+    whose column holds the same value are left out.
+    """
+    doc = {'_v': FORMAT_VERSION, '_f': 0}
+    stored = set()
+    for bit, (key, column) in enumerate(FIELDS):
+        if key not in data:
+            continue
+        value = data[key]
+        if value is not None and not isinstance(value, str):
+            continue
+        if row is not None and row.get(column) != value:
+            continue
+        doc['_f'] |= 1 << bit
+        stored.add(key)
+
+    for key, value in data.items():
+        if key not in stored:
+            doc[key] = value if value is None or isinstance(value, (str, int, float, bool)) else str(value)
+    return doc
+
+
+def parse_legacy_raw_data(text):
+    """Payload dict from a pre-JSONB raw_data value (Python dict repr, or JSON). Raises ValueError."""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        try:
+            value = ast.literal_eval(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+            raise ValueError(f"unreadable raw_data: {e}") from None
+    if not isinstance(value, dict):
+        raise ValueError(f"raw_data is a {type(value).__name__}, not a dict")
+    return value
+
+
+def expand_raw_data(raw, row):
+    """
+    The webhook payload as received, from a row's raw_data and its columns
+    (`row` maps column name to value, e.g. a RealDictCursor row). Returns None
+    when raw_data has been purged.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, str):
+        return parse_legacy_raw_data(raw)
+    if raw.get('_v') != FORMAT_VERSION:
+        return dict(raw)
+
+    payload = {}
+    mask = raw.get('_f', 0)
+    for bit, (key, column) in enumerate(FIELDS):
+        if mask & (1 << bit):
+            payload[key] = row.get(column)
+    payload.update((key, value) for key, value in raw.items() if key not in ('_v', '_f'))
+    return payload
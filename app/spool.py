@@ -0,0 +1,299 @@
+"""
+Webhook Spool
+Local write-ahead log for webhooks the database cannot take right now (slow,
+unreachable or out of connections). The receiver appends the webhook here,
+answers 200, and a replayer thread writes the spooled webhooks to Postgres in
+batches once it accepts writes again.
+
+On disk, SPOOL_DIR holds one slot per worker (slot-0, slot-1, ...), claimed
+with an flock on slot-N.lock. Each slot is a sequence of append-only segment
+files (000000000001.seg, ...), each a run of frames:
+
+    b'WS' | payload length (uint32 LE) | crc32(payload) (uint32 LE) | payload (JSON)
+
+- append() returns once the frame is fsynced. Concurrent appends share one
+  fsync (group commit): whichever caller finds no fsync running syncs
+  everything written so far for the others.
+- A worker starts a fresh segment at startup and rolls over at
+  segment_bytes, so a frame torn by a crash can only be at the end of a
+  segment that is no longer written.
+- Replay mmaps each segment, stops at the first short or CRC-failing frame,
+  and records how far it got in <segment>.pos after each batch. Replayed
+  segments are deleted. A sealed segment with a bad frame is renamed
+  .corrupt for inspection.
+- Frames are replayed in append order, so a slot's webhooks reach the
+  database in the order they were received. Replay is idempotent as long as
+  store_batch is; the receiver relies on webhook_events.delivery_key.
+
+Slots whose worker is gone (fewer workers after a restart) are unlocked, and
+any worker's replayer adopts and drains them.
+"""
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+MAGIC = b'WS'
+HEADER = struct.Struct('<2sII')  # magic, payload length, crc32
+SEGMENT_SUFFIX = '.seg'
+
+logger = logging.getLogger(__name__)
+
+
+class SpoolFull(Exception):
+    """The slot already holds max_bytes of unreplayed webhooks."""
+
+
+def encode_frame(entry):
+    payload = json.dumps(entry, separators=(',', ':')).encode('utf-8')
+    return HEADER.pack(MAGIC, len(payload), zlib.crc32(payload)) + payload
+
+
+def iter_frames(buf, pos=0):
+    """(payload, end offset) for each intact frame from pos; stops at the first bad or short one"""
+    size = len(buf)
+    while pos + HEADER.size <= size:
+        magic, length, crc = HEADER.unpack_from(buf, pos)
+        start = pos + HEADER.size
+        end = start + length
+        if magic != MAGIC or end > size:
+            return
+        payload = buf[start:end]
+        if zlib.crc32(payload) != crc:
+            return
+        yield payload, end
+        pos = end
+
+
+def _segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(SEGMENT_SUFFIX))
+
+
+def _read_position(path):
+    try:
+        with open(path + '.pos') as f:
+            return int(f.read() or 0)
+    except FileNotFoundError:
+        return 0
+
+
+def _write_position(path, pos):
+    tmp = path + '.pos.tmp'
+    with open(tmp, 'w') as f:
+        f.write(str(pos))
+    os.replace(tmp, path + '.pos')
+
+
+def _remove_segment(path):
+    os.remove(path)
+    if os.path.exists(path + '.pos'):
+        os.remove(path + '.pos')
+
+
+def count_pending(directory):
+    """Frames not yet replayed in a slot directory"""
+    pending = 0
+    for name in _segments(directory):
+        path = os.path.join(directory, name)
+        pos = _read_position(path)
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > pos:
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buf:
+                    pending += sum(1 for _ in iter_frames(buf, pos))
+    return pending
+
+
+def replay_directory(directory, store_batch, batch_size=500, active=lambda: None, on_stored=None):
+    """
+    Pass every unreplayed frame of a slot, oldest first, to store_batch(list
+    of entries) in batches, saving the position after each. An exception from
+    store_batch stops the replay (the batch is retried next time). Fully
+    replayed segments are deleted, except the one active() names - the one
+    still being written. Returns entries replayed.
+    """
+    replayed = 0
+    for name in _segments(directory):
+        path = os.path.join(directory, name)
+        # Read before sizing the file: a segment that was not active then is
+        # sealed, so its size is final and it can be deleted once replayed
+        writing = active() == name
+        pos = _read_position(path)
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size > pos:
+                with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as buf:
+                    batch = []
+                    for payload, end in iter_frames(buf, pos):
+                        batch.append(json.loads(payload))
+                        if len(batch) >= batch_size:
+                            store_batch(batch)
+                            _write_position(path, end)
+                            replayed += len(batch)
+                            if on_stored:
+                                on_stored(len(batch))
+                            batch = []
+                        pos = end
+                    if batch:
+                        store_batch(batch)
+                        _write_position(path, pos)
+                        replayed += len(batch)
+                        if on_stored:
+                            on_stored(len(batch))
+        if writing:
+            break
+        if pos < size:
+            logger.error(f"Spool segment {path} is corrupt after byte {pos:,} - kept as .corrupt")
+            os.replace(path, path + '.corrupt')
+            if os.path.exists(path + '.pos'):
+                os.remove(path + '.pos')
+        else:
+            _remove_segment(path)
+    return replayed
+
+
+def _try_lock(path):
+    """Open and flock path without blocking; the open file, or None if another process holds it"""
+    lock_file = open(path, 'a')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class Spool:
+    """This worker's slot: append (durably) and replay."""
+
+    def __init__(self, root, segment_bytes=64 * 1024 * 1024, max_bytes=1024 * 1024 * 1024):
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+
+        slot = 0
+        while True:
+            self._lock_file = _try_lock(os.path.join(root, f'slot-{slot}.lock'))
+            if self._lock_file is not None:
+                break
+            slot += 1
+        self.slot = slot
+        self.directory = os.path.join(root, f'slot-{slot}')
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._cond = threading.Condition()
+        self._appended = 0
+        self._synced = 0
+        self._syncing = False
+        self._replayed = 0
+        self._pending_at_start = count_pending(self.directory)
+        self.bytes = sum(os.path.getsize(os.path.join(self.directory, name))
+                         for name in _segments(self.directory))
+
+        # Never append after a previous run's tail, which may be torn
+        existing = _segments(self.directory)
+        self._segment_no = int(existing[-1][:-len(SEGMENT_SUFFIX)]) if existing else 0
+        self._fd = None
+        self._open_segment()
+
+    @property
+    def pending(self):
+        """Webhooks in this slot not yet replayed"""
+        return self._pending_at_start + self._appended - self._replayed
+
+    def _open_segment(self):
+        self._segment_no += 1
+        self.segment = f'{self._segment_no:012d}{SEGMENT_SUFFIX}'
+        self._fd = os.open(os.path.join(self.directory, self.segment),
+                           os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._segment_size = 0
+
+    def _rotate(self):
+        """Seal the current segment (caller holds the lock)"""
+        while self._syncing:
+            self._cond.wait()
+        os.fsync(self._fd)
+        os.close(self._fd)
+        self._synced = self._appended
+        self._open_segment()
+
+    def append(self, entry):
+        """Write entry (JSON-serializable) and return once it is on disk. Raises SpoolFull."""
+        frame = encode_frame(entry)
+        with self._cond:
+            if self.bytes + len(frame) > self.max_bytes:
+                raise SpoolFull(f"spool slot {self.slot} holds {self.bytes:,} bytes")
+            if self._segment_size and self._segment_size + len(frame) > self.segment_bytes:
+                self._rotate()
+            os.write(self._fd, frame)
+            self._segment_size += len(frame)
+            self.bytes += len(frame)
+            self._appended += 1
+            ticket = self._appended
+
+            # Group commit: one caller fsyncs for everyone written so far
+            while self._synced < ticket:
+                if self._syncing:
+                    self._cond.wait()
+                    continue
+                self._syncing = True
+                target, fd = self._appended, self._fd
+                self._cond.release()
+                try:
+                    os.fsync(fd)
+                finally:
+                    self._cond.acquire()
+                    self._syncing = False
+                    self._cond.notify_all()
+                self._synced = max(self._synced, target)
+
+    def _on_replayed(self, count):
+        with self._cond:
+            self._replayed += count
+
+    def replay(self, store_batch, batch_size=500):
+        """Replay this slot; see replay_directory()"""
+        replayed = replay_directory(self.directory, store_batch, batch_size,
+                                    active=lambda: self.segment, on_stored=self._on_replayed)
+        with self._cond:
+            self.bytes = sum(os.path.getsize(os.path.join(self.directory, name))
+                             for name in _segments(self.directory))
+        return replayed
+
+    def replay_orphans(self, store_batch, batch_size=500):
+        """Drain slots no worker holds (e.g. after running with fewer workers). Returns entries replayed."""
+        replayed = 0
+        for name in sorted(os.listdir(self.root)):
+            if not name.endswith('.lock') or name == f'slot-{self.slot}.lock':
+                continue
+            directory = os.path.join(self.root, name[:-len('.lock')])
+            if not os.path.isdir(directory) or not _segments(directory):
+                continue
+            lock_file = _try_lock(os.path.join(self.root, name))
+            if lock_file is None:
+                continue
+            try:
+                replayed += replay_directory(directory, store_batch, batch_size)
+            finally:
+                lock_file.close()
+        return replayed
+
+    def dead_letter(self, entry, error):
+        """Keep a webhook the database rejected (not retried) in failed.jsonl"""
+        with open(os.path.join(self.root, 'failed.jsonl'), 'a') as f:
+            f.write(json.dumps({'failed_at': time.time(), 'error': error, 'entry': entry}) + '\n')
+
+    def close(self):
+        with self._cond:
+            while self._syncing:
+                self._cond.wait()
+            os.fsync(self._fd)
+            os.close(self._fd)
+        self._lock_file.close()
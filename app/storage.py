@@ -0,0 +1,444 @@
+"""
+Webhook Storage Backends
+Where the receiver writes a webhook once it is parsed, validated and built
+into a WebhookRecord (app/webhook_record.py). STORAGE_BACKEND selects one:
+
+    postgres  webhook_events / webhook_data_issues / transactions / routes (production)
+    memory    plain Python structures; profiling and load tests without a database
+    sqlite    a local file with the same tables, for running the receiver on a laptop
+
+Every backend offers the same operations:
+
+    load_mappings()        bins / merchants / mids names and dimension keys for the cache
+    ping()                 raise if the store cannot be reached
+    store(record, issues, touch_route)
+                           -> (event id, transaction written); event id None for a
+                           delivery already stored, in which case nothing else is written.
+                           The transaction row is only updated by a record received
+                           after the one it holds (record.received_at), so a webhook
+                           replayed late from the spool never replaces a newer status
+    store_batch(items)     store() for (record, issues, touch_route) items in one
+                           transaction; a rejected item's result is its exception
+
+`unavailable` holds the exception types meaning the store cannot be reached
+(the receiver spools and retries); `rejected` those meaning this webhook was
+refused (it is dead-lettered).
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import nullcontext
+from datetime import timezone
+
+import psycopg2
+
+from app.webhook_record import EVENT_COLUMNS, TRANSACTION_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# transactions columns an upsert updates; an update where none of them
+# changed is skipped
+UPDATABLE_COLUMNS = (
+    'trans_id', 'reply_code', 'reply_desc', 'status', 'system_reference', 'trans_date',
+    'merchant_name', 'mid_id', 'mid_name', 'recon_id',
+)
+# ...plus these, written along with them
+UPDATED_KEYS = ('mid_key', 'merchant_key')
+
+ISSUE_COLUMNS = ('trans_order', 'trans_id', 'issue_type', 'field_name', 'field_value',
+                 'error_message', 'raw_webhook_data')
+
+EMPTY_MAPPINGS = ('bins', 'merchants', 'mids', 'bank_keys', 'mid_keys', 'merchant_keys', 'country_keys')
+
+
+def _no_stage(name):
+    return nullcontext()
+
+
+def issue_rows(record, issues):
+    """webhook_data_issues rows (ISSUE_COLUMNS order) for the issue dicts of one record"""
+    raw = str(record.data)
+    return [(record.trans_order, record.trans_id, issue['issue_type'], issue['field_name'],
+             str(issue['field_value']), issue['error_message'], raw)
+            for issue in issues]
+
+
+def _log_issues(record, issues):
+    for issue in issues:
+        logger.warning(f"Data issue logged: {issue['issue_type']} for {issue['field_name']} in {record.trans_order}")
+
+
+# ---------------------------------------------------------------------------
+# Postgres
+# ---------------------------------------------------------------------------
+
+_INSERT_EVENT_SQL = f"""
+    INSERT INTO webhook_events ({', '.join(EVENT_COLUMNS)}, raw_data, received_at)
+    VALUES ({', '.join(['%s'] * (len(EVENT_COLUMNS) + 2))})
+    ON CONFLICT (delivery_key) WHERE delivery_key IS NOT NULL DO NOTHING
+    RETURNING id;
+"""
+
+_INSERT_ISSUE_SQL = f"""
+    INSERT INTO webhook_data_issues ({', '.join(ISSUE_COLUMNS)})
+    VALUES ({', '.join(['%s'] * len(ISSUE_COLUMNS))})
+"""
+
+_UPSERT_TRANSACTION_SQL = f"""
+    INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}, first_seen_at, last_updated_at)
+    VALUES ({', '.join(['%s'] * (len(TRANSACTION_COLUMNS) + 2))})
+    ON CONFLICT (trans_order) DO UPDATE SET
+        {', '.join(f'{column} = EXCLUDED.{column}' for column in UPDATABLE_COLUMNS + UPDATED_KEYS)},
+        last_updated_at = EXCLUDED.last_updated_at
+    WHERE transactions.last_updated_at <= EXCLUDED.last_updated_at AND (
+        {', '.join(f'transactions.{column}' for column in UPDATABLE_COLUMNS)}
+    ) IS DISTINCT FROM (
+        {', '.join(f'EXCLUDED.{column}' for column in UPDATABLE_COLUMNS)}
+    );
+"""
+
+_TOUCH_ROUTE_SQL = """
+    INSERT INTO routes (mid_id, bank_name, mid_name, first_seen, last_seen)
+    VALUES (%s, %s, %s, NOW(), NOW())
+    ON CONFLICT (mid_id, (COALESCE(bank_name, ''))) DO UPDATE SET
+        mid_name = COALESCE(EXCLUDED.mid_name, routes.mid_name),
+        last_seen = NOW()
+"""
+
+
+class PostgresStorage:
+    """The production schema, through the receiver's pooled connections."""
+
+    name = 'postgres'
+    unavailable = (psycopg2.OperationalError,)
+    rejected = psycopg2.Error
+
+    def __init__(self, get_connection, stage=None):
+        # get_connection(): context manager yielding a connection, committing on exit
+        self._get_connection = get_connection
+        self._stage = stage or _no_stage
+
+    def load_mappings(self):
+        """The 3 mapping tables and the dimension keys, as dicts."""
+        with self._get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT bin, bank_name FROM bin_bank_mapping")
+                bins = dict(cur.fetchall())
+                cur.execute("SELECT merchant_id, merchant_name FROM merchant_mapping")
+                merchants = dict(cur.fetchall())
+                cur.execute("SELECT mid_id, terminal_name FROM mid_mapping")
+                mids = dict(cur.fetchall())
+                cur.execute("SELECT bank_name, bank_key FROM dim_banks")
+                bank_keys = dict(cur.fetchall())
+                cur.execute("SELECT mid_id, mid_name, mid_key FROM dim_mids")
+                mid_keys = {(row[0], row[1]): row[2] for row in cur.fetchall()}
+                cur.execute("SELECT merchant_id, merchant_name, merchant_key FROM dim_merchants")
+                merchant_keys = {(row[0], row[1]): row[2] for row in cur.fetchall()}
+                cur.execute("SELECT country_code, country_key FROM dim_countries")
+                country_keys = dict(cur.fetchall())
+        return {'bins': bins, 'merchants': merchants, 'mids': mids,
+                'bank_keys': bank_keys, 'mid_keys': mid_keys,
+                'merchant_keys': merchant_keys, 'country_keys': country_keys}
+
+    def ping(self):
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+
+    def _write(self, cursor, record, issues, touch_route):
+        # Audit trail: one webhook_events row per distinct delivery. Dimension
+        # keys the record has no value for are set by the table's trigger.
+        with self._stage('insert_event'):
+            cursor.execute(_INSERT_EVENT_SQL, record.event_params() + (record.received_at,))
+            row = cursor.fetchone()
+        if row is None:
+            return None, False
+
+        if issues:
+            with self._stage('insert_issues'):
+                cursor.executemany(_INSERT_ISSUE_SQL, issue_rows(record, issues))
+            _log_issues(record, issues)
+
+        # Latest status only, keyed by trans_order; an unchanged row, or one
+        # already updated by a later webhook, is not rewritten
+        with self._stage('upsert'):
+            cursor.execute(_UPSERT_TRANSACTION_SQL,
+                           record.transaction_params() + (record.received_at, record.received_at))
+            written = cursor.rowcount > 0
+
+        if touch_route:
+            cursor.execute(_TOUCH_ROUTE_SQL, (record.mid_id, record.bank_name, record.mid_name))
+        return row[0], written
+
+    def store(self, record, issues, touch_route):
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                return self._write(cursor, record, issues, touch_route)
+
+    def store_batch(self, items):
+        """One transaction, a savepoint per webhook; a connection problem aborts the whole batch."""
+        results = []
+        with self._get_connection() as conn:
+            with conn.cursor() as cursor:
+                for record, issues, touch_route in items:
+                    cursor.execute("SAVEPOINT stored_webhook")
+                    try:
+                        results.append(self._write(cursor, record, issues, touch_route))
+                    except psycopg2.OperationalError:
+                        raise
+                    except psycopg2.Error as e:
+                        cursor.execute("ROLLBACK TO SAVEPOINT stored_webhook")
+                        results.append(e)
+                        continue
+                    cursor.execute("RELEASE SAVEPOINT stored_webhook")
+        return results
+
+    def close(self):
+        """Nothing to release: the pool belongs to the receiver."""
+
+
+# ---------------------------------------------------------------------------
+# In memory
+# ---------------------------------------------------------------------------
+
+_transaction_index = {column: i for i, column in enumerate(TRANSACTION_COLUMNS)}
+_UPDATE_POSITIONS = [_transaction_index[column] for column in UPDATABLE_COLUMNS + UPDATED_KEYS]
+_COMPARED_POSITIONS = [_transaction_index[column] for column in UPDATABLE_COLUMNS]
+
+
+class MemoryStorage:
+    """
+    Keeps what Postgres would: events (as their column values), data issues,
+    transactions (latest row per trans_order) and routes. Nothing is
+    persisted. `mappings` seeds load_mappings(), e.g. for a load test.
+    """
+
+    name = 'memory'
+    unavailable = ()
+    rejected = ()
+
+    def __init__(self, mappings=None):
+        self._mappings = {name: {} for name in EMPTY_MAPPINGS}
+        self._mappings.update(mappings or {})
+        self._lock = threading.Lock()
+        self.events = []
+        self.issues = []
+        self.transactions = {}
+        self.routes = {}
+        self._delivery_keys = set()
+
+    def load_mappings(self):
+        return {name: dict(mapping) for name, mapping in self._mappings.items()}
+
+    def ping(self):
+        pass
+
+    def _write(self, record, issues, touch_route):
+        key = record.delivery_key
+        if key is not None:
+            if key in self._delivery_keys:
+                return None, False
+            self._delivery_keys.add(key)
+        self.events.append(record.event_params() + (record.received_at,))
+        event_id = len(self.events)
+
+        if issues:
+            self.issues.extend(issue_rows(record, issues))
+            _log_issues(record, issues)
+
+        # TRANSACTION_COLUMNS values + last_updated_at
+        row = record.transaction_params() + (record.received_at,)
+        current = self.transactions.get(record.trans_order)
+        if current is None:
+            self.transactions[record.trans_order] = row
+            written = True
+        elif current[-1] <= row[-1] and any(current[i] != row[i] for i in _COMPARED_POSITIONS):
+            updated = list(current)
+            for i in _UPDATE_POSITIONS + [-1]:
+                updated[i] = row[i]
+            self.transactions[record.trans_order] = tuple(updated)
+            written = True
+        else:
+            written = False
+
+        if touch_route:
+            route = (record.mid_id, record.bank_name)
+            self.routes[route] = record.mid_name or self.routes.get(route)
+        return event_id, written
+
+    def store(self, record, issues, touch_route):
+        with self._lock:
+            return self._write(record, issues, touch_route)
+
+    def store_batch(self, items):
+        with self._lock:
+            return [self._write(*item) for item in items]
+
+    def close(self):
+        pass
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+_SQLITE_KEY_COLUMNS = {'bank_key', 'mid_key', 'merchant_key', 'country_key'}
+
+
+def _sqlite_columns(columns):
+    return ',\n    '.join(f"{column} {'INTEGER' if column in _SQLITE_KEY_COLUMNS else 'TEXT'}"
+                          for column in columns)
+
+
+_SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id INTEGER PRIMARY KEY,
+    {_sqlite_columns(EVENT_COLUMNS)},
+    raw_data TEXT,
+    received_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_webhook_events_delivery_key ON webhook_events (delivery_key);
+CREATE TABLE IF NOT EXISTS webhook_data_issues (
+    id INTEGER PRIMARY KEY,
+    {_sqlite_columns(ISSUE_COLUMNS)},
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS transactions (
+    {_sqlite_columns(TRANSACTION_COLUMNS)},
+    first_seen_at TEXT,
+    last_updated_at TEXT,
+    PRIMARY KEY (trans_order)
+);
+CREATE TABLE IF NOT EXISTS routes (
+    mid_id TEXT, bank_name TEXT, mid_name TEXT, first_seen TEXT, last_seen TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_routes_route ON routes (mid_id, COALESCE(bank_name, ''));
+CREATE TABLE IF NOT EXISTS bin_bank_mapping (bin TEXT PRIMARY KEY, bank_name TEXT);
+CREATE TABLE IF NOT EXISTS merchant_mapping (merchant_id TEXT PRIMARY KEY, merchant_name TEXT);
+CREATE TABLE IF NOT EXISTS mid_mapping (mid_id TEXT PRIMARY KEY, terminal_name TEXT);
+"""
+
+# Same statements as Postgres, in SQLite's dialect (?, CURRENT_TIMESTAMP, IS NOT)
+_SQLITE_INSERT_EVENT_SQL = f"""
+    INSERT INTO webhook_events ({', '.join(EVENT_COLUMNS)}, raw_data, received_at)
+    VALUES ({', '.join(['?'] * (len(EVENT_COLUMNS) + 2))})
+    ON CONFLICT (delivery_key) DO NOTHING
+    RETURNING id
+"""
+
+_SQLITE_INSERT_ISSUE_SQL = f"""
+    INSERT INTO webhook_data_issues ({', '.join(ISSUE_COLUMNS)})
+    VALUES ({', '.join(['?'] * len(ISSUE_COLUMNS))})
+"""
+
+_SQLITE_UPSERT_TRANSACTION_SQL = f"""
+    INSERT INTO transactions ({', '.join(TRANSACTION_COLUMNS)}, first_seen_at, last_updated_at)
+    VALUES ({', '.join(['?'] * (len(TRANSACTION_COLUMNS) + 2))})
+    ON CONFLICT (trans_order) DO UPDATE SET
+        {', '.join(f'{column} = excluded.{column}' for column in UPDATABLE_COLUMNS + UPDATED_KEYS)},
+        last_updated_at = excluded.last_updated_at
+    WHERE transactions.last_updated_at <= excluded.last_updated_at AND (
+        {', '.join(f'transactions.{column}' for column in UPDATABLE_COLUMNS)}
+    ) IS NOT (
+        {', '.join(f'excluded.{column}' for column in UPDATABLE_COLUMNS)}
+    )
+"""
+
+_SQLITE_TOUCH_ROUTE_SQL = """
+    INSERT INTO routes (mid_id, bank_name, mid_name, first_seen, last_seen)
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT (mid_id, COALESCE(bank_name, '')) DO UPDATE SET
+        mid_name = COALESCE(excluded.mid_name, routes.mid_name),
+        last_seen = CURRENT_TIMESTAMP
+"""
+
+
+def _json_text(doc):
+    return json.dumps(doc, separators=(',', ':'))
+
+
+def _sqlite_time(moment):
+    """UTC text in CURRENT_TIMESTAMP's format (plus microseconds), so stored times compare as text"""
+    return moment.astimezone(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class SQLiteStorage:
+    """
+    The receiver's tables in one SQLite file (created if missing). Mapping
+    tables are created empty; there are no dimension tables, so keys stay
+    NULL. One connection, used under a lock.
+    """
+
+    name = 'sqlite'
+    unavailable = (sqlite3.OperationalError,)
+    rejected = sqlite3.Error
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        # Autocommit mode: transactions are opened explicitly with BEGIN
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SQLITE_SCHEMA)
+
+    def load_mappings(self):
+        mappings = {name: {} for name in EMPTY_MAPPINGS}
+        with self._lock:
+            mappings['bins'] = dict(self._conn.execute("SELECT bin, bank_name FROM bin_bank_mapping"))
+            mappings['merchants'] = dict(self._conn.execute("SELECT merchant_id, merchant_name FROM merchant_mapping"))
+            mappings['mids'] = dict(self._conn.execute("SELECT mid_id, terminal_name FROM mid_mapping"))
+        return mappings
+
+    def ping(self):
+        with self._lock:
+            self._conn.execute("SELECT 1")
+
+    def _write(self, record, issues, touch_route):
+        cursor = self._conn.cursor()
+        received_at = _sqlite_time(record.received_at)
+        row = cursor.execute(_SQLITE_INSERT_EVENT_SQL,
+                             record.event_params(_json_text) + (received_at,)).fetchone()
+        if row is None:
+            return None, False
+        if issues:
+            cursor.executemany(_SQLITE_INSERT_ISSUE_SQL, issue_rows(record, issues))
+            _log_issues(record, issues)
+        cursor.execute(_SQLITE_UPSERT_TRANSACTION_SQL, record.transaction_params() + (received_at, received_at))
+        written = cursor.rowcount > 0
+        if touch_route:
+            cursor.execute(_SQLITE_TOUCH_ROUTE_SQL, (record.mid_id, record.bank_name, record.mid_name))
+        return row[0], written
+
+    def store(self, record, issues, touch_route):
+        result = self.store_batch([(record, issues, touch_route)])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def store_batch(self, items):
+        """One transaction, a savepoint per webhook (as in Postgres)."""
+        results = []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for item in items:
+                    self._conn.execute("SAVEPOINT stored_webhook")
+                    try:
+                        results.append(self._write(*item))
+                    except sqlite3.OperationalError:
+                        raise
+                    except sqlite3.Error as e:
+                        self._conn.execute("ROLLBACK TO SAVEPOINT stored_webhook")
+                        results.append(e)
+                    self._conn.execute("RELEASE SAVEPOINT stored_webhook")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return results
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
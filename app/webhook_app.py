@@ -5,69 +5,169 @@ Receives transaction webhooks from Coriunder and stores in PostgreSQL
 Updated to use trans_order as unique identifier and include merchant names
 """
 
-from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 import psycopg2
-from psycopg2 import pool as psycopg2_pool
-from psycopg2.extras import RealDictCursor
 from datetime import datetime
 import logging
 from urllib.parse import parse_qs
 import os
-from contextlib import contextmanager
+from contextlib import asynccontextmanager, contextmanager
+from concurrent.futures import ThreadPoolExecutor
 import requests
 import json
+import asyncio
 import threading
 import time
+import queue
+import select
 from dotenv import load_dotenv
 
+from app.metrics import (
+    Counter, Gauge, Histogram, CONTENT_TYPE_LATEST, generate_latest,
+    start_multiprocess_writer, stop_multiprocess_writer,
+)
+from app.log_config import configure_logging, success_sampled
+from app.dedup import DeliveryCache, delivery_key
+from app.fast_parse import is_urlencoded, parse_urlencoded
+from app.webhook_record import WebhookRecord
+from app.db_pool import BoundedPool, PoolExhausted, pool_size, server_max_connections
+from app.spool import Spool, SpoolFull
+from app.storage import MemoryStorage, PostgresStorage, SQLiteStorage
+from services import db
+
 # Load environment variables from .env file
 load_dotenv('/opt/payment-webhook/.env')
 
-# Create logs directory if it doesn't exist
+# Logs go to ./logs/webhook_receiver.log once the app starts (queued JSON by
+# default - see app/log_config.py for LOG_MODE / LOG_FORMAT)
 log_dir = './logs'
-os.makedirs(log_dir, exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('./logs/webhook_receiver.log'),
-        logging.StreamHandler()
-    ]
-)
+_log_handler = None
 logger = logging.getLogger(__name__)
 
-# Initialize FastAPI
-app = FastAPI(title="Payment Webhook Receiver", version="2.1.0")
+# Routes; create_app() mounts them on the FastAPI application
+router = APIRouter()
 
-@app.on_event("startup")
-async def startup_event():
-    _init_cache()
+# Database configuration (services/db.py; its connect_timeout bounds every new
+# connection, so a down or unreachable Postgres cannot stall startup or a pool
+# checkout)
+DB_CONFIG = db.write_config('receiver')
 
-# Database configuration
-DB_CONFIG = {
-    'dbname': os.getenv('DB_NAME', 'payment_transactions'),
-    'user': os.getenv('DB_USER', 'webhook_user'),
-    'password': os.getenv('DB_PASSWORD'),
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', '5432')
-}
+# Where webhooks are written (see app/storage.py): postgres, or memory / sqlite
+# to run the receiver without a database (profiling, load tests, local runs)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'postgres')
+SQLITE_PATH = os.getenv('SQLITE_PATH', './webhooks.sqlite3')
 
 # Slack configuration
 SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL', '')
 
-# Connection pool: 2 idle connections kept warm, up to 10 under load (4 workers × ~2 concurrent)
-_db_pool = psycopg2_pool.ThreadedConnectionPool(minconn=2, maxconn=10, **DB_CONFIG)
+# Recently committed delivery keys kept per worker for duplicate detection
+DEDUP_CACHE_SIZE = int(os.getenv('DEDUP_CACHE_SIZE', '100000'))
+
+# Connection pool (see app/db_pool.py). Each worker gets an equal share of
+# Postgres max_connections minus DB_POOL_RESERVED, capped at DB_POOL_MAX.
+# A webhook waits up to DB_POOL_TIMEOUT seconds for a connection, with at
+# most DB_POOL_MAX_WAITERS waiting; beyond that it is answered 503 with
+# Retry-After: SHED_RETRY_AFTER so Coriunder retries later.
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_RESERVED = int(os.getenv('DB_POOL_RESERVED', '20'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '2'))
+DB_POOL_MAX_WAITERS = int(os.getenv('DB_POOL_MAX_WAITERS', '32'))
+SHED_RETRY_AFTER = int(os.getenv('SHED_RETRY_AFTER', '5'))
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))  # uvicorn --workers
+
+# Local spool (see app/spool.py): a webhook whose database write takes longer
+# than SPOOL_DB_BUDGET seconds, or fails because Postgres is unreachable or
+# out of connections, is written to SPOOL_DIR instead and replayed in batches
+# of SPOOL_REPLAY_BATCH once the database recovers. Empty SPOOL_DIR disables it.
+SPOOL_DIR = os.getenv('SPOOL_DIR', './spool')
+SPOOL_DB_BUDGET = float(os.getenv('SPOOL_DB_BUDGET', '1'))
+SPOOL_MAX_MB = int(os.getenv('SPOOL_MAX_MB', '1024'))
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', '500'))
+SPOOL_REPLAY_INTERVAL = 2  # seconds between replay attempts while the database is down
+
+# /health is answered from a status a background thread refreshes every
+# HEALTH_CHECK_INTERVAL seconds (one SELECT 1 per worker, not per probe);
+# the database counts as down once no ping has succeeded for 3 intervals.
+HEALTH_CHECK_INTERVAL = float(os.getenv('HEALTH_CHECK_INTERVAL', '5'))
+
+# Seconds shutdown waits for background threads (Slack queue, spool replay batch)
+SHUTDOWN_TIMEOUT = 10
+
+# ---------------------------------------------------------------------------
+# Metrics (exposed at /metrics, see app/metrics.py)
+# ---------------------------------------------------------------------------
+WEBHOOK_REQUESTS = Counter(
+    'webhook_requests_total', 'Webhook requests by response status', ['status'])
+WEBHOOK_LATENCY = Histogram(
+    'webhook_request_duration_seconds', 'End-to-end webhook handling time')
+WEBHOOK_STAGE_LATENCY = Histogram(
+    'webhook_stage_duration_seconds',
+    'Webhook handling time per stage (parse, cache_lookup, validate, insert_event, insert_issues, upsert, commit)',
+    ['stage'])
+DB_POOL_WAIT = Histogram(
+    'db_pool_checkout_wait_seconds', 'Time spent checking a connection out of the pool')
+DB_POOL_IN_USE = Gauge(
+    'db_pool_connections_in_use', 'Pooled connections currently checked out')
+DB_POOL_LIMIT = Gauge(
+    'db_pool_connections_max', 'Pool size limit (saturation = in_use / max)')
+DB_POOL_WAITING = Gauge(
+    'db_pool_checkouts_waiting', 'Requests waiting for a pooled connection')
+DB_POOL_REJECTED = Counter(
+    'db_pool_checkouts_rejected_total', 'Checkouts shed with 503, by reason (timeout, queue_full)',
+    ['reason'])
+CACHE_LOOKUPS = Counter(
+    'mapping_cache_lookups_total', 'Mapping cache lookups by table and result', ['table', 'result'])
+SLACK_QUEUE_DEPTH = Gauge(
+    'slack_notifier_queue_depth', 'Slack notifications waiting to be sent')
+SLACK_DROPPED = Counter(
+    'slack_notifications_dropped_total', 'Slack notifications dropped because the queue was full')
+TRANSACTION_UPSERTS = Counter(
+    'transaction_upserts_total', 'transactions upserts by outcome (written, or skipped as unchanged)',
+    ['result'])
+WEBHOOK_DUPLICATES = Counter(
+    'webhook_duplicates_total', 'Duplicate deliveries answered without writing, by where they were caught',
+    ['source'])
+SPOOL_PENDING = Gauge(
+    'spool_pending_webhooks', 'Spooled webhooks waiting to be written to the database')
+SPOOL_PENDING.set_function(lambda: _spool.pending if _spool else 0)
+WEBHOOKS_SPOOLED = Counter(
+    'webhooks_spooled_total', 'Webhooks written to the local spool, by reason (slow, unavailable, busy, backlog)',
+    ['reason'])
+SPOOL_REPLAYED = Counter(
+    'spool_replayed_total', 'Spooled webhooks replayed, by result (stored, duplicate, failed)', ['result'])
+LOG_DROPPED = Counter(
+    'log_records_dropped_total', 'Log records dropped because the logging queue was full')
+LOG_DROPPED.set_function(lambda: getattr(_log_handler, 'dropped', 0))
+
+# Storage backend and, for postgres, the connection pool (2 idle connections
+# kept warm, up to this worker's share under load); opened by start_receiver()
+_storage = None
+_db_pool: BoundedPool | None = None
+DB_POOL_LIMIT.set_function(lambda: _db_pool.maxconn if _db_pool else 0)
+DB_POOL_IN_USE.set_function(lambda: _db_pool.in_use if _db_pool else 0)
+DB_POOL_WAITING.set_function(lambda: _db_pool.waiting if _db_pool else 0)
+
+# Set by stop_receiver(); background loops exit at their next wakeup
+_stopping = threading.Event()
+_workers: list = []  # background threads stop_receiver() waits for
 
 @contextmanager
 def get_db_connection():
-    """Borrow a connection from the pool, return it on exit."""
-    conn = _db_pool.getconn()
+    """Borrow a connection from the pool, return it on exit. Raises PoolExhausted when overloaded."""
+    checkout_started = time.perf_counter()
+    try:
+        conn = _db_pool.getconn()
+    except PoolExhausted as e:
+        DB_POOL_REJECTED.inc(e.reason)
+        raise
+    finally:
+        DB_POOL_WAIT.observe(time.perf_counter() - checkout_started)
     try:
         yield conn
-        conn.commit()
+        with WEBHOOK_STAGE_LATENCY.time('commit'):
+            conn.commit()
     except Exception as e:
         conn.rollback()
         logger.error(f"Database error: {e}")
@@ -79,68 +179,178 @@ def get_db_connection():
 # In-memory mapping cache
 # bin_bank_mapping, merchant_mapping, mid_mapping are static config tables
 # (~768 KB total). Cache them and refresh every 5 minutes so DB lookups
-# become O(1) dict access instead of a round-trip per webhook.
+# become O(1) dict access instead of a round-trip per webhook. Imports
+# (utils/mapping_import.py) NOTIFY on _MAPPING_NOTIFY_CHANNEL after they
+# commit, which triggers an immediate refresh.
+# The dimension tables (dim_banks, dim_mids, dim_merchants, dim_countries;
+# database/migrations/migration_create_dimension_keys.sql) are cached the same
+# way so rows are written with their integer keys. A value the cache has not
+# seen yet is written without a key and the insert trigger assigns one (and
+# NOTIFYs, so the next refresh picks it up).
 # ---------------------------------------------------------------------------
-_mapping_cache: dict = {'bins': {}, 'merchants': {}, 'mids': {}}
+_mapping_cache: dict = {'bins': {}, 'merchants': {}, 'mids': {},
+                        'bank_keys': {}, 'mid_keys': {}, 'merchant_keys': {}, 'country_keys': {}}
 _cache_lock = threading.RLock()
 _CACHE_TTL = 300  # seconds
+_CACHE_RETRY = 5  # seconds between load attempts until the first one succeeds
+_cache_loaded_at: float | None = None  # time.time() of the last successful load; None = never (not ready)
+_MAPPING_NOTIFY_CHANNEL = 'mapping_refresh'
+
+# Delivery keys this worker has committed (see app/dedup.py)
+_delivery_cache = DeliveryCache(DEDUP_CACHE_SIZE)
+
+# Routes catalog (routes table, read by the Telegram bot): each worker upserts
+# a (mid_id, bank_name) route when it first sees it, when its mid_name changes,
+# and otherwise at most once per interval to keep last_seen fresh.
+_route_touches: dict = {}
+_route_touch_lock = threading.Lock()
+_ROUTE_TOUCH_INTERVAL = 300  # seconds
+
+def _open_mapping_listener():
+    """Dedicated autocommit connection LISTENing for mapping imports (postgres only, else None)."""
+    if _storage.name != 'postgres':
+        return None
+    conn = psycopg2.connect(**DB_CONFIG)
+    conn.autocommit = True
+    conn.cursor().execute(f"LISTEN {_MAPPING_NOTIFY_CHANNEL}")
+    return conn
 
-def _load_mappings() -> dict:
-    """Load all 3 mapping tables from DB into dicts."""
-    conn = _db_pool.getconn()
+def _store_mappings(fresh):
+    global _cache_loaded_at
+    with _cache_lock:
+        _mapping_cache.update(fresh)
+        _cache_loaded_at = time.time()
+
+def _wait_for_refresh(listen_conn, timeout):
+    """Block until an import NOTIFY or timeout seconds. Returns the listener, or None if it broke."""
+    if listen_conn is None:
+        _stopping.wait(timeout)
+        return None
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT bin, bank_name FROM bin_bank_mapping")
-            bins = {row[0]: row[1] for row in cur.fetchall()}
-            cur.execute("SELECT merchant_id, merchant_name FROM merchant_mapping")
-            merchants = {row[0]: row[1] for row in cur.fetchall()}
-            cur.execute("SELECT mid_id, terminal_name FROM mid_mapping")
-            mids = {row[0]: row[1] for row in cur.fetchall()}
-        return {'bins': bins, 'merchants': merchants, 'mids': mids}
-    finally:
-        _db_pool.putconn(conn)
+        if select.select([listen_conn], [], [], timeout)[0]:
+            listen_conn.poll()
+            tables = {notify.payload for notify in listen_conn.notifies}
+            listen_conn.notifies.clear()
+            logger.info(f"Mapping import notified ({', '.join(sorted(tables))}) — refreshing cache")
+        return listen_conn
+    except Exception as e:
+        logger.warning(f"Mapping cache LISTEN connection lost: {e}")
+        try:
+            listen_conn.close()
+        except Exception:
+            pass
+        return None
 
 def _refresh_cache_loop():
-    """Background thread: reload mappings every TTL seconds."""
-    while True:
-        time.sleep(_CACHE_TTL)
+    """
+    Background thread: reload mappings every TTL seconds, or when an import
+    NOTIFYs. Until the first load succeeds (the worker is not ready), retry
+    every _CACHE_RETRY seconds instead.
+    """
+    listen_conn = None
+    while not _stopping.is_set():
+        if listen_conn is None:
+            try:
+                listen_conn = _open_mapping_listener()
+            except Exception as e:
+                logger.warning(f"Mapping cache LISTEN failed (TTL refresh only): {e}")
+        listen_conn = _wait_for_refresh(listen_conn, _CACHE_TTL if _cache_loaded_at else _CACHE_RETRY)
+        if _stopping.is_set():
+            break
         try:
-            fresh = _load_mappings()
-            with _cache_lock:
-                _mapping_cache.update(fresh)
+            _store_mappings(_storage.load_mappings())
             logger.info(f"Mapping cache refreshed — bins:{len(_mapping_cache['bins'])} merchants:{len(_mapping_cache['merchants'])} mids:{len(_mapping_cache['mids'])}")
         except Exception as e:
             logger.warning(f"Mapping cache refresh failed (using stale data): {e}")
 
 def _init_cache():
-    """Load cache on startup, then start background refresh thread."""
+    """Load the cache, then keep refreshing it (background thread, started at startup)."""
     try:
-        fresh = _load_mappings()
-        with _cache_lock:
-            _mapping_cache.update(fresh)
+        _store_mappings(_storage.load_mappings())
         logger.info(f"Mapping cache loaded — bins:{len(_mapping_cache['bins'])} merchants:{len(_mapping_cache['merchants'])} mids:{len(_mapping_cache['mids'])}")
     except Exception as e:
         logger.error(f"Failed to load mapping cache on startup: {e}")
-    t = threading.Thread(target=_refresh_cache_loop, daemon=True)
-    t.start()
+    _refresh_cache_loop()
 
 def lookup_bank_name(ccbin: str | None) -> str | None:
     if not ccbin:
         return None
     with _cache_lock:
-        return _mapping_cache['bins'].get(ccbin)
+        bank_name = _mapping_cache['bins'].get(ccbin)
+    CACHE_LOOKUPS.inc('bins', 'miss' if bank_name is None else 'hit')
+    return bank_name
 
 def lookup_merchant_name(merchant_id: str | None) -> str | None:
     if not merchant_id:
         return None
     with _cache_lock:
-        return _mapping_cache['merchants'].get(merchant_id)
+        merchant_name = _mapping_cache['merchants'].get(merchant_id)
+    CACHE_LOOKUPS.inc('merchants', 'miss' if merchant_name is None else 'hit')
+    return merchant_name
 
 def lookup_mid_name(mid_id: str | None) -> str | None:
     if not mid_id:
         return None
     with _cache_lock:
-        return _mapping_cache['mids'].get(mid_id)
+        mid_name = _mapping_cache['mids'].get(mid_id)
+    CACHE_LOOKUPS.inc('mids', 'miss' if mid_name is None else 'hit')
+    return mid_name
+
+def lookup_dimension_keys(data, bank_name, merchant_name, mid_name) -> dict:
+    """Dimension keys for the row's text values; None where the cache has no key yet."""
+    mid_id = data.get('MidID')
+    merchant_id = data.get('merchant_id')
+    country = data.get('client_country')
+    with _cache_lock:
+        keys = {
+            'bank_key': _mapping_cache['bank_keys'].get(bank_name) if bank_name else None,
+            'mid_key': _mapping_cache['mid_keys'].get((mid_id, mid_name)) if mid_id else None,
+            'merchant_key': (_mapping_cache['merchant_keys'].get((merchant_id, merchant_name))
+                             if merchant_id else None),
+            'country_key': _mapping_cache['country_keys'].get(country) if country else None,
+        }
+    missing = ((bank_name and keys['bank_key'] is None) or (mid_id and keys['mid_key'] is None)
+               or (merchant_id and keys['merchant_key'] is None) or (country and keys['country_key'] is None))
+    CACHE_LOOKUPS.inc('dimensions', 'miss' if missing else 'hit')
+    return keys
+
+_KEY_NAMES = ('bank_key', 'mid_key', 'merchant_key', 'country_key')
+
+def resolve_record(data, status, key, received_at=None, spooled=None):
+    """
+    WebhookRecord with names and dimension keys resolved from the mapping
+    cache. For a replay, `spooled` is the record as it was spooled: its names
+    and keys fill in what the cache does not know (yet).
+    """
+    bank_name = lookup_bank_name(data.get('ccBIN'))
+    merchant_name = lookup_merchant_name(data.get('merchant_id'))
+    mid_name = lookup_mid_name(data.get('MidID'))
+    if spooled is not None:
+        bank_name = bank_name or spooled.bank_name
+        merchant_name = merchant_name or spooled.merchant_name
+        mid_name = mid_name or spooled.mid_name
+    keys = lookup_dimension_keys(data, bank_name, merchant_name, mid_name)
+    if spooled is not None and (bank_name, merchant_name, mid_name) == (
+            spooled.bank_name, spooled.merchant_name, spooled.mid_name):
+        keys = {name: keys[name] if keys[name] is not None else getattr(spooled, name) for name in _KEY_NAMES}
+    return WebhookRecord.build(data, status, bank_name, merchant_name, mid_name, keys, key, received_at)
+
+def route_due(record):
+    """
+    Whether to record the record's route in the routes catalog now (throttled
+    per worker). A BIN not in bin_bank_mapping gives a route with a NULL bank,
+    which keeps the MID findable in the bot's MID search.
+    """
+    if not record.mid_id:
+        return False
+    now = time.monotonic()
+    route = (record.mid_id, record.bank_name)
+    with _route_touch_lock:
+        last = _route_touches.get(route)
+        if last and last[0] == record.mid_name and now - last[1] < _ROUTE_TOUCH_INTERVAL:
+            return False
+        _route_touches[route] = (record.mid_name, now)
+    return True
 
 def send_slack_notification(status_code, error_message, webhook_data, request_info):
     """Send error notification to Slack channel"""
@@ -230,6 +440,30 @@ def send_slack_notification(status_code, error_message, webhook_data, request_in
         logger.error(f"Error sending Slack notification: {e}", exc_info=True)
         return False
 
+# ---------------------------------------------------------------------------
+# Slack notifier queue
+# A Slack post can block for up to 5s; webhook handlers only enqueue and a
+# background thread delivers, so error responses are never held up by Slack.
+# ---------------------------------------------------------------------------
+_slack_queue: queue.Queue = queue.Queue(maxsize=1000)
+SLACK_QUEUE_DEPTH.set_function(_slack_queue.qsize)
+
+def _slack_worker():
+    """Background thread: deliver queued Slack notifications in order (None stops it)."""
+    while True:
+        args = _slack_queue.get()
+        if args is None:
+            return
+        send_slack_notification(*args)
+
+def notify_slack(status_code, error_message, webhook_data, request_info):
+    """Queue a Slack error notification for the background sender."""
+    try:
+        _slack_queue.put_nowait((status_code, error_message, dict(webhook_data), request_info))
+    except queue.Full:
+        SLACK_DROPPED.inc()
+        logger.warning(f"Slack notification queue full, dropping {status_code} notification")
+
 def determine_status(reply_code):
     """Determine transaction status based on reply_code"""
     if reply_code == '553':
@@ -255,37 +489,26 @@ def parse_webhook_data(form_data):
     
     return data
 
-def log_data_issue(trans_order, trans_id, issue_type, field_name, field_value, error_message, raw_data, cursor):
-    """Log data quality issues"""
-    try:
-        cursor.execute("""
-            INSERT INTO webhook_data_issues 
-            (trans_order, trans_id, issue_type, field_name, field_value, error_message, raw_webhook_data)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (trans_order, trans_id, issue_type, field_name, str(field_value), error_message, str(raw_data)))
-        logger.warning(f"Data issue logged: {issue_type} for {field_name} in {trans_order}")
-    except Exception as e:
-        logger.error(f"Failed to log data issue: {e}")
-
-def validate_webhook_data(data, bank_name, merchant_name, cursor):
-    """Validate webhook data and log issues. Uses pre-resolved names from cache."""
+def validate_webhook_data(record):
+    """Data quality issues of a webhook, stored with it. Uses pre-resolved names from cache."""
     issues = []
 
     # Required fields
     required_fields = ['trans_order', 'reply_code', 'merchant_id', 'trans_date']
     for field in required_fields:
-        if not data.get(field):
+        value = getattr(record, field)
+        if not value:
             issues.append({
                 'issue_type': 'missing_field',
                 'field_name': field,
-                'field_value': data.get(field),
+                'field_value': value,
                 'error_message': f'Required field {field} is missing or empty'
             })
 
     # Check BIN via cache (no DB query needed)
-    cc_bin = data.get('ccBIN')
+    cc_bin = record.cc_bin
     if cc_bin:
-        if bank_name is None:
+        if record.bank_name is None:
             issues.append({
                 'issue_type': 'missing_bin_mapping',
                 'field_name': 'ccBIN',
@@ -301,8 +524,8 @@ def validate_webhook_data(data, bank_name, merchant_name, cursor):
         })
 
     # Check merchant via cache (no DB query needed)
-    merchant_id = data.get('merchant_id')
-    if merchant_id and merchant_name is None:
+    merchant_id = record.merchant_id
+    if merchant_id and record.merchant_name is None:
         issues.append({
             'issue_type': 'missing_merchant_mapping',
             'field_name': 'merchant_id',
@@ -312,202 +535,133 @@ def validate_webhook_data(data, bank_name, merchant_name, cursor):
 
     # Important optional fields
     for field in ['client_email', 'client_fullname', 'trans_amount']:
-        if not data.get(field):
+        value = getattr(record, field)
+        if not value:
             issues.append({
                 'issue_type': 'missing_optional',
                 'field_name': field,
-                'field_value': data.get(field),
+                'field_value': value,
                 'error_message': f'Optional but important field {field} is missing'
             })
 
-    for issue in issues:
-        log_data_issue(
-            data.get('trans_order'),
-            data.get('trans_id'),
-            issue['issue_type'],
-            issue['field_name'],
-            issue['field_value'],
-            issue['error_message'],
-            data,
-            cursor
-        )
+    return issues
+
+def _count_write(event_id, written, issues):
+    if event_id is not None:
+        if issues:
+            logger.warning(f"Webhook has {len(issues)} data quality issues")
+        TRANSACTION_UPSERTS.inc('written' if written else 'skipped')
 
-    return len(issues)
-
-def insert_webhook_event(data, status, bank_name, merchant_name, mid_name, cursor):
-    """Insert webhook event into webhook_events table (audit trail)."""
-    insert_query = """
-    INSERT INTO webhook_events (
-        trans_id, trans_order, reply_code, reply_desc, status,
-        trans_date, otrans_amount, trans_amount,
-        otrans_currency, trans_currency,
-        merchant_id, merchant_name, client_fullname, client_phone, client_email,
-        payment_details, exp_month, exp_year, trans_type,
-        signature, system_reference,
-        debit_company, debrefnum, debrefcode, debit_companyname,
-        is3d, is_refund,
-        client_address, client_address2, client_zipcode,
-        client_country, client_city,
-        bin_country, pm, cc_bin, bank_name,
-        plid, storage_id, mid_id, mid_name, recon_id, cp26, cp27, cp28, cp29, cp30,
-        raw_data
-    ) VALUES (
-        %(trans_id)s, %(trans_order)s, %(reply_code)s, %(reply_desc)s, %(status)s,
-        %(trans_date)s, %(otrans_amount)s, %(trans_amount)s,
-        %(otrans_currency)s, %(trans_currency)s,
-        %(merchant_id)s, %(merchant_name)s, %(client_fullname)s, %(client_phone)s, %(client_email)s,
-        %(payment_details)s, %(exp_month)s, %(exp_year)s, %(trans_type)s,
-        %(signature)s, %(system_reference)s,
-        %(debit_company)s, %(debrefnum)s, %(debrefcode)s, %(debit_companyname)s,
-        %(is3d)s, %(is_refund)s,
-        %(client_address)s, %(client_address2)s, %(client_zipcode)s,
-        %(client_country)s, %(client_city)s,
-        %(bin_country)s, %(pm)s, %(ccBIN)s, %(bank_name)s,
-        %(plid)s, %(StorageID)s, %(mid_id)s, %(mid_name)s, %(recon_id)s, %(CP26)s, %(CP27)s, %(CP28)s, %(CP29)s, %(CP30)s,
-        %(raw_data)s
-    )
-    RETURNING id;
+def store_webhook(record):
     """
-    params = {
-        'trans_id': data.get('trans_id'),
-        'trans_order': data.get('trans_order'),
-        'reply_code': data.get('reply_code'),
-        'reply_desc': data.get('reply_desc'),
-        'status': status,
-        'trans_date': data.get('trans_date'),
-        'otrans_amount': data.get('otrans_amount'),
-        'trans_amount': data.get('trans_amount'),
-        'otrans_currency': data.get('otrans_currency'),
-        'trans_currency': data.get('trans_currency'),
-        'merchant_id': data.get('merchant_id'),
-        'merchant_name': merchant_name,
-        'client_fullname': data.get('client_fullname'),
-        'client_phone': data.get('client_phone'),
-        'client_email': data.get('client_email'),
-        'payment_details': data.get('payment_details'),
-        'exp_month': data.get('exp_month'),
-        'exp_year': data.get('exp_year'),
-        'trans_type': data.get('trans_type'),
-        'signature': data.get('signature'),
-        'system_reference': data.get('system_reference'),
-        'debit_company': data.get('debit_company'),
-        'debrefnum': data.get('debrefnum'),
-        'debrefcode': data.get('debrefcode'),
-        'debit_companyname': data.get('debit_companyname'),
-        'is3d': data.get('is3d'),
-        'is_refund': data.get('isRefund'),
-        'client_address': data.get('client_address'),
-        'client_address2': data.get('client_address2'),
-        'client_zipcode': data.get('client_zipcode'),
-        'client_country': data.get('client_country'),
-        'client_city': data.get('client_city'),
-        'bin_country': data.get('bin_country'),
-        'pm': data.get('pm'),
-        'ccBIN': data.get('ccBIN'),
-        'bank_name': bank_name,
-        'plid': data.get('plid'),
-        'StorageID': data.get('StorageID'),
-        'mid_id': data.get('MidID'),
-        'mid_name': mid_name,
-        'recon_id': data.get('ReconID'),
-        'CP26': data.get('CP26'),
-        'CP27': data.get('CP27'),
-        'CP28': data.get('CP28'),
-        'CP29': data.get('CP29'),
-        'CP30': data.get('CP30'),
-        'raw_data': str(data)
-    }
-    cursor.execute(insert_query, params)
-    return cursor.fetchone()['id']
-
-def upsert_transaction(data, status, bank_name, merchant_name, mid_name, cursor):
-    """Insert or update transaction keyed by trans_order (latest status only)."""
-    upsert_query = """
-    INSERT INTO transactions (
-        trans_order, trans_id, reply_code, reply_desc, status,
-        trans_date, otrans_amount, trans_amount,
-        otrans_currency, trans_currency,
-        merchant_id, merchant_name, client_fullname, client_phone, client_email,
-        payment_details, exp_month, exp_year, trans_type,
-        system_reference,
-        debit_company, debrefnum, debrefcode, debit_companyname,
-        is3d, is_refund,
-        client_address, client_address2, client_zipcode,
-        client_country, client_city,
-        bin_country, pm, cc_bin, bank_name,
-        mid_id, mid_name, recon_id,
-        first_seen_at, last_updated_at
-    ) VALUES (
-        %(trans_order)s, %(trans_id)s, %(reply_code)s, %(reply_desc)s, %(status)s,
-        %(trans_date)s, %(otrans_amount)s, %(trans_amount)s,
-        %(otrans_currency)s, %(trans_currency)s,
-        %(merchant_id)s, %(merchant_name)s, %(client_fullname)s, %(client_phone)s, %(client_email)s,
-        %(payment_details)s, %(exp_month)s, %(exp_year)s, %(trans_type)s,
-        %(system_reference)s,
-        %(debit_company)s, %(debrefnum)s, %(debrefcode)s, %(debit_companyname)s,
-        %(is3d)s, %(is_refund)s,
-        %(client_address)s, %(client_address2)s, %(client_zipcode)s,
-        %(client_country)s, %(client_city)s,
-        %(bin_country)s, %(pm)s, %(ccBIN)s, %(bank_name)s,
-        %(mid_id)s, %(mid_name)s, %(recon_id)s,
-        NOW(), NOW()
-    )
-    ON CONFLICT (trans_order) DO UPDATE SET
-        trans_id = EXCLUDED.trans_id,
-        reply_code = EXCLUDED.reply_code,
-        reply_desc = EXCLUDED.reply_desc,
-        status = EXCLUDED.status,
-        system_reference = EXCLUDED.system_reference,
-        trans_date = EXCLUDED.trans_date,
-        merchant_name = EXCLUDED.merchant_name,
-        mid_id = EXCLUDED.mid_id,
-        mid_name = EXCLUDED.mid_name,
-        recon_id = EXCLUDED.recon_id,
-        last_updated_at = NOW();
+    Store one webhook (webhook_events row, data issues, transactions upsert,
+    route touch) in one transaction. Returns the event id, or None if this
+    delivery was already stored.
     """
-    params = {
-        'trans_order': data.get('trans_order'),
-        'trans_id': data.get('trans_id'),
-        'reply_code': data.get('reply_code'),
-        'reply_desc': data.get('reply_desc'),
-        'status': status,
-        'trans_date': data.get('trans_date'),
-        'otrans_amount': data.get('otrans_amount'),
-        'trans_amount': data.get('trans_amount'),
-        'otrans_currency': data.get('otrans_currency'),
-        'trans_currency': data.get('trans_currency'),
-        'merchant_id': data.get('merchant_id'),
-        'merchant_name': merchant_name,
-        'client_fullname': data.get('client_fullname'),
-        'client_phone': data.get('client_phone'),
-        'client_email': data.get('client_email'),
-        'payment_details': data.get('payment_details'),
-        'exp_month': data.get('exp_month'),
-        'exp_year': data.get('exp_year'),
-        'trans_type': data.get('trans_type'),
-        'system_reference': data.get('system_reference'),
-        'debit_company': data.get('debit_company'),
-        'debrefnum': data.get('debrefnum'),
-        'debrefcode': data.get('debrefcode'),
-        'debit_companyname': data.get('debit_companyname'),
-        'is3d': data.get('is3d'),
-        'is_refund': data.get('isRefund'),
-        'client_address': data.get('client_address'),
-        'client_address2': data.get('client_address2'),
-        'client_zipcode': data.get('client_zipcode'),
-        'client_country': data.get('client_country'),
-        'client_city': data.get('client_city'),
-        'bin_country': data.get('bin_country'),
-        'pm': data.get('pm'),
-        'ccBIN': data.get('ccBIN'),
-        'bank_name': bank_name,
-        'mid_id': data.get('MidID'),
-        'mid_name': mid_name,
-        'recon_id': data.get('ReconID')
-    }
-    cursor.execute(upsert_query, params)
+    with WEBHOOK_STAGE_LATENCY.time('validate'):
+        issues = validate_webhook_data(record)
+    event_id, written = _storage.store(record, issues, route_due(record))
+    _count_write(event_id, written, issues)
+    return event_id
 
-@app.api_route("/webhook", methods=["GET", "POST"])
+# ---------------------------------------------------------------------------
+# Spool (app/spool.py): webhooks the database could not take in time
+# ---------------------------------------------------------------------------
+_spool: Spool | None = None
+
+def store_spooled(entries):
+    """
+    Replay a batch of spooled webhooks in one transaction (store_batch). Names
+    are resolved again against the current mapping cache (the spooling
+    worker's may have been cold or stale); the arrival time is kept. A
+    webhook the database rejects goes to the spool's failed.jsonl; a
+    connection problem raises, so the batch is retried.
+    """
+    items = []
+    for entry in entries:
+        spooled = WebhookRecord.from_spool_entry(entry)
+        record = resolve_record(spooled.data, spooled.status, spooled.delivery_key, spooled.received_at, spooled)
+        items.append((record, validate_webhook_data(record), route_due(record)))
+    results = _storage.store_batch(items)
+    # Committed
+    for entry, (record, issues, _), result in zip(entries, items, results):
+        if isinstance(result, Exception):
+            logger.error(f"Spooled webhook rejected by the database: {result}",
+                         extra={'trans_order': record.trans_order, 'trans_id': record.trans_id})
+            _spool.dead_letter(entry, str(result))
+            SPOOL_REPLAYED.inc('failed')
+            continue
+        event_id, written = result
+        _count_write(event_id, written, issues)
+        _delivery_cache.add(record.delivery_key)
+        SPOOL_REPLAYED.inc('stored' if event_id is not None else 'duplicate')
+
+def _replay_spool_loop():
+    """Background thread: drain this worker's spool (and abandoned slots) whenever the database accepts writes."""
+    while not _stopping.is_set():
+        try:
+            replayed = _spool.replay(store_spooled, SPOOL_REPLAY_BATCH)
+            replayed += _spool.replay_orphans(store_spooled, SPOOL_REPLAY_BATCH)
+            if replayed:
+                logger.info(f"Spool replayed {replayed} webhooks ({_spool.pending} pending)")
+                continue  # keep draining: new webhooks are spooled until it is empty
+        except (*_storage.unavailable, PoolExhausted) as e:
+            logger.warning(f"Spool replay paused, database not accepting writes: {e}")
+        except Exception as e:
+            logger.error(f"Spool replay failed: {e}", exc_info=True)
+        _stopping.wait(SPOOL_REPLAY_INTERVAL)
+
+def _open_spool():
+    spool = Spool(SPOOL_DIR, max_bytes=SPOOL_MAX_MB * 1024 * 1024)
+    if spool.pending:
+        logger.warning(f"Spool slot {spool.slot} has {spool.pending} webhooks from a previous run to replay")
+    return spool
+
+async def store_or_spool(record):
+    """
+    Store the webhook, or spool it when the database is slow (over
+    SPOOL_DB_BUDGET), unreachable or out of connections. While spooled
+    webhooks are waiting, new ones are spooled behind them so each
+    transaction's updates reach the database in order. Returns (event id,
+    spool reason or None). Raises PoolExhausted when the webhook can be
+    neither stored nor spooled.
+    """
+    if _spool is None:
+        return await run_in_threadpool(store_webhook, record), None
+
+    if _spool.pending:
+        reason = 'backlog'
+    else:
+        try:
+            # On timeout the write carries on in its thread; if it commits,
+            # the replay finds the delivery_key already stored
+            return await asyncio.wait_for(run_in_threadpool(store_webhook, record), SPOOL_DB_BUDGET), None
+        except asyncio.TimeoutError:
+            reason = 'slow'
+        except PoolExhausted:
+            reason = 'busy'
+        except _storage.unavailable as e:
+            logger.warning(f"Database unavailable, spooling webhook: {e}")
+            reason = 'unavailable'
+
+    try:
+        await run_in_threadpool(_spool.append, record.spool_entry())
+    except (SpoolFull, OSError) as e:
+        raise PoolExhausted('spool', f"database unavailable and spool not writable: {e}")
+    WEBHOOKS_SPOOLED.inc(reason)
+    return None, reason
+
+def duplicate_response(data, status):
+    """200 response for a delivery that was already processed."""
+    return JSONResponse(status_code=200, content={
+        "status": "success",
+        "message": "Duplicate delivery, already processed",
+        "trans_order": data.get('trans_order'),
+        "trans_id": data.get('trans_id'),
+        "status_determined": status
+    })
+
+@router.api_route("/webhook", methods=["GET", "POST"])
 async def receive_webhook(request: Request):
     """
     Endpoint to receive webhooks from Coriunder payment gateway
@@ -520,18 +674,24 @@ async def receive_webhook(request: Request):
         'client_ip': request.client.host if request.client else 'unknown'
     }
     data = {}
+    request_started = time.perf_counter()
+    response_status = 500
 
     try:
         # Parse data based on request method
-        if request.method == "GET":
-            # Parse query parameters for GET requests
-            data = parse_webhook_data(dict(request.query_params))
-        else:
-            # Parse form data for POST requests
-            form_data = await request.form()
-            data = parse_webhook_data(dict(form_data))
-        
-        logger.info(f"Received webhook for trans_order: {data.get('trans_order')}, trans_id: {data.get('trans_id')}, reply_code: {data.get('reply_code')}")
+        with WEBHOOK_STAGE_LATENCY.time('parse'):
+            if request.method == "GET":
+                # Parse query parameters for GET requests
+                data = parse_urlencoded(request.scope['query_string'])
+            elif is_urlencoded(request.headers.get('content-type')):
+                # Coriunder's urlencoded POSTs: one pass over the raw body
+                data = parse_urlencoded(await request.body())
+            else:
+                # Parse form data for other POST requests (multipart)
+                form_data = await request.form()
+                data = parse_webhook_data(dict(form_data))
+
+        logger.debug(f"Received webhook for trans_order: {data.get('trans_order')}, trans_id: {data.get('trans_id')}, reply_code: {data.get('reply_code')}")
 
         # Use trans_id as fallback if trans_order is missing
         if not data.get('trans_order') and data.get('trans_id'):
@@ -541,33 +701,55 @@ async def receive_webhook(request: Request):
         # Validate required fields - trans_order (or trans_id) is the key identifier
         if not data.get('trans_order') or not data.get('reply_code'):
             error_msg = "Missing required fields: trans_order/trans_id and reply_code"
-            logger.error(f"Response sent (400): {error_msg}")
-            send_slack_notification(400, error_msg, data, request_info)
+            logger.error(f"Response sent (400): {error_msg}", extra={'trans_id': data.get('trans_id')})
+            notify_slack(400, error_msg, data, request_info)
             raise HTTPException(status_code=400, detail=error_msg)
         
         # Determine status
         status = determine_status(data.get('reply_code'))
 
+        # Exact retry of a delivery this worker already committed: nothing to write
+        key = delivery_key(data)
+        if _delivery_cache.seen(key):
+            WEBHOOK_DUPLICATES.inc('memory')
+            response_status = 200
+            return duplicate_response(data, status)
+
         # Resolve names once from cache (O(1), no DB round-trip)
-        bank_name = lookup_bank_name(data.get('ccBIN'))
-        merchant_name = lookup_merchant_name(data.get('merchant_id'))
-        mid_name = lookup_mid_name(data.get('MidID'))
-
-        # Store in database
-        with get_db_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                # Validate data and log issues (but don't fail the webhook)
-                issues_count = validate_webhook_data(data, bank_name, merchant_name, cursor)
-                if issues_count > 0:
-                    logger.warning(f"Webhook has {issues_count} data quality issues")
-
-                # Insert into webhook_events (audit trail - keeps all webhooks)
-                event_id = insert_webhook_event(data, status, bank_name, merchant_name, mid_name, cursor)
-                logger.info(f"Inserted webhook event with id: {event_id}")
-
-                # Upsert into transactions (latest status only - keyed by trans_order)
-                upsert_transaction(data, status, bank_name, merchant_name, mid_name, cursor)
-                logger.info(f"Updated transaction table for trans_order: {data.get('trans_order')} with status: {status}")
+        with WEBHOOK_STAGE_LATENCY.time('cache_lookup'):
+            record = resolve_record(data, status, key)
+
+        # Store in database (on a threadpool thread, so waiting for a pooled
+        # connection or for Postgres does not block this worker's event loop),
+        # or in the local spool if the database cannot take it now
+        try:
+            event_id, spooled = await store_or_spool(record)
+        except PoolExhausted as e:
+            logger.warning(f"Response sent (503): database busy, shedding ({e})",
+                           extra={'trans_order': data.get('trans_order'), 'trans_id': data.get('trans_id')})
+            response_status = 503
+            return JSONResponse(status_code=503, headers={'Retry-After': str(SHED_RETRY_AFTER)},
+                                content={"status": "busy", "message": "Database busy, retry later"})
+
+        if spooled:
+            # Durable on local disk; written to the database by the replayer
+            response_status = 200
+            return JSONResponse(status_code=200, content={
+                "status": "success",
+                "message": "Webhook accepted (queued for storage)",
+                "trans_order": data.get('trans_order'),
+                "trans_id": data.get('trans_id'),
+                "status_determined": status
+            })
+
+        # Remember the delivery only once it is committed
+        _delivery_cache.add(key)
+
+        if event_id is None:
+            # Retry already stored by another worker / before a restart
+            WEBHOOK_DUPLICATES.inc('db')
+            response_status = 200
+            return duplicate_response(data, status)
 
         response_data = {
             "status": "success",
@@ -576,33 +758,92 @@ async def receive_webhook(request: Request):
             "trans_id": data.get('trans_id'),
             "status_determined": status
         }
-        logger.info(f"Response sent (200): {response_data}")
+        # One summary line per successful webhook, sampled (LOG_SUCCESS_SAMPLE_RATE)
+        if success_sampled():
+            logger.info("Webhook processed", extra={
+                'trans_order': data.get('trans_order'),
+                'trans_id': data.get('trans_id'),
+                'reply_code': data.get('reply_code'),
+                'status': status,
+                'event_id': event_id,
+                'duration_ms': round((time.perf_counter() - request_started) * 1000, 1)
+            })
+        response_status = 200
         return JSONResponse(status_code=200, content=response_data)
         
-    except HTTPException:
+    except HTTPException as e:
+        response_status = e.status_code
         raise
     except Exception as e:
         error_detail = f"Internal server error: {str(e)}"
-        logger.error(f"Response sent (500): {error_detail}", exc_info=True)
-        send_slack_notification(500, error_detail, data, request_info)
+        logger.error(f"Response sent (500): {error_detail}", exc_info=True, extra={
+            'trans_order': data.get('trans_order'),
+            'trans_id': data.get('trans_id'),
+            'reply_code': data.get('reply_code')
+        })
+        notify_slack(500, error_detail, data, request_info)
         raise HTTPException(status_code=500, detail=error_detail)
+    finally:
+        WEBHOOK_REQUESTS.inc(str(response_status))
+        WEBHOOK_LATENCY.observe(time.perf_counter() - request_started)
 
-@app.get("/health")
-async def health_check():
-    """Health check endpoint"""
-    try:
-        with get_db_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("SELECT 1")
-        return {"status": "healthy", "database": "connected"}
-    except Exception as e:
-        logger.error(f"Health check failed: {e}")
-        return JSONResponse(
-            status_code=503,
-            content={"status": "unhealthy", "database": "disconnected", "error": str(e)}
-        )
+# ---------------------------------------------------------------------------
+# Health: last database ping, refreshed in the background
+# ---------------------------------------------------------------------------
+_db_health = {'last_ok': None, 'error': None}  # time.time() of the last successful ping, last failure
+
+def _health_monitor_loop():
+    """Background thread: ping the database every HEALTH_CHECK_INTERVAL seconds for /health."""
+    while not _stopping.is_set():
+        try:
+            _storage.ping()
+            _db_health.update(last_ok=time.time(), error=None)
+        except PoolExhausted:
+            # Every connection is busy serving webhooks: the database is answering
+            _db_health.update(last_ok=time.time(), error=None)
+        except Exception as e:
+            if _db_health['error'] is None:
+                logger.error(f"Health check failed: {e}")
+            _db_health['error'] = str(e)
+        _stopping.wait(HEALTH_CHECK_INTERVAL)
+
+def health_status() -> dict:
+    """Worker status for /health, from the background ping and in-memory state (no DB access)"""
+    now = time.time()
+    last_ok = _db_health['last_ok']
+    connected = last_ok is not None and now - last_ok < 3 * HEALTH_CHECK_INTERVAL
+    status = {
+        "status": "healthy" if connected else "unhealthy",
+        "database": "connected" if connected else "disconnected",
+        "last_db_ping_age_seconds": round(now - last_ok, 1) if last_ok else None,
+        "pool": ({"in_use": _db_pool.in_use, "max": _db_pool.maxconn, "waiting": _db_pool.waiting}
+                 if _db_pool else None),
+        "mapping_cache_age_seconds": round(now - _cache_loaded_at, 1) if _cache_loaded_at else None,
+        "spool_pending": _spool.pending if _spool else None,
+    }
+    if not connected and _db_health['error']:
+        status["error"] = _db_health['error']
+    return status
 
-@app.get("/")
+@router.get("/health")
+async def health_check():
+    """Health check endpoint (cached status, see _health_monitor_loop)"""
+    status = health_status()
+    return JSONResponse(status_code=200 if status["status"] == "healthy" else 503, content=status)
+
+@router.get("/ready")
+async def readiness_check():
+    """Readiness: 503 until the mapping cache has loaded, so a cold worker gets no webhooks"""
+    if _cache_loaded_at is None:
+        return JSONResponse(status_code=503, content={"status": "not_ready", "reason": "mapping cache not loaded"})
+    return {"status": "ready", "mapping_cache_age_seconds": round(time.time() - _cache_loaded_at, 1)}
+
+@router.get("/metrics")
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+@router.get("/")
 async def root():
     """Root endpoint"""
     return {
@@ -618,10 +859,102 @@ async def root():
         ],
         "endpoints": {
             "webhook": "/webhook (GET, POST)",
-            "health": "/health (GET)"
+            "health": "/health (GET)",
+            "ready": "/ready (GET)",
+            "metrics": "/metrics (GET)"
         }
     }
 
+# ---------------------------------------------------------------------------
+# Application factory and lifecycle
+# Importing this module opens nothing; the pool, spool, logging and background
+# threads belong to the running application (lifespan), so tests and
+# benchmarks can import it without a database.
+# ---------------------------------------------------------------------------
+
+def _open_pool(max_connections):
+    """Pool sized from max_connections (None: unknown, use DB_POOL_MAX); connects on first use"""
+    return BoundedPool(
+        minconn=2,
+        maxconn=(pool_size(max_connections, WEB_CONCURRENCY, DB_POOL_RESERVED, DB_POOL_MAX)
+                 if max_connections else DB_POOL_MAX),
+        timeout=DB_POOL_TIMEOUT,
+        max_waiters=DB_POOL_MAX_WAITERS,
+        **DB_CONFIG)
+
+def start_receiver():
+    """
+    Bring up this worker: logging, then the max_connections query and the
+    spool scan in parallel, then the pool and background threads. Nothing
+    waits on Postgres longer than DB_CONNECT_TIMEOUT. The mapping cache
+    loads in the background; /ready answers 503 until it has.
+    """
+    global _log_handler, _storage, _db_pool, _spool
+    if _log_handler is None:
+        os.makedirs(log_dir, exist_ok=True)
+        _log_handler = configure_logging(os.path.join(log_dir, 'webhook_receiver.log'))
+    _stopping.clear()
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup') as startup:
+        spool = startup.submit(_open_spool) if SPOOL_DIR else None
+        if STORAGE_BACKEND == 'postgres':
+            max_connections = server_max_connections(DB_CONFIG)
+            if max_connections is None:
+                logger.warning(f"Could not read max_connections, pool limited to DB_POOL_MAX={DB_POOL_MAX}")
+            _db_pool = _open_pool(max_connections)
+            _storage = PostgresStorage(get_db_connection, stage=WEBHOOK_STAGE_LATENCY.time)
+        elif STORAGE_BACKEND == 'memory':
+            _storage = MemoryStorage()
+        elif STORAGE_BACKEND == 'sqlite':
+            _storage = SQLiteStorage(SQLITE_PATH)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {STORAGE_BACKEND!r} (postgres, memory or sqlite)")
+        _spool = spool.result() if spool else None
+    logger.info(f"Storing webhooks in {_storage.name}")
+
+    # The cache thread is not waited for at shutdown: it sleeps in select() on its LISTEN connection
+    threading.Thread(target=_init_cache, name='mapping-cache', daemon=True).start()
+    _workers[:] = [threading.Thread(target=target, name=target.__name__.lstrip('_'), daemon=True)
+                   for target in (_slack_worker, _health_monitor_loop) + ((_replay_spool_loop,) if _spool else ())]
+    for thread in _workers:
+        thread.start()
+    start_multiprocess_writer()
+
+def stop_receiver():
+    """Stop background loops, sync and release the spool, close the storage and pooled connections."""
+    global _spool, _storage, _db_pool
+    _stopping.set()
+    _slack_queue.put(None)  # after any notifications still queued
+    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+    for thread in _workers:
+        thread.join(max(0, deadline - time.monotonic()))
+    stop_multiprocess_writer(max(0, deadline - time.monotonic()))
+    if _spool:
+        _spool.close()
+        _spool = None
+    if _storage:
+        _storage.close()
+        _storage = None
+    if _db_pool:
+        _db_pool.closeall()
+        _db_pool = None
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    await run_in_threadpool(start_receiver)
+    try:
+        yield
+    finally:
+        await run_in_threadpool(stop_receiver)
+
+def create_app() -> FastAPI:
+    """The receiver application; resources are opened at startup by lifespan()."""
+    application = FastAPI(title="Payment Webhook Receiver", version="2.1.0", lifespan=lifespan)
+    application.include_router(router)
+    return application
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
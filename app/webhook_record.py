@@ -0,0 +1,159 @@
+"""
+One webhook as the receiver stores it.
+
+receive_webhook() builds a WebhookRecord once the payload is parsed and the
+names and dimension keys are resolved. Validation reads its attributes, and
+the storage backends (app/storage.py) bind their columns positionally from it
+(event_params() / transaction_params()), instead of each building its own
+~40-key params dict from data.get() calls.
+
+Attributes are named after the table columns (cc_bin, mid_id, is_refund, ...);
+app/raw_data.FIELDS maps the Coriunder payload keys to them. `data` keeps the
+parsed payload itself for raw_data, data issue logs and Slack notifications.
+`received_at` is when the receiver got the webhook; the backends store it as
+webhook_events.received_at and transactions.last_updated_at, so a webhook
+replayed from the spool keeps its arrival time.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from operator import attrgetter
+
+from psycopg2.extras import Json
+
+from app.raw_data import FIELDS, compact_raw_data
+
+# Payload keys in the order of WebhookRecord's first fields
+PAYLOAD_KEYS = tuple(key for key, _ in FIELDS) + ('otrans_amount', 'trans_amount')
+
+# webhook_events columns bound from the record (raw_data is added by event_params)
+EVENT_COLUMNS = (
+    'trans_id', 'trans_order', 'reply_code', 'reply_desc', 'status',
+    'trans_date', 'otrans_amount', 'trans_amount',
+    'otrans_currency', 'trans_currency',
+    'merchant_id', 'merchant_name', 'client_fullname', 'client_phone', 'client_email',
+    'payment_details', 'exp_month', 'exp_year', 'trans_type',
+    'signature', 'system_reference',
+    'debit_company', 'debrefnum', 'debrefcode', 'debit_companyname',
+    'is3d', 'is_refund',
+    'client_address', 'client_address2', 'client_zipcode',
+    'client_country', 'client_city',
+    'bin_country', 'pm', 'cc_bin', 'bank_name',
+    'plid', 'storage_id', 'mid_id', 'mid_name', 'recon_id', 'cp26', 'cp27', 'cp28', 'cp29', 'cp30',
+    'bank_key', 'mid_key', 'merchant_key', 'country_key',
+    'delivery_key',
+)
+
+# transactions columns bound from the record
+TRANSACTION_COLUMNS = (
+    'trans_order', 'trans_id', 'reply_code', 'reply_desc', 'status',
+    'trans_date', 'otrans_amount', 'trans_amount',
+    'otrans_currency', 'trans_currency',
+    'merchant_id', 'merchant_name', 'client_fullname', 'client_phone', 'client_email',
+    'payment_details', 'exp_month', 'exp_year', 'trans_type',
+    'system_reference',
+    'debit_company', 'debrefnum', 'debrefcode', 'debit_companyname',
+    'is3d', 'is_refund',
+    'client_address', 'client_address2', 'client_zipcode',
+    'client_country', 'client_city',
+    'bin_country', 'pm', 'cc_bin', 'bank_name',
+    'mid_id', 'mid_name', 'recon_id',
+    'bank_key', 'mid_key', 'merchant_key', 'country_key',
+)
+
+
+@dataclass(slots=True)
+class WebhookRecord:
+    # Payload fields, in PAYLOAD_KEYS order
+    trans_id: str | None
+    trans_order: str | None
+    reply_code: str | None
+    reply_desc: str | None
+    trans_date: str | None
+    otrans_currency: str | None
+    trans_currency: str | None
+    merchant_id: str | None
+    client_fullname: str | None
+    client_phone: str | None
+    client_email: str | None
+    payment_details: str | None
+    exp_month: str | None
+    exp_year: str | None
+    trans_type: str | None
+    signature: str | None
+    system_reference: str | None
+    debit_company: str | None
+    debrefnum: str | None
+    debrefcode: str | None
+    debit_companyname: str | None
+    is3d: str | None
+    is_refund: str | None
+    client_address: str | None
+    client_address2: str | None
+    client_zipcode: str | None
+    client_country: str | None
+    client_city: str | None
+    bin_country: str | None
+    pm: str | None
+    cc_bin: str | None
+    plid: str | None
+    storage_id: str | None
+    mid_id: str | None
+    recon_id: str | None
+    cp26: str | None
+    cp27: str | None
+    cp28: str | None
+    cp29: str | None
+    cp30: str | None
+    otrans_amount: str | None
+    trans_amount: str | None
+    # Resolved by the receiver
+    status: str
+    bank_name: str | None
+    merchant_name: str | None
+    mid_name: str | None
+    bank_key: int | None
+    mid_key: int | None
+    merchant_key: int | None
+    country_key: int | None
+    delivery_key: str | None
+    received_at: datetime
+    data: dict
+
+    @classmethod
+    def build(cls, data, status, bank_name, merchant_name, mid_name, keys, delivery_key=None, received_at=None):
+        """Record for parsed payload `data`; keys as returned by lookup_dimension_keys(), received_at defaults to now"""
+        return cls(*map(data.get, PAYLOAD_KEYS),
+                   status, bank_name, merchant_name, mid_name,
+                   keys['bank_key'], keys['mid_key'], keys['merchant_key'], keys['country_key'],
+                   delivery_key, received_at or datetime.now(timezone.utc), data)
+
+    def spool_entry(self):
+        """JSON-serializable form for app/spool.py"""
+        return {
+            'data': self.data,
+            'status': self.status,
+            'names': [self.bank_name, self.merchant_name, self.mid_name],
+            'keys': [self.bank_key, self.mid_key, self.merchant_key, self.country_key],
+            'delivery_key': self.delivery_key,
+            'received_at': self.received_at.isoformat(),
+        }
+
+    @classmethod
+    def from_spool_entry(cls, entry):
+        keys = dict(zip(('bank_key', 'mid_key', 'merchant_key', 'country_key'), entry['keys']))
+        # Entries spooled before received_at was recorded get the replay time
+        received_at = datetime.fromisoformat(entry['received_at']) if entry.get('received_at') else None
+        return cls.build(entry['data'], entry['status'], *entry['names'], keys, entry['delivery_key'], received_at)
+
+    def event_params(self, adapt=Json):
+        """Values for EVENT_COLUMNS + raw_data (the document wrapped by adapt: Json for psycopg2)"""
+        return _event_values(self) + (adapt(compact_raw_data(self.data)),)
+
+    def transaction_params(self):
+        """Values for TRANSACTION_COLUMNS"""
+        return _transaction_values(self)
+
+
+_event_values = attrgetter(*EVENT_COLUMNS)
+_transaction_values = attrgetter(*TRANSACTION_COLUMNS)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Webhook Payload Parsing Microbenchmark
+Times the receiver's parse stage for urlencoded POST bodies on synthetic
+Coriunder webhooks, with and without Starlette's request plumbing:
+
+    generic  await request.form() + dict() + parse_webhook_data()  (before)
+    fast     await request.body() + app/fast_parse.parse_urlencoded()  (now)
+
+and checks both produce the same data for every payload. No database needed.
+
+Usage:
+    python benchmarks/bench_parse.py --payloads 2000 --rounds 20
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import os
+import time
+from urllib.parse import urlencode
+
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_raw_data import make_payloads
+from app.fast_parse import parse_urlencoded
+from app.webhook_app import parse_webhook_data
+
+SCOPE = {'type': 'http', 'method': 'POST', 'path': '/webhook', 'query_string': b'',
+         'headers': [(b'content-type', b'application/x-www-form-urlencoded')]}
+
+
+def make_request(body):
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    return Request(SCOPE, receive)
+
+
+async def generic(body):
+    form_data = await make_request(body).form()
+    return parse_webhook_data(dict(form_data))
+
+
+async def fast(body):
+    return parse_urlencoded(await make_request(body).body())
+
+
+async def time_path(path, bodies):
+    started = time.perf_counter()
+    for body in bodies:
+        await path(body)
+    return (time.perf_counter() - started) / len(bodies) * 1e6
+
+
+def time_parser_only(bodies):
+    """The parsers alone, without building a Request (fast path only has no Starlette part)"""
+    started = time.perf_counter()
+    for body in bodies:
+        parse_urlencoded(body)
+    return (time.perf_counter() - started) / len(bodies) * 1e6
+
+
+async def run(bodies, rounds):
+    mismatches = 0
+    for body in bodies:
+        if await generic(body) != await fast(body):
+            mismatches += 1
+
+    results = {'generic': [], 'fast': [], 'parse_urlencoded only': []}
+    for _ in range(rounds):
+        results['generic'].append(await time_path(generic, bodies))
+        results['fast'].append(await time_path(fast, bodies))
+        results['parse_urlencoded only'].append(time_parser_only(bodies))
+    return results, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the receiver's webhook parsing paths")
+    parser.add_argument('--payloads', type=int, default=2000, help='Distinct webhook bodies')
+    parser.add_argument('--rounds', type=int, default=20, help='Timed passes over all bodies')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible payloads')
+    args = parser.parse_args()
+
+    bodies = [urlencode({key: '' if value is None else value for key, value in data.items()}).encode()
+              for data in make_payloads(args.payloads, args.seed)]
+
+    print("=" * 60)
+    print("Webhook Payload Parsing Microbenchmark")
+    print(f"{len(bodies):,} bodies, avg {sum(map(len, bodies)) / len(bodies):,.0f} bytes, {args.rounds} rounds")
+    print("=" * 60)
+
+    results, mismatches = asyncio.run(run(bodies, args.rounds))
+
+    base = statistics.median(results['generic'])
+    print(f"\n{'Path':<24} {'min us':>8} {'median us':>10} {'vs generic':>11}")
+    print("-" * 56)
+    for name, times in results.items():
+        median = statistics.median(times)
+        print(f"{name:<24} {min(times):>8.1f} {median:>10.1f} {base / median:>10.1f}x")
+
+    if mismatches:
+        print(f"\n❌ {mismatches:,} bodies parsed differently by the fast path")
+        sys.exit(1)
+    print(f"\n✅ Both paths produce the same data for all {len(bodies):,} bodies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Payment Monitor Benchmark
+Seeds a scratch Postgres database (see benchmarks/seed.py), then times a full
+payment_monitor.main() cycle, each check_* function and each daily report
+query, and verifies the monitor still produces the expected alerts.
+
+Telegram is never contacted - both services get a stub that records the
+messages they would have sent.
+
+Usage:
+    # Seed 5M rows over 400 routes and run 3 timed cycles
+    BENCH_DB_NAME=payment_bench python benchmarks/bench_payment_monitor.py --rows 5000000 --routes 400
+
+    # Re-run against the already seeded data, saving the alert fingerprint
+    python benchmarks/bench_payment_monitor.py --reuse --save-alerts before.json
+
+    # After a change: same data, fail if the alerts differ
+    python benchmarks/bench_payment_monitor.py --reuse --compare-alerts before.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+from psycopg2.extras import RealDictCursor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import seed
+from services import payment_monitor as pm
+from services import payment_daily_report as report
+
+# Per-route helpers are timed over this many routes and reported per call
+ROUTE_SAMPLE_SIZE = 50
+
+
+class FakeTelegram:
+    """Stands in for the `requests` module inside the services: records every
+    sendMessage payload and answers like the Bot API would."""
+
+    class _Response:
+        def __init__(self, message_id):
+            self._message_id = message_id
+
+        def json(self):
+            return {'ok': True, 'result': {'message_id': self._message_id}}
+
+        def raise_for_status(self):
+            pass
+
+    def __init__(self):
+        self.sent = []
+
+    def post(self, url, json=None, timeout=None, **kwargs):
+        self.sent.append(json)
+        return self._Response(len(self.sent))
+
+
+def point_services_at_bench_db():
+    """Redirect both services to the benchmark database and a stub Telegram"""
+    for module in (pm, report):
+        module.DB_CONFIG.clear()
+        module.DB_CONFIG.update(seed.BENCH_DB_CONFIG)
+        module.requests = FakeTelegram()
+        module.TELEGRAM_BOT_TOKEN = 'bench-token'
+
+    pm.TELEGRAM_CHANNEL_IDS = ['bench-channel']
+    report.TELEGRAM_CHANNEL_ID = 'bench-channel'
+
+
+def timed(fn, *args, verbose=False, **kwargs):
+    """Call fn, returning (elapsed seconds, result). Service output is muted unless verbose."""
+    sink = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with sink:
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+    return elapsed, result
+
+
+def alert_fingerprint(conn):
+    """Every alert / suppression the monitor wrote, as sorted comparable rows"""
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT 'alert', time_window, mid_id, bank_name, severity FROM alert_history
+        UNION ALL
+        SELECT 'suppressed', time_window, mid_id, bank_name, suppression_reason FROM alert_suppression_log
+    """)
+    rows = sorted([list(row) for row in cursor.fetchall()])
+    cursor.close()
+    return rows
+
+
+def run_main_cycle(conn, args):
+    """Time one cold payment_monitor.main() cycle, returning (seconds, fingerprint)"""
+    seed.reset_alert_state(conn)
+    seed.inject_recent_traffic(conn, args.live_per_route, args.seed)
+    try:
+        elapsed, _ = timed(pm.main, verbose=args.verbose)
+    except SystemExit:
+        print("❌ payment_monitor.main() exited with an error - rerun with --verbose")
+        sys.exit(1)
+    return elapsed, alert_fingerprint(conn)
+
+
+def run_check_functions(conn, timings, args):
+    """Time each check_* function individually, in the order main() calls them"""
+    seed.reset_alert_state(conn)
+    seed.inject_recent_traffic(conn, args.live_per_route, args.seed)
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+
+    for time_window in ['5min', '15min', '30min']:
+        elapsed, _ = timed(pm.check_performance_window, cursor, conn, time_window, verbose=args.verbose)
+        timings.setdefault(f"check_performance_window[{time_window}]", []).append(elapsed)
+
+        if time_window == '5min':
+            elapsed, _ = timed(pm.check_low_volume_failures, cursor, conn, time_window, verbose=args.verbose)
+            timings.setdefault("check_low_volume_failures[5min]", []).append(elapsed)
+    conn.commit()
+
+    # Per-route helpers, averaged over a sample of routes
+    cursor.execute("SELECT mid_id, bank_name FROM bench_routes ORDER BY route_no LIMIT %s",
+                   (ROUTE_SAMPLE_SIZE,))
+    routes = cursor.fetchall()
+    helpers = [
+        ('check_route_health', lambda r: pm.check_route_health(cursor, r['mid_id'], r['bank_name'])),
+        ('check_manual_override', lambda r: pm.check_manual_override(cursor, r['mid_id'], r['bank_name'])),
+        ('check_recent_alert', lambda r: pm.check_recent_alert(cursor, r['mid_id'], r['bank_name'], pm.COOLDOWN_MINUTES)),
+        ('find_alternative_routes', lambda r: pm.find_alternative_routes(cursor, r['bank_name'], exclude_mid_id=r['mid_id'])),
+        ('get_decline_reasons', lambda r: pm.get_decline_reasons(cursor, r['mid_id'], r['bank_name'], '5min')),
+        ('get_merchant_breakdown', lambda r: pm.get_merchant_breakdown(cursor, r['mid_id'], r['bank_name'], '5min')),
+    ]
+    for name, helper in helpers:
+        started = time.perf_counter()
+        for route in routes:
+            helper(route)
+        per_call = (time.perf_counter() - started) / max(len(routes), 1)
+        timings.setdefault(f"{name} (per call)", []).append(per_call)
+
+    conn.rollback()
+    cursor.close()
+
+
+def run_report_queries(conn, timings, args):
+    """Time each payment_daily_report query plus a full generate_daily_report()"""
+    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=1)
+    cursor = conn.cursor()
+
+    queries = [
+        ('get_alert_summary', lambda: report.get_alert_summary(cursor, start_date, end_date)),
+        ('get_top_problematic_routes', lambda: report.get_top_problematic_routes(cursor, start_date, end_date)),
+        ('get_time_window_breakdown', lambda: report.get_time_window_breakdown(cursor, start_date, end_date)),
+        ('get_top_banks', lambda: report.get_top_banks(cursor, start_date, end_date)),
+        ('get_top_mids', lambda: report.get_top_mids(cursor, start_date, end_date)),
+        ('populate_daily_stats', lambda: report.populate_daily_stats(
+            cursor, start_date.date() - timedelta(days=6), start_date.date())),
+        ('get_trend_data', lambda: report.get_trend_data(cursor, start_date.date(), days=7)),
+        ('get_suppression_summary', lambda: report.get_suppression_summary(cursor, start_date, end_date)),
+        ('get_top_suppressed_routes', lambda: report.get_top_suppressed_routes(cursor, start_date, end_date, limit=5)),
+        ('get_recovered_routes', lambda: report.get_recovered_routes(cursor, lookback_days=7)),
+    ]
+    for name, query in queries:
+        elapsed, _ = timed(query)
+        timings.setdefault(f"report.{name}", []).append(elapsed)
+    conn.commit()
+    cursor.close()
+
+    elapsed, ok = timed(report.generate_daily_report, verbose=args.verbose)
+    if not ok:
+        print("❌ generate_daily_report() failed - rerun with --verbose")
+        sys.exit(1)
+    timings.setdefault("report.generate_daily_report", []).append(elapsed)
+
+
+def print_timings(timings):
+    """Print min / median / max for every timed step"""
+    width = max(len(name) for name in timings)
+    print(f"\n{'Step':<{width}}  {'min ms':>10}  {'median ms':>10}  {'max ms':>10}  runs")
+    print("-" * (width + 46))
+    for name, samples in timings.items():
+        print(f"{name:<{width}}  {min(samples) * 1000:>10.1f}  "
+              f"{statistics.median(samples) * 1000:>10.1f}  {max(samples) * 1000:>10.1f}  {len(samples)}")
+
+
+def compare_alerts(fingerprint, expected, baseline_path):
+    """Check the produced alerts against the seeded patterns and an optional baseline"""
+    ok = True
+
+    produced = sorted([row[:4] for row in fingerprint])
+    missing = [row for row in expected if row not in produced]
+    unexpected = [row for row in produced if row not in expected]
+    if missing or unexpected:
+        ok = False
+        print("\n❌ Alerts differ from the injected outage patterns")
+        for row in missing:
+            print(f"   missing:    {row}")
+        for row in unexpected:
+            print(f"   unexpected: {row}")
+    else:
+        print(f"\n✅ All {len(expected)} injected outage patterns produced the expected alert/suppression")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)['alerts']
+        if baseline != fingerprint:
+            ok = False
+            print(f"❌ Alerts differ from baseline {baseline_path}")
+            for row in baseline:
+                if row not in fingerprint:
+                    print(f"   baseline only: {row}")
+            for row in fingerprint:
+                if row not in baseline:
+                    print(f"   current only:  {row}")
+        else:
+            print(f"✅ Alerts identical to baseline {baseline_path} ({len(baseline)} rows)")
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark payment_monitor on a seeded dataset")
+    parser.add_argument('--rows', type=int, default=1_000_000, help='Historical transactions to seed')
+    parser.add_argument('--routes', type=int, default=300, help='Number of MID + Bank routes')
+    parser.add_argument('--days', type=int, default=30, help='Days of history to spread rows over')
+    parser.add_argument('--live-per-route', type=int, default=15,
+                        help='Healthy transactions per normal route in the last 30 minutes')
+    parser.add_argument('--alerts-per-day', type=int, default=2000,
+                        help='Historical alerts per day for the report queries')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed cycles per step')
+    parser.add_argument('--reuse', action='store_true', help='Skip the bulk load and reuse seeded data')
+    parser.add_argument('--save-alerts', metavar='FILE', help='Write timings and alert fingerprint as JSON')
+    parser.add_argument('--compare-alerts', metavar='FILE', help='Fail if alerts differ from a saved run')
+    parser.add_argument('--verbose', action='store_true', help='Show service output')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Payment Monitor Benchmark")
+    print(f"Database: {seed.BENCH_DB_CONFIG['dbname']} @ {seed.BENCH_DB_CONFIG['host']}")
+    print("=" * 60)
+
+    conn = seed.get_bench_connection()
+    if not args.reuse:
+        seed.seed_history(conn, args.rows, args.routes, args.days, args.seed)
+
+    cursor = conn.cursor()
+    cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = 'transactions'")
+    row_estimate = cursor.fetchone()[0]
+    cursor.execute("SELECT kind, COUNT(*) FROM bench_routes GROUP BY kind ORDER BY kind")
+    route_kinds = dict(cursor.fetchall())
+    cursor.close()
+    print(f"\n📊 transactions: ~{row_estimate:,} rows, routes: {route_kinds}")
+
+    point_services_at_bench_db()
+    timings = {}
+    expected = seed.expected_alerts(conn)
+    fingerprint = None
+    consistent = True
+
+    print(f"\n⏱️  Timing {args.repeat} full monitor cycles...")
+    for i in range(args.repeat):
+        elapsed, cycle_fingerprint = run_main_cycle(conn, args)
+        timings.setdefault("payment_monitor.main", []).append(elapsed)
+        if fingerprint is None:
+            fingerprint = cycle_fingerprint
+        elif cycle_fingerprint != fingerprint:
+            consistent = False
+            print(f"❌ Cycle {i + 1} produced different alerts than cycle 1")
+
+    print("⏱️  Timing check_* functions...")
+    for _ in range(args.repeat):
+        run_check_functions(conn, timings, args)
+
+    print("⏱️  Timing daily report queries...")
+    seed.reset_alert_state(conn)
+    seed.seed_alert_history(conn, args.alerts_per_day, 8, args.seed)
+    for _ in range(args.repeat):
+        run_report_queries(conn, timings, args)
+
+    print_timings(timings)
+    alerts_ok = compare_alerts(fingerprint, expected, args.compare_alerts) and consistent
+
+    if args.save_alerts:
+        with open(args.save_alerts, 'w') as f:
+            json.dump({
+                'rows': row_estimate,
+                'routes': route_kinds,
+                'timings_ms': {name: [round(s * 1000, 2) for s in samples]
+                               for name, samples in timings.items()},
+                'alerts': fingerprint,
+            }, f, indent=2)
+        print(f"💾 Results written to {args.save_alerts}")
+
+    conn.close()
+    sys.exit(0 if alerts_ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+raw_data Storage Size Benchmark
+Writes the same synthetic Coriunder webhooks into three scratch copies of the
+webhook_events payload columns in the benchmark database, differing only in
+how raw_data is stored:
+
+    repr     TEXT holding str(data), as the receiver used to write it
+    jsonb    the full payload as JSONB
+    compact  app/raw_data.compact_raw_data() as JSONB (what the receiver writes now)
+
+and reports table + TOAST size, average raw_data bytes and insert time. Fails
+if any compact row does not expand back to its original payload.
+
+Usage:
+    BENCH_DB_NAME=payment_bench python benchmarks/bench_raw_data.py --rows 200000
+"""
+
+import argparse
+import random
+import sys
+import os
+import time
+
+from psycopg2.extras import Json, RealDictCursor, execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import seed
+from app.raw_data import FIELDS, compact_raw_data, expand_raw_data
+
+VARIANTS = {
+    'repr': ('TEXT', lambda data: str(data)),
+    'jsonb': ('JSONB', lambda data: Json(data)),
+    'compact': ('JSONB', lambda data: Json(compact_raw_data(data))),
+}
+
+# Columns as in webhook_events (database/schema/database_schema_fixed.sql)
+PAYLOAD_COLUMNS = [column for _, column in FIELDS]
+TABLE_SQL = """
+CREATE TABLE {table} (
+    id BIGSERIAL PRIMARY KEY,
+    {columns},
+    otrans_amount DECIMAL(15, 4),
+    trans_amount DECIMAL(15, 4),
+    status VARCHAR(20),
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    raw_data {raw_type}
+)
+"""
+
+
+def make_payloads(rows, seed_value):
+    """Synthetic webhooks with the field set and value shapes Coriunder sends"""
+    rnd = random.Random(seed_value)
+    payloads = []
+    for n in range(rows):
+        reply_code, reply_desc = ('000', 'Approved') if rnd.random() < 0.7 else rnd.choice(seed.DECLINE_REASONS)
+        amount = f"{rnd.uniform(5, 900):.2f}"
+        payloads.append({
+            'trans_id': str(40_000_000 + n),
+            'trans_order': f"ORD-{rnd.randint(1, 10**9):010d}",
+            'reply_code': reply_code,
+            'reply_desc': reply_desc,
+            'trans_date': f"19/10/2026 {n % 24:02d}:{n % 60:02d}:{rnd.randint(0, 59):02d}",
+            'otrans_amount': amount,
+            'trans_amount': amount,
+            'otrans_currency': 'EUR',
+            'trans_currency': 'EUR',
+            'merchant_id': str(rnd.randint(1000, 1084)),
+            'client_fullname': f"Client {rnd.randint(1, 10**6)}",
+            'client_phone': f"+90555{rnd.randint(0, 10**7):07d}",
+            'client_email': f"client{rnd.randint(1, 10**6)}@example.com",
+            'payment_details': f"Visa .... {rnd.randint(0, 9999):04d}",
+            'exp_month': f"{rnd.randint(1, 12):02d}",
+            'exp_year': str(rnd.randint(2026, 2032)),
+            'trans_type': '0',
+            'signature': f"{rnd.getrandbits(256):064x}",
+            'system_reference': None,
+            'debit_company': str(rnd.randint(1, 40)),
+            'debrefnum': str(rnd.randint(10**11, 10**12)),
+            'debrefcode': None,
+            'debit_companyname': f"Bench Acquirer {rnd.randint(1, 40)}",
+            'is3d': rnd.choice(['0', '1']),
+            'isRefund': '0',
+            'client_address': f"{rnd.randint(1, 200)} Bench Street",
+            'client_address2': None,
+            'client_zipcode': str(rnd.randint(10000, 99999)),
+            'client_country': rnd.choice(['TR', 'DE', 'GB', 'FR']),
+            'client_city': rnd.choice(['Istanbul', 'Berlin', 'London', 'Paris']),
+            'bin_country': rnd.choice(['TR', 'DE', 'GB', 'FR']),
+            'pm': rnd.choice(['Visa', 'MasterCard']),
+            'ccBIN': str(rnd.choice([454360, 540709, 411111, 552608])),
+            'plid': None,
+            'StorageID': str(rnd.randint(10**6, 10**7)),
+            'MidID': f"MID{rnd.randint(1, 60)}",
+            'ReconID': None,
+            'CP26': None, 'CP27': None, 'CP28': None, 'CP29': None, 'CP30': None,
+        })
+    return payloads
+
+
+def load_variant(conn, name, payloads, batch_size=2000):
+    """Create bench_raw_<name>, insert every payload, return (table, insert seconds)"""
+    raw_type, encode = VARIANTS[name]
+    table = f"bench_raw_{name}"
+    cursor = conn.cursor()
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    cursor.execute(TABLE_SQL.format(table=table, raw_type=raw_type,
+                                    columns=',\n    '.join(f'{column} TEXT' for column in PAYLOAD_COLUMNS)))
+    conn.commit()
+
+    insert = (f"INSERT INTO {table} ({', '.join(PAYLOAD_COLUMNS)}, otrans_amount, trans_amount, raw_data) "
+              f"VALUES %s")
+    started = time.perf_counter()
+    for start in range(0, len(payloads), batch_size):
+        rows = [
+            tuple(data.get(key) for key, _ in FIELDS) + (data['otrans_amount'], data['trans_amount'], encode(data))
+            for data in payloads[start:start + batch_size]
+        ]
+        execute_values(cursor, insert, rows, page_size=batch_size)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+
+    cursor.close()
+    return table, elapsed
+
+
+def sizes(conn, table):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT pg_relation_size(c.oid),
+               COALESCE(pg_total_relation_size(NULLIF(c.reltoastrelid, 0)), 0),
+               pg_total_relation_size(c.oid)
+        FROM pg_class c WHERE c.oid = %s::regclass
+    """, (table,))
+    heap, toast, total = cursor.fetchone()
+    cursor.execute(f"SELECT AVG(pg_column_size(raw_data)) FROM {table}")
+    avg_raw = float(cursor.fetchone()[0])
+    cursor.close()
+    conn.rollback()
+    return heap, toast, total, avg_raw
+
+
+def verify_compact(conn, payloads):
+    """Every compact row expands back to the payload it was written from"""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("SELECT * FROM bench_raw_compact ORDER BY id")
+    mismatches = sum(1 for row, data in zip(cursor.fetchall(), payloads)
+                     if expand_raw_data(row['raw_data'], row) != data)
+    cursor.close()
+    conn.rollback()
+    return mismatches
+
+
+def mb(size):
+    return f"{size / 1024 / 1024:,.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare webhook_events raw_data storage formats")
+    parser.add_argument('--rows', type=int, default=200_000, help='Webhooks to write per variant')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible payloads')
+    parser.add_argument('--keep', action='store_true', help='Keep the bench_raw_* tables afterwards')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("raw_data Storage Size Benchmark")
+    print(f"Database: {seed.BENCH_DB_CONFIG['dbname']} @ {seed.BENCH_DB_CONFIG['host']}")
+    print("=" * 60)
+
+    payloads = make_payloads(args.rows, args.seed)
+    conn = seed.get_bench_connection()
+
+    results = {}
+    for name in VARIANTS:
+        print(f"⏱️  Writing {args.rows:,} webhooks ({name})...")
+        table, elapsed = load_variant(conn, name, payloads)
+        conn.autocommit = True
+        conn.cursor().execute(f"VACUUM ANALYZE {table}")
+        conn.autocommit = False
+        results[name] = sizes(conn, table) + (elapsed,)
+
+    mismatches = verify_compact(conn, payloads)
+
+    base_total = results['repr'][2]
+    print(f"\n{'Format':<10} {'heap MB':>9} {'toast MB':>9} {'total MB':>9} {'raw B/row':>10} "
+          f"{'insert s':>9} {'vs repr':>8}")
+    print("-" * 70)
+    for name, (heap, toast, total, avg_raw, elapsed) in results.items():
+        print(f"{name:<10} {mb(heap):>9} {mb(toast):>9} {mb(total):>9} {avg_raw:>10.0f} "
+              f"{elapsed:>9.2f} {base_total / total:>7.2f}x")
+
+    if not args.keep:
+        cursor = conn.cursor()
+        for name in VARIANTS:
+            cursor.execute(f"DROP TABLE IF EXISTS bench_raw_{name}")
+        conn.commit()
+        cursor.close()
+    conn.close()
+
+    if mismatches:
+        print(f"\n❌ {mismatches:,} compact rows did not expand to their original payload")
+        sys.exit(1)
+    print(f"\n✅ All {args.rows:,} compact rows expand to their original payload")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Receiver Overhead Benchmark
+Times receive_webhook() end to end - ASGI request, parse, cache lookups,
+validation, record building, response - with the in-memory storage backend
+(app/storage.MemoryStorage), so the figure is the receiver's own Python/HTTP
+cost without any database time. Requests go straight to the ASGI app through
+httpx, no socket. No database needed.
+
+Usage:
+    python benchmarks/bench_receiver.py --payloads 2000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import logging
+import statistics
+import sys
+import os
+import time
+from urllib.parse import urlencode
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_raw_data import make_payloads
+from app import webhook_app
+from app.dedup import DeliveryCache
+from app.storage import MemoryStorage
+
+HEADERS = {'content-type': 'application/x-www-form-urlencoded'}
+
+
+async def time_round(client, bodies, method):
+    """Mean microseconds per request; fails on any non-200 response"""
+    started = time.perf_counter()
+    for body in bodies:
+        if method == 'POST':
+            response = await client.post('/webhook', content=body, headers=HEADERS)
+        else:
+            response = await client.get('/webhook?' + body.decode())
+        if response.status_code != 200:
+            raise SystemExit(f"❌ {method} answered {response.status_code}: {response.text}")
+    return (time.perf_counter() - started) / len(bodies) * 1e6
+
+
+def fresh_state():
+    """Empty storage and dedup cache, so every pass stores each webhook rather than dedups it"""
+    webhook_app._storage = MemoryStorage()
+    webhook_app._delivery_cache = DeliveryCache(webhook_app.DEDUP_CACHE_SIZE)
+
+
+async def run(bodies, rounds):
+    transport = httpx.ASGITransport(app=webhook_app.app)
+    results = {'POST urlencoded': [], 'GET query': []}
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+        for _ in range(rounds):
+            for name, method in (('POST urlencoded', 'POST'), ('GET query', 'GET')):
+                fresh_state()
+                results[name].append(await time_round(client, bodies, method))
+    return results, webhook_app._storage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the webhook receiver without a database")
+    parser.add_argument('--payloads', type=int, default=2000, help='Distinct webhook bodies')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed passes over all bodies')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible payloads')
+    args = parser.parse_args()
+
+    bodies = [urlencode({key: '' if value is None else value for key, value in data.items()}).encode()
+              for data in make_payloads(args.payloads, args.seed)]
+
+    # Memory storage, no spool; keep per-webhook log lines out of the timing
+    webhook_app.STORAGE_BACKEND = 'memory'
+    webhook_app.SPOOL_DIR = ''
+    webhook_app._log_handler = logging.NullHandler()
+    logging.getLogger('app').setLevel(logging.ERROR)
+    webhook_app.start_receiver()
+
+    print("=" * 60)
+    print("Webhook Receiver Overhead (memory storage)")
+    print(f"{len(bodies):,} webhooks, {args.rounds} rounds")
+    print("=" * 60)
+
+    try:
+        results, storage = asyncio.run(run(bodies, args.rounds))
+    finally:
+        webhook_app.stop_receiver()
+
+    print(f"\n{'Request':<18} {'min us':>8} {'median us':>10} {'req/s':>9}")
+    print("-" * 48)
+    for name, times in results.items():
+        median = statistics.median(times)
+        print(f"{name:<18} {min(times):>8.1f} {median:>10.1f} {1e6 / median:>9,.0f}")
+
+    print(f"\n✅ Last pass stored {len(storage.events):,} webhooks, {len(storage.transactions):,} transactions")
+
+
+if __name__ == "__main__":
+    main()
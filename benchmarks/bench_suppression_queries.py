@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Suppression Query Regression Benchmark
+Seeds a large alert_suppression_log in the benchmark database and compares the
+set-based get_top_suppressed_routes / get_recovered_routes (and the bot's
+/recovered snapshot) against the previous correlated-subquery versions kept
+below. The previous versions are timed without the indexes from
+migration_suppression_log_route_indexes.sql, the new ones with them. Fails if
+any query returns different rows.
+
+Needs the transactions and bench_routes seeded by bench_payment_monitor.py.
+The previous queries carry the same name tie-breakers as the new ones so a
+LIMIT cuts ties identically.
+
+Usage:
+    BENCH_DB_NAME=payment_bench python benchmarks/bench_suppression_queries.py --rows 500000
+    python benchmarks/bench_suppression_queries.py --reuse --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import seed
+from services import payment_daily_report as report
+from services import bot_snapshots
+
+# Created by the migration; dropped first so "before" runs on the old schema
+NEW_INDEXES = ('idx_asl_time_route', 'idx_asl_mid_bank_time', 'idx_asl_midname_bank_time', 'idx_t_mid_updated')
+
+MIGRATION_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'database', 'migrations', 'migration_suppression_log_route_indexes.sql')
+
+PREVIOUS_TOP_SUPPRESSED = """
+    SELECT
+        mid_name,
+        bank_name,
+        COUNT(*) as suppression_count,
+        AVG(success_rate_7d) as avg_success_rate_7d,
+        AVG(success_rate_30d) as avg_success_rate_30d,
+        MAX(suppression_time) as last_suppressed,
+        (SELECT metadata->'alternative_routes' FROM alert_suppression_log asl2
+         WHERE asl2.mid_name = alert_suppression_log.mid_name
+           AND asl2.bank_name = alert_suppression_log.bank_name
+           AND asl2.metadata IS NOT NULL
+         ORDER BY suppression_time DESC LIMIT 1) as alternatives
+    FROM alert_suppression_log
+    WHERE suppression_time >= %s AND suppression_time < %s
+    GROUP BY mid_name, bank_name
+    ORDER BY suppression_count DESC, mid_name, bank_name
+    LIMIT %s
+"""
+
+PREVIOUS_RECOVERED = """
+    WITH recently_suppressed AS (
+        SELECT DISTINCT
+            s.mid_id,
+            s.mid_name,
+            s.bank_name,
+            MAX(s.suppression_time) as last_suppressed,
+            AVG(s.success_rate_7d) as avg_suppressed_success_rate
+        FROM alert_suppression_log s
+        WHERE s.suppression_time >= NOW() - INTERVAL '%s days'
+        GROUP BY s.mid_id, s.mid_name, s.bank_name
+        HAVING AVG(s.success_rate_7d) < 10
+    ),
+    current_performance AS (
+        SELECT
+            t.mid_id,
+            COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') as success_7d,
+            COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days') as total_7d,
+            ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') /
+                  NULLIF(COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'), 0), 2) as current_success_rate_7d
+        FROM transactions t
+        WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'
+        GROUP BY t.mid_id
+    )
+    SELECT
+        rs.mid_name,
+        rs.bank_name,
+        rs.avg_suppressed_success_rate as old_success_rate,
+        cp.current_success_rate_7d as new_success_rate,
+        cp.total_7d as recent_transactions,
+        rs.last_suppressed
+    FROM recently_suppressed rs
+    JOIN current_performance cp ON rs.mid_id = cp.mid_id
+    WHERE cp.current_success_rate_7d >= 10
+      AND cp.total_7d >= 10
+    ORDER BY cp.current_success_rate_7d DESC, rs.mid_name, rs.bank_name
+    LIMIT %s
+"""
+
+
+def seed_suppression_log(conn, rows, days, suppressed_mids, seed_value):
+    """
+    Replace alert_suppression_log with `rows` suppressions spread over every
+    route of `suppressed_mids` MIDs - in practice only a handful of MIDs are
+    suppressed while all of them carry traffic.
+    """
+    cursor = conn.cursor()
+    print(f"Seeding {rows:,} suppression rows over {days} days...")
+    cursor.execute("TRUNCATE alert_suppression_log RESTART IDENTITY")
+    cursor.execute("SELECT setseed(%s)", (((seed_value % 1000) / 1000.0) / 3,))
+    cursor.execute("""
+        CREATE TEMP TABLE suppressed ON COMMIT DROP AS
+        SELECT row_number() OVER (ORDER BY route_no) - 1 AS n, *
+        FROM bench_routes
+        WHERE mid_id IN (SELECT DISTINCT mid_id FROM bench_routes ORDER BY mid_id LIMIT %s)
+    """, (suppressed_mids,))
+    cursor.execute("""
+        INSERT INTO alert_suppression_log (
+            suppression_time, mid_id, mid_name, bank_name, suppression_reason,
+            success_count_7d, declined_count_7d, total_transactions_7d,
+            success_rate_7d, success_rate_30d, alert_count_7d,
+            time_window, current_decline_rate, metadata
+        )
+        SELECT
+            NOW() - random() * (%(days)s * INTERVAL '1 day'),
+            r.mid_id, r.mid_name, r.bank_name,
+            CASE WHEN random() < 0.3 THEN 'dead_route' ELSE 'low_success_rate' END,
+            1, 49, 50,
+            round((random() * 12)::numeric, 2), round((random() * 12)::numeric, 2),
+            0, '5min', 98.0,
+            CASE WHEN random() < 0.8 THEN jsonb_build_object(
+                'reason', 'low_success_rate',
+                'alternative_routes', jsonb_build_array(
+                    jsonb_build_object('mid_name', 'Bench PSP ' || (g %% 97),
+                                       'success_rate_24h', 40 + g %% 50, 'total_24h', 100)
+                )
+            ) END
+        FROM generate_series(1, %(rows)s) g
+        JOIN suppressed r ON r.n = g %% (SELECT COUNT(*) FROM suppressed)
+    """, {'rows': rows, 'days': days})
+    cursor.execute("ANALYZE alert_suppression_log")
+    conn.commit()
+    cursor.close()
+
+
+def drop_indexes(conn):
+    """Back to the schema the previous queries ran on"""
+    cursor = conn.cursor()
+    for index in NEW_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+    cursor.execute("ANALYZE alert_suppression_log")
+    conn.commit()
+    cursor.close()
+
+
+def create_indexes(conn):
+    """Apply the index migration statement by statement, as psql would (CONCURRENTLY needs autocommit)"""
+    with open(MIGRATION_PATH) as f:
+        statements = [part.strip() for part in f.read().split(';')]
+    conn.autocommit = True
+    cursor = conn.cursor()
+    for statement in statements:
+        if any(line.strip() and not line.strip().startswith('--') for line in statement.splitlines()):
+            cursor.execute(statement)
+    cursor.close()
+    conn.autocommit = False
+
+
+def time_query(conn, fn, repeat):
+    """Run fn(cursor) once to warm the cache, then `repeat` timed times: (samples in seconds, last result)"""
+    samples = []
+    result = None
+    for attempt in range(repeat + 1):
+        cursor = conn.cursor()
+        started = time.perf_counter()
+        result = fn(cursor)
+        if attempt:
+            samples.append(time.perf_counter() - started)
+        cursor.close()
+        conn.rollback()
+    return samples, result
+
+
+def previous(query, params):
+    def run(cursor):
+        cursor.execute(query, params)
+        return cursor.fetchall()
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare suppression report queries before/after the LATERAL rewrite")
+    parser.add_argument('--rows', type=int, default=500_000, help='Suppression rows to seed')
+    parser.add_argument('--days', type=int, default=30, help='Days to spread suppressions over')
+    parser.add_argument('--suppressed-mids', type=int, default=3, help='MIDs whose routes get suppressed')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for reproducible data')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+    parser.add_argument('--reuse', action='store_true', help='Keep the existing alert_suppression_log rows')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Suppression Query Regression Benchmark")
+    print(f"Database: {seed.BENCH_DB_CONFIG['dbname']} @ {seed.BENCH_DB_CONFIG['host']}")
+    print("=" * 60)
+
+    conn = seed.get_bench_connection()
+    if not args.reuse:
+        seed_suppression_log(conn, args.rows, args.days, args.suppressed_mids, args.seed)
+
+    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = end_date - timedelta(days=1)  # the report's window
+
+    cases = [
+        ('get_top_suppressed_routes',
+         previous(PREVIOUS_TOP_SUPPRESSED, (start_date, end_date, 10)),
+         lambda c: report.get_top_suppressed_routes(c, start_date, end_date, limit=10),
+         False),
+        ('get_recovered_routes',
+         previous(PREVIOUS_RECOVERED, (7, 10)),
+         lambda c: report.get_recovered_routes(c, lookback_days=7),
+         False),
+        # No LIMIT and only ordered by success rate, so compare as sets
+        ('bot_snapshots.build_recovered',
+         previous(PREVIOUS_RECOVERED.replace('LIMIT %s', ''), (7,)),
+         bot_snapshots.build_recovered,
+         True),
+    ]
+
+    print("⏱️  Timing previous queries (old indexes)...")
+    drop_indexes(conn)
+    before = {name: time_query(conn, before_fn, args.repeat)[0] for name, before_fn, _, _ in cases}
+
+    print("⏱️  Timing rewritten queries (with migration indexes)...")
+    create_indexes(conn)
+    after = {name: time_query(conn, after_fn, args.repeat)[0] for name, _, after_fn, _ in cases}
+
+    # Outputs compared inside one transaction so NOW() is the same for both
+    ok = True
+    cursor = conn.cursor()
+    print(f"\n{'Query':<32} {'before ms':>10} {'after ms':>10} {'speedup':>8}  rows  output")
+    print("-" * 80)
+    for name, before_fn, after_fn, unordered in cases:
+        before_rows = [tuple(row) for row in before_fn(cursor)]
+        after_rows = [tuple(row) for row in after_fn(cursor)]
+        if unordered:
+            before_rows, after_rows = sorted(before_rows), sorted(after_rows)
+        same = before_rows == after_rows
+        ok = ok and same
+
+        before_ms = statistics.median(before[name]) * 1000
+        after_ms = statistics.median(after[name]) * 1000
+        speedup = before_ms / after_ms if after_ms else float('inf')
+        print(f"{name:<32} {before_ms:>10.1f} {after_ms:>10.1f} {speedup:>7.1f}x  {len(after_rows):>4}  "
+              f"{'identical' if same else 'DIFFERENT'}")
+    cursor.close()
+    conn.rollback()
+
+    conn.close()
+    if ok:
+        print("\n✅ All rewritten queries returned identical rows")
+    else:
+        print("\n❌ Rewritten queries returned different rows")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
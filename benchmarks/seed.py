@@ -0,0 +1,520 @@
+#!/usr/bin/env python3
+"""
+Benchmark Dataset Seeder
+Creates the monitoring tables in a scratch database and fills them with a
+reproducible synthetic dataset: bulk transaction history spread over hundreds
+of MID + Bank routes, recent "live" traffic, and injected outage patterns.
+
+Never point this at production - it TRUNCATEs every table it touches.
+"""
+
+import os
+import random
+import time
+
+import psycopg2
+
+# Scratch database used by the benchmarks (falls back to the normal DB_* settings
+# for host/user/password so the same server can host both databases)
+BENCH_DB_CONFIG = {
+    'dbname': os.getenv('BENCH_DB_NAME', 'payment_bench'),
+    'user': os.getenv('BENCH_DB_USER', os.getenv('DB_USER', 'webhook_user')),
+    'password': os.getenv('BENCH_DB_PASSWORD', os.getenv('DB_PASSWORD')),
+    'host': os.getenv('BENCH_DB_HOST', os.getenv('DB_HOST', 'localhost')),
+    'port': os.getenv('BENCH_DB_PORT', os.getenv('DB_PORT', '5432'))
+}
+
+PRODUCTION_DB_NAME = os.getenv('DB_NAME', 'payment_transactions')
+
+# Dimension tables, key columns, trigger and views, applied as shipped
+DIMENSION_MIGRATION = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   'database', 'migrations', 'migration_create_dimension_keys.sql')
+
+# Route kinds and how they behave in the seeded data
+#   normal     - healthy history, healthy live traffic, never alerts
+#   outage     - healthy history, every recent transaction declined -> 5min CRITICAL alert
+#   regression - healthy 7d history, nothing succeeds in the last 24h -> regression alert
+#   dead       - <10% success forever -> alert suppressed by smart filtering
+#   lowvol     - healthy history, <8 recent txns but last 10 all declined -> low-volume alert
+#   excluded   - outage pattern on a test MID -> skipped by EXCLUDED_MID_NAMES
+ROUTE_KIND_WEIGHTS = [
+    ('normal', 0.88),
+    ('outage', 0.03),
+    ('regression', 0.02),
+    ('dead', 0.03),
+    ('lowvol', 0.02),
+    ('excluded', 0.02),
+]
+
+SUCCESS_PROBABILITY = {
+    'normal': 0.80,
+    'outage': 0.75,
+    'regression': 0.60,
+    'dead': 0.02,
+    'lowvol': 0.70,
+    'excluded': 0.70,
+}
+
+DECLINE_REASONS = [
+    ('005', 'Do not honor'),
+    ('051', 'Invalid card number'),
+    ('F.0114', 'Insufficient funds. Failed to complete the transaction'),
+    ('054', 'Expired card'),
+    ('F.2008', "Transaction didn't pass risk management system"),
+    ('057', 'Transaction not permitted to cardholder'),
+]
+
+# Only the tables the monitor and the daily report read or write.
+# Column layout mirrors database/schema/database_schema_fixed.sql and
+# database/views/create_monitoring_views.sql.
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS transactions (
+    id BIGSERIAL PRIMARY KEY,
+    trans_id VARCHAR(100),
+    trans_order VARCHAR(100) NOT NULL,
+    reply_code VARCHAR(10),
+    reply_desc TEXT,
+    status VARCHAR(20),
+    trans_date VARCHAR(100),
+    trans_amount DECIMAL(15, 4),
+    trans_currency VARCHAR(10),
+    merchant_id VARCHAR(50),
+    merchant_name VARCHAR(255),
+    client_country VARCHAR(10),
+    cc_bin VARCHAR(10),
+    bank_name VARCHAR(255),
+    mid_id VARCHAR(100),
+    mid_name VARCHAR(255),
+    first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    last_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS alert_history (
+    id BIGSERIAL PRIMARY KEY,
+    alert_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    severity VARCHAR(20) NOT NULL,
+    time_window VARCHAR(10) NOT NULL,
+    mid_id VARCHAR(100),
+    mid_name VARCHAR(255),
+    bank_name VARCHAR(255),
+    total_transactions INTEGER,
+    successful INTEGER,
+    declined INTEGER,
+    pending INTEGER,
+    success_rate DECIMAL(5,2),
+    decline_rate DECIMAL(5,2),
+    message TEXT,
+    telegram_message_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS alert_suppression_log (
+    id BIGSERIAL PRIMARY KEY,
+    suppression_time TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    mid_id VARCHAR(100),
+    mid_name VARCHAR(255),
+    bank_name VARCHAR(255),
+    suppression_reason VARCHAR(50),
+    success_count_7d INTEGER,
+    declined_count_7d INTEGER,
+    total_transactions_7d INTEGER,
+    success_rate_7d DECIMAL(5,2),
+    success_rate_30d DECIMAL(5,2),
+    alert_count_7d INTEGER,
+    time_window VARCHAR(10),
+    current_decline_rate DECIMAL(5,2),
+    metadata JSONB
+);
+
+CREATE TABLE IF NOT EXISTS daily_alert_stats (
+    stat_date DATE PRIMARY KEY,
+    total_alerts INTEGER NOT NULL DEFAULT 0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    warning_count INTEGER NOT NULL DEFAULT 0,
+    unique_routes INTEGER NOT NULL DEFAULT 0,
+    unique_mids INTEGER NOT NULL DEFAULT 0,
+    unique_banks INTEGER NOT NULL DEFAULT 0,
+    alerts_5min INTEGER NOT NULL DEFAULT 0,
+    alerts_15min INTEGER NOT NULL DEFAULT 0,
+    alerts_30min INTEGER NOT NULL DEFAULT 0,
+    total_suppressions INTEGER NOT NULL DEFAULT 0,
+    unique_routes_suppressed INTEGER NOT NULL DEFAULT 0,
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS alert_overrides (
+    id SERIAL PRIMARY KEY,
+    mid_id VARCHAR(100),
+    mid_name VARCHAR(255),
+    bank_name VARCHAR(255),
+    override_action VARCHAR(20),
+    reason TEXT,
+    created_by VARCHAR(100),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP,
+    last_modified_at TIMESTAMP,
+    last_modified_by VARCHAR(100),
+    is_active BOOLEAN DEFAULT true,
+    UNIQUE (mid_id, bank_name, override_action)
+);
+
+CREATE TABLE IF NOT EXISTS bench_routes (
+    route_no INTEGER PRIMARY KEY,
+    mid_id VARCHAR(100) NOT NULL,
+    mid_name VARCHAR(255) NOT NULL,
+    bank_name VARCHAR(255) NOT NULL,
+    merchant_id VARCHAR(50) NOT NULL,
+    merchant_name VARCHAR(255) NOT NULL,
+    kind VARCHAR(20) NOT NULL,
+    success_p REAL NOT NULL,
+    bank_key INTEGER,
+    mid_key INTEGER,
+    merchant_key INTEGER
+);
+
+-- Never written by the benchmarks; exists so the dimension key migration
+-- applies unchanged
+CREATE TABLE IF NOT EXISTS webhook_events (
+    id BIGSERIAL PRIMARY KEY,
+    merchant_id VARCHAR(50),
+    merchant_name VARCHAR(255),
+    client_country VARCHAR(10),
+    bank_name VARCHAR(255),
+    mid_id VARCHAR(100),
+    mid_name VARCHAR(255),
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+# Created after the bulk load - building indexes once is much faster than
+# maintaining them row by row
+INDEX_SQL = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_t_trans_order ON transactions(trans_order);
+CREATE INDEX IF NOT EXISTS idx_t_status_updated ON transactions(status, last_updated_at);
+CREATE INDEX IF NOT EXISTS idx_t_bank_name_status ON transactions(bank_name, status);
+CREATE INDEX IF NOT EXISTS idx_t_mid_id ON transactions(mid_id);
+CREATE INDEX IF NOT EXISTS idx_t_mid_name ON transactions(mid_name);
+CREATE INDEX IF NOT EXISTS idx_t_last_updated ON transactions(last_updated_at);
+CREATE INDEX IF NOT EXISTS idx_ah_alert_time ON alert_history(alert_time);
+CREATE INDEX IF NOT EXISTS idx_ah_mid_bank ON alert_history(mid_id, bank_name);
+CREATE INDEX IF NOT EXISTS idx_asl_time ON alert_suppression_log(suppression_time);
+"""
+
+def get_bench_connection():
+    """Connect to the benchmark database, refusing to touch production"""
+    if BENCH_DB_CONFIG['dbname'] == PRODUCTION_DB_NAME:
+        raise RuntimeError(
+            f"BENCH_DB_NAME is set to the production database ({PRODUCTION_DB_NAME}) - "
+            f"benchmarks truncate their tables, use a scratch database"
+        )
+    return psycopg2.connect(**BENCH_DB_CONFIG)
+
+def build_routes(num_routes, seed):
+    """Deterministically generate MID + Bank routes with an assigned behaviour"""
+    rng = random.Random(seed)
+    num_mids = max(10, num_routes // 8)
+    num_banks = max(10, num_routes // 5)
+
+    mids = [(f"41{rng.randrange(10**9, 10**10)}", f"Bench PSP {i:03d} - LIVE - Visa")
+            for i in range(num_mids)]
+    banks = [f"BENCH BANK {i:03d} A.S." for i in range(num_banks)]
+    merchants = [(str(1000000 + i), f"Bench Merchant {i:02d} [LIVE]") for i in range(40)]
+
+    kinds, weights = zip(*ROUTE_KIND_WEIGHTS)
+    routes = []
+    seen = set()
+    while len(routes) < num_routes:
+        mid_id, mid_name = rng.choice(mids)
+        bank_name = rng.choice(banks)
+        if (mid_id, bank_name) in seen:
+            continue
+        seen.add((mid_id, bank_name))
+
+        kind = rng.choices(kinds, weights)[0]
+        if kind == 'excluded':
+            mid_name = f"Timesaver Test {len(routes):03d}"
+        merchant_id, merchant_name = rng.choice(merchants)
+        routes.append((len(routes), mid_id, mid_name, bank_name, merchant_id, merchant_name,
+                       kind, SUCCESS_PROBABILITY[kind]))
+
+    return routes
+
+def _decline_case(column):
+    """SQL CASE picking a decline reason code/description from a random() column"""
+    n = len(DECLINE_REASONS)
+    idx = 0 if column == 'reply_code' else 1
+    whens = " ".join(
+        f"WHEN {i} THEN '{reason[idx].replace(chr(39), chr(39) * 2)}'"
+        for i, reason in enumerate(DECLINE_REASONS)
+    )
+    return f"CASE floor(pick * {n})::int {whens} END"
+
+def seed_history(conn, rows, num_routes, days, seed, chunk_size=1_000_000):
+    """Recreate the schema and bulk-load `rows` historical transactions"""
+    cursor = conn.cursor()
+
+    print(f"Creating schema in {BENCH_DB_CONFIG['dbname']}...")
+    cursor.execute("DROP TABLE IF EXISTS transactions, alert_history, alert_suppression_log, "
+                   "daily_alert_stats, alert_overrides, bench_routes, webhook_events, "
+                   "dim_banks, dim_mids, dim_merchants, dim_countries CASCADE")
+    cursor.execute(SCHEMA_SQL)
+    with open(DIMENSION_MIGRATION) as f:
+        cursor.execute(f.read())
+
+    routes = build_routes(num_routes, seed)
+    cursor.executemany("""
+        INSERT INTO bench_routes
+        (route_no, mid_id, mid_name, bank_name, merchant_id, merchant_name, kind, success_p)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, routes)
+    # Keys are written with the rows, as the receiver does, so the trigger
+    # has nothing to look up during the bulk load
+    cursor.execute("""
+        UPDATE bench_routes
+        SET bank_key = dim_bank_key(bank_name),
+            mid_key = dim_mid_key(mid_id, mid_name),
+            merchant_key = dim_merchant_key(merchant_id, merchant_name)
+    """)
+    cursor.execute("SELECT dim_country_key('TR')")
+    conn.commit()
+
+    # Deterministic random() for the rest of this session
+    cursor.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0),))
+
+    started = time.perf_counter()
+    for start in range(1, rows + 1, chunk_size):
+        end = min(start + chunk_size - 1, rows)
+        # History ends 2 hours ago so the 5/15/30 minute windows only see the
+        # live traffic and outages injected right before each timed run.
+        # Regression routes stop succeeding 24 hours ago.
+        cursor.execute(f"""
+            INSERT INTO transactions (
+                trans_id, trans_order, reply_code, reply_desc, status, trans_date,
+                trans_amount, trans_currency, merchant_id, merchant_name, client_country,
+                cc_bin, bank_name, mid_id, mid_name, first_seen_at, last_updated_at,
+                bank_key, mid_key, merchant_key, country_key
+            )
+            SELECT
+                g::text,
+                'BENCH-' || g,
+                CASE WHEN ok THEN '000' ELSE {_decline_case('reply_code')} END,
+                CASE WHEN ok THEN 'Success' ELSE {_decline_case('reply_desc')} END,
+                CASE WHEN ok THEN 'success' ELSE 'declined' END,
+                to_char(ts, 'YYYY-MM-DD HH24:MI:SS'),
+                round((random() * 5000)::numeric, 2),
+                'TRY',
+                r.merchant_id,
+                r.merchant_name,
+                'TR',
+                (400000 + r.route_no)::text,
+                r.bank_name,
+                r.mid_id,
+                r.mid_name,
+                ts,
+                ts,
+                r.bank_key,
+                r.mid_key,
+                r.merchant_key,
+                c.country_key
+            FROM (
+                SELECT
+                    g,
+                    g %% %(num_routes)s AS route_no,
+                    NOW() - INTERVAL '2 hours' - random() * (%(days)s * INTERVAL '1 day') AS ts,
+                    random() AS roll,
+                    random() AS pick
+                FROM generate_series(%(start)s, %(end)s) g
+            ) s
+            JOIN bench_routes r ON r.route_no = s.route_no
+            JOIN dim_countries c ON c.country_code = 'TR'
+            CROSS JOIN LATERAL (
+                SELECT s.roll < r.success_p
+                       AND NOT (r.kind = 'regression' AND s.ts >= NOW() - INTERVAL '24 hours') AS ok
+            ) o
+        """, {'num_routes': num_routes, 'days': days, 'start': start, 'end': end})
+        conn.commit()
+        elapsed = time.perf_counter() - started
+        print(f"   {end:,}/{rows:,} rows ({end / elapsed:,.0f} rows/s)")
+
+    print("Building indexes...")
+    cursor.execute(INDEX_SQL)
+    conn.commit()
+    cursor.execute("ANALYZE")
+    conn.commit()
+    cursor.close()
+
+def inject_recent_traffic(conn, live_per_route, seed):
+    """
+    (Re)insert the time-sensitive rows: healthy live traffic on normal routes
+    over the last 30 minutes plus the outage patterns. Must run right before
+    each timed cycle because the monitor windows are relative to NOW().
+    """
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM transactions WHERE trans_order LIKE 'BENCHLIVE-%%'")
+    cursor.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0) / 2,))
+
+    # Healthy live traffic
+    cursor.execute(f"""
+        INSERT INTO transactions (
+            trans_id, trans_order, reply_code, reply_desc, status, trans_date,
+            trans_amount, trans_currency, merchant_id, merchant_name, client_country,
+            cc_bin, bank_name, mid_id, mid_name, first_seen_at, last_updated_at,
+            bank_key, mid_key, merchant_key, country_key
+        )
+        SELECT
+            'L' || r.route_no || '-' || n,
+            'BENCHLIVE-N-' || r.route_no || '-' || n,
+            CASE WHEN ok THEN '000' ELSE {_decline_case('reply_code')} END,
+            CASE WHEN ok THEN 'Success' ELSE {_decline_case('reply_desc')} END,
+            CASE WHEN ok THEN 'success' ELSE 'declined' END,
+            to_char(ts, 'YYYY-MM-DD HH24:MI:SS'),
+            100, 'TRY', r.merchant_id, r.merchant_name, 'TR',
+            (400000 + r.route_no)::text, r.bank_name, r.mid_id, r.mid_name, ts, ts,
+            r.bank_key, r.mid_key, r.merchant_key, c.country_key
+        FROM bench_routes r
+        JOIN dim_countries c ON c.country_code = 'TR'
+        CROSS JOIN generate_series(1, %s) n
+        CROSS JOIN LATERAL (
+            SELECT NOW() - random() * INTERVAL '30 minutes' AS ts,
+                   random() < r.success_p AS ok,
+                   random() AS pick
+        ) s
+        WHERE r.kind = 'normal'
+    """, (live_per_route,))
+
+    # Outage patterns: 12 straight declines in the last 3 minutes. Injected
+    # declines use a code the low-volume check does not treat as a customer error.
+    cursor.execute("""
+        INSERT INTO transactions (
+            trans_id, trans_order, reply_code, reply_desc, status, trans_date,
+            trans_amount, trans_currency, merchant_id, merchant_name, client_country,
+            cc_bin, bank_name, mid_id, mid_name, first_seen_at, last_updated_at,
+            bank_key, mid_key, merchant_key, country_key
+        )
+        SELECT
+            'O' || r.route_no || '-' || n,
+            'BENCHLIVE-O-' || r.route_no || '-' || n,
+            '96', 'System malfunction', 'declined',
+            to_char(NOW(), 'YYYY-MM-DD HH24:MI:SS'),
+            100, 'TRY', r.merchant_id, r.merchant_name, 'TR',
+            (400000 + r.route_no)::text, r.bank_name, r.mid_id, r.mid_name,
+            NOW() - n * INTERVAL '15 seconds', NOW() - n * INTERVAL '15 seconds',
+            r.bank_key, r.mid_key, r.merchant_key, c.country_key
+        FROM bench_routes r
+        JOIN dim_countries c ON c.country_code = 'TR'
+        CROSS JOIN generate_series(1, 12) n
+        WHERE r.kind IN ('outage', 'regression', 'dead', 'excluded')
+    """)
+
+    # Low-volume failures: 5 declines inside the 5 minute window, 5 more
+    # between 36 and 60 minutes ago (outside every window's minimum volume),
+    # so the last 10 overall are all declined
+    cursor.execute("""
+        INSERT INTO transactions (
+            trans_id, trans_order, reply_code, reply_desc, status, trans_date,
+            trans_amount, trans_currency, merchant_id, merchant_name, client_country,
+            cc_bin, bank_name, mid_id, mid_name, first_seen_at, last_updated_at,
+            bank_key, mid_key, merchant_key, country_key
+        )
+        SELECT
+            'V' || r.route_no || '-' || n,
+            'BENCHLIVE-V-' || r.route_no || '-' || n,
+            '96', 'System malfunction', 'declined',
+            to_char(NOW(), 'YYYY-MM-DD HH24:MI:SS'),
+            100, 'TRY', r.merchant_id, r.merchant_name, 'TR',
+            (400000 + r.route_no)::text, r.bank_name, r.mid_id, r.mid_name, ts, ts,
+            r.bank_key, r.mid_key, r.merchant_key, c.country_key
+        FROM bench_routes r
+        JOIN dim_countries c ON c.country_code = 'TR'
+        CROSS JOIN generate_series(1, 10) n
+        CROSS JOIN LATERAL (
+            SELECT CASE WHEN n <= 5 THEN NOW() - n * INTERVAL '40 seconds'
+                        ELSE NOW() - n * INTERVAL '6 minutes' END AS ts
+        ) s
+        WHERE r.kind = 'lowvol'
+    """)
+
+    conn.commit()
+    cursor.execute("ANALYZE transactions")
+    conn.commit()
+    cursor.close()
+
+def reset_alert_state(conn):
+    """Clear everything the monitor writes so each timed cycle starts cold"""
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE alert_history, alert_suppression_log, daily_alert_stats, alert_overrides RESTART IDENTITY")
+    conn.commit()
+    cursor.close()
+
+def seed_alert_history(conn, alerts_per_day, days, seed):
+    """
+    Fill alert_history / alert_suppression_log with `days` of past alerts so the
+    daily report queries have a realistic amount of data to aggregate.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT setseed(%s)", (((seed % 1000) / 1000.0) / 3,))
+    total = alerts_per_day * days
+    cursor.execute("""
+        INSERT INTO alert_history (
+            alert_time, severity, time_window, mid_id, mid_name, bank_name,
+            total_transactions, successful, declined, pending,
+            success_rate, decline_rate, message, telegram_message_id
+        )
+        SELECT
+            CURRENT_DATE + INTERVAL '1 day' - random() * (%(days)s * INTERVAL '1 day'),
+            CASE WHEN random() < 0.4 THEN 'CRITICAL' ELSE 'WARNING' END,
+            (ARRAY['5min', '15min', '30min'])[1 + floor(random() * 3)::int],
+            r.mid_id, r.mid_name, r.bank_name,
+            20, 4, 16, 0, 20.0, 80.0,
+            'Decline rate 80.0%% exceeded threshold',
+            g::int
+        FROM generate_series(1, %(total)s) g
+        JOIN bench_routes r ON r.route_no = g %% (SELECT COUNT(*) FROM bench_routes)
+    """, {'days': days, 'total': total})
+
+    cursor.execute("""
+        INSERT INTO alert_suppression_log (
+            suppression_time, mid_id, mid_name, bank_name, suppression_reason,
+            success_count_7d, declined_count_7d, total_transactions_7d,
+            success_rate_7d, success_rate_30d, alert_count_7d,
+            time_window, current_decline_rate, metadata
+        )
+        SELECT
+            CURRENT_DATE + INTERVAL '1 day' - random() * (%(days)s * INTERVAL '1 day'),
+            r.mid_id, r.mid_name, r.bank_name,
+            CASE WHEN r.kind = 'dead' THEN 'dead_route' ELSE 'low_success_rate' END,
+            1, 49, 50, 2.0, 3.0, 0, '5min', 98.0,
+            jsonb_build_object(
+                'assessment', 'Dead route',
+                'reason', 'dead_route',
+                'alternative_routes', jsonb_build_array(
+                    jsonb_build_object('mid_name', 'Bench PSP 001 - LIVE - Visa',
+                                       'success_rate_24h', 55.5, 'total_24h', 120)
+                ),
+                'has_alternatives', true
+            )
+        FROM generate_series(1, %(total)s) g
+        JOIN bench_routes r ON r.route_no = g %% (SELECT COUNT(*) FROM bench_routes)
+        WHERE r.kind IN ('dead', 'regression', 'outage')
+    """, {'days': days, 'total': total})
+
+    conn.commit()
+    cursor.execute("ANALYZE alert_history")
+    cursor.execute("ANALYZE alert_suppression_log")
+    conn.commit()
+    cursor.close()
+
+def expected_alerts(conn):
+    """
+    Alert decisions implied by the injected patterns as (kind, window, mid_id,
+    bank_name) - the fingerprint minus its severity / suppression reason.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT mid_id, bank_name, kind FROM bench_routes ORDER BY route_no")
+    expected = []
+    for mid_id, bank_name, kind in cursor.fetchall():
+        if kind in ('outage', 'regression', 'lowvol'):
+            expected.append(['alert', '5min', mid_id, bank_name])
+        elif kind == 'dead':
+            expected.append(['suppressed', '5min', mid_id, bank_name])
+    cursor.close()
+    return sorted(expected)
@@ -0,0 +1,55 @@
+-- Migration Script: Add delivery_key to webhook_events for duplicate detection
+-- Created: 2026-10-19
+-- Purpose: Coriunder retries webhook deliveries. The receiver stores an md5 of
+--          (trans_order, trans_id, reply_code, signature) per event and inserts
+--          with ON CONFLICT DO NOTHING, so an exact retry is neither stored again
+--          nor re-upserted into transactions.
+--
+-- Existing rows keep delivery_key NULL (the index is partial), so historical
+-- duplicates are untouched. Run outside a transaction block (CONCURRENTLY).
+
+-- =====================================================
+-- Add delivery_key column
+-- =====================================================
+
+ALTER TABLE webhook_events
+ADD COLUMN IF NOT EXISTS delivery_key VARCHAR(32);
+
+COMMENT ON COLUMN webhook_events.delivery_key IS 'md5(trans_order|trans_id|reply_code|signature) - identifies retried deliveries';
+
+-- =====================================================
+-- Unique index (partial: only rows written by the new receiver)
+-- =====================================================
+
+CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS idx_we_delivery_key
+ON webhook_events(delivery_key)
+WHERE delivery_key IS NOT NULL;
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+-- Verify column was added
+SELECT
+    column_name,
+    data_type,
+    character_maximum_length
+FROM information_schema.columns
+WHERE table_name = 'webhook_events'
+    AND column_name = 'delivery_key';
+
+-- Check index
+SELECT
+    indexname,
+    indexdef
+FROM pg_indexes
+WHERE tablename = 'webhook_events'
+    AND indexname = 'idx_we_delivery_key';
+
+-- After deployment: duplicates that would previously have been stored
+-- (should stay at 0 for new rows)
+SELECT delivery_key, COUNT(*)
+FROM webhook_events
+WHERE delivery_key IS NOT NULL
+GROUP BY delivery_key
+HAVING COUNT(*) > 1;
@@ -0,0 +1,43 @@
+-- Migration Script: Create backfill_progress table (checkpoints for utils/backfill.py)
+-- Created: 2026-10-19
+-- Purpose: Derived columns (mid_name, bank_name, merchant_name) used to be
+--          backfilled with one unbounded UPDATE per table, holding row locks
+--          for minutes on large tables. utils/backfill.py now walks the id
+--          range in small committed batches; each batch records how far its
+--          segment got here in the same transaction, so an interrupted
+--          backfill resumes exactly where it stopped.
+
+-- =====================================================
+-- backfill_progress table
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS backfill_progress (
+    job_name VARCHAR(100) NOT NULL,
+    segment INTEGER NOT NULL,
+    start_id BIGINT NOT NULL,
+    end_id BIGINT NOT NULL,
+    next_id BIGINT NOT NULL,
+    rows_updated BIGINT NOT NULL DEFAULT 0,
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP,
+    PRIMARY KEY (job_name, segment)
+);
+
+COMMENT ON TABLE backfill_progress IS 'Resume checkpoints for utils/backfill.py: one row per id segment of a backfill job';
+COMMENT ON COLUMN backfill_progress.job_name IS 'Backfill and table, e.g. mid_name:transactions';
+COMMENT ON COLUMN backfill_progress.next_id IS 'First id of the segment not processed yet; the segment is done once it passes end_id';
+COMMENT ON COLUMN backfill_progress.rows_updated IS 'Rows changed by this segment so far';
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+SELECT job_name,
+       COUNT(*) as segments,
+       COUNT(finished_at) as finished,
+       SUM(rows_updated) as rows_updated,
+       MAX(updated_at) as last_batch
+FROM backfill_progress
+GROUP BY job_name
+ORDER BY job_name;
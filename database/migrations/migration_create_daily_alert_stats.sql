@@ -0,0 +1,88 @@
+-- Migration Script: Create daily_alert_stats table (pre-aggregated daily report numbers)
+-- Created: 2026-10-19
+-- Purpose: services/payment_daily_report.py used to rescan 7 days of
+--          alert_history for its trend section on every run. Each finished
+--          day is now aggregated once into daily_alert_stats, so the trend
+--          and weekly numbers read 7 rows. The report recomputes its own day
+--          on every run and fills in any missing earlier days; past days can
+--          be recomputed with --backfill-from / --backfill-to.
+
+-- =====================================================
+-- daily_alert_stats table
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS daily_alert_stats (
+    stat_date DATE PRIMARY KEY,
+    total_alerts INTEGER NOT NULL DEFAULT 0,
+    critical_count INTEGER NOT NULL DEFAULT 0,
+    warning_count INTEGER NOT NULL DEFAULT 0,
+    unique_routes INTEGER NOT NULL DEFAULT 0,
+    unique_mids INTEGER NOT NULL DEFAULT 0,
+    unique_banks INTEGER NOT NULL DEFAULT 0,
+    alerts_5min INTEGER NOT NULL DEFAULT 0,
+    alerts_15min INTEGER NOT NULL DEFAULT 0,
+    alerts_30min INTEGER NOT NULL DEFAULT 0,
+    total_suppressions INTEGER NOT NULL DEFAULT 0,
+    unique_routes_suppressed INTEGER NOT NULL DEFAULT 0,
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE daily_alert_stats IS 'One row per finished day of alert_history / alert_suppression_log, written by payment_daily_report.py';
+COMMENT ON COLUMN daily_alert_stats.computed_at IS 'When the row was last (re)computed';
+
+-- =====================================================
+-- Backfill every finished day already in alert_history
+-- =====================================================
+
+INSERT INTO daily_alert_stats (
+    stat_date, total_alerts, critical_count, warning_count,
+    unique_routes, unique_mids, unique_banks,
+    alerts_5min, alerts_15min, alerts_30min,
+    total_suppressions, unique_routes_suppressed
+)
+SELECT
+    g.day::date,
+    a.total_alerts, a.critical_count, a.warning_count,
+    a.unique_routes, a.unique_mids, a.unique_banks,
+    a.alerts_5min, a.alerts_15min, a.alerts_30min,
+    s.total_suppressions, s.unique_routes_suppressed
+FROM generate_series(
+         (SELECT MIN(alert_time)::date FROM alert_history),
+         CURRENT_DATE - 1,
+         INTERVAL '1 day'
+     ) AS g(day)
+CROSS JOIN LATERAL (
+    SELECT
+        COUNT(*) as total_alerts,
+        COUNT(*) FILTER (WHERE severity = 'CRITICAL') as critical_count,
+        COUNT(*) FILTER (WHERE severity = 'WARNING') as warning_count,
+        COUNT(DISTINCT mid_name || ' + ' || bank_name) as unique_routes,
+        COUNT(DISTINCT mid_name) as unique_mids,
+        COUNT(DISTINCT bank_name) as unique_banks,
+        COUNT(*) FILTER (WHERE time_window = '5min') as alerts_5min,
+        COUNT(*) FILTER (WHERE time_window = '15min') as alerts_15min,
+        COUNT(*) FILTER (WHERE time_window = '30min') as alerts_30min
+    FROM alert_history
+    WHERE alert_time >= g.day AND alert_time < g.day + INTERVAL '1 day'
+) a
+CROSS JOIN LATERAL (
+    SELECT
+        COUNT(*) as total_suppressions,
+        COUNT(DISTINCT mid_name || ' + ' || bank_name) as unique_routes_suppressed
+    FROM alert_suppression_log
+    WHERE suppression_time >= g.day AND suppression_time < g.day + INTERVAL '1 day'
+) s
+ON CONFLICT (stat_date) DO NOTHING;
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+-- Last 7 days as the report sees them
+SELECT stat_date, total_alerts, critical_count, warning_count, total_suppressions
+FROM daily_alert_stats
+ORDER BY stat_date DESC
+LIMIT 7;
+
+-- Days covered
+SELECT MIN(stat_date), MAX(stat_date), COUNT(*) FROM daily_alert_stats;
@@ -0,0 +1,561 @@
+-- Migration Script: Dictionary-encoded dimension keys for transactions and webhook_events
+-- Created: 2026-10-19
+-- Purpose: Every row repeats long strings (bank_name, mid_id + mid_name,
+--          merchant_id + merchant_name, client_country). Each distinct value
+--          now gets a small integer key in a dimension table:
+--
+--            dim_banks      bank_key     -> bank_name
+--            dim_mids       mid_key      -> (mid_id, mid_name)
+--            dim_merchants  merchant_key -> (merchant_id, merchant_name)
+--            dim_countries  country_key  -> country_code (client_country)
+--
+--          The dimensions hold the values exactly as stored on the rows (a
+--          MID that appears under two names has two keys), so grouping by
+--          keys gives the same groups as grouping by the strings. Keys are
+--          never reused or changed.
+--
+--          The webhook receiver sets the keys from its mapping cache; the
+--          trigger below fills any key it could not (a value the cache has not
+--          seen yet, other writers, scripts that change the text columns).
+--          The monitor's window query and the mid_bank_performance_* /
+--          bank_performance_* views group by the keys and join the dimensions
+--          for display names, with unchanged output columns.
+--
+--          The text columns are kept: Grafana panels and ad-hoc queries read
+--          them directly.
+--
+-- Steps:
+--   1. Run this migration (adds nullable columns - no table rewrite - and
+--      keys rows from the last day so the monitor's windows are complete)
+--   2. Key the older rows in batches:
+--        python3 utils/backfill.py dimension_keys
+
+-- =====================================================
+-- Dimension tables
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS dim_banks (
+    bank_key SERIAL PRIMARY KEY,
+    bank_name VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_mids (
+    mid_key SERIAL PRIMARY KEY,
+    mid_id VARCHAR(100) NOT NULL,
+    mid_name VARCHAR(255)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dim_mids_value ON dim_mids (mid_id, (COALESCE(mid_name, '')));
+
+CREATE TABLE IF NOT EXISTS dim_merchants (
+    merchant_key SERIAL PRIMARY KEY,
+    merchant_id VARCHAR(50) NOT NULL,
+    merchant_name TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dim_merchants_value ON dim_merchants (merchant_id, (COALESCE(merchant_name, '')));
+
+CREATE TABLE IF NOT EXISTS dim_countries (
+    country_key SMALLSERIAL PRIMARY KEY,
+    country_code VARCHAR(10) NOT NULL UNIQUE
+);
+
+COMMENT ON TABLE dim_banks IS 'Dictionary of bank_name values (transactions.bank_key, webhook_events.bank_key)';
+COMMENT ON TABLE dim_mids IS 'Dictionary of (mid_id, mid_name) pairs as stored on rows (mid_key)';
+COMMENT ON TABLE dim_merchants IS 'Dictionary of (merchant_id, merchant_name) pairs as stored on rows (merchant_key)';
+COMMENT ON TABLE dim_countries IS 'Dictionary of client_country codes (country_key)';
+
+-- =====================================================
+-- Key lookup functions (get or create)
+-- =====================================================
+
+-- Each returns the key for a value, adding it to the dimension if it is new.
+-- NULL in, NULL out. A new value NOTIFYs mapping_refresh so receivers pick
+-- it up for their cache straight away.
+
+CREATE OR REPLACE FUNCTION dim_bank_key(p_bank_name VARCHAR) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_bank_name IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT bank_key INTO k FROM dim_banks WHERE bank_name = p_bank_name;
+    IF k IS NULL THEN
+        INSERT INTO dim_banks (bank_name) VALUES (p_bank_name)
+        ON CONFLICT DO NOTHING
+        RETURNING bank_key INTO k;
+        IF k IS NULL THEN  -- added by a concurrent transaction
+            SELECT bank_key INTO k FROM dim_banks WHERE bank_name = p_bank_name;
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_banks');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_mid_key(p_mid_id VARCHAR, p_mid_name VARCHAR) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_mid_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT mid_key INTO k FROM dim_mids
+    WHERE mid_id = p_mid_id AND COALESCE(mid_name, '') = COALESCE(p_mid_name, '');
+    IF k IS NULL THEN
+        INSERT INTO dim_mids (mid_id, mid_name) VALUES (p_mid_id, p_mid_name)
+        ON CONFLICT DO NOTHING
+        RETURNING mid_key INTO k;
+        IF k IS NULL THEN
+            SELECT mid_key INTO k FROM dim_mids
+            WHERE mid_id = p_mid_id AND COALESCE(mid_name, '') = COALESCE(p_mid_name, '');
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_mids');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_merchant_key(p_merchant_id VARCHAR, p_merchant_name TEXT) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_merchant_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT merchant_key INTO k FROM dim_merchants
+    WHERE merchant_id = p_merchant_id AND COALESCE(merchant_name, '') = COALESCE(p_merchant_name, '');
+    IF k IS NULL THEN
+        INSERT INTO dim_merchants (merchant_id, merchant_name) VALUES (p_merchant_id, p_merchant_name)
+        ON CONFLICT DO NOTHING
+        RETURNING merchant_key INTO k;
+        IF k IS NULL THEN
+            SELECT merchant_key INTO k FROM dim_merchants
+            WHERE merchant_id = p_merchant_id AND COALESCE(merchant_name, '') = COALESCE(p_merchant_name, '');
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_merchants');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_country_key(p_country_code VARCHAR) RETURNS SMALLINT AS $$
+DECLARE
+    k SMALLINT;
+BEGIN
+    IF p_country_code IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT country_key INTO k FROM dim_countries WHERE country_code = p_country_code;
+    IF k IS NULL THEN
+        INSERT INTO dim_countries (country_code) VALUES (p_country_code)
+        ON CONFLICT DO NOTHING
+        RETURNING country_key INTO k;
+        IF k IS NULL THEN
+            SELECT country_key INTO k FROM dim_countries WHERE country_code = p_country_code;
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_countries');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+-- =====================================================
+-- Key columns
+-- =====================================================
+
+ALTER TABLE transactions
+    ADD COLUMN IF NOT EXISTS bank_key INTEGER,
+    ADD COLUMN IF NOT EXISTS mid_key INTEGER,
+    ADD COLUMN IF NOT EXISTS merchant_key INTEGER,
+    ADD COLUMN IF NOT EXISTS country_key SMALLINT;
+
+ALTER TABLE webhook_events
+    ADD COLUMN IF NOT EXISTS bank_key INTEGER,
+    ADD COLUMN IF NOT EXISTS mid_key INTEGER,
+    ADD COLUMN IF NOT EXISTS merchant_key INTEGER,
+    ADD COLUMN IF NOT EXISTS country_key SMALLINT;
+
+COMMENT ON COLUMN transactions.bank_key IS 'dim_banks key of bank_name';
+COMMENT ON COLUMN transactions.mid_key IS 'dim_mids key of (mid_id, mid_name)';
+COMMENT ON COLUMN transactions.merchant_key IS 'dim_merchants key of (merchant_id, merchant_name)';
+COMMENT ON COLUMN transactions.country_key IS 'dim_countries key of client_country';
+
+-- =====================================================
+-- Trigger: keep keys in step with the text columns
+-- =====================================================
+
+-- A key supplied by the writer is trusted (the receiver takes it from the
+-- dimension tables). A missing key, or a text column changed without its
+-- key, is looked up / created here.
+CREATE OR REPLACE FUNCTION set_dimension_keys() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.bank_name IS NULL THEN
+        NEW.bank_key := NULL;
+    ELSIF NEW.bank_key IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.bank_name IS DISTINCT FROM OLD.bank_name
+           AND NEW.bank_key IS NOT DISTINCT FROM OLD.bank_key) THEN
+        NEW.bank_key := dim_bank_key(NEW.bank_name);
+    END IF;
+
+    IF NEW.mid_id IS NULL THEN
+        NEW.mid_key := NULL;
+    ELSIF NEW.mid_key IS NULL
+       OR (TG_OP = 'UPDATE' AND (NEW.mid_id, NEW.mid_name) IS DISTINCT FROM (OLD.mid_id, OLD.mid_name)
+           AND NEW.mid_key IS NOT DISTINCT FROM OLD.mid_key) THEN
+        NEW.mid_key := dim_mid_key(NEW.mid_id, NEW.mid_name);
+    END IF;
+
+    IF NEW.merchant_id IS NULL THEN
+        NEW.merchant_key := NULL;
+    ELSIF NEW.merchant_key IS NULL
+       OR (TG_OP = 'UPDATE' AND (NEW.merchant_id, NEW.merchant_name) IS DISTINCT FROM (OLD.merchant_id, OLD.merchant_name)
+           AND NEW.merchant_key IS NOT DISTINCT FROM OLD.merchant_key) THEN
+        NEW.merchant_key := dim_merchant_key(NEW.merchant_id, NEW.merchant_name);
+    END IF;
+
+    IF NEW.client_country IS NULL THEN
+        NEW.country_key := NULL;
+    ELSIF NEW.country_key IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.client_country IS DISTINCT FROM OLD.client_country
+           AND NEW.country_key IS NOT DISTINCT FROM OLD.country_key) THEN
+        NEW.country_key := dim_country_key(NEW.client_country);
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_dimension_keys ON transactions;
+CREATE TRIGGER trg_transactions_dimension_keys
+    BEFORE INSERT OR UPDATE OF bank_name, mid_id, mid_name, merchant_id, merchant_name, client_country
+    ON transactions
+    FOR EACH ROW EXECUTE FUNCTION set_dimension_keys();
+
+DROP TRIGGER IF EXISTS trg_webhook_events_dimension_keys ON webhook_events;
+CREATE TRIGGER trg_webhook_events_dimension_keys
+    BEFORE INSERT OR UPDATE OF bank_name, mid_id, mid_name, merchant_id, merchant_name, client_country
+    ON webhook_events
+    FOR EACH ROW EXECUTE FUNCTION set_dimension_keys();
+
+-- =====================================================
+-- Key the last day's rows (older rows: utils/backfill.py dimension_keys)
+-- =====================================================
+
+UPDATE transactions
+SET bank_key = dim_bank_key(bank_name),
+    mid_key = dim_mid_key(mid_id, mid_name),
+    merchant_key = dim_merchant_key(merchant_id, merchant_name),
+    country_key = dim_country_key(client_country)
+WHERE last_updated_at >= NOW() - INTERVAL '1 day';
+
+UPDATE webhook_events
+SET bank_key = dim_bank_key(bank_name),
+    mid_key = dim_mid_key(mid_id, mid_name),
+    merchant_key = dim_merchant_key(merchant_id, merchant_name),
+    country_key = dim_country_key(client_country)
+WHERE received_at >= NOW() - INTERVAL '1 day';
+
+-- =====================================================
+-- Views: group by keys, names from the dimensions
+-- (same columns as migration_exclude_test_mids_all_views.sql)
+-- =====================================================
+
+CREATE OR REPLACE VIEW mid_bank_performance_5min AS
+SELECT
+    dm.mid_id, dm.mid_name, db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        mid_key, bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE status = 'success') as successful,
+        COUNT(*) FILTER (WHERE status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(last_updated_at) as first_transaction,
+        MAX(last_updated_at) as last_transaction
+    FROM transactions
+    WHERE last_updated_at >= NOW() - INTERVAL '5 minutes'
+        AND mid_key IS NOT NULL AND bank_key IS NOT NULL
+    GROUP BY mid_key, bank_key
+) p
+JOIN dim_mids dm ON dm.mid_key = p.mid_key
+JOIN dim_banks db ON db.bank_key = p.bank_key
+WHERE dm.mid_id NOT IN ('43110201461')
+    AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+    AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+ORDER BY p.decline_rate DESC NULLS LAST;
+
+CREATE OR REPLACE VIEW mid_bank_performance_15min AS
+SELECT
+    dm.mid_id, dm.mid_name, db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        mid_key, bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE status = 'success') as successful,
+        COUNT(*) FILTER (WHERE status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(last_updated_at) as first_transaction,
+        MAX(last_updated_at) as last_transaction
+    FROM transactions
+    WHERE last_updated_at >= NOW() - INTERVAL '15 minutes'
+        AND mid_key IS NOT NULL AND bank_key IS NOT NULL
+    GROUP BY mid_key, bank_key
+) p
+JOIN dim_mids dm ON dm.mid_key = p.mid_key
+JOIN dim_banks db ON db.bank_key = p.bank_key
+WHERE dm.mid_id NOT IN ('43110201461')
+    AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+    AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+ORDER BY p.decline_rate DESC NULLS LAST;
+
+CREATE OR REPLACE VIEW mid_bank_performance_30min AS
+SELECT
+    dm.mid_id, dm.mid_name, db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        mid_key, bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE status = 'success') as successful,
+        COUNT(*) FILTER (WHERE status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(last_updated_at) as first_transaction,
+        MAX(last_updated_at) as last_transaction
+    FROM transactions
+    WHERE last_updated_at >= NOW() - INTERVAL '30 minutes'
+        AND mid_key IS NOT NULL AND bank_key IS NOT NULL
+    GROUP BY mid_key, bank_key
+) p
+JOIN dim_mids dm ON dm.mid_key = p.mid_key
+JOIN dim_banks db ON db.bank_key = p.bank_key
+WHERE dm.mid_id NOT IN ('43110201461')
+    AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+    AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+ORDER BY p.decline_rate DESC NULLS LAST;
+
+CREATE OR REPLACE VIEW mid_bank_performance_2hour_baseline AS
+SELECT
+    dm.mid_id, dm.mid_name, db.bank_name,
+    p.total_transactions, p.successful, p.declined,
+    p.success_rate, p.decline_rate
+FROM (
+    SELECT
+        mid_key, bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE status = 'success') as successful,
+        COUNT(*) FILTER (WHERE status = 'declined') as declined,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate
+    FROM transactions
+    WHERE last_updated_at >= NOW() - INTERVAL '2 hours'
+        AND mid_key IS NOT NULL AND bank_key IS NOT NULL
+    GROUP BY mid_key, bank_key
+    HAVING COUNT(*) >= 10
+) p
+JOIN dim_mids dm ON dm.mid_key = p.mid_key
+JOIN dim_banks db ON db.bank_key = p.bank_key
+WHERE dm.mid_id NOT IN ('43110201461')
+    AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+    AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL);
+
+-- Bank views aggregate across MIDs, so the test-MID exclusion is a join to
+-- dim_mids before grouping (rows without a MID were excluded before too)
+
+CREATE OR REPLACE VIEW bank_performance_5min AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE t.last_updated_at >= NOW() - INTERVAL '5 minutes'
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+CREATE OR REPLACE VIEW bank_performance_15min AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE t.last_updated_at >= NOW() - INTERVAL '15 minutes'
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+CREATE OR REPLACE VIEW bank_performance_30min AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE t.last_updated_at >= NOW() - INTERVAL '30 minutes'
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+CREATE OR REPLACE VIEW bank_performance_1hour AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE t.last_updated_at >= NOW() - INTERVAL '1 hour'
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+CREATE OR REPLACE VIEW bank_performance_2hour AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE t.last_updated_at >= NOW() - INTERVAL '2 hours'
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+CREATE OR REPLACE VIEW bank_performance_today AS
+SELECT
+    db.bank_name,
+    p.total_transactions, p.successful, p.declined, p.pending,
+    p.success_rate, p.decline_rate, p.first_transaction, p.last_transaction
+FROM (
+    SELECT
+        t.bank_key,
+        COUNT(*) as total_transactions,
+        COUNT(*) FILTER (WHERE t.status = 'success') as successful,
+        COUNT(*) FILTER (WHERE t.status = 'declined') as declined,
+        COUNT(*) FILTER (WHERE t.status = 'pending') as pending,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success') / NULLIF(COUNT(*), 0), 2) as success_rate,
+        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'declined') / NULLIF(COUNT(*), 0), 2) as decline_rate,
+        MIN(t.last_updated_at) as first_transaction,
+        MAX(t.last_updated_at) as last_transaction
+    FROM transactions t
+    JOIN dim_mids dm ON dm.mid_key = t.mid_key
+    WHERE DATE(t.last_updated_at) = CURRENT_DATE
+        AND t.bank_key IS NOT NULL
+        AND dm.mid_id NOT IN ('43110201461')
+        AND (dm.mid_name NOT ILIKE '%timesaver%' OR dm.mid_name IS NULL)
+        AND (dm.mid_name NOT ILIKE '%test%' OR dm.mid_name IS NULL)
+    GROUP BY t.bank_key
+) p
+JOIN dim_banks db ON db.bank_key = p.bank_key
+ORDER BY p.total_transactions DESC;
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+SELECT
+    (SELECT COUNT(*) FROM dim_banks) as banks,
+    (SELECT COUNT(*) FROM dim_mids) as mids,
+    (SELECT COUNT(*) FROM dim_merchants) as merchants,
+    (SELECT COUNT(*) FROM dim_countries) as countries;
+
+-- Rows still waiting for utils/backfill.py dimension_keys (planner estimate is enough)
+SELECT COUNT(*) as unkeyed_last_day
+FROM transactions
+WHERE last_updated_at >= NOW() - INTERVAL '1 day'
+  AND ((bank_key IS NULL AND bank_name IS NOT NULL) OR (mid_key IS NULL AND mid_id IS NOT NULL));
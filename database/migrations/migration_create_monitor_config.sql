@@ -0,0 +1,76 @@
+-- Migration Script: Create monitor_config table (versioned runtime configuration)
+-- Created: 2026-10-19
+-- Purpose: /config threshold and /config enable|disable in the Telegram bot
+--          used to regex-rewrite services/payment_monitor.py on disk. The
+--          monitor now reads its thresholds, smart-filter settings and
+--          exclusion lists from the latest row of monitor_config at the start
+--          of every run (see services/monitor_config.py), falling back to the
+--          constants in payment_monitor.py for any key not stored here.
+--
+-- Every change inserts a new version; older versions are kept as history
+-- and can be restored with /config rollback <version>.
+
+-- =====================================================
+-- monitor_config table
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS monitor_config (
+    version SERIAL PRIMARY KEY,
+    config JSONB NOT NULL,
+    changed_by VARCHAR(100),
+    change_note TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+COMMENT ON TABLE monitor_config IS 'Versioned payment_monitor configuration - the highest version is active';
+COMMENT ON COLUMN monitor_config.config IS 'Keys override payment_monitor.py defaults: thresholds, smart_filter, cooldown_minutes, excluded_*';
+
+-- =====================================================
+-- Initial version (current payment_monitor.py values)
+-- =====================================================
+
+INSERT INTO monitor_config (config, changed_by, change_note)
+SELECT
+    '{
+        "thresholds": {
+            "5min":  {"min_transactions": 8,  "critical_decline_rate": 75, "warning_decline_rate": 60},
+            "15min": {"min_transactions": 13, "critical_decline_rate": 75, "warning_decline_rate": 50},
+            "30min": {"min_transactions": 25, "critical_decline_rate": 70, "warning_decline_rate": 50}
+        },
+        "smart_filter": {
+            "enabled": true,
+            "min_success_rate_threshold": 0.10,
+            "recent_period_hours": 24,
+            "historical_period_days": 7,
+            "min_transactions_for_analysis": 10
+        },
+        "cooldown_minutes": 1440,
+        "excluded_decline_codes": ["F.0114", "39", "005-39", "4.01", "F.2008"],
+        "excluded_decline_descriptions": [
+            "insufficient funds",
+            "insufficient fund",
+            "didn''t pass risk management system",
+            "did not pass risk management system",
+            "risk management system"
+        ],
+        "excluded_mids": ["43110201461"],
+        "excluded_mid_names": ["timesaver", "test", "networxpay"]
+    }'::jsonb,
+    'migration',
+    'Initial values from payment_monitor.py'
+WHERE NOT EXISTS (SELECT 1 FROM monitor_config);
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+-- Active configuration
+SELECT version, changed_by, created_at, jsonb_pretty(config)
+FROM monitor_config
+ORDER BY version DESC
+LIMIT 1;
+
+-- Change history
+SELECT version, changed_by, change_note, created_at
+FROM monitor_config
+ORDER BY version DESC;
@@ -0,0 +1,101 @@
+-- Migration Script: Create routes catalog (one row per MID + bank route)
+-- Created: 2026-10-19
+-- Purpose: The Telegram bot resolves MID and bank names from user input
+--          (/check, /alternatives, /suppress, alert buttons). It used to run
+--          SELECT DISTINCT ... FROM transactions WHERE ... ILIKE '%...%', a
+--          full scan of the largest table per command. routes holds one row
+--          per (mid_id, bank_name) and stays small; the bot caches it in
+--          memory (services/route_catalog.py). bank_name is NULL for a MID
+--          seen with BINs missing from bin_bank_mapping, so the MID stays
+--          findable by name.
+--
+-- Maintenance: the webhook receiver upserts the route it just wrote
+-- (PostgresStorage.store in app/storage.py, throttled per worker), so new routes
+-- appear within seconds and last_seen is accurate to a few minutes.
+--
+-- Requires the pg_trgm extension (contrib) for the fuzzy-search indexes.
+
+-- =====================================================
+-- Extension
+-- =====================================================
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- =====================================================
+-- routes table
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS routes (
+    mid_id VARCHAR(100) NOT NULL,
+    bank_name VARCHAR(255),
+    mid_name VARCHAR(255),
+    first_seen TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- One row per route, the NULL bank included (the upserts use this as their
+-- ON CONFLICT target)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_routes_route
+ON routes (mid_id, (COALESCE(bank_name, '')));
+
+-- A routes table created by an earlier version of this script had
+-- PRIMARY KEY (mid_id, bank_name), which rules out the NULL bank
+ALTER TABLE routes DROP CONSTRAINT IF EXISTS routes_pkey;
+ALTER TABLE routes ALTER COLUMN bank_name DROP NOT NULL;
+
+COMMENT ON TABLE routes IS 'MID + bank routes seen in transactions (name lookups for the Telegram bot)';
+COMMENT ON COLUMN routes.bank_name IS 'NULL when the BIN had no bin_bank_mapping entry';
+COMMENT ON COLUMN routes.mid_name IS 'Latest terminal name seen for this MID (from mid_mapping)';
+COMMENT ON COLUMN routes.last_seen IS 'Last transaction on this route, refreshed by the receiver at most every few minutes';
+
+-- =====================================================
+-- Trigram indexes (ILIKE '%...%' and similarity search)
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_routes_bank_name_trgm
+ON routes USING gin (bank_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_routes_mid_name_trgm
+ON routes USING gin (mid_name gin_trgm_ops);
+
+-- =====================================================
+-- Backfill from existing transactions (one-off scan)
+-- =====================================================
+
+INSERT INTO routes (mid_id, bank_name, mid_name, first_seen, last_seen)
+SELECT
+    mid_id,
+    bank_name,
+    (ARRAY_AGG(mid_name ORDER BY last_updated_at DESC) FILTER (WHERE mid_name IS NOT NULL))[1],
+    MIN(COALESCE(first_seen_at, last_updated_at)),
+    MAX(last_updated_at)
+FROM transactions
+WHERE mid_id IS NOT NULL
+GROUP BY mid_id, bank_name
+ON CONFLICT (mid_id, (COALESCE(bank_name, ''))) DO UPDATE SET
+    mid_name = COALESCE(EXCLUDED.mid_name, routes.mid_name),
+    first_seen = LEAST(routes.first_seen, EXCLUDED.first_seen),
+    last_seen = GREATEST(routes.last_seen, EXCLUDED.last_seen);
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+-- Route count vs distinct routes in transactions (should match)
+SELECT
+    (SELECT COUNT(*) FROM routes) AS catalog_routes,
+    (SELECT COUNT(*) FROM (
+        SELECT DISTINCT mid_id, bank_name
+        FROM transactions
+        WHERE mid_id IS NOT NULL
+    ) t) AS transaction_routes;
+
+-- Check indexes
+SELECT
+    indexname,
+    indexdef
+FROM pg_indexes
+WHERE tablename = 'routes';
+
+-- Fuzzy lookup uses the trigram index
+EXPLAIN SELECT bank_name FROM routes WHERE bank_name ILIKE '%sipay%';
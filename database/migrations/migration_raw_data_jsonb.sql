@@ -0,0 +1,54 @@
+-- Migration Script: Store webhook_events.raw_data as compact JSONB
+-- Created: 2026-10-19
+-- Purpose: raw_data held str(data) - a Python dict repr of the whole payload
+--          in a TEXT column, repeating every field the row already stores in
+--          its own column. The receiver now writes JSONB holding only what
+--          the columns cannot reproduce (see app/raw_data.py), and
+--          expand_raw_data() rebuilds the full payload.
+--
+-- Steps:
+--   1. Run this migration (renames and adds columns only - no table rewrite)
+--   2. Convert existing rows in batches:
+--        python3 utils/backfill.py raw_data
+--   3. Once the backfill reports complete, drop the old column (see end of file)
+
+-- =====================================================
+-- Swap the column
+-- =====================================================
+
+-- Existing text stays readable as raw_data_legacy until it is converted
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'webhook_events' AND column_name = 'raw_data' AND data_type = 'text'
+    ) THEN
+        ALTER TABLE webhook_events RENAME COLUMN raw_data TO raw_data_legacy;
+    END IF;
+END $$;
+
+ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS raw_data JSONB;
+
+COMMENT ON COLUMN webhook_events.raw_data IS 'Payload fields not kept in their own columns, {"_v": 1, "_f": <fields present>, ...}; expand with app/raw_data.py';
+
+-- =====================================================
+-- After utils/backfill.py raw_data has completed:
+-- =====================================================
+
+-- SELECT COUNT(*) FROM webhook_events WHERE raw_data_legacy IS NOT NULL;  -- expect 0
+-- ALTER TABLE webhook_events DROP COLUMN raw_data_legacy;
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+SELECT column_name, data_type
+FROM information_schema.columns
+WHERE table_name = 'webhook_events' AND column_name IN ('raw_data', 'raw_data_legacy')
+ORDER BY column_name;
+
+SELECT
+    COUNT(raw_data) as compact_rows,
+    COUNT(raw_data_legacy) as legacy_rows,
+    pg_size_pretty(pg_total_relation_size('webhook_events')) as table_size
+FROM webhook_events;
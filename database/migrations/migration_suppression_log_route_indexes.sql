@@ -0,0 +1,49 @@
+-- Migration Script: Route indexes for the suppression report queries
+-- Created: 2026-10-19
+-- Purpose: The daily report's top suppressed routes now fetch each route's
+--          latest alternative routes with a LATERAL lookup instead of a
+--          correlated subquery per group, and recovered routes only aggregate
+--          transactions for the suppressed MIDs. These indexes serve those
+--          per-route probes and payment_monitor's "first suppression in 24h"
+--          check (mid_id, bank_name, suppression_time).
+--
+-- Note: idx_t_mid_updated is built CONCURRENTLY on transactions and may
+-- take a while on a large table.
+
+-- =====================================================
+-- Indexes
+-- =====================================================
+
+-- Date-range scans (daily report, /stats, recovered routes). Carries the
+-- grouped columns so those scans can be index-only.
+CREATE INDEX IF NOT EXISTS idx_asl_time_route
+    ON alert_suppression_log(suppression_time)
+    INCLUDE (mid_id, mid_name, bank_name, success_rate_7d, success_rate_30d);
+
+-- Per-route lookups by MID ID (payment_monitor notification check)
+CREATE INDEX IF NOT EXISTS idx_asl_mid_bank_time
+    ON alert_suppression_log(mid_id, bank_name, suppression_time);
+
+-- Latest row with alternatives per route (get_top_suppressed_routes)
+CREATE INDEX IF NOT EXISTS idx_asl_midname_bank_time
+    ON alert_suppression_log(mid_name, bank_name, suppression_time DESC)
+    WHERE metadata IS NOT NULL;
+
+-- Last 7 days of one MID (get_recovered_routes, /recovered). Built
+-- CONCURRENTLY so webhook writes are not blocked - run this file with psql
+-- outside an explicit transaction.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t_mid_updated
+    ON transactions(mid_id, last_updated_at);
+
+-- Sets the visibility map so the new indexes can be used index-only
+VACUUM (ANALYZE) alert_suppression_log;
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+SELECT indexname, indexdef
+FROM pg_indexes
+WHERE tablename = 'alert_suppression_log'
+   OR indexname = 'idx_t_mid_updated'
+ORDER BY indexname;
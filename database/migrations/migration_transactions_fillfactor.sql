@@ -0,0 +1,45 @@
+-- Migration Script: Leave free space in transactions pages for in-place updates
+-- Created: 2026-10-19
+-- Purpose: Webhook upserts no longer rewrite unchanged rows (see the
+--          transactions upsert in PostgresStorage, app/storage.py). The
+--          remaining updates are real status changes. With 10% free space
+--          per page the new row version stays on the same page, which keeps
+--          the heap compact. It also lets PostgreSQL use a HOT (heap-only
+--          tuple) update when no indexed column changed.
+--
+-- Note: last_updated_at is indexed (idx_t_status_updated) and changes on every
+-- real update, so most status updates will still touch the indexes. The win
+-- comes from skipping no-op updates, not from HOT.
+--
+-- fillfactor only applies to newly written pages; existing pages pick it up
+-- as rows are updated (or after a VACUUM FULL / pg_repack in a quiet window).
+
+-- =====================================================
+-- Storage parameters
+-- =====================================================
+
+ALTER TABLE transactions SET (
+    fillfactor = 90,
+    autovacuum_vacuum_scale_factor = 0.05,
+    autovacuum_analyze_scale_factor = 0.02
+);
+
+-- =====================================================
+-- Verification queries
+-- =====================================================
+
+-- Storage options now set on the table
+SELECT relname, reloptions
+FROM pg_class
+WHERE relname = 'transactions';
+
+-- Update / HOT update / dead tuple counters - compare before and after deploy
+SELECT
+    relname,
+    n_tup_upd,
+    n_tup_hot_upd,
+    ROUND(100.0 * n_tup_hot_upd / NULLIF(n_tup_upd, 0), 1) AS hot_pct,
+    n_dead_tup,
+    last_autovacuum
+FROM pg_stat_user_tables
+WHERE relname = 'transactions';
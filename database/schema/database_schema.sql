@@ -76,7 +76,7 @@ CREATE TABLE IF NOT EXISTS webhook_events (
     cp30 TEXT,
     
     -- Metadata
-    raw_data TEXT, -- Store full raw webhook data for debugging
+    raw_data JSONB, -- Payload fields not kept in the columns above (see app/raw_data.py)
     received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
     -- Indexes for fast queries
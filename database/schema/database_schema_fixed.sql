@@ -1,5 +1,37 @@
 -- Database Schema for Payment Gateway Webhooks
 -- Option 3: Hybrid Approach (Audit Trail + Latest Status)
+--
+-- Includes the receiver-side migrations (delivery_key, dimension keys, JSONB
+-- raw_data, routes catalog, transactions fillfactor), so a fresh install
+-- matches a migrated database. Requires the pg_trgm extension (contrib).
+
+-- =====================================================
+-- Dimension tables (integer keys for repeated strings)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS dim_banks (
+    bank_key SERIAL PRIMARY KEY,
+    bank_name VARCHAR(255) NOT NULL UNIQUE
+);
+
+CREATE TABLE IF NOT EXISTS dim_mids (
+    mid_key SERIAL PRIMARY KEY,
+    mid_id VARCHAR(100) NOT NULL,
+    mid_name VARCHAR(255)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dim_mids_value ON dim_mids (mid_id, (COALESCE(mid_name, '')));
+
+CREATE TABLE IF NOT EXISTS dim_merchants (
+    merchant_key SERIAL PRIMARY KEY,
+    merchant_id VARCHAR(50) NOT NULL,
+    merchant_name TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_dim_merchants_value ON dim_merchants (merchant_id, (COALESCE(merchant_name, '')));
+
+CREATE TABLE IF NOT EXISTS dim_countries (
+    country_key SMALLSERIAL PRIMARY KEY,
+    country_code VARCHAR(10) NOT NULL UNIQUE
+);
 
 -- =====================================================
 -- Table 1: webhook_events (Full Audit Trail)
@@ -26,6 +58,7 @@ CREATE TABLE IF NOT EXISTS webhook_events (
     
     -- Merchant information
     merchant_id VARCHAR(50),
+    merchant_name TEXT,
     
     -- Customer information
     client_fullname VARCHAR(255),
@@ -77,8 +110,15 @@ CREATE TABLE IF NOT EXISTS webhook_events (
     cp29 TEXT,
     cp30 TEXT,
 
+    -- Dimension keys (set_dimension_keys() fills any the writer leaves NULL)
+    bank_key INTEGER,
+    mid_key INTEGER,
+    merchant_key INTEGER,
+    country_key SMALLINT,
+
     -- Metadata
-    raw_data TEXT,
+    raw_data JSONB, -- Payload fields not kept in the columns above (see app/raw_data.py)
+    delivery_key VARCHAR(32), -- md5(trans_order|trans_id|reply_code|signature), identifies retried deliveries
     received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
@@ -94,6 +134,7 @@ CREATE INDEX IF NOT EXISTS idx_we_client_country ON webhook_events(client_countr
 CREATE INDEX IF NOT EXISTS idx_we_mid_id ON webhook_events(mid_id);
 CREATE INDEX IF NOT EXISTS idx_we_mid_name ON webhook_events(mid_name);
 CREATE INDEX IF NOT EXISTS idx_we_recon_id ON webhook_events(recon_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_we_delivery_key ON webhook_events(delivery_key) WHERE delivery_key IS NOT NULL;
 
 -- =====================================================
 -- Table 2: transactions (Latest Status per Transaction)
@@ -120,6 +161,7 @@ CREATE TABLE IF NOT EXISTS transactions (
     
     -- Merchant information
     merchant_id VARCHAR(50),
+    merchant_name TEXT,
     
     -- Customer information
     client_fullname VARCHAR(255),
@@ -161,12 +203,24 @@ CREATE TABLE IF NOT EXISTS transactions (
     mid_name VARCHAR(255),
     recon_id VARCHAR(100),
 
+    -- Dimension keys (set_dimension_keys() fills any the writer leaves NULL)
+    bank_key INTEGER,
+    mid_key INTEGER,
+    merchant_key INTEGER,
+    country_key SMALLINT,
+
     -- Metadata
     first_seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     last_updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+) WITH (
+    -- Free space for status updates (migration_transactions_fillfactor.sql)
+    fillfactor = 90,
+    autovacuum_vacuum_scale_factor = 0.05,
+    autovacuum_analyze_scale_factor = 0.02
 );
 
 -- Indexes for transactions
+CREATE UNIQUE INDEX IF NOT EXISTS idx_t_trans_order_u ON transactions(trans_order); -- upsert conflict target
 CREATE INDEX IF NOT EXISTS idx_t_status_updated ON transactions(status, last_updated_at);
 CREATE INDEX IF NOT EXISTS idx_t_trans_date ON transactions(trans_date);
 CREATE INDEX IF NOT EXISTS idx_t_cc_bin_status ON transactions(cc_bin, status);
@@ -213,6 +267,194 @@ CREATE TABLE IF NOT EXISTS bin_bank_mapping (
 CREATE INDEX IF NOT EXISTS idx_bin_lookup ON bin_bank_mapping(bin);
 CREATE INDEX IF NOT EXISTS idx_bank_name_lookup ON bin_bank_mapping(bank_name);
 
+-- =====================================================
+-- Table 5: merchant_mapping (rows: database/seeds/merchant_import.sql)
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS merchant_mapping (
+    id SERIAL PRIMARY KEY,
+    merchant_id VARCHAR(50) UNIQUE NOT NULL,
+    merchant_name VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes for merchant_mapping
+CREATE INDEX IF NOT EXISTS idx_merchant_id_lookup ON merchant_mapping(merchant_id);
+
+-- =====================================================
+-- Dimension keys: lookup functions and trigger
+-- =====================================================
+
+-- Each returns the key for a value, adding it to the dimension if it is new.
+-- NULL in, NULL out. A new value NOTIFYs mapping_refresh so receivers pick
+-- it up for their cache straight away.
+
+CREATE OR REPLACE FUNCTION dim_bank_key(p_bank_name VARCHAR) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_bank_name IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT bank_key INTO k FROM dim_banks WHERE bank_name = p_bank_name;
+    IF k IS NULL THEN
+        INSERT INTO dim_banks (bank_name) VALUES (p_bank_name)
+        ON CONFLICT DO NOTHING
+        RETURNING bank_key INTO k;
+        IF k IS NULL THEN  -- added by a concurrent transaction
+            SELECT bank_key INTO k FROM dim_banks WHERE bank_name = p_bank_name;
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_banks');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_mid_key(p_mid_id VARCHAR, p_mid_name VARCHAR) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_mid_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT mid_key INTO k FROM dim_mids
+    WHERE mid_id = p_mid_id AND COALESCE(mid_name, '') = COALESCE(p_mid_name, '');
+    IF k IS NULL THEN
+        INSERT INTO dim_mids (mid_id, mid_name) VALUES (p_mid_id, p_mid_name)
+        ON CONFLICT DO NOTHING
+        RETURNING mid_key INTO k;
+        IF k IS NULL THEN
+            SELECT mid_key INTO k FROM dim_mids
+            WHERE mid_id = p_mid_id AND COALESCE(mid_name, '') = COALESCE(p_mid_name, '');
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_mids');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_merchant_key(p_merchant_id VARCHAR, p_merchant_name TEXT) RETURNS INTEGER AS $$
+DECLARE
+    k INTEGER;
+BEGIN
+    IF p_merchant_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT merchant_key INTO k FROM dim_merchants
+    WHERE merchant_id = p_merchant_id AND COALESCE(merchant_name, '') = COALESCE(p_merchant_name, '');
+    IF k IS NULL THEN
+        INSERT INTO dim_merchants (merchant_id, merchant_name) VALUES (p_merchant_id, p_merchant_name)
+        ON CONFLICT DO NOTHING
+        RETURNING merchant_key INTO k;
+        IF k IS NULL THEN
+            SELECT merchant_key INTO k FROM dim_merchants
+            WHERE merchant_id = p_merchant_id AND COALESCE(merchant_name, '') = COALESCE(p_merchant_name, '');
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_merchants');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION dim_country_key(p_country_code VARCHAR) RETURNS SMALLINT AS $$
+DECLARE
+    k SMALLINT;
+BEGIN
+    IF p_country_code IS NULL THEN
+        RETURN NULL;
+    END IF;
+    SELECT country_key INTO k FROM dim_countries WHERE country_code = p_country_code;
+    IF k IS NULL THEN
+        INSERT INTO dim_countries (country_code) VALUES (p_country_code)
+        ON CONFLICT DO NOTHING
+        RETURNING country_key INTO k;
+        IF k IS NULL THEN
+            SELECT country_key INTO k FROM dim_countries WHERE country_code = p_country_code;
+        ELSE
+            PERFORM pg_notify('mapping_refresh', 'dim_countries');
+        END IF;
+    END IF;
+    RETURN k;
+END;
+$$ LANGUAGE plpgsql;
+
+-- A key supplied by the writer is trusted (the receiver takes it from the
+-- dimension tables). A missing key, or a text column changed without its
+-- key, is looked up / created here.
+CREATE OR REPLACE FUNCTION set_dimension_keys() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.bank_name IS NULL THEN
+        NEW.bank_key := NULL;
+    ELSIF NEW.bank_key IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.bank_name IS DISTINCT FROM OLD.bank_name
+           AND NEW.bank_key IS NOT DISTINCT FROM OLD.bank_key) THEN
+        NEW.bank_key := dim_bank_key(NEW.bank_name);
+    END IF;
+
+    IF NEW.mid_id IS NULL THEN
+        NEW.mid_key := NULL;
+    ELSIF NEW.mid_key IS NULL
+       OR (TG_OP = 'UPDATE' AND (NEW.mid_id, NEW.mid_name) IS DISTINCT FROM (OLD.mid_id, OLD.mid_name)
+           AND NEW.mid_key IS NOT DISTINCT FROM OLD.mid_key) THEN
+        NEW.mid_key := dim_mid_key(NEW.mid_id, NEW.mid_name);
+    END IF;
+
+    IF NEW.merchant_id IS NULL THEN
+        NEW.merchant_key := NULL;
+    ELSIF NEW.merchant_key IS NULL
+       OR (TG_OP = 'UPDATE' AND (NEW.merchant_id, NEW.merchant_name) IS DISTINCT FROM (OLD.merchant_id, OLD.merchant_name)
+           AND NEW.merchant_key IS NOT DISTINCT FROM OLD.merchant_key) THEN
+        NEW.merchant_key := dim_merchant_key(NEW.merchant_id, NEW.merchant_name);
+    END IF;
+
+    IF NEW.client_country IS NULL THEN
+        NEW.country_key := NULL;
+    ELSIF NEW.country_key IS NULL
+       OR (TG_OP = 'UPDATE' AND NEW.client_country IS DISTINCT FROM OLD.client_country
+           AND NEW.country_key IS NOT DISTINCT FROM OLD.country_key) THEN
+        NEW.country_key := dim_country_key(NEW.client_country);
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_dimension_keys ON transactions;
+CREATE TRIGGER trg_transactions_dimension_keys
+    BEFORE INSERT OR UPDATE OF bank_name, mid_id, mid_name, merchant_id, merchant_name, client_country
+    ON transactions
+    FOR EACH ROW EXECUTE FUNCTION set_dimension_keys();
+
+DROP TRIGGER IF EXISTS trg_webhook_events_dimension_keys ON webhook_events;
+CREATE TRIGGER trg_webhook_events_dimension_keys
+    BEFORE INSERT OR UPDATE OF bank_name, mid_id, mid_name, merchant_id, merchant_name, client_country
+    ON webhook_events
+    FOR EACH ROW EXECUTE FUNCTION set_dimension_keys();
+
+-- =====================================================
+-- Table 6: routes (MID + bank routes for the Telegram bot)
+-- =====================================================
+
+-- bank_name is NULL for a MID only seen with BINs missing from bin_bank_mapping
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS routes (
+    mid_id VARCHAR(100) NOT NULL,
+    bank_name VARCHAR(255),
+    mid_name VARCHAR(255),
+    first_seen TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Indexes for routes
+CREATE UNIQUE INDEX IF NOT EXISTS idx_routes_route ON routes (mid_id, (COALESCE(bank_name, '')));
+CREATE INDEX IF NOT EXISTS idx_routes_bank_name_trgm ON routes USING gin (bank_name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_routes_mid_name_trgm ON routes USING gin (mid_name gin_trgm_ops);
+
 -- =====================================================
 -- Views for Metabase Dashboards
 -- =====================================================
@@ -2,6 +2,10 @@
 """
 Nightly cleanup: null out raw_data on webhook_events older than RETENTION_DAYS.
 Commits every BATCH_SIZE rows so it's safe to kill and restart at any point.
+
+Until the raw_data backfill (utils/backfill.py) has converted every row and
+the column is dropped, old payload text is also held in raw_data_legacy;
+it is cleared in the same UPDATE.
 """
 
 import psycopg2
@@ -11,6 +15,10 @@ import os
 import sys
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import db
+
 load_dotenv('/opt/payment-webhook/.env')
 
 BATCH_SIZE = 1000
@@ -27,13 +35,16 @@ logging.basicConfig(
 )
 log = logging.getLogger(__name__)
 
-DB_CONFIG = {
-    'dbname': os.getenv('DB_NAME', 'payment_transactions'),
-    'user':   os.getenv('DB_USER', 'webhook_user'),
-    'password': os.getenv('DB_PASSWORD'),
-    'host':   os.getenv('DB_HOST', 'localhost'),
-    'port':   os.getenv('DB_PORT', '5432'),
-}
+DB_CONFIG = db.write_config('cleanup')
+
+def has_legacy_column(conn):
+    """Whether webhook_events still has raw_data_legacy (migration_raw_data_jsonb.sql)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'webhook_events' AND column_name = 'raw_data_legacy'
+        """)
+        return cur.fetchone() is not None
 
 def run():
     conn = psycopg2.connect(**DB_CONFIG)
@@ -41,10 +52,17 @@ def run():
     total = 0
 
     try:
+        if has_legacy_column(conn):
+            clear = "raw_data = NULL, raw_data_legacy = NULL"
+            held = "(raw_data IS NOT NULL OR raw_data_legacy IS NOT NULL)"
+        else:
+            clear = "raw_data = NULL"
+            held = "raw_data IS NOT NULL"
+
         with conn.cursor() as cur:
-            cur.execute("""
+            cur.execute(f"""
                 SELECT count(*) FROM webhook_events
-                WHERE raw_data IS NOT NULL
+                WHERE {held}
                   AND received_at < NOW() - INTERVAL '%s days'
             """, (RETENTION_DAYS,))
             pending = cur.fetchone()[0]
@@ -57,12 +75,12 @@ def run():
 
         while True:
             with conn.cursor() as cur:
-                cur.execute("""
+                cur.execute(f"""
                     UPDATE webhook_events
-                    SET raw_data = NULL
+                    SET {clear}
                     WHERE id IN (
                         SELECT id FROM webhook_events
-                        WHERE raw_data IS NOT NULL
+                        WHERE {held}
                           AND received_at < NOW() - INTERVAL '%s days'
                         ORDER BY received_at
                         LIMIT %s
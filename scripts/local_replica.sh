@@ -0,0 +1,80 @@
+#!/bin/bash
+# Local streaming-replication pair for trying read-replica routing
+# (services/db.py): a primary on PRIMARY_PORT and a hot standby on
+# REPLICA_PORT, both under DATA_DIR, listening on localhost only.
+#
+#   scripts/local_replica.sh start     # initdb + basebackup on first run
+#   scripts/local_replica.sh status    # replication state and replay lag
+#   scripts/local_replica.sh stop
+#   scripts/local_replica.sh destroy   # stop and delete DATA_DIR
+#
+# Then point the services at it, e.g.
+#   DB_HOST=localhost DB_PORT=55432 DB_READ_HOST=localhost DB_READ_PORT=55433 DB_USER=postgres
+# and load the schema into the primary (database/schema, database/migrations);
+# the replica follows. Set PG_BIN if initdb / pg_ctl are not on PATH.
+
+set -e
+
+DATA_DIR="${DATA_DIR:-/tmp/payment-webhook-replica}"
+PRIMARY_PORT="${PRIMARY_PORT:-55432}"
+REPLICA_PORT="${REPLICA_PORT:-55433}"
+DB_NAME="${DB_NAME:-payment_transactions}"
+PG="${PG_BIN:+$PG_BIN/}"
+
+PRIMARY="$DATA_DIR/primary"
+REPLICA="$DATA_DIR/replica"
+
+start() {
+    if [ ! -d "$PRIMARY" ]; then
+        echo "Creating primary in $PRIMARY..."
+        mkdir -p "$DATA_DIR"
+        "${PG}initdb" -D "$PRIMARY" -U postgres --auth=trust > /dev/null
+        cat >> "$PRIMARY/postgresql.conf" <<EOF
+port = $PRIMARY_PORT
+listen_addresses = 'localhost'
+unix_socket_directories = '$DATA_DIR'
+wal_level = replica
+max_wal_senders = 4
+hot_standby = on
+EOF
+        echo "host replication postgres 127.0.0.1/32 trust" >> "$PRIMARY/pg_hba.conf"
+    fi
+    "${PG}pg_ctl" -D "$PRIMARY" -l "$DATA_DIR/primary.log" -w status > /dev/null 2>&1 || \
+        "${PG}pg_ctl" -D "$PRIMARY" -l "$DATA_DIR/primary.log" -w start > /dev/null
+    "${PG}psql" -h localhost -p "$PRIMARY_PORT" -U postgres -tAc \
+        "SELECT 1 FROM pg_database WHERE datname = '$DB_NAME'" | grep -q 1 || \
+        "${PG}createdb" -h localhost -p "$PRIMARY_PORT" -U postgres "$DB_NAME"
+
+    if [ ! -d "$REPLICA" ]; then
+        echo "Cloning replica into $REPLICA..."
+        # -R writes standby.signal and primary_conninfo
+        "${PG}pg_basebackup" -h localhost -p "$PRIMARY_PORT" -U postgres -D "$REPLICA" -R -X stream
+        echo "port = $REPLICA_PORT" >> "$REPLICA/postgresql.conf"
+    fi
+    "${PG}pg_ctl" -D "$REPLICA" -l "$DATA_DIR/replica.log" -w status > /dev/null 2>&1 || \
+        "${PG}pg_ctl" -D "$REPLICA" -l "$DATA_DIR/replica.log" -w start > /dev/null
+
+    echo "✅ Primary on localhost:$PRIMARY_PORT, replica on localhost:$REPLICA_PORT ($DB_NAME)"
+}
+
+stop() {
+    for dir in "$REPLICA" "$PRIMARY"; do
+        [ -d "$dir" ] && "${PG}pg_ctl" -D "$dir" -m fast stop > /dev/null 2>&1 || true
+    done
+    echo "Stopped"
+}
+
+status() {
+    "${PG}psql" -h localhost -p "$PRIMARY_PORT" -U postgres -c \
+        "SELECT application_name, state, replay_lag FROM pg_stat_replication"
+    "${PG}psql" -h localhost -p "$REPLICA_PORT" -U postgres -c \
+        "SELECT pg_is_in_recovery() AS replica, now() - pg_last_xact_replay_timestamp() AS since_last_replay"
+}
+
+case "$1" in
+    start) start ;;
+    stop) stop ;;
+    status) status ;;
+    destroy) stop; rm -rf "$DATA_DIR"; echo "Removed $DATA_DIR" ;;
+    *) echo "Usage: $0 {start|status|stop|destroy}"; exit 1 ;;
+esac
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Bot Update Dispatcher
+Runs Telegram updates on a pool of worker threads. Updates from the same
+chat are handled one at a time in arrival order, so next-step handlers and
+button presses stay consistent; different chats run in parallel, so a slow
+/stats or /recovered query no longer holds up other operators.
+
+Every update gets a time budget by command. Handlers read the remainder
+with remaining_time() (the bot applies it as statement_timeout on the
+connections it borrows) and a watchdog reports updates that overrun it.
+
+Updates arrive either by long polling (poll_updates) or through a local
+HTTP endpoint registered with Telegram as a webhook (serve_webhook).
+"""
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from telebot import types
+
+_STOP = object()
+_local = threading.local()
+
+
+def remaining_time():
+    """Seconds left in the current update's budget, or None outside a worker."""
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+def update_chat_id(update):
+    """Chat an update belongs to (its ordering lane)."""
+    if update.message:
+        return update.message.chat.id
+    if update.edited_message:
+        return update.edited_message.chat.id
+    if update.callback_query:
+        if update.callback_query.message:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    return None
+
+
+def update_command(update):
+    """'stats' for '/stats week', the callback data for a button press, '' otherwise."""
+    if update.message and update.message.text and update.message.text.startswith('/'):
+        return update.message.text.split()[0][1:].split('@')[0].lower()
+    if update.callback_query and update.callback_query.data:
+        return update.callback_query.data
+    return ''
+
+
+class ChatOrderedDispatcher:
+    """Worker pool with one FIFO lane per chat."""
+
+    def __init__(self, handle, workers=4, timeouts=None, default_timeout=15, watchdog_interval=5):
+        self._handle = handle
+        self.workers = workers
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.watchdog_interval = watchdog_interval
+        self._lanes = {}            # chat_id -> deque of pending updates
+        self._ready = queue.Queue() # chat_ids with work and no worker on them
+        self._lock = threading.Lock()
+        self._running = {}          # worker name -> [chat_id, command, started, deadline, reported]
+        self._threads = []
+
+    def timeout_for(self, command):
+        """Budget for a command or callback ('menu_stats_week' matches 'menu_stats')."""
+        if command in self.timeouts:
+            return self.timeouts[command]
+        for prefix, seconds in self.timeouts.items():
+            if command.startswith(prefix + '_'):
+                return seconds
+        return self.default_timeout
+
+    def start(self):
+        for i in range(self.workers):
+            t = threading.Thread(target=self._worker, name=f"bot-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        threading.Thread(target=self._watchdog, name="bot-watchdog", daemon=True).start()
+
+    def stop(self, timeout=10):
+        """Let workers finish their current update, then exit."""
+        for _ in self._threads:
+            self._ready.put(_STOP)
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, update):
+        key = update_chat_id(update)
+        with self._lock:
+            lane = self._lanes.get(key)
+            if lane is None:
+                self._lanes[key] = deque([update])
+                self._ready.put(key)
+            else:
+                # A worker owns (or is queued for) this chat; it will get here in order
+                lane.append(update)
+
+    def pending(self):
+        """Updates waiting or running, for status output."""
+        with self._lock:
+            return sum(len(lane) for lane in self._lanes.values()) + len(self._running)
+
+    def _worker(self):
+        name = threading.current_thread().name
+        while True:
+            key = self._ready.get()
+            if key is _STOP:
+                return
+            with self._lock:
+                update = self._lanes[key].popleft()
+            self._run(name, key, update)
+            with self._lock:
+                if self._lanes[key]:
+                    self._ready.put(key)
+                else:
+                    del self._lanes[key]
+
+    def _run(self, name, key, update):
+        command = update_command(update)
+        started = time.monotonic()
+        _local.deadline = started + self.timeout_for(command)
+        with self._lock:
+            self._running[name] = [key, command, started, _local.deadline, False]
+        try:
+            self._handle(update)
+        except Exception as e:
+            print(f"Update {update.update_id} ({command or 'message'}) failed: {e}")
+        finally:
+            _local.deadline = None
+            with self._lock:
+                self._running.pop(name, None)
+
+    def _watchdog(self):
+        while True:
+            time.sleep(self.watchdog_interval)
+            now = time.monotonic()
+            with self._lock:
+                overdue = [entry for entry in self._running.values() if now > entry[3] and not entry[4]]
+                for entry in overdue:
+                    entry[4] = True
+            for chat_id, command, started, _, _ in overdue:
+                print(f"⚠️  Chat {chat_id}: '{command or 'message'}' still running after {now - started:.0f}s (over budget)")
+
+
+def poll_updates(bot, dispatcher, timeout=60):
+    """Long-poll getUpdates and hand each update to the dispatcher."""
+    offset = None
+    while True:
+        try:
+            updates = bot.get_updates(offset=offset, timeout=timeout, long_polling_timeout=timeout)
+        except Exception as e:
+            print(f"Polling error: {e}")
+            time.sleep(3)
+            continue
+        for update in updates:
+            offset = update.update_id + 1
+            dispatcher.submit(update)
+
+
+def serve_webhook(dispatcher, host, port, path, secret_token=None):
+    """
+    Receive updates on a local HTTP endpoint (behind the TLS proxy that
+    Telegram's webhook URL points at). Answers 200 as soon as the update is
+    queued. Blocks until interrupted.
+    """
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if self.path != path:
+                self.send_error(404)
+                return
+            if secret_token and self.headers.get('X-Telegram-Bot-Api-Secret-Token') != secret_token:
+                self.send_error(403)
+                return
+            length = int(self.headers.get('Content-Length', 0))
+            try:
+                update = types.Update.de_json(json.loads(self.rfile.read(length)))
+            except ValueError:
+                self.send_error(400)
+                return
+            dispatcher.submit(update)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), WebhookHandler)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
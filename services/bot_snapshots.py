@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Bot Statistics Snapshots
+/stats, /status and /recovered used to aggregate alert_history,
+alert_suppression_log and transactions on every button press, so several
+operators pressing them during an incident multiplied the load.
+
+A background thread now runs those queries every `interval` seconds, and
+right after each monitor cycle (payment_monitor.py sends NOTIFY
+monitor_cycle_complete when it commits). Handlers render the latest
+snapshot from memory and show how old it is.
+"""
+
+import select
+import threading
+import time
+from datetime import datetime
+
+from psycopg2.extras import RealDictCursor
+
+MONITOR_NOTIFY_CHANNEL = 'monitor_cycle_complete'
+
+
+# ----------------------------------------------------------------------
+# Snapshot queries (one function per snapshot, each takes a cursor)
+# ----------------------------------------------------------------------
+
+def build_stats_today(cursor):
+    cursor.execute("""
+        SELECT
+            COUNT(*) as total_suppressions,
+            COUNT(DISTINCT mid_name || '|' || bank_name) as unique_routes,
+            suppression_reason,
+            COUNT(*) as count_by_reason
+        FROM alert_suppression_log
+        WHERE suppression_time >= CURRENT_DATE
+        GROUP BY suppression_reason
+    """)
+    suppressions = cursor.fetchall()
+
+    cursor.execute("""
+        SELECT COUNT(*) as total_alerts
+        FROM alert_history
+        WHERE alert_time >= CURRENT_DATE
+    """)
+    alerts = cursor.fetchone()
+
+    return {
+        'suppressions': suppressions,
+        'total_alerts': alerts['total_alerts'] if alerts else 0,
+    }
+
+
+def build_stats_week(cursor):
+    cursor.execute("""
+        SELECT
+            COUNT(*) as total_suppressions,
+            COUNT(DISTINCT mid_name || '|' || bank_name) as unique_routes
+        FROM alert_suppression_log
+        WHERE suppression_time >= CURRENT_DATE - INTERVAL '7 days'
+    """)
+    supp_stats = cursor.fetchone()
+
+    cursor.execute("""
+        SELECT COUNT(*) as total_alerts
+        FROM alert_history
+        WHERE alert_time >= CURRENT_DATE - INTERVAL '7 days'
+    """)
+    alert_stats = cursor.fetchone()
+
+    return {
+        'total_suppressions': supp_stats['total_suppressions'],
+        'unique_routes': supp_stats['unique_routes'],
+        'total_alerts': alert_stats['total_alerts'],
+    }
+
+
+def build_status(cursor):
+    cursor.execute("SELECT NOW() as current_time")
+    db_status = cursor.fetchone()
+
+    cursor.execute("SELECT alert_time FROM alert_history ORDER BY alert_time DESC LIMIT 1")
+    last_alert = cursor.fetchone()
+
+    cursor.execute("SELECT suppression_time FROM alert_suppression_log ORDER BY suppression_time DESC LIMIT 1")
+    last_suppression = cursor.fetchone()
+
+    cursor.execute("SELECT COUNT(*) as count FROM alert_overrides WHERE is_active = true")
+    override_count = cursor.fetchone()
+
+    cursor.execute("SELECT COUNT(*) as count FROM telegram_authorized_users WHERE is_active = true")
+    user_count = cursor.fetchone()
+
+    return {
+        'current_time': db_status['current_time'],
+        'last_alert': last_alert['alert_time'] if last_alert else None,
+        'last_suppression': last_suppression['suppression_time'] if last_suppression else None,
+        'override_count': override_count['count'],
+        'user_count': user_count['count'],
+    }
+
+
+def build_recovered(cursor):
+    cursor.execute("""
+        WITH recently_suppressed AS (
+            SELECT DISTINCT
+                s.mid_id,
+                s.mid_name,
+                s.bank_name,
+                AVG(s.success_rate_7d) as avg_suppressed_success_rate,
+                MAX(s.suppression_time) as last_suppressed
+            FROM alert_suppression_log s
+            WHERE s.suppression_time >= NOW() - INTERVAL '7 days'
+            GROUP BY s.mid_id, s.mid_name, s.bank_name
+            HAVING AVG(s.success_rate_7d) < 10
+        ),
+        current_performance AS (
+            -- Only the suppressed MIDs (same plan as payment_daily_report.get_recovered_routes)
+            SELECT
+                m.mid_id,
+                perf.success_7d,
+                perf.total_7d,
+                ROUND(100.0 * perf.success_7d / NULLIF(perf.total_7d, 0), 2) as current_success_rate_7d
+            FROM (SELECT DISTINCT mid_id FROM recently_suppressed) m
+            CROSS JOIN LATERAL (
+                SELECT
+                    COUNT(*) FILTER (WHERE t.status = 'success') as success_7d,
+                    COUNT(*) as total_7d
+                FROM transactions t
+                WHERE t.mid_id = m.mid_id
+                  AND t.last_updated_at >= NOW() - INTERVAL '7 days'
+            ) perf
+        )
+        SELECT
+            rs.mid_name,
+            rs.bank_name,
+            rs.avg_suppressed_success_rate as old_success_rate,
+            cp.current_success_rate_7d as new_success_rate,
+            cp.total_7d as recent_transactions,
+            rs.last_suppressed
+        FROM recently_suppressed rs
+        JOIN current_performance cp ON rs.mid_id = cp.mid_id
+        WHERE cp.current_success_rate_7d >= 10
+          AND cp.total_7d >= 10
+        ORDER BY cp.current_success_rate_7d DESC
+    """)
+    return cursor.fetchall()
+
+
+SNAPSHOT_BUILDERS = {
+    'stats_today': build_stats_today,
+    'stats_week': build_stats_week,
+    'status': build_status,
+    'recovered': build_recovered,
+}
+
+
+# ----------------------------------------------------------------------
+# Store + refresher
+# ----------------------------------------------------------------------
+
+class SnapshotStore:
+    """Latest result of each snapshot query, refreshed in the background."""
+
+    def __init__(self, get_connection, builders=None, interval=60):
+        self._get_connection = get_connection
+        self.builders = builders or SNAPSHOT_BUILDERS
+        self.interval = interval
+        self._snapshots = {}    # name -> (data, built_at monotonic, built_at datetime)
+        self.errors = {}        # name -> last refresh error (cleared on success)
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, names=None):
+        """Rebuild the given snapshots (all by default). Returns the names that failed."""
+        failed = []
+        with self._refresh_lock:
+            for name in names or self.builders:
+                try:
+                    with self._get_connection() as conn:
+                        cursor = conn.cursor(cursor_factory=RealDictCursor)
+                        data = self.builders[name](cursor)
+                        conn.rollback()
+                    self._snapshots[name] = (data, time.monotonic(), datetime.now())
+                    self.errors.pop(name, None)
+                except Exception as e:
+                    self.errors[name] = str(e)
+                    failed.append(name)
+                    print(f"Snapshot '{name}' refresh failed (keeping previous): {e}")
+        return failed
+
+    def get(self, name):
+        """(data, age_seconds) for a snapshot, building it now if it never loaded."""
+        if name not in self._snapshots:
+            self.refresh([name])
+        if name not in self._snapshots:
+            raise RuntimeError(self.errors.get(name, f"snapshot '{name}' unavailable"))
+        data, built_at, _ = self._snapshots[name]
+        return data, time.monotonic() - built_at
+
+    def start(self, listen_connect=None, channel=MONITOR_NOTIFY_CHANNEL):
+        """Start the refresher thread; with listen_connect, also refresh on NOTIFY."""
+        t = threading.Thread(target=self._refresh_loop, args=(listen_connect, channel),
+                             name="bot-snapshots", daemon=True)
+        t.start()
+        return t
+
+    def _refresh_loop(self, listen_connect, channel):
+        listen_conn = None
+        while True:
+            if listen_connect and listen_conn is None:
+                try:
+                    listen_conn = listen_connect()
+                    listen_conn.autocommit = True
+                    listen_conn.cursor().execute(f"LISTEN {channel}")
+                except Exception as e:
+                    print(f"Snapshot LISTEN failed (interval refresh only): {e}")
+                    listen_conn = None
+
+            self.refresh()
+
+            if listen_conn is None:
+                time.sleep(self.interval)
+                continue
+            try:
+                # Wake on the monitor's NOTIFY or after `interval` seconds
+                if select.select([listen_conn], [], [], self.interval)[0]:
+                    listen_conn.poll()
+                    listen_conn.notifies.clear()
+            except Exception as e:
+                print(f"Snapshot LISTEN connection lost: {e}")
+                try:
+                    listen_conn.close()
+                except Exception:
+                    pass
+                listen_conn = None
+
+
+def format_age(seconds):
+    """'42s', '3m 5s' - for the snapshot footer."""
+    seconds = int(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{seconds // 60}m {seconds % 60}s"
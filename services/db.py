@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Database Endpoints
+One place for how services connect: writes (and reads that must see them)
+go to the primary, heavy read-only scans to a streaming replica when one is
+configured and fresh enough. Settings are read from the environment when a
+config is built, i.e. after the service has loaded its .env.
+
+    DB_HOST / DB_PORT / DB_NAME / DB_USER / DB_PASSWORD    primary (as before)
+    DB_READ_HOST / DB_READ_PORT                             replica (unset: reads use the primary)
+    DB_READ_MAX_LAG                                         seconds of replay lag tolerated (default 10)
+
+The receiver, the services and the utilities build their DB_CONFIG with
+write_config(); the monitor, daily report and bot also build a replica config
+with read_config() for their read-only scans. A read connection is only taken
+from the replica when its replay lag is at most DB_READ_MAX_LAG (and, if
+asked, it has replayed a given primary WAL position, so a report sees rows it
+has just written). Otherwise the read goes to the primary and a warning is
+printed. Read connections are read-only sessions either way.
+
+Every connection carries application_name 'payment-webhook/<component>'
+(with '/read' on replica connections), so pg_stat_activity and
+pg_stat_statements show which service a load comes from.
+"""
+
+import os
+import threading
+import time
+
+import psycopg2
+from psycopg2 import pool as psycopg2_pool
+
+APPLICATION = 'payment-webhook'
+LAG_CHECK_INTERVAL = 5  # seconds a ReadPool trusts its last lag check
+
+# Replay lag in seconds; 0 when everything received is replayed (an idle
+# primary sends nothing, so the last replay timestamp alone would look stale);
+# NULL when the server is not a replica
+_LAG_SQL = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+
+def write_config(component):
+    """psycopg2.connect() keywords for the primary"""
+    return {
+        'dbname': os.getenv('DB_NAME', 'payment_transactions'),
+        'user': os.getenv('DB_USER', 'webhook_user'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST', 'localhost'),
+        'port': os.getenv('DB_PORT', '5432'),
+        'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', '5')),
+        'application_name': f"{APPLICATION}/{component}",
+    }
+
+
+def read_config(component):
+    """psycopg2.connect() keywords for the replica, or None when none is configured"""
+    host = os.getenv('DB_READ_HOST')
+    if not host:
+        return None
+    return dict(write_config(component),
+                host=host,
+                port=os.getenv('DB_READ_PORT', os.getenv('DB_PORT', '5432')),
+                application_name=f"{APPLICATION}/{component}/read")
+
+
+def read_only(config):
+    """config with every transaction read-only (so a read pool cannot write, even on the primary)"""
+    return dict(config, options='-c default_transaction_read_only=on')
+
+
+def current_lsn(conn):
+    """The primary's current WAL position (pass to a read as min_lsn to see everything committed so far)"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_lsn()::text")
+        return cursor.fetchone()[0]
+
+
+def replica_lag(conn):
+    """Replay lag in seconds, or None if conn is not to a replica"""
+    with conn.cursor() as cursor:
+        cursor.execute(_LAG_SQL)
+        lag = cursor.fetchone()[0]
+    conn.rollback()
+    return None if lag is None else float(lag)
+
+
+def replica_fresh(conn, max_lag=None, min_lsn=None, wait=None):
+    """
+    Whether reads on conn (a replica) are fresh enough: lag within max_lag
+    and, with min_lsn, that position replayed - waiting up to `wait` seconds
+    (default max_lag) for it.
+    """
+    if max_lag is None:
+        max_lag = float(os.getenv('DB_READ_MAX_LAG', '10'))
+    lag = replica_lag(conn)
+    if lag is None or lag > max_lag:
+        return False
+    if min_lsn is None:
+        return True
+    deadline = time.monotonic() + (max_lag if wait is None else wait)
+    with conn.cursor() as cursor:
+        while True:
+            cursor.execute("SELECT pg_last_wal_replay_lsn() >= %s::pg_lsn", (min_lsn,))
+            replayed = cursor.fetchone()[0]
+            conn.rollback()
+            if replayed:
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+
+def connect_read(config, replica_config=None, max_lag=None, min_lsn=None):
+    """
+    Read-only connection: to replica_config if given and fresh (see
+    replica_fresh), else to the primary at config
+    """
+    if replica_config is not None:
+        try:
+            conn = psycopg2.connect(**replica_config)
+            if replica_fresh(conn, max_lag, min_lsn):
+                return conn
+            conn.close()
+            print("⚠️  Replica lagging, reading from primary")
+        except psycopg2.Error as e:
+            print(f"⚠️  Replica unavailable, reading from primary: {e}")
+    return psycopg2.connect(**read_only(config))
+
+
+class ReadPool:
+    """
+    Pooled read-only connections: from the replica while it is fresh, from
+    the primary otherwise. The replica's state is re-checked at most every
+    LAG_CHECK_INTERVAL seconds either way, so a burst of checkouts costs one
+    lag query and a down replica one connect attempt. Same
+    getconn/putconn/closeall interface as psycopg2's pools.
+    """
+
+    def __init__(self, config, replica_config, minconn, maxconn, max_lag=None, min_lsn=None):
+        self.max_lag = max_lag
+        self.min_lsn = min_lsn
+        self._configs = {'replica': replica_config, 'primary': read_only(config)}
+        self._sizes = (minconn, maxconn)
+        self._pools = {}
+        self._owner = {}  # id(conn) -> pool it came from
+        self._fresh_until = 0.0
+        self._retry_at = 0.0  # replica skipped until then after a failed check
+        self._lock = threading.Lock()
+
+    def _pool(self, which):
+        """The replica or primary pool, created on first use"""
+        with self._lock:
+            if which not in self._pools:
+                self._pools[which] = psycopg2_pool.ThreadedConnectionPool(*self._sizes, **self._configs[which])
+            return self._pools[which]
+
+    def _from_replica(self):
+        """A replica connection if the replica is fresh, else None"""
+        if time.monotonic() < self._retry_at:
+            return None
+        try:
+            pool = self._pool('replica')
+            conn = pool.getconn()
+        except psycopg2.Error as e:
+            print(f"⚠️  Replica unavailable, reading from primary: {e}")
+            self._retry_at = time.monotonic() + LAG_CHECK_INTERVAL
+            return None
+        if time.monotonic() < self._fresh_until:
+            return conn
+        try:
+            fresh = replica_fresh(conn, self.max_lag, self.min_lsn)
+        except psycopg2.Error as e:
+            print(f"⚠️  Replica lag check failed, reading from primary: {e}")
+            pool.putconn(conn, close=True)
+            self._retry_at = time.monotonic() + LAG_CHECK_INTERVAL
+            return None
+        if not fresh:
+            pool.putconn(conn)
+            print("⚠️  Replica lagging, reading from primary")
+            self._retry_at = time.monotonic() + LAG_CHECK_INTERVAL
+            return None
+        self._fresh_until = time.monotonic() + LAG_CHECK_INTERVAL
+        return conn
+
+    def getconn(self):
+        conn = self._from_replica() if self._configs['replica'] else None
+        pool = self._pools.get('replica')
+        if conn is None:
+            pool = self._pool('primary')
+            conn = pool.getconn()
+        with self._lock:
+            self._owner[id(conn)] = pool
+        return conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            pool = self._owner.pop(id(conn))
+        pool.putconn(conn, close=close)
+
+    def closeall(self):
+        with self._lock:
+            for pool in self._pools.values():
+                pool.closeall()
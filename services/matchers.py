@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Exclusion Matchers
+Case-insensitive "contains any of these substrings" checks, used for
+EXCLUDED_MID_NAMES and EXCLUDED_DECLINE_DESCRIPTIONS in payment_monitor.py
+and for the exclusion check in the Telegram bot's /test.
+
+Each pattern list is compiled once into a single regex alternation, and
+results are memoised per distinct string in a bounded LRU - the same MID
+names and decline descriptions come back every cycle.
+
+Semantics are those of the original loops: the text is lowercased and
+stripped, then matches if any pattern is a substring of it (patterns are
+compared as given, so they should be lowercase).
+"""
+
+import re
+from functools import lru_cache
+
+
+class SubstringMatcher:
+    """Compiled any-substring matcher with a per-string result cache."""
+
+    def __init__(self, patterns, cache_size=4096):
+        self.patterns = tuple(patterns)
+        if self.patterns:
+            # Longest first so the alternation stops at the most specific pattern
+            alternatives = sorted(set(self.patterns), key=len, reverse=True)
+            self._regex = re.compile('|'.join(re.escape(p) for p in alternatives))
+        else:
+            self._regex = None
+        self.matches = lru_cache(maxsize=cache_size)(self._matches)
+
+    def _matches(self, text):
+        if not text or self._regex is None:
+            return False
+        return self._regex.search(text.lower().strip()) is not None
+
+    def cache_info(self):
+        return self.matches.cache_info()
+
+
+@lru_cache(maxsize=32)
+def _matcher_for(patterns):
+    return SubstringMatcher(patterns)
+
+
+def substring_matcher(patterns):
+    """
+    Shared matcher for a pattern list. Compiled on first use and reused
+    while the list is unchanged (e.g. until monitor_config changes it).
+    """
+    return _matcher_for(tuple(patterns))
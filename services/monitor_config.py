@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Monitor Configuration
+Runtime settings for payment_monitor.py, stored as versioned JSONB rows in
+monitor_config (database/migrations/migration_create_monitor_config.sql).
+The highest version is active. Every change inserts a new version, so the
+table doubles as an audit trail and any version can be restored.
+
+The monitor reads the active version at the start of each run and overlays
+it on its module constants; keys missing from the stored config keep the
+constant's value.
+"""
+
+import copy
+
+from psycopg2.extras import Json, RealDictCursor
+
+# config key -> payment_monitor.py module constant it overrides
+CONFIG_KEYS = {
+    'thresholds': 'THRESHOLDS',
+    'smart_filter': 'SMART_FILTER_CONFIG',
+    'cooldown_minutes': 'COOLDOWN_MINUTES',
+    'excluded_decline_codes': 'EXCLUDED_DECLINE_CODES',
+    'excluded_decline_descriptions': 'EXCLUDED_DECLINE_DESCRIPTIONS',
+    'excluded_mids': 'EXCLUDED_MIDS',
+    'excluded_mid_names': 'EXCLUDED_MID_NAMES',
+}
+
+# Looked up by exact value, so held as sets once loaded
+SET_KEYS = {'excluded_decline_codes', 'excluded_mids'}
+
+
+def merge(base, overrides):
+    """Copy of base with overrides applied; nested dicts are merged key by key."""
+    merged = dict(base)
+    for key, value in overrides.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_current(cursor):
+    """Active version (version, config, changed_by, change_note, created_at), or None. Needs a RealDictCursor."""
+    cursor.execute("""
+        SELECT version, config, changed_by, change_note, created_at
+        FROM monitor_config
+        ORDER BY version DESC
+        LIMIT 1
+    """)
+    return cursor.fetchone()
+
+
+def history(cursor, limit=5):
+    """Most recent versions, newest first."""
+    cursor.execute("""
+        SELECT version, changed_by, change_note, created_at
+        FROM monitor_config
+        ORDER BY version DESC
+        LIMIT %s
+    """, (limit,))
+    return cursor.fetchall()
+
+
+def save_changes(conn, changes, changed_by, note=None):
+    """
+    Store a new version = active config with `changes` merged in. Commits and
+    returns the new version number. The table lock serialises concurrent
+    /config commands so neither change is lost.
+    """
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("LOCK TABLE monitor_config IN EXCLUSIVE MODE")
+    current = load_current(cursor)
+    config = merge(current['config'] if current else {}, changes)
+    cursor.execute("""
+        INSERT INTO monitor_config (config, changed_by, change_note)
+        VALUES (%s, %s, %s)
+        RETURNING version
+    """, (Json(config), changed_by, note))
+    version = cursor.fetchone()['version']
+    conn.commit()
+    return version
+
+
+def rollback_to(conn, version, changed_by):
+    """Re-activate an older version by copying it as a new version. Returns the new version, or None."""
+    cursor = conn.cursor(cursor_factory=RealDictCursor)
+    cursor.execute("LOCK TABLE monitor_config IN EXCLUSIVE MODE")
+    cursor.execute("SELECT config FROM monitor_config WHERE version = %s", (version,))
+    row = cursor.fetchone()
+    if row is None:
+        conn.rollback()
+        return None
+    cursor.execute("""
+        INSERT INTO monitor_config (config, changed_by, change_note)
+        VALUES (%s, %s, %s)
+        RETURNING version
+    """, (Json(row['config']), changed_by, f"Rollback to version {version}"))
+    new_version = cursor.fetchone()['version']
+    conn.commit()
+    return new_version
+
+
+def _module_defaults(module):
+    """The module's constants for CONFIG_KEYS as they were before any config was applied."""
+    defaults = getattr(module, '_CONFIG_DEFAULTS', None)
+    if defaults is None:
+        defaults = copy.deepcopy({key: getattr(module, attr) for key, attr in CONFIG_KEYS.items()})
+        module._CONFIG_DEFAULTS = defaults
+    return defaults
+
+
+def effective(module, config):
+    """`config` merged over the module's defaults, i.e. the settings the monitor runs with."""
+    return copy.deepcopy(merge(_module_defaults(module),
+                               {key: value for key, value in config.items() if key in CONFIG_KEYS}))
+
+
+def monitor_effective(config):
+    """effective() for payment_monitor.py, for callers outside the monitor (the bot's /test)."""
+    from services import payment_monitor  # imports this module
+    return effective(payment_monitor, config)
+
+
+def apply_to_module(module, config):
+    """
+    Set the module constants named in CONFIG_KEYS from `config`, merged over
+    the defaults captured on first call. Returns the effective config.
+    """
+    config = effective(module, config)
+    for key, attr in CONFIG_KEYS.items():
+        value = config[key]
+        setattr(module, attr, frozenset(value) if key in SET_KEYS else value)
+    return config
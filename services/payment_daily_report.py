@@ -6,28 +6,36 @@ Generates and sends daily summary of payment alerts via Telegram
 
 import os
 import sys
+import argparse
+import time as clock
 import psycopg2
 import requests
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
 from dotenv import load_dotenv
 from collections import defaultdict
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import db
+
 # Load environment variables
 load_dotenv()
 
-# Database configuration
-DB_CONFIG = {
-    'dbname': os.getenv('DB_NAME', 'payment_transactions'),
-    'user': os.getenv('DB_USER', 'webhook_user'),
-    'password': os.getenv('DB_PASSWORD'),
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', '5432')
-}
+# Database configuration. daily_alert_stats is written on DB_CONFIG; the
+# report sections read from the replica when DB_READ_HOST is set and it has
+# caught up with that write (see services/db.py)
+DB_CONFIG = db.write_config('daily-report')
+READ_DB_CONFIG = db.read_config('daily-report')
 
 # Telegram configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
 
+# Report sections run concurrently, each on its own connection
+REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '4'))
+REPORT_QUERY_TIMEOUT = int(os.getenv('REPORT_QUERY_TIMEOUT', '60'))  # seconds per section
+
 def get_db_connection():
     """Create and return database connection"""
     return psycopg2.connect(**DB_CONFIG)
@@ -176,18 +184,77 @@ def get_top_mids(cursor, start_date, end_date, limit=5):
     cursor.execute(query, (start_date, end_date, limit))
     return cursor.fetchall()
 
-def get_trend_data(cursor, days=7):
-    """Get trend data for the last N days"""
+def populate_daily_stats(cursor, first_day, last_day, only_missing=False):
+    """
+    (Re)compute daily_alert_stats rows for first_day..last_day inclusive.
+    With only_missing, days that already have a row are left alone.
+    Returns the number of rows written; the caller commits.
+    """
     query = """
+        INSERT INTO daily_alert_stats (
+            stat_date, total_alerts, critical_count, warning_count,
+            unique_routes, unique_mids, unique_banks,
+            alerts_5min, alerts_15min, alerts_30min,
+            total_suppressions, unique_routes_suppressed
+        )
         SELECT
-            DATE(alert_time) as date,
-            COUNT(*) as alerts
-        FROM alert_history
-        WHERE alert_time >= CURRENT_DATE - INTERVAL '%s days'
-        GROUP BY DATE(alert_time)
-        ORDER BY date DESC
+            g.day::date,
+            a.total_alerts, a.critical_count, a.warning_count,
+            a.unique_routes, a.unique_mids, a.unique_banks,
+            a.alerts_5min, a.alerts_15min, a.alerts_30min,
+            s.total_suppressions, s.unique_routes_suppressed
+        FROM generate_series(%(first_day)s::date, %(last_day)s::date, INTERVAL '1 day') AS g(day)
+        CROSS JOIN LATERAL (
+            SELECT
+                COUNT(*) as total_alerts,
+                COUNT(*) FILTER (WHERE severity = 'CRITICAL') as critical_count,
+                COUNT(*) FILTER (WHERE severity = 'WARNING') as warning_count,
+                COUNT(DISTINCT mid_name || ' + ' || bank_name) as unique_routes,
+                COUNT(DISTINCT mid_name) as unique_mids,
+                COUNT(DISTINCT bank_name) as unique_banks,
+                COUNT(*) FILTER (WHERE time_window = '5min') as alerts_5min,
+                COUNT(*) FILTER (WHERE time_window = '15min') as alerts_15min,
+                COUNT(*) FILTER (WHERE time_window = '30min') as alerts_30min
+            FROM alert_history
+            WHERE alert_time >= g.day AND alert_time < g.day + INTERVAL '1 day'
+        ) a
+        CROSS JOIN LATERAL (
+            SELECT
+                COUNT(*) as total_suppressions,
+                COUNT(DISTINCT mid_name || ' + ' || bank_name) as unique_routes_suppressed
+            FROM alert_suppression_log
+            WHERE suppression_time >= g.day AND suppression_time < g.day + INTERVAL '1 day'
+        ) s
+        WHERE NOT %(only_missing)s
+           OR NOT EXISTS (SELECT 1 FROM daily_alert_stats d WHERE d.stat_date = g.day::date)
+        ON CONFLICT (stat_date) DO UPDATE SET
+            total_alerts = EXCLUDED.total_alerts,
+            critical_count = EXCLUDED.critical_count,
+            warning_count = EXCLUDED.warning_count,
+            unique_routes = EXCLUDED.unique_routes,
+            unique_mids = EXCLUDED.unique_mids,
+            unique_banks = EXCLUDED.unique_banks,
+            alerts_5min = EXCLUDED.alerts_5min,
+            alerts_15min = EXCLUDED.alerts_15min,
+            alerts_30min = EXCLUDED.alerts_30min,
+            total_suppressions = EXCLUDED.total_suppressions,
+            unique_routes_suppressed = EXCLUDED.unique_routes_suppressed,
+            computed_at = NOW()
     """
-    cursor.execute(query, (days,))
+    cursor.execute(query, {'first_day': first_day, 'last_day': last_day, 'only_missing': only_missing})
+    return cursor.rowcount
+
+def get_trend_data(cursor, report_day, days=7):
+    """Get (date, alerts) for the N days ending on report_day, newest first, from daily_alert_stats"""
+    query = """
+        SELECT
+            stat_date as date,
+            total_alerts as alerts
+        FROM daily_alert_stats
+        WHERE stat_date > %s::date - %s AND stat_date <= %s::date
+        ORDER BY stat_date DESC
+    """
+    cursor.execute(query, (report_day, days, report_day))
     return cursor.fetchall()
 
 def get_suppression_summary(cursor, start_date, end_date):
@@ -207,24 +274,42 @@ def get_suppression_summary(cursor, start_date, end_date):
 
 def get_top_suppressed_routes(cursor, start_date, end_date, limit=10):
     """Get top suppressed MID+Bank routes with alternative route suggestions"""
+    # Alternatives are looked up only for the routes that make the cut, one
+    # index probe each (idx_asl_midname_bank_time)
     query = """
+        WITH top_routes AS (
+            SELECT
+                mid_name,
+                bank_name,
+                COUNT(*) as suppression_count,
+                AVG(success_rate_7d) as avg_success_rate_7d,
+                AVG(success_rate_30d) as avg_success_rate_30d,
+                MAX(suppression_time) as last_suppressed
+            FROM alert_suppression_log
+            WHERE suppression_time >= %s AND suppression_time < %s
+            GROUP BY mid_name, bank_name
+            ORDER BY suppression_count DESC, mid_name, bank_name
+            LIMIT %s
+        )
         SELECT
-            mid_name,
-            bank_name,
-            COUNT(*) as suppression_count,
-            AVG(success_rate_7d) as avg_success_rate_7d,
-            AVG(success_rate_30d) as avg_success_rate_30d,
-            MAX(suppression_time) as last_suppressed,
-            (SELECT metadata->'alternative_routes' FROM alert_suppression_log asl2
-             WHERE asl2.mid_name = alert_suppression_log.mid_name
-               AND asl2.bank_name = alert_suppression_log.bank_name
-               AND asl2.metadata IS NOT NULL
-             ORDER BY suppression_time DESC LIMIT 1) as alternatives
-        FROM alert_suppression_log
-        WHERE suppression_time >= %s AND suppression_time < %s
-        GROUP BY mid_name, bank_name
-        ORDER BY suppression_count DESC
-        LIMIT %s
+            t.mid_name,
+            t.bank_name,
+            t.suppression_count,
+            t.avg_success_rate_7d,
+            t.avg_success_rate_30d,
+            t.last_suppressed,
+            latest.alternatives
+        FROM top_routes t
+        LEFT JOIN LATERAL (
+            SELECT asl.metadata->'alternative_routes' as alternatives
+            FROM alert_suppression_log asl
+            WHERE asl.mid_name = t.mid_name
+              AND asl.bank_name = t.bank_name
+              AND asl.metadata IS NOT NULL
+            ORDER BY asl.suppression_time DESC
+            LIMIT 1
+        ) latest ON true
+        ORDER BY t.suppression_count DESC, t.mid_name, t.bank_name
     """
     cursor.execute(query, (start_date, end_date, limit))
     return cursor.fetchall()
@@ -248,15 +333,21 @@ def get_recovered_routes(cursor, lookback_days=7):
             HAVING AVG(s.success_rate_7d) < 10  -- Was being suppressed (low success)
         ),
         current_performance AS (
+            -- Only the suppressed MIDs, not every MID with traffic this week
             SELECT
-                t.mid_id,
-                COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') as success_7d,
-                COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days') as total_7d,
-                ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') /
-                      NULLIF(COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'), 0), 2) as current_success_rate_7d
-            FROM transactions t
-            WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'
-            GROUP BY t.mid_id
+                m.mid_id,
+                perf.success_7d,
+                perf.total_7d,
+                ROUND(100.0 * perf.success_7d / NULLIF(perf.total_7d, 0), 2) as current_success_rate_7d
+            FROM (SELECT DISTINCT mid_id FROM recently_suppressed) m
+            CROSS JOIN LATERAL (
+                SELECT
+                    COUNT(*) FILTER (WHERE t.status = 'success') as success_7d,
+                    COUNT(*) as total_7d
+                FROM transactions t
+                WHERE t.mid_id = m.mid_id
+                  AND t.last_updated_at >= NOW() - INTERVAL '7 days'
+            ) perf
         )
         SELECT
             rs.mid_name,
@@ -269,42 +360,131 @@ def get_recovered_routes(cursor, lookback_days=7):
         JOIN current_performance cp ON rs.mid_id = cp.mid_id
         WHERE cp.current_success_rate_7d >= 10  -- Now performing well!
           AND cp.total_7d >= 10  -- Has meaningful volume
-        ORDER BY cp.current_success_rate_7d DESC
+        ORDER BY cp.current_success_rate_7d DESC, rs.mid_name, rs.bank_name
         LIMIT 10
     """
     cursor.execute(query, (lookback_days,))
     return cursor.fetchall()
 
+def run_sections(sections, workers=None, timeout=None, min_lsn=None):
+    """
+    Run report sections concurrently. `sections` maps name -> (query_fn, fallback),
+    where query_fn(cursor) returns the section's rows. Each section gets its own
+    pooled connection with statement_timeout set, so a slow or failing query only
+    costs its own section: it is reported and replaced by its fallback.
+
+    Connections are read-only, from the replica if it has replayed min_lsn
+    (the primary's WAL position after this run's writes) and is not lagging.
+
+    Returns (results, failed_names, timings) with timings in seconds.
+    """
+    workers = workers or REPORT_WORKERS
+    timeout = timeout or REPORT_QUERY_TIMEOUT
+    db_pool = db.ReadPool(DB_CONFIG, READ_DB_CONFIG, 1, workers, min_lsn=min_lsn)
+    timings = {}
+
+    def run(name, query_fn):
+        started = clock.monotonic()
+        conn = db_pool.getconn()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SET statement_timeout = %s", (timeout * 1000,))
+            return query_fn(cursor)
+        finally:
+            conn.rollback()
+            db_pool.putconn(conn)
+            timings[name] = clock.monotonic() - started
+
+    results = {}
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {name: executor.submit(run, name, query_fn)
+                       for name, (query_fn, fallback) in sections.items()}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    print(f"⚠️  Report section '{name}' failed, continuing without it: {e}")
+                    results[name] = sections[name][1]
+                    failed.append(name)
+    finally:
+        db_pool.closeall()
+
+    return results, failed, timings
+
 def format_number(num):
     """Format number with commas"""
     if num is None:
         return "0"
     return f"{int(num):,}"
 
-def generate_daily_report():
-    """Generate and send daily alert report"""
+def generate_daily_report(report_day=None, send=True):
+    """
+    Generate and send the alert report for report_day (default: yesterday).
+    With send=False the report is printed instead of sent to Telegram.
+    """
 
-    # Calculate date range (yesterday full day)
-    end_date = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    start_date = end_date - timedelta(days=1)
+    # Calculate date range (report day, full day)
+    if report_day is None:
+        report_day = date.today() - timedelta(days=1)
+    start_date = datetime.combine(report_day, time.min)
+    end_date = start_date + timedelta(days=1)
 
     # For display
     report_date = start_date.strftime('%B %d, %Y')
 
     try:
+        report_started = clock.monotonic()
         conn = get_db_connection()
         cursor = conn.cursor()
 
-        # Gather all data
-        summary = get_alert_summary(cursor, start_date, end_date)
-        top_routes = get_top_problematic_routes(cursor, start_date, end_date)
-        time_windows = get_time_window_breakdown(cursor, start_date, end_date)
-        top_banks = get_top_banks(cursor, start_date, end_date)
-        top_mids = get_top_mids(cursor, start_date, end_date)
-        trend_data = get_trend_data(cursor, days=7)
-        suppression_summary = get_suppression_summary(cursor, start_date, end_date)
-        top_suppressed = get_top_suppressed_routes(cursor, start_date, end_date, limit=5)
-        recovered_routes = get_recovered_routes(cursor, lookback_days=7)
+        # Aggregate the report day (recomputed, so regenerating a past report
+        # picks up late rows) and any trend days not aggregated yet
+        stats_failed = False
+        try:
+            populate_daily_stats(cursor, report_day, report_day)
+            populate_daily_stats(cursor, report_day - timedelta(days=6), report_day - timedelta(days=1), only_missing=True)
+            conn.commit()
+        except psycopg2.Error as e:
+            # The trend falls back to whatever rows are already there
+            print(f"⚠️  Could not refresh daily_alert_stats: {e}")
+            conn.rollback()
+            stats_failed = True
+        stats_elapsed = clock.monotonic() - report_started
+
+        # The trend section must see the rows just written
+        written_lsn = db.current_lsn(conn) if READ_DB_CONFIG else None
+
+        # Close database connection
+        cursor.close()
+        conn.close()
+
+        # Gather all data - independent queries, run concurrently
+        results, failed_sections, timings = run_sections({
+            'summary': (lambda c: get_alert_summary(c, start_date, end_date), (0, 0, 0, 0, 0, 0)),
+            'top_routes': (lambda c: get_top_problematic_routes(c, start_date, end_date), []),
+            'time_windows': (lambda c: get_time_window_breakdown(c, start_date, end_date), []),
+            'top_banks': (lambda c: get_top_banks(c, start_date, end_date), []),
+            'top_mids': (lambda c: get_top_mids(c, start_date, end_date), []),
+            'trend': (lambda c: get_trend_data(c, report_day, days=7), []),
+            'suppression_summary': (lambda c: get_suppression_summary(c, start_date, end_date), []),
+            'top_suppressed': (lambda c: get_top_suppressed_routes(c, start_date, end_date, limit=5), []),
+            'recovered': (lambda c: get_recovered_routes(c, lookback_days=7), []),
+        }, min_lsn=written_lsn)
+        timings['daily_alert_stats'] = stats_elapsed
+        if stats_failed:
+            failed_sections.append('daily_alert_stats')
+
+        summary = results['summary']
+        top_routes = results['top_routes']
+        time_windows = results['time_windows']
+        top_banks = results['top_banks']
+        top_mids = results['top_mids']
+        trend_data = results['trend']
+        suppression_summary = results['suppression_summary']
+        top_suppressed = results['top_suppressed']
+        recovered_routes = results['recovered']
 
         # Unpack summary
         total_alerts, critical_count, warning_count, unique_routes, unique_mids, unique_banks = summary
@@ -332,7 +512,14 @@ def generate_daily_report():
 
 📅 <b>Report Period:</b> {report_date}
 🕐 <b>Time Range:</b> 00:00 - 23:59 UTC
+"""
+
+        if failed_sections:
+            report += f"""
+⚠️ <b>Incomplete report</b> - data unavailable for: {', '.join(failed_sections)}
+"""
 
+        report += f"""
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
 🎯 <b>EXECUTIVE SUMMARY</b>
 ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
@@ -507,10 +694,10 @@ def generate_daily_report():
 
         max_alerts = max([row[1] for row in trend_data]) if trend_data else 1
         for i, trend_row in enumerate(trend_data):
-            date, alerts = trend_row
+            day, alerts = trend_row
             bar = generate_bar_chart(alerts, max_alerts, 20)
-            date_str = date.strftime('%b %d')
-            today_marker = " (Today)" if i == 0 else ""
+            date_str = day.strftime('%b %d')
+            today_marker = " (Report day)" if i == 0 else ""
             peak_marker = " (Peak)" if alerts == max_alerts else ""
 
             report += f"{date_str:10} {alerts:3} alerts  {bar}{today_marker}{peak_marker}\n"
@@ -568,6 +755,8 @@ def generate_daily_report():
 
             if avg_position_pct < -10:
                 report += "• Trending significantly below 7-day average\n"
+        elif 'summary' in failed_sections:
+            report += "⚠️ <b>Alert summary unavailable</b> - see logs\n"
         else:
             report += "✅ <b>No alerts in this period</b> - All systems performing normally\n"
 
@@ -603,9 +792,15 @@ def generate_daily_report():
 🔍 <b>Monitoring:</b> Real-time alerts with 24h cooldown
 """
 
-        # Close database connection
-        cursor.close()
-        conn.close()
+        total_elapsed = clock.monotonic() - report_started
+        print(f"Report data for {report_date} gathered in {total_elapsed * 1000:.0f} ms")
+        for name, elapsed in sorted(timings.items(), key=lambda item: item[1], reverse=True):
+            status = "FAILED" if name in failed_sections else "ok"
+            print(f"   {name:<22} {elapsed * 1000:>8.0f} ms  {status}")
+
+        if not send:
+            print(report)
+            return True
 
         # Send report
         print(f"Sending daily report for {report_date}...")
@@ -624,6 +819,51 @@ def generate_daily_report():
         traceback.print_exc()
         return False
 
+def backfill_daily_stats(first_day, last_day):
+    """Recompute daily_alert_stats for first_day..last_day without sending anything"""
+    try:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        written = populate_daily_stats(cursor, first_day, last_day)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"✅ daily_alert_stats: {written} day(s) recomputed ({first_day} to {last_day})")
+        return True
+    except Exception as e:
+        print(f"Error backfilling daily_alert_stats: {e}")
+        return False
+
+def parse_day(value):
+    """argparse type for YYYY-MM-DD"""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM-DD, got {value!r}")
+
 if __name__ == "__main__":
-    success = generate_daily_report()
+    parser = argparse.ArgumentParser(description="Send the daily payment alert report")
+    parser.add_argument('--date', type=parse_day,
+                        help="Report day (YYYY-MM-DD) to generate or regenerate (default: yesterday)")
+    parser.add_argument('--no-send', action='store_true',
+                        help="Print the report instead of sending it to Telegram")
+    parser.add_argument('--backfill-from', type=parse_day,
+                        help="Recompute daily_alert_stats from this day and exit without a report")
+    parser.add_argument('--backfill-to', type=parse_day,
+                        help="Last day to recompute with --backfill-from (default: yesterday)")
+    args = parser.parse_args()
+
+    yesterday = date.today() - timedelta(days=1)
+    if args.backfill_to and not args.backfill_from:
+        parser.error("--backfill-to needs --backfill-from")
+
+    if args.backfill_from:
+        backfill_to = args.backfill_to or yesterday
+        if backfill_to > yesterday or args.backfill_from > backfill_to:
+            parser.error(f"backfill range must be finished days, ending no later than {yesterday}")
+        success = backfill_daily_stats(args.backfill_from, backfill_to)
+    else:
+        if args.date and args.date > yesterday:
+            parser.error(f"--date must be a finished day ({yesterday} or earlier)")
+        success = generate_daily_report(args.date, send=not args.no_send)
     sys.exit(0 if success else 1)
@@ -12,17 +12,18 @@ from datetime import datetime, timedelta
 from dotenv import load_dotenv
 import sys
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import db, monitor_config
+from services.matchers import substring_matcher
+
 # Load environment variables
 load_dotenv('/opt/payment-webhook/.env')
 
-# Configuration
-DB_CONFIG = {
-    'dbname': os.getenv('DB_NAME', 'payment_transactions'),
-    'user': os.getenv('DB_USER', 'webhook_user'),
-    'password': os.getenv('DB_PASSWORD'),
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', '5432')
-}
+# Configuration. Window scans and per-route breakdowns read from the replica
+# when DB_READ_HOST is set (see services/db.py); alert state stays on DB_CONFIG.
+DB_CONFIG = db.write_config('monitor')
+READ_DB_CONFIG = db.read_config('monitor')
 
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_IDS = [id.strip() for id in os.getenv('TELEGRAM_CHANNEL_ID', '').split(',') if id.strip()]
@@ -48,6 +49,9 @@ THRESHOLDS = {
 
 COOLDOWN_MINUTES = 1440  # 24 hours
 
+# NOTIFY channel the Telegram bot listens on (refreshes its /stats snapshots)
+MONITOR_NOTIFY_CHANNEL = 'monitor_cycle_complete'
+
 # Smart filtering configuration
 SMART_FILTER_CONFIG = {
     'enabled': True,  # Set to False to disable smart filtering
@@ -87,34 +91,38 @@ EXCLUDED_MID_NAMES = [
     'networxpay',   # Networxpay MIDs - silenced per request
 ]
 
+def load_runtime_config(cursor, conn):
+    """
+    Apply the active monitor_config version (set with /config in the bot) over
+    the constants above. Keeps the constants if the table is missing or empty.
+    """
+    try:
+        current = monitor_config.load_current(cursor)
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"⚠️  monitor_config not loaded, using built-in defaults: {e}")
+        return None
+
+    config = monitor_config.apply_to_module(sys.modules[__name__], current['config'] if current else {})
+    if current:
+        print(f"Config version {current['version']} (by {current['changed_by']}), "
+              f"smart filter {'on' if config['smart_filter']['enabled'] else 'off'}, "
+              f"threshold {config['smart_filter']['min_success_rate_threshold'] * 100:.0f}%")
+    return current['version'] if current else None
+
 def should_exclude_mid(mid_id, mid_name):
     """Check if a MID should be excluded from alerts"""
     # Check by MID ID
     if mid_id and mid_id in EXCLUDED_MIDS:
         return True
 
-    # Check by MID name (case-insensitive partial match)
-    if mid_name:
-        mid_name_lower = mid_name.lower().strip()
-        for excluded_name in EXCLUDED_MID_NAMES:
-            if excluded_name in mid_name_lower:
-                return True
-
-    return False
+    # Check by MID name (case-insensitive partial match, see services/matchers.py)
+    return substring_matcher(EXCLUDED_MID_NAMES).matches(mid_name)
 
 def should_exclude_decline(reply_desc):
     """Check if a decline reason should be excluded from alerts"""
-    if not reply_desc:
-        return False
-
-    reply_desc_lower = reply_desc.lower().strip()
-
-    # Check if it matches any excluded descriptions
-    for excluded in EXCLUDED_DECLINE_DESCRIPTIONS:
-        if excluded in reply_desc_lower:
-            return True
-
-    return False
+    # Case-insensitive partial match against EXCLUDED_DECLINE_DESCRIPTIONS
+    return substring_matcher(EXCLUDED_DECLINE_DESCRIPTIONS).matches(reply_desc)
 
 def check_route_health(cursor, mid_id, bank_name):
     """
@@ -360,6 +368,10 @@ def get_db_connection():
     """Get database connection"""
     return psycopg2.connect(**DB_CONFIG)
 
+def get_read_connection():
+    """Read-only connection for the window scans (replica if fresh, else primary)"""
+    return db.connect_read(DB_CONFIG, READ_DB_CONFIG)
+
 def check_recent_alert(cursor, mid_id, bank_name, minutes=30):
     """Check if we recently sent an alert for this MID+Bank combination"""
     cursor.execute("""
@@ -604,8 +616,12 @@ def send_telegram_alert(severity, time_window, mid_name, bank_name,
     # Return first message ID if any succeeded (for backward compatibility with logging)
     return message_ids[0] if message_ids else None
 
-def check_performance_window(cursor, conn, time_window):
-    """Check performance for a specific time window"""
+def check_performance_window(cursor, conn, time_window, read_cursor=None):
+    """
+    Check performance for a specific time window. Read-only scans go through
+    read_cursor (default: cursor); alert state is read and written on cursor.
+    """
+    reads = read_cursor or cursor
 
     thresholds = THRESHOLDS[time_window]
 
@@ -613,26 +629,40 @@ def check_performance_window(cursor, conn, time_window):
     minutes_map = {'5min': 5, '15min': 15, '30min': 30}
     minutes = minutes_map.get(time_window, 30)
 
-    # Get raw transaction data to recalculate excluding insufficient funds
-    cursor.execute("""
+    # Get raw transaction data to recalculate excluding insufficient funds.
+    # Grouped on the integer dimension keys (one per mid_id + mid_name and per
+    # bank_name), names joined back from the dimension tables afterwards.
+    reads.execute("""
         SELECT
-            mid_id,
-            mid_name,
-            bank_name,
-            COUNT(*) as total_transactions,
-            COUNT(*) FILTER (WHERE status = 'success') as successful,
-            COUNT(*) FILTER (WHERE status = 'declined') as total_declined,
-            COUNT(*) FILTER (WHERE status = 'pending') as pending,
-            ARRAY_AGG(reply_desc) FILTER (WHERE status = 'declined') as decline_descriptions
-        FROM transactions
-        WHERE last_updated_at >= NOW() - INTERVAL %s
-          AND mid_id IS NOT NULL
-          AND bank_name IS NOT NULL
-        GROUP BY mid_id, mid_name, bank_name
-        HAVING COUNT(*) >= %s
+            dm.mid_id,
+            dm.mid_name,
+            db.bank_name,
+            w.total_transactions,
+            w.successful,
+            w.total_declined,
+            w.pending,
+            w.decline_descriptions
+        FROM (
+            SELECT
+                mid_key,
+                bank_key,
+                COUNT(*) as total_transactions,
+                COUNT(*) FILTER (WHERE status = 'success') as successful,
+                COUNT(*) FILTER (WHERE status = 'declined') as total_declined,
+                COUNT(*) FILTER (WHERE status = 'pending') as pending,
+                ARRAY_AGG(reply_desc) FILTER (WHERE status = 'declined') as decline_descriptions
+            FROM transactions
+            WHERE last_updated_at >= NOW() - INTERVAL %s
+              AND mid_key IS NOT NULL
+              AND bank_key IS NOT NULL
+            GROUP BY mid_key, bank_key
+            HAVING COUNT(*) >= %s
+        ) w
+        JOIN dim_mids dm ON dm.mid_key = w.mid_key
+        JOIN dim_banks db ON db.bank_key = w.bank_key
     """, (f'{minutes} minutes', thresholds['min_transactions'],))
 
-    results = cursor.fetchall()
+    results = reads.fetchall()
     alerts_sent = 0
 
     for row in results:
@@ -674,7 +704,7 @@ def check_performance_window(cursor, conn, time_window):
 
         if manual_override['has_override'] and manual_override['action'] == 'suppress':
             # User manually suppressed this route - but check if it has recovered
-            health_check = check_route_health(cursor, mid_id, bank_name)
+            health_check = check_route_health(reads, mid_id, bank_name)
 
             if health_check.get('should_alert') and health_check.get('reason') == 'healthy_route':
                 # Route has recovered! Auto-remove the manual suppression
@@ -719,7 +749,7 @@ def check_performance_window(cursor, conn, time_window):
         else:
             # No manual override (or already handled suppress above), check smart filter
             # SMART FILTERING: Check if this route is healthy enough to alert
-            health_check = check_route_health(cursor, mid_id, bank_name)
+            health_check = check_route_health(reads, mid_id, bank_name)
 
         if not health_check['should_alert']:
             # Route is dead/unhealthy - suppress alert
@@ -805,10 +835,10 @@ def check_performance_window(cursor, conn, time_window):
         print(f"{severity}: {mid_name} + {bank_name} - {decline_rate:.1f}% decline rate in {time_window}{excluded_note}{regression_note}")
 
         # Get decline reasons breakdown
-        decline_reasons = get_decline_reasons(cursor, mid_id, bank_name, time_window)
+        decline_reasons = get_decline_reasons(reads, mid_id, bank_name, time_window)
 
         # Get merchant breakdown
-        merchant_breakdown = get_merchant_breakdown(cursor, mid_id, bank_name, time_window)
+        merchant_breakdown = get_merchant_breakdown(reads, mid_id, bank_name, time_window)
 
         # Send Telegram alert
         telegram_msg_id = send_telegram_alert(
@@ -836,13 +866,15 @@ def check_performance_window(cursor, conn, time_window):
 
     return alerts_sent
 
-def check_low_volume_failures(cursor, conn, time_window):
+def check_low_volume_failures(cursor, conn, time_window, read_cursor=None):
     """
     Check for MID + Bank combinations with complete failures (5min window only)
     Alert if:
     - More than 0 but less than 8 transactions in last 5 minutes
     - AND all of the last 10 transactions overall are declined
+    Read-only scans go through read_cursor (default: cursor).
     """
+    reads = read_cursor or cursor
 
     # Only check this for 5min window
     if time_window != '5min':
@@ -916,8 +948,8 @@ def check_low_volume_failures(cursor, conn, time_window):
     ORDER BY rlv.recent_count DESC
     """
 
-    cursor.execute(query)
-    results = cursor.fetchall()
+    reads.execute(query)
+    results = reads.fetchall()
     alerts_sent = 0
 
     for row in results:
@@ -942,7 +974,7 @@ def check_low_volume_failures(cursor, conn, time_window):
 
         if manual_override['has_override'] and manual_override['action'] == 'suppress':
             # User manually suppressed this route - but check if it has recovered
-            health_check = check_route_health(cursor, mid_id, bank_name)
+            health_check = check_route_health(reads, mid_id, bank_name)
 
             if health_check.get('should_alert') and health_check.get('reason') == 'healthy_route':
                 # Route has recovered! Auto-remove the manual suppression
@@ -993,7 +1025,7 @@ def check_low_volume_failures(cursor, conn, time_window):
         else:
             # No manual override (or already handled suppress above), check smart filter
             # SMART FILTERING: Check if this route is healthy enough to alert
-            health_check = check_route_health(cursor, mid_id, bank_name)
+            health_check = check_route_health(reads, mid_id, bank_name)
 
         if not health_check['should_alert']:
             # Route is dead/unhealthy - suppress alert
@@ -1065,7 +1097,7 @@ def check_low_volume_failures(cursor, conn, time_window):
         print(f"🔴 CRITICAL: MID {mid_name} + {bank_name} - All last 10 transactions DECLINED (low volume)!")
 
         # Get decline reasons for last 10 transactions (excluding customer errors)
-        cursor.execute("""
+        reads.execute("""
             WITH last_10_declined AS (
                 SELECT
                     reply_code,
@@ -1091,7 +1123,7 @@ def check_low_volume_failures(cursor, conn, time_window):
             ORDER BY count DESC
         """, (mid_id, bank_name))
 
-        decline_reasons_rows = cursor.fetchall()
+        decline_reasons_rows = reads.fetchall()
         if decline_reasons_rows:
             decline_reasons_text = "\n".join([
                 f"   • [{escape_html(row['reply_code'])}] {escape_html(row['reply_desc'])}: {row['count']}"
@@ -1101,7 +1133,7 @@ def check_low_volume_failures(cursor, conn, time_window):
             decline_reasons_text = "   • No decline reasons available"
 
         # Get merchant breakdown for this alert (using last 10 overall transactions)
-        cursor.execute("""
+        reads.execute("""
             SELECT
                 COALESCE(merchant_name, 'Unknown') as merchant_name,
                 COUNT(*) FILTER (WHERE status = 'success') as success_count,
@@ -1119,7 +1151,7 @@ def check_low_volume_failures(cursor, conn, time_window):
             ORDER BY declined_count DESC, total_count DESC
         """, (mid_id, bank_name))
 
-        merchant_rows = cursor.fetchall()
+        merchant_rows = reads.fetchall()
         if merchant_rows:
             merchant_text = "\n".join([
                 f"   • {escape_html(row['merchant_name'])}: {row['declined_count']}/{row['total_count']} declined"
@@ -1240,23 +1272,34 @@ def main():
         conn = get_db_connection()
         cursor = conn.cursor(cursor_factory=RealDictCursor)
 
+        # Scans on their own connection; autocommit so no long snapshot is
+        # held open on the replica for the whole run
+        read_conn = get_read_connection()
+        read_conn.autocommit = True
+        read_cursor = read_conn.cursor(cursor_factory=RealDictCursor)
+
+        load_runtime_config(cursor, conn)
+
         total_alerts = 0
 
         # Check each time window
         for time_window in ['5min', '15min', '30min']:
             print(f"\n🔍 Checking {time_window} window...")
-            alerts = check_performance_window(cursor, conn, time_window)
+            alerts = check_performance_window(cursor, conn, time_window, read_cursor)
             total_alerts += alerts
             print(f"   Alerts sent: {alerts}")
 
             # For 5min window, also check low-volume complete failures
             if time_window == '5min':
                 print(f"\n🔍 Checking low-volume complete failures...")
-                low_vol_alerts = check_low_volume_failures(cursor, conn, time_window)
+                low_vol_alerts = check_low_volume_failures(cursor, conn, time_window, read_cursor)
                 total_alerts += low_vol_alerts
                 print(f"   Low-volume alerts sent: {low_vol_alerts}")
 
         # All alerts already committed individually
+        # Tell the Telegram bot to refresh its statistics snapshots (delivered on commit)
+        cursor.execute("SELECT pg_notify(%s, %s)", (MONITOR_NOTIFY_CHANNEL, str(total_alerts)))
+
         # Final commit for any remaining changes (suppression logs, etc.)
         conn.commit()
 
@@ -1264,6 +1307,8 @@ def main():
         print(f"✅ Monitoring complete: {total_alerts} alerts sent")
         print("=" * 60)
 
+        read_cursor.close()
+        read_conn.close()
         cursor.close()
         conn.close()
 
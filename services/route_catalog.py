@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Route Catalog
+Name lookups for the Telegram bot, served from the routes table
+(database/migrations/migration_create_routes_catalog.sql) instead of
+SELECT DISTINCT scans of transactions.
+
+The whole table (one row per MID + bank) is held in memory and reloaded
+every `ttl` seconds; searches are case-insensitive substring matches like
+the ILIKE '%...%' queries they replace. When nothing matches in memory
+(a route newer than the snapshot, or a typo) the routes table is queried
+directly: substring first, then pg_trgm similarity.
+
+Routes with a NULL bank (the MID was only seen with BINs missing from
+bin_bank_mapping) are only used for MID lookups (search_mids, mid_name).
+"""
+
+import threading
+import time
+
+from psycopg2.extras import RealDictCursor
+
+
+class RouteCatalog:
+    """In-memory view of the routes table with a TTL."""
+
+    def __init__(self, get_connection, ttl=300, similarity_threshold=0.3):
+        self._get_connection = get_connection
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self._routes = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Snapshot
+    # ------------------------------------------------------------------
+
+    def refresh(self):
+        """Reload all routes from the database."""
+        with self._get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute("""
+                SELECT mid_id, mid_name, bank_name, last_seen
+                FROM routes
+                ORDER BY mid_name, bank_name
+            """)
+            rows = cursor.fetchall()
+            conn.rollback()
+        routes = [
+            {
+                'mid_id': row['mid_id'],
+                'mid_name': row['mid_name'],
+                'bank_name': row['bank_name'],
+                'last_seen': row['last_seen'],
+                '_mid_key': (row['mid_name'] or '').lower(),
+                '_bank_key': row['bank_name'].lower() if row['bank_name'] else None,
+            }
+            for row in rows
+        ]
+        self._routes = routes
+        self._loaded_at = time.monotonic()
+        return len(routes)
+
+    def _snapshot(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            with self._lock:
+                # Another thread may have refreshed while we waited
+                if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+                    try:
+                        self.refresh()
+                    except Exception as e:
+                        if self._loaded_at is None:
+                            raise
+                        print(f"Route catalog refresh failed (using stale data): {e}")
+                        self._loaded_at = time.monotonic()
+        return self._routes
+
+    def _query(self, sql, params):
+        with self._get_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            conn.rollback()
+        return rows
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def search_banks(self, text, mid_id=None, limit=10):
+        """Bank names containing `text` (optionally only on one MID), sorted."""
+        needle = text.lower()
+        banks = sorted({
+            r['bank_name'] for r in self._snapshot()
+            if r['_bank_key'] is not None and needle in r['_bank_key'] and (mid_id is None or r['mid_id'] == mid_id)
+        })
+        if banks:
+            return banks[:limit]
+
+        rows = self._query("""
+            SELECT bank_name
+            FROM routes
+            WHERE (%(mid_id)s::varchar IS NULL OR mid_id = %(mid_id)s)
+              AND (bank_name ILIKE %(pattern)s OR similarity(bank_name, %(text)s) >= %(threshold)s)
+            GROUP BY bank_name
+            ORDER BY MAX(similarity(bank_name, %(text)s)) DESC, bank_name
+            LIMIT %(limit)s
+        """, {'mid_id': mid_id, 'text': text, 'pattern': f'%{text}%',
+              'threshold': self.similarity_threshold, 'limit': limit})
+        return [row['bank_name'] for row in rows]
+
+    def search_mids(self, text, limit=10):
+        """Distinct (mid_id, mid_name) pairs whose mid_name contains `text`."""
+        needle = text.lower()
+        mids = sorted({
+            (r['mid_id'], r['mid_name']) for r in self._snapshot()
+            if r['mid_name'] and needle in r['_mid_key']
+        }, key=lambda m: (m[1], m[0]))
+        if mids:
+            return [{'mid_id': mid_id, 'mid_name': mid_name} for mid_id, mid_name in mids[:limit]]
+
+        rows = self._query("""
+            SELECT mid_id, mid_name
+            FROM routes
+            WHERE mid_name ILIKE %(pattern)s OR similarity(mid_name, %(text)s) >= %(threshold)s
+            GROUP BY mid_id, mid_name
+            ORDER BY MAX(similarity(mid_name, %(text)s)) DESC, mid_name
+            LIMIT %(limit)s
+        """, {'text': text, 'pattern': f'%{text}%',
+              'threshold': self.similarity_threshold, 'limit': limit})
+        return [dict(row) for row in rows]
+
+    def find_route(self, mid_id=None, mid_text=None, bank_text=None):
+        """
+        First route matching all given criteria: exact mid_id, and substrings
+        of mid_name / bank_name. Returns {'mid_id', 'mid_name', 'bank_name'} or None.
+        """
+        mid_needle = mid_text.lower() if mid_text else None
+        bank_needle = bank_text.lower() if bank_text else None
+        for r in self._snapshot():
+            if r['_bank_key'] is None:
+                continue
+            if mid_id is not None and r['mid_id'] != mid_id:
+                continue
+            if mid_needle and mid_needle not in r['_mid_key']:
+                continue
+            if bank_needle and bank_needle not in r['_bank_key']:
+                continue
+            return {'mid_id': r['mid_id'], 'mid_name': r['mid_name'], 'bank_name': r['bank_name']}
+
+        rows = self._query("""
+            SELECT mid_id, mid_name, bank_name
+            FROM routes
+            WHERE bank_name IS NOT NULL
+              AND (%(mid_id)s::varchar IS NULL OR mid_id = %(mid_id)s)
+              AND (%(mid_text)s::varchar IS NULL OR mid_name ILIKE %(mid_pattern)s)
+              AND (%(bank_text)s::varchar IS NULL OR bank_name ILIKE %(bank_pattern)s)
+            ORDER BY last_seen DESC
+            LIMIT 1
+        """, {'mid_id': mid_id, 'mid_text': mid_text, 'bank_text': bank_text,
+              'mid_pattern': f'%{mid_text}%', 'bank_pattern': f'%{bank_text}%'})
+        return dict(rows[0]) if rows else None
+
+    def get_route(self, mid_name, bank_name):
+        """Exact (mid_name, bank_name) lookup, e.g. for /override."""
+        for r in self._snapshot():
+            if r['mid_name'] == mid_name and r['bank_name'] == bank_name:
+                return {'mid_id': r['mid_id'], 'mid_name': r['mid_name'], 'bank_name': r['bank_name']}
+
+        rows = self._query("""
+            SELECT mid_id, mid_name, bank_name
+            FROM routes
+            WHERE mid_name = %s AND bank_name = %s
+            LIMIT 1
+        """, (mid_name, bank_name))
+        return dict(rows[0]) if rows else None
+
+    def mid_name(self, mid_id):
+        """Terminal name for a MID, or None if the MID is unknown."""
+        for r in self._snapshot():
+            if r['mid_id'] == mid_id and r['mid_name']:
+                return r['mid_name']
+
+        rows = self._query("""
+            SELECT mid_name
+            FROM routes
+            WHERE mid_id = %s AND mid_name IS NOT NULL
+            ORDER BY last_seen DESC
+            LIMIT 1
+        """, (mid_id,))
+        return rows[0]['mid_name'] if rows else None
@@ -16,42 +16,133 @@ import telebot
 from telebot import types
 import threading
 import time
+from urllib.parse import urlparse
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.route_catalog import RouteCatalog
+from services.bot_dispatch import ChatOrderedDispatcher, remaining_time, poll_updates, serve_webhook
+from services.bot_snapshots import SnapshotStore, format_age
+from services import db, monitor_config
+from services.matchers import substring_matcher
 
 # Load environment variables
 load_dotenv('/opt/payment-webhook/.env')
 
-# Database configuration
-DB_CONFIG = {
-    'dbname': os.getenv('DB_NAME', 'payment_transactions'),
-    'user': os.getenv('DB_USER', 'webhook_user'),
-    'password': os.getenv('DB_PASSWORD'),
-    'host': os.getenv('DB_HOST', 'localhost'),
-    'port': os.getenv('DB_PORT', '5432')
-}
+# Database configuration. Handlers use DB_CONFIG; the route catalog and the
+# statistics snapshots read from the replica when DB_READ_HOST is set
+# (see services/db.py)
+DB_CONFIG = db.write_config('telegram-bot')
+READ_DB_CONFIG = db.read_config('telegram-bot')
 
 # Telegram configuration
 TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
 TELEGRAM_CHANNEL_IDS = [id.strip() for id in os.getenv('TELEGRAM_CHANNEL_ID', '').split(',') if id.strip()]
 
-if not TELEGRAM_BOT_TOKEN:
-    print("Error: TELEGRAM_BOT_TOKEN not found in .env file")
-    sys.exit(1)
-
-# Initialize bot
-bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN)
+# Update handling: worker threads (updates from one chat stay in order)
+BOT_WORKERS = int(os.getenv('BOT_WORKERS', '4'))
+BOT_COMMAND_TIMEOUT = int(os.getenv('BOT_COMMAND_TIMEOUT', '15'))  # seconds, default per update
+
+# polling: long-poll getUpdates; webhook: Telegram posts to BOT_WEBHOOK_URL,
+# which the TLS proxy forwards to BOT_WEBHOOK_LISTEN:BOT_WEBHOOK_PORT
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+BOT_WEBHOOK_URL = os.getenv('BOT_WEBHOOK_URL', '')
+BOT_WEBHOOK_SECRET = os.getenv('BOT_WEBHOOK_SECRET', '')
+BOT_WEBHOOK_LISTEN = os.getenv('BOT_WEBHOOK_LISTEN', '127.0.0.1')
+BOT_WEBHOOK_PORT = int(os.getenv('BOT_WEBHOOK_PORT', '8081'))
+
+# /stats, /status, /recovered render from snapshots refreshed this often
+# (and after every monitor run, via NOTIFY)
+BOT_SNAPSHOT_INTERVAL = int(os.getenv('BOT_SNAPSHOT_INTERVAL', '60'))
+
+# Heavier commands get a longer budget (prefixes match callback data too)
+COMMAND_TIMEOUTS = {
+    'stats': 30,
+    'menu_stats': 30,
+    'recovered': 30,
+    'menu_recovered': 30,
+    'status': 20,
+    'menu_status': 20,
+    'alternatives': 20,
+    'alt': 20,
+    'alertalt': 20,
+}
 
-# Connection pool: bot is low-traffic so 1–3 connections is plenty
-_db_pool = psycopg2_pool.ThreadedConnectionPool(minconn=1, maxconn=3, **DB_CONFIG)
+# Initialize bot (handlers run on the dispatcher's workers, not telebot's pool).
+# Creating it makes no API call; main() checks the token is configured, so
+# the module can be imported (tests, tools) without one.
+bot = telebot.TeleBot(TELEGRAM_BOT_TOKEN or '', threaded=False, validate_token=False)
+
+# Connection pools: a handler can hold two connections at once (its own plus
+# log_interaction); route catalog lookups and the snapshot refresher use the
+# read pool. Opened by main() (or on first use).
+_db_pool = None
+_read_pool = None
+_db_pool_lock = threading.Lock()
+
+def _get_pool():
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                _db_pool = psycopg2_pool.ThreadedConnectionPool(minconn=1, maxconn=BOT_WORKERS * 2,
+                                                                **DB_CONFIG)
+    return _db_pool
+
+def _get_read_pool():
+    global _read_pool
+    if _read_pool is None:
+        with _db_pool_lock:
+            if _read_pool is None:
+                _read_pool = db.ReadPool(DB_CONFIG, READ_DB_CONFIG, minconn=1, maxconn=BOT_WORKERS + 2)
+    return _read_pool
+
+def _apply_statement_timeout(conn):
+    """Cap queries at what is left of the current update's budget."""
+    remaining = remaining_time()
+    with conn.cursor() as cursor:
+        if remaining is None:
+            cursor.execute("SET statement_timeout TO DEFAULT")
+        else:
+            cursor.execute("SET statement_timeout = %s", (max(int(remaining * 1000), 1),))
 
 @contextmanager
-def get_db_connection():
-    """Borrow a connection from the pool, return it on exit."""
-    conn = _db_pool.getconn()
+def _borrow(pool):
+    conn = pool.getconn()
     try:
+        _apply_statement_timeout(conn)
         yield conn
     finally:
-        _db_pool.putconn(conn)
+        pool.putconn(conn)
+
+def get_db_connection():
+    """Borrow a connection from the pool, return it on exit."""
+    return _borrow(_get_pool())
+
+def get_read_connection():
+    """Borrow a read-only connection (replica if fresh, else primary), return it on exit."""
+    return _borrow(_get_read_pool())
+
+# MID / bank name lookups (routes table, cached in memory for 5 minutes)
+route_catalog = RouteCatalog(get_read_connection, ttl=300)
+
+# Precomputed /stats, /status, /recovered results (see services/bot_snapshots.py)
+snapshots = SnapshotStore(get_read_connection, interval=BOT_SNAPSHOT_INTERVAL)
+
+def get_snapshot(message, name):
+    """
+    Latest snapshot and its footer line. Admins can add 'refresh' to the
+    command (e.g. /stats today refresh) to rebuild it first.
+    """
+    if 'refresh' in message.text.split()[1:] and getattr(message, 'user_role', None) == 'admin':
+        snapshots.refresh([name])
+    data, age = snapshots.get(name)
+    footer = f"\n<i>🕒 Updated {format_age(age)} ago</i>"
+    if name in snapshots.errors:
+        footer += "\n<i>⚠️ Last refresh failed, showing previous data</i>"
+    return data, footer
 
 def is_authorized(message):
     """Check if user is authorized to use the bot"""
@@ -230,6 +321,9 @@ Your role: <b>{role_or_error}</b>
 /config threshold VALUE - Set success rate threshold
 /config enable - Enable smart filtering
 /config disable - Disable smart filtering
+/config history - Recent configuration versions
+/config rollback VERSION - Restore a version
+/refresh - Rebuild cached statistics now
 
 <b>Other:</b>
 /help - Show this help message
@@ -361,23 +455,16 @@ def save_override(message, mid_name, bank_name, override_action):
     username = message.from_user.username
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            cursor.execute("""
-                SELECT DISTINCT mid_id
-                FROM transactions
-                WHERE mid_name = %s AND bank_name = %s
-                LIMIT 1
-            """, (mid_name, bank_name))
+        mid_result = route_catalog.get_route(mid_name, bank_name)
 
-            mid_result = cursor.fetchone()
+        if not mid_result:
+            bot.reply_to(message, f"❌ Route not found: {mid_name} + {bank_name}")
+            return
 
-            if not mid_result:
-                bot.reply_to(message, f"❌ Route not found: {mid_name} + {bank_name}")
-                return
+        mid_id = mid_result['mid_id']
 
-            mid_id = mid_result['mid_id']
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             cursor.execute("""
                 INSERT INTO alert_overrides (mid_id, mid_name, bank_name, override_action, reason, created_by)
@@ -529,30 +616,11 @@ def handle_stats(message):
 def show_stats_today(message):
     """Show today's suppression statistics"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            cursor.execute("""
-                SELECT
-                    COUNT(*) as total_suppressions,
-                    COUNT(DISTINCT mid_name || '|' || bank_name) as unique_routes,
-                    suppression_reason,
-                    COUNT(*) as count_by_reason
-                FROM alert_suppression_log
-                WHERE suppression_time >= CURRENT_DATE
-                GROUP BY suppression_reason
-            """)
-            suppressions = cursor.fetchall()
-
-            cursor.execute("""
-                SELECT COUNT(*) as total_alerts
-                FROM alert_history
-                WHERE alert_time >= CURRENT_DATE
-            """)
-            alerts = cursor.fetchone()
+        stats, footer = get_snapshot(message, 'stats_today')
+        suppressions = stats['suppressions']
 
         total_suppressions = sum(row['count_by_reason'] for row in suppressions)
-        total_alerts = alerts['total_alerts'] if alerts else 0
+        total_alerts = stats['total_alerts']
         total_potential = total_suppressions + total_alerts
 
         if total_potential > 0:
@@ -579,6 +647,8 @@ def show_stats_today(message):
 
             response += f"• {reason_display}: {supp['count_by_reason']}\n"
 
+        response += footer
+
         bot.reply_to(message, response, parse_mode='HTML')
 
         log_interaction(
@@ -594,27 +664,10 @@ def show_stats_today(message):
 def show_stats_week(message):
     """Show weekly statistics"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-
-            cursor.execute("""
-                SELECT
-                    COUNT(*) as total_suppressions,
-                    COUNT(DISTINCT mid_name || '|' || bank_name) as unique_routes
-                FROM alert_suppression_log
-                WHERE suppression_time >= CURRENT_DATE - INTERVAL '7 days'
-            """)
-            supp_stats = cursor.fetchone()
-
-            cursor.execute("""
-                SELECT COUNT(*) as total_alerts
-                FROM alert_history
-                WHERE alert_time >= CURRENT_DATE - INTERVAL '7 days'
-            """)
-            alert_stats = cursor.fetchone()
+        supp_stats, footer = get_snapshot(message, 'stats_week')
 
         total_supp = supp_stats['total_suppressions']
-        total_alerts = alert_stats['total_alerts']
+        total_alerts = supp_stats['total_alerts']
         total_potential = total_supp + total_alerts
         suppression_rate = (total_supp / total_potential * 100) if total_potential > 0 else 0
 
@@ -631,6 +684,7 @@ def show_stats_week(message):
 • Alerts: {total_alerts/7:.1f}/day
 • Suppressions: {total_supp/7:.1f}/day
 """
+        response += footer
 
         bot.reply_to(message, response, parse_mode='HTML')
 
@@ -664,31 +718,24 @@ def handle_alternatives(message):
     bank_search = parts[1].strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        banks = route_catalog.search_banks(bank_search, limit=5)
 
-            cursor.execute("""
-                SELECT DISTINCT bank_name
-                FROM transactions
-                WHERE bank_name ILIKE %s
-                ORDER BY bank_name
-                LIMIT 5
-            """, (f'%{bank_search}%',))
-            banks = cursor.fetchall()
-
-            if not banks:
-                bot.reply_to(message, f"❌ No banks found matching '{bank_search}'")
-                return
+        if not banks:
+            bot.reply_to(message, f"❌ No banks found matching '{bank_search}'")
+            return
 
-            if len(banks) > 1:
-                bank_list = "\n".join([f"• {b['bank_name']}" for b in banks])
-                bot.reply_to(
-                    message,
-                    f"Multiple banks found. Please be more specific:\n{bank_list}"
-                )
-                return
+        if len(banks) > 1:
+            bank_list = "\n".join([f"• {b}" for b in banks])
+            bot.reply_to(
+                message,
+                f"Multiple banks found. Please be more specific:\n{bank_list}"
+            )
+            return
 
-            bank_name = banks[0]['bank_name']
+        bank_name = banks[0]
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             cursor.execute("""
                 WITH route_performance AS (
@@ -773,53 +820,14 @@ def handle_alternatives(message):
 def handle_recovered(message):
     """Show routes that have recovered from suppression"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                WITH recently_suppressed AS (
-                    SELECT DISTINCT
-                        s.mid_id,
-                        s.mid_name,
-                        s.bank_name,
-                        AVG(s.success_rate_7d) as avg_suppressed_success_rate,
-                        MAX(s.suppression_time) as last_suppressed
-                    FROM alert_suppression_log s
-                    WHERE s.suppression_time >= NOW() - INTERVAL '7 days'
-                    GROUP BY s.mid_id, s.mid_name, s.bank_name
-                    HAVING AVG(s.success_rate_7d) < 10
-                ),
-                current_performance AS (
-                    SELECT
-                        t.mid_id,
-                        COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') as success_7d,
-                        COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days') as total_7d,
-                        ROUND(100.0 * COUNT(*) FILTER (WHERE t.status = 'success' AND t.last_updated_at >= NOW() - INTERVAL '7 days') /
-                              NULLIF(COUNT(*) FILTER (WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'), 0), 2) as current_success_rate_7d
-                    FROM transactions t
-                    WHERE t.last_updated_at >= NOW() - INTERVAL '7 days'
-                    GROUP BY t.mid_id
-                )
-                SELECT
-                    rs.mid_name,
-                    rs.bank_name,
-                    rs.avg_suppressed_success_rate as old_success_rate,
-                    cp.current_success_rate_7d as new_success_rate,
-                    cp.total_7d as recent_transactions,
-                    rs.last_suppressed
-                FROM recently_suppressed rs
-                JOIN current_performance cp ON rs.mid_id = cp.mid_id
-                WHERE cp.current_success_rate_7d >= 10
-                  AND cp.total_7d >= 10
-                ORDER BY cp.current_success_rate_7d DESC
-            """)
-            recovered = cursor.fetchall()
+        recovered, footer = get_snapshot(message, 'recovered')
 
         if not recovered:
             bot.reply_to(
                 message,
                 "<b>✅ No Recovered Routes</b>\n\n"
                 "ℹ️ All previously suppressed routes are still underperforming.\n"
-                "This is normal - dead routes usually stay dead.",
+                "This is normal - dead routes usually stay dead." + footer,
                 parse_mode='HTML'
             )
             return
@@ -840,6 +848,7 @@ def handle_recovered(message):
             )
 
         response += "💡 These routes now pass the 10% threshold"
+        response += footer
 
         bot.reply_to(message, response, parse_mode='HTML')
 
@@ -871,25 +880,18 @@ def handle_check(message):
     bank_search = parts[2].strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        route = route_catalog.find_route(mid_text=mid_search, bank_text=bank_search)
 
-            cursor.execute("""
-                SELECT DISTINCT mid_id, mid_name, bank_name
-                FROM transactions
-                WHERE mid_name ILIKE %s
-                  AND bank_name ILIKE %s
-                LIMIT 1
-            """, (f'%{mid_search}%', f'%{bank_search}%'))
-            route = cursor.fetchone()
-
-            if not route:
-                bot.reply_to(message, f"❌ No route found matching '{mid_search}' + '{bank_search}'")
-                return
+        if not route:
+            bot.reply_to(message, f"❌ No route found matching '{mid_search}' + '{bank_search}'")
+            return
 
-            mid_id = route['mid_id']
-            mid_name = route['mid_name']
-            bank_name = route['bank_name']
+        mid_id = route['mid_id']
+        mid_name = route['mid_name']
+        bank_name = route['bank_name']
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             cursor.execute("""
                 SELECT
@@ -991,25 +993,18 @@ def handle_test(message):
     bank_search = parts[2].strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
+        route = route_catalog.find_route(mid_text=mid_search, bank_text=bank_search)
 
-            cursor.execute("""
-                SELECT DISTINCT mid_id, mid_name, bank_name
-                FROM transactions
-                WHERE mid_name ILIKE %s
-                  AND bank_name ILIKE %s
-                LIMIT 1
-            """, (f'%{mid_search}%', f'%{bank_search}%'))
-            route = cursor.fetchone()
-
-            if not route:
-                bot.reply_to(message, f"❌ No route found")
-                return
+        if not route:
+            bot.reply_to(message, f"❌ No route found")
+            return
 
-            mid_id = route['mid_id']
-            mid_name = route['mid_name']
-            bank_name = route['bank_name']
+        mid_id = route['mid_id']
+        mid_name = route['mid_name']
+        bank_name = route['bank_name']
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             cursor.execute("""
                 SELECT
@@ -1026,6 +1021,16 @@ def handle_test(message):
             """, (mid_id, bank_name))
             override = cursor.fetchone()
 
+            current = monitor_config.load_current(cursor)
+
+        # Same exclusion check the monitor applies before anything else, with
+        # the monitor's built-in defaults for anything not stored
+        config = monitor_config.monitor_effective(current['config'] if current else {})
+        excluded = (
+            mid_id in config.get('excluded_mids', [])
+            or substring_matcher(config.get('excluded_mid_names', [])).matches(mid_name)
+        )
+
         sr_7d = stats['success_rate_7d'] or 0
 
         response = f"<b>🧪 Alert Simulation</b>\n"
@@ -1034,7 +1039,10 @@ def handle_test(message):
         response += f"<b>Bank:</b> {bank_name[:40]}\n"
         response += f"<b>Success Rate (7d):</b> {sr_7d:.1f}%\n\n"
 
-        if override:
+        if excluded:
+            response += "🔇 <b>Result: Alert SUPPRESSED</b>\n"
+            response += "📌 Reason: MID excluded from monitoring (see /config)\n"
+        elif override:
             if override['override_action'] == 'suppress':
                 response += "✅ <b>Result: Alert SUPPRESSED</b>\n"
                 response += "📌 Reason: Manual override (forced suppression)\n"
@@ -1077,12 +1085,14 @@ def handle_config(message):
     if len(parts) < 2:
         bot.reply_to(
             message,
-            "Usage: /config <show|threshold|enable|disable>\n\n"
+            "Usage: /config <show|threshold|enable|disable|history|rollback>\n\n"
             "Examples:\n"
             "• /config show - Show current configuration\n"
             "• /config threshold 15 - Set success rate threshold to 15%\n"
             "• /config enable - Enable smart filtering\n"
-            "• /config disable - Disable smart filtering"
+            "• /config disable - Disable smart filtering\n"
+            "• /config history - Recent configuration versions\n"
+            "• /config rollback 3 - Restore version 3"
         )
         return
 
@@ -1106,43 +1116,50 @@ def handle_config(message):
         update_config_enabled(message, True)
     elif action == 'disable':
         update_config_enabled(message, False)
+    elif action == 'history':
+        show_config_history(message)
+    elif action == 'rollback':
+        if len(parts) < 3 or not parts[2].isdigit():
+            bot.reply_to(message, "❌ Usage: /config rollback <VERSION>")
+            return
+        rollback_config(message, int(parts[2]))
     else:
         bot.reply_to(message, f"❌ Unknown config action: {action}")
 
 def show_config(message):
     """Show current smart filtering configuration"""
-    # Read from payment_monitor.py
     try:
-        with open('/opt/payment-webhook/services/payment_monitor.py', 'r') as f:
-            content = f.read()
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
+            current = monitor_config.load_current(cursor)
 
-        # Extract SMART_FILTER_CONFIG
-        import re
-        enabled_match = re.search(r"'enabled':\s*(True|False)", content)
-        threshold_match = re.search(r"'min_success_rate_threshold':\s*(\d+\.?\d*)", content)
-        recent_days_match = re.search(r"'recent_period_days':\s*(\d+)", content)
-        historical_days_match = re.search(r"'historical_period_days':\s*(\d+)", content)
+        if not current:
+            bot.reply_to(message, "ℹ️ No configuration stored yet - the monitor uses its built-in defaults")
+            return
 
-        enabled = enabled_match.group(1) if enabled_match else "Unknown"
-        threshold = float(threshold_match.group(1)) * 100 if threshold_match else "Unknown"
-        recent = recent_days_match.group(1) if recent_days_match else "Unknown"
-        historical = historical_days_match.group(1) if historical_days_match else "Unknown"
+        smart_filter = current['config'].get('smart_filter', {})
+        enabled = smart_filter.get('enabled', "Unknown")
+        threshold = smart_filter['min_success_rate_threshold'] * 100 if 'min_success_rate_threshold' in smart_filter else "Unknown"
+        recent = smart_filter.get('recent_period_hours', "Unknown")
+        historical = smart_filter.get('historical_period_days', "Unknown")
 
-        status_icon = "✅" if enabled == "True" else "🔴"
+        status_icon = "✅" if enabled is True else "🔴"
 
         response = f"""<b>⚙️ Smart Filtering Configuration</b>
 ━━━━━━━━━━━━━━━━━━━━━
 
 <b>Status:</b> {status_icon} {enabled}
 <b>Success Rate Threshold:</b> {threshold}%
-<b>Recent Period:</b> {recent} days
+<b>Recent Period:</b> {recent} hours
 <b>Historical Period:</b> {historical} days
 
 <b>What this means:</b>
 • Routes with &lt;{threshold}% success rate will be suppressed
-• Recent = last {recent} days performance
+• Recent = last {recent} hours performance
 • Historical = last {historical} days for regression detection
 
+<b>Version:</b> {current['version']} by {current['changed_by']} ({current['created_at'].strftime('%Y-%m-%d %H:%M')})
+
 <b>Admin only:</b> Use /config threshold or /config enable/disable to modify
 """
 
@@ -1161,26 +1178,17 @@ def show_config(message):
 def update_config_threshold(message, threshold):
     """Update success rate threshold"""
     try:
-        # Read current file
-        with open('/opt/payment-webhook/services/payment_monitor.py', 'r') as f:
-            content = f.read()
-
-        # Update threshold
-        import re
-        threshold_decimal = threshold / 100
-        content = re.sub(
-            r"'min_success_rate_threshold':\s*\d+\.?\d*",
-            f"'min_success_rate_threshold': {threshold_decimal}",
-            content
-        )
-
-        # Write back
-        with open('/opt/payment-webhook/services/payment_monitor.py', 'w') as f:
-            f.write(content)
+        with get_db_connection() as conn:
+            version = monitor_config.save_changes(
+                conn,
+                {'smart_filter': {'min_success_rate_threshold': threshold / 100}},
+                message.from_user.username,
+                f"Threshold set to {threshold}%"
+            )
 
         bot.reply_to(
             message,
-            f"✅ <b>Configuration Updated</b>\n\n"
+            f"✅ <b>Configuration Updated</b> (version {version})\n\n"
             f"Success rate threshold set to <b>{threshold}%</b>\n\n"
             f"⚠️ Note: Changes will take effect on next monitoring run (within 5 minutes)",
             parse_mode='HTML'
@@ -1191,7 +1199,7 @@ def update_config_threshold(message, threshold):
             message.from_user.id,
             message.text,
             'config_update_threshold',
-            details={'new_threshold': threshold},
+            details={'new_threshold': threshold, 'version': version},
             success=True
         )
 
@@ -1209,25 +1217,20 @@ def update_config_threshold(message, threshold):
 def update_config_enabled(message, enabled):
     """Enable or disable smart filtering"""
     try:
-        with open('/opt/payment-webhook/services/payment_monitor.py', 'r') as f:
-            content = f.read()
-
-        import re
-        content = re.sub(
-            r"'enabled':\s*(True|False)",
-            f"'enabled': {enabled}",
-            content
-        )
-
-        with open('/opt/payment-webhook/services/payment_monitor.py', 'w') as f:
-            f.write(content)
-
         status = "enabled" if enabled else "disabled"
         icon = "✅" if enabled else "🔴"
 
+        with get_db_connection() as conn:
+            version = monitor_config.save_changes(
+                conn,
+                {'smart_filter': {'enabled': enabled}},
+                message.from_user.username,
+                f"Smart filtering {status}"
+            )
+
         bot.reply_to(
             message,
-            f"{icon} <b>Smart Filtering {status.title()}</b>\n\n"
+            f"{icon} <b>Smart Filtering {status.title()}</b> (version {version})\n\n"
             f"⚠️ Changes will take effect on next monitoring run (within 5 minutes)",
             parse_mode='HTML'
         )
@@ -1237,6 +1240,7 @@ def update_config_enabled(message, enabled):
             message.from_user.id,
             message.text,
             f'config_{status}',
+            details={'version': version},
             success=True
         )
 
@@ -1251,41 +1255,90 @@ def update_config_enabled(message, enabled):
             error_message=str(e)
         )
 
-@bot.message_handler(commands=['status'])
-@require_auth
-def handle_status(message):
-    """Show bot and system status"""
+def show_config_history(message):
+    """Show the most recent configuration versions"""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(cursor_factory=RealDictCursor)
+            versions = monitor_config.history(cursor, limit=10)
+
+        if not versions:
+            bot.reply_to(message, "ℹ️ No configuration stored yet")
+            return
+
+        response = "<b>⚙️ Configuration History</b>\n"
+        response += "━" * 30 + "\n\n"
+        for i, row in enumerate(versions):
+            active = " ✅ active" if i == 0 else ""
+            response += (
+                f"<b>v{row['version']}</b>{active}\n"
+                f"   {row['change_note'] or '-'}\n"
+                f"   By: {row['changed_by']} | {row['created_at'].strftime('%Y-%m-%d %H:%M')}\n\n"
+            )
+        response += "Restore one with /config rollback VERSION"
 
-            cursor.execute("SELECT NOW() as current_time")
-            db_status = cursor.fetchone()
+        bot.reply_to(message, response, parse_mode='HTML')
 
-            cursor.execute("SELECT alert_time FROM alert_history ORDER BY alert_time DESC LIMIT 1")
-            last_alert = cursor.fetchone()
+    except Exception as e:
+        bot.reply_to(message, f"❌ Error reading config history: {e}")
 
-            cursor.execute("SELECT suppression_time FROM alert_suppression_log ORDER BY suppression_time DESC LIMIT 1")
-            last_suppression = cursor.fetchone()
+def rollback_config(message, version):
+    """Re-activate an older configuration version"""
+    try:
+        with get_db_connection() as conn:
+            new_version = monitor_config.rollback_to(conn, version, message.from_user.username)
 
-            cursor.execute("SELECT COUNT(*) as count FROM alert_overrides WHERE is_active = true")
-            override_count = cursor.fetchone()
+        if new_version is None:
+            bot.reply_to(message, f"❌ Configuration version {version} not found")
+            return
 
-            cursor.execute("SELECT COUNT(*) as count FROM telegram_authorized_users WHERE is_active = true")
-            user_count = cursor.fetchone()
+        bot.reply_to(
+            message,
+            f"✅ <b>Configuration Restored</b>\n\n"
+            f"Version {version} is active again as version {new_version}\n\n"
+            f"⚠️ Changes will take effect on next monitoring run (within 5 minutes)",
+            parse_mode='HTML'
+        )
+
+        log_interaction(
+            message.from_user.username,
+            message.from_user.id,
+            message.text,
+            'config_rollback',
+            details={'restored_version': version, 'new_version': new_version},
+            success=True
+        )
+
+    except Exception as e:
+        bot.reply_to(message, f"❌ Error: {e}")
+        log_interaction(
+            message.from_user.username,
+            message.from_user.id,
+            message.text,
+            'config_rollback',
+            success=False,
+            error_message=str(e)
+        )
+
+@bot.message_handler(commands=['status'])
+@require_auth
+def handle_status(message):
+    """Show bot and system status"""
+    try:
+        status, footer = get_snapshot(message, 'status')
 
         # Format timestamps
         from datetime import datetime
         now = datetime.now()
 
-        if last_alert and last_alert['alert_time']:
-            alert_ago = now - last_alert['alert_time']
+        if status['last_alert']:
+            alert_ago = now - status['last_alert']
             alert_str = f"{alert_ago.seconds // 3600}h {(alert_ago.seconds % 3600) // 60}m ago"
         else:
             alert_str = "Never"
 
-        if last_suppression and last_suppression['suppression_time']:
-            supp_ago = now - last_suppression['suppression_time']
+        if status['last_suppression']:
+            supp_ago = now - status['last_suppression']
             supp_str = f"{supp_ago.seconds // 3600}h {(supp_ago.seconds % 3600) // 60}m ago"
         else:
             supp_str = "Never"
@@ -1295,20 +1348,21 @@ def handle_status(message):
 
 <b>🔌 System Health:</b>
 • Bot: ✅ Running
-• Database: ✅ Connected
-• Server Time: {db_status['current_time'].strftime('%Y-%m-%d %H:%M:%S UTC')}
+• Database: {'⚠️ Last refresh failed' if 'status' in snapshots.errors else '✅ Connected'}
+• Server Time: {status['current_time'].strftime('%Y-%m-%d %H:%M:%S UTC')}
 
 <b>📊 Activity:</b>
 • Last Alert: {alert_str}
 • Last Suppression: {supp_str}
-• Active Overrides: {override_count['count']}
-• Authorized Users: {user_count['count']}
+• Active Overrides: {status['override_count']}
+• Authorized Users: {status['user_count']}
 
 <b>ℹ️ Monitoring:</b>
 • Runs every 5 minutes
 • Daily reports at 09:00 UTC
 • Smart filtering: Active
 """
+        response += footer
 
         bot.reply_to(message, response, parse_mode='HTML')
 
@@ -1327,6 +1381,30 @@ def handle_status(message):
             parse_mode='HTML'
         )
 
+@bot.message_handler(commands=['refresh'])
+@require_auth
+def handle_refresh(message):
+    """Rebuild all statistics snapshots now (admin only)"""
+    if message.user_role not in ['admin']:
+        bot.reply_to(message, "❌ This command requires admin privileges")
+        return
+
+    started = time.monotonic()
+    failed = snapshots.refresh()
+
+    if failed:
+        bot.reply_to(message, f"⚠️ Refreshed with errors: {', '.join(failed)}")
+    else:
+        bot.reply_to(message, f"✅ Statistics refreshed in {time.monotonic() - started:.1f}s")
+
+    log_interaction(
+        message.from_user.username,
+        message.from_user.id,
+        message.text,
+        'refresh_snapshots',
+        success=not failed
+    )
+
 # ============================================================================
 # CALLBACK HANDLERS - Interactive Buttons
 # ============================================================================
@@ -1452,33 +1530,23 @@ def process_alternatives_search(message):
     bank_search = message.text.strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT bank_name
-                FROM transactions
-                WHERE bank_name ILIKE %s
-                ORDER BY bank_name
-                LIMIT 10
-            """, (f'%{bank_search}%',))
-            banks = cursor.fetchall()
-
-            if not banks:
-                bot.reply_to(message, f"❌ No banks found matching '{bank_search}'")
-                return
+        banks = route_catalog.search_banks(bank_search, limit=10)
 
-            if len(banks) > 1:
-                markup = types.InlineKeyboardMarkup(row_width=1)
-                for bank in banks:
-                    bank_name = bank['bank_name']
-                    display_name = bank_name if len(bank_name) <= 50 else bank_name[:47] + "..."
-                    callback_data = f"alt_{bank_name[:50]}"
-                    markup.add(types.InlineKeyboardButton(display_name, callback_data=callback_data))
-                bot.reply_to(message, f"Found {len(banks)} banks. Select one:", reply_markup=markup)
-                return
+        if not banks:
+            bot.reply_to(message, f"❌ No banks found matching '{bank_search}'")
+            return
 
-            bank_name = banks[0]['bank_name']
-            show_alternatives_for_bank(message.chat.id, bank_name, cursor, username=message.from_user.username, user_id=message.from_user.id)
+        if len(banks) > 1:
+            markup = types.InlineKeyboardMarkup(row_width=1)
+            for bank_name in banks:
+                display_name = bank_name if len(bank_name) <= 50 else bank_name[:47] + "..."
+                callback_data = f"alt_{bank_name[:50]}"
+                markup.add(types.InlineKeyboardButton(display_name, callback_data=callback_data))
+            bot.reply_to(message, f"Found {len(banks)} banks. Select one:", reply_markup=markup)
+            return
+
+        bank_name = banks[0]
+        show_alternatives_for_bank(message.chat.id, bank_name, username=message.from_user.username, user_id=message.from_user.id)
 
     except Exception as e:
         bot.reply_to(message, f"❌ Error: {e}")
@@ -1489,7 +1557,8 @@ def show_alternatives_for_bank(chat_id, bank_name, cursor=None, username=None, u
 
     try:
         if own_conn:
-            _conn = _db_pool.getconn()
+            _conn = _get_pool().getconn()
+            _apply_statement_timeout(_conn)
             cursor = _conn.cursor(cursor_factory=RealDictCursor)
         else:
             _conn = None
@@ -1576,7 +1645,7 @@ def show_alternatives_for_bank(chat_id, bank_name, cursor=None, username=None, u
 
     finally:
         if own_conn and _conn:
-            _db_pool.putconn(_conn)
+            _get_pool().putconn(_conn)
 
 @bot.callback_query_handler(func=lambda call: call.data.startswith('alt_'))
 def handle_bank_selection(call):
@@ -1598,16 +1667,7 @@ def process_suppress_step1(message):
     mid_search = message.text.strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT mid_id, mid_name
-                FROM transactions
-                WHERE mid_name ILIKE %s
-                ORDER BY mid_name
-                LIMIT 10
-            """, (f'%{mid_search}%',))
-            mids = cursor.fetchall()
+        mids = route_catalog.search_mids(mid_search, limit=10)
 
         if not mids:
             bot.reply_to(message, f"❌ No MIDs found matching '{mid_search}'")
@@ -1646,16 +1706,12 @@ def handle_mid_selection(call):
     try:
         mid_id = call.data.replace('selmid_', '')
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("SELECT DISTINCT mid_name FROM transactions WHERE mid_id = %s LIMIT 1", (mid_id,))
-            result = cursor.fetchone()
+        mid_name = route_catalog.mid_name(mid_id)
 
-        if not result:
+        if not mid_name:
             bot.answer_callback_query(call.id, "❌ MID not found")
             return
 
-        mid_name = result['mid_name']
         bot.answer_callback_query(call.id)
 
         msg = bot.send_message(
@@ -1674,16 +1730,7 @@ def process_suppress_step2(message, mid_id, mid_name):
     bank_search = message.text.strip()
 
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT bank_name
-                FROM transactions
-                WHERE mid_id = %s AND bank_name ILIKE %s
-                ORDER BY bank_name
-                LIMIT 10
-            """, (mid_id, f'%{bank_search}%'))
-            banks = cursor.fetchall()
+        banks = route_catalog.search_banks(bank_search, mid_id=mid_id, limit=10)
 
         if not banks:
             bot.reply_to(message, f"❌ No banks found for this MID matching '{bank_search}'")
@@ -1692,8 +1739,7 @@ def process_suppress_step2(message, mid_id, mid_name):
         if len(banks) > 1:
             # Show buttons to select bank
             markup = types.InlineKeyboardMarkup(row_width=1)
-            for bank in banks:
-                bank_name = bank['bank_name']
+            for bank_name in banks:
                 display_name = bank_name if len(bank_name) <= 50 else bank_name[:47] + "..."
                 markup.add(types.InlineKeyboardButton(
                     display_name,
@@ -1703,7 +1749,7 @@ def process_suppress_step2(message, mid_id, mid_name):
             bot.reply_to(message, f"Found {len(banks)} banks. Select one:", reply_markup=markup)
             return
 
-        bank_name = banks[0]['bank_name']
+        bank_name = banks[0]
 
         # Ask for reason
         msg = bot.reply_to(
@@ -1729,15 +1775,7 @@ def handle_bank_for_suppress(call):
         mid_id = parts[0]
         bank_search = parts[1]
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT mid_name, bank_name
-                FROM transactions
-                WHERE mid_id = %s AND bank_name ILIKE %s
-                LIMIT 1
-            """, (mid_id, f'%{bank_search}%'))
-            result = cursor.fetchone()
+        result = route_catalog.find_route(mid_id=mid_id, bank_text=bank_search)
 
         if not result:
             bot.answer_callback_query(call.id, "❌ Route not found")
@@ -1816,15 +1854,7 @@ def handle_alert_alternatives_callback(call):
         mid_id = parts[0]
         bank_search = parts[1]
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT bank_name
-                FROM transactions
-                WHERE mid_id = %s AND bank_name ILIKE %s
-                LIMIT 1
-            """, (mid_id, f'%{bank_search}%'))
-            result = cursor.fetchone()
+        result = route_catalog.find_route(mid_id=mid_id, bank_text=bank_search)
 
         if not result:
             bot.answer_callback_query(call.id, "❌ Bank not found")
@@ -1860,22 +1890,17 @@ def handle_alert_suppress_callback(call):
         reason = "Suppressed via alert button"
         username = call.from_user.username or f"user_{call.from_user.id}"
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT mid_name, bank_name
-                FROM transactions
-                WHERE mid_id = %s AND bank_name ILIKE %s
-                LIMIT 1
-            """, (mid_id, f'%{bank_search}%'))
-            result = cursor.fetchone()
+        result = route_catalog.find_route(mid_id=mid_id, bank_text=bank_search)
 
-            if not result:
-                bot.answer_callback_query(call.id, "❌ Route not found")
-                return
+        if not result:
+            bot.answer_callback_query(call.id, "❌ Route not found")
+            return
 
-            mid_name = result['mid_name']
-            bank_name = result['bank_name']
+        mid_name = result['mid_name']
+        bank_name = result['bank_name']
+
+        with get_db_connection() as conn:
+            cursor = conn.cursor(cursor_factory=RealDictCursor)
 
             cursor.execute("""
                 INSERT INTO alert_overrides (mid_id, mid_name, bank_name, override_action, reason, created_by, created_at)
@@ -1930,15 +1955,7 @@ def handle_suppress_callback(call):
         mid_id = parts[1]
         bank_hash = parts[2]
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT mid_name, bank_name
-                FROM transactions
-                WHERE mid_id = %s
-                LIMIT 1
-            """, (mid_id,))
-            route = cursor.fetchone()
+        route = route_catalog.find_route(mid_id=mid_id)
 
         if not route:
             bot.answer_callback_query(call.id, "❌ Route not found")
@@ -1970,15 +1987,7 @@ def handle_alert_callback(call):
         mid_id = parts[1]
         bank_hash = parts[2]
 
-        with get_db_connection() as conn:
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute("""
-                SELECT DISTINCT mid_name, bank_name
-                FROM transactions
-                WHERE mid_id = %s
-                LIMIT 1
-            """, (mid_id,))
-            route = cursor.fetchone()
+        route = route_catalog.find_route(mid_id=mid_id)
 
         if not route:
             bot.answer_callback_query(call.id, "❌ Route not found")
@@ -2070,7 +2079,22 @@ def save_override_from_button(message, mid_id, mid_name, bank_name, override_act
 # MAIN BOT LOOP
 # ============================================================================
 
-if __name__ == "__main__":
+def main():
+    if not TELEGRAM_BOT_TOKEN:
+        print("Error: TELEGRAM_BOT_TOKEN not found in .env file")
+        sys.exit(1)
+
+    if BOT_MODE == 'webhook' and not BOT_WEBHOOK_URL:
+        print("Error: BOT_MODE=webhook requires BOT_WEBHOOK_URL in .env file")
+        sys.exit(1)
+
+    # Connect to Postgres (pool + route catalog) and clear the Telegram
+    # webhook at the same time; each is bounded by its own timeout
+    startup = ThreadPoolExecutor(max_workers=2, thread_name_prefix='startup')
+    routes_loaded = startup.submit(route_catalog.refresh)
+    webhook_removed = startup.submit(bot.remove_webhook)
+    startup.shutdown(wait=True)
+
     print("=" * 60)
     print("🤖 Payment Alert Management Bot")
     print("=" * 60)
@@ -2078,6 +2102,10 @@ if __name__ == "__main__":
     print("Bot is starting...")
     print(f"Bot Token: {TELEGRAM_BOT_TOKEN[:10]}...")
     print(f"Database: {DB_CONFIG['dbname']} @ {DB_CONFIG['host']}")
+    try:
+        print(f"Route catalog: {routes_loaded.result()} routes loaded")
+    except Exception as e:
+        print(f"⚠️  Route catalog not loaded (will retry on first lookup): {e}")
     print()
     print("Commands available:")
     print("  /start - Show welcome message")
@@ -2090,16 +2118,41 @@ if __name__ == "__main__":
     print("  /test - Simulate alert decision")
     print("  /config - Configuration (admin only)")
     print("  /status - System status")
+    print("  /refresh - Rebuild statistics snapshots (admin only)")
     print()
     print("✅ Bot is ready! Press Ctrl+C to stop.")
     print("=" * 60)
     print()
 
+    dispatcher = ChatOrderedDispatcher(
+        lambda update: bot.process_new_updates([update]),
+        workers=BOT_WORKERS,
+        timeouts=COMMAND_TIMEOUTS,
+        default_timeout=BOT_COMMAND_TIMEOUT
+    )
+    dispatcher.start()
+    # LISTEN on the primary: NOTIFY is not replicated
+    snapshots.start(listen_connect=lambda: psycopg2.connect(**DB_CONFIG))
+
     try:
-        bot.polling(none_stop=True, timeout=60)
+        webhook_removed.result()
+        if BOT_MODE == 'webhook':
+            bot.set_webhook(url=BOT_WEBHOOK_URL, secret_token=BOT_WEBHOOK_SECRET or None)
+            print(f"Webhook mode: {BOT_WEBHOOK_URL} -> {BOT_WEBHOOK_LISTEN}:{BOT_WEBHOOK_PORT} ({BOT_WORKERS} workers)")
+            serve_webhook(dispatcher, BOT_WEBHOOK_LISTEN, BOT_WEBHOOK_PORT,
+                          urlparse(BOT_WEBHOOK_URL).path or '/', BOT_WEBHOOK_SECRET or None)
+        else:
+            print(f"Polling mode ({BOT_WORKERS} workers)")
+            poll_updates(bot, dispatcher, timeout=60)
     except KeyboardInterrupt:
         print("\n\n🛑 Bot stopped by user")
     except Exception as e:
         print(f"\n\n❌ Bot crashed: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        dispatcher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Tests for utils/backfill.py batching and checkpointing.
+
+No live database is required: run_segment takes a connection, so a fake one
+records the batches and checkpoint updates that would have been committed.
+"""
+import sys
+import os
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import backfill
+
+
+def test_plan_segments_covers_range_without_gaps():
+    segments = backfill.plan_segments(1, 10, 3)
+    assert segments == [(1, 4), (5, 8), (9, 10)]
+    assert backfill.plan_segments(5, 6, 8) == [(5, 5), (6, 6)]
+    assert backfill.plan_segments(None, None, 4) == []
+
+
+def test_update_sql_fill_and_overwrite():
+    spec = backfill.BACKFILLS['bank_name']
+    fill = backfill.update_sql(spec, 'transactions')
+    assert 'FROM bin_bank_mapping src' in fill
+    assert 't.cc_bin = src.bin' in fill
+    assert 't.bank_name IS NULL' in fill
+    assert 't.id >= %(lo)s AND t.id < %(hi)s' in fill
+
+    overwrite = backfill.update_sql(spec, 'transactions', overwrite=True)
+    assert 't.bank_name IS DISTINCT FROM src.bank_name' in overwrite
+
+
+def test_progress_eta_uses_this_runs_rate():
+    now = [0.0]
+    progress = backfill.Progress('job', total_ids=1000, done_ids=500, interval=3600, clock=lambda: now[0])
+    assert progress.eta() is None
+
+    now[0] = 10.0
+    progress.advance(100, 40)
+    assert progress.eta() == 40.0
+    assert progress.rows_updated == 40
+    assert backfill.format_duration(3725) == '1h02m'
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def execute(self, query, params=None):
+        self.conn.executed.append((query, params))
+        self.rowcount = 7 if 'SET mid_name' in query else 1
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        pass
+
+
+def test_run_segment_commits_each_batch_with_its_checkpoint():
+    conn = FakeConnection()
+    segment = {'segment': 2, 'start_id': 1, 'end_id': 25, 'next_id': 6}
+    progress = backfill.Progress('mid_name:transactions', total_ids=25, done_ids=5, interval=3600)
+
+    updated = backfill.run_segment(conn, backfill.BACKFILLS['mid_name'], 'transactions',
+                                   'mid_name:transactions', segment, 10, progress)
+
+    batches = [params for query, params in conn.executed if 'SET mid_name' in query]
+    checkpoints = [params for query, params in conn.executed if 'UPDATE backfill_progress' in query]
+    assert batches == [{'lo': 6, 'hi': 16}, {'lo': 16, 'hi': 26}]
+    assert [c['hi'] for c in checkpoints] == [16, 26]
+    assert all(c['segment'] == 2 for c in checkpoints)
+    assert conn.commits == 3  # lock_timeout + one per batch
+    assert updated == 14
+    assert progress.done_ids == 25
+
+
+def test_run_segment_stops_when_asked():
+    conn = FakeConnection()
+    stop = threading.Event()
+    stop.set()
+    segment = {'segment': 0, 'start_id': 1, 'end_id': 100, 'next_id': 1}
+    progress = backfill.Progress('job', total_ids=100, interval=3600)
+
+    assert backfill.run_segment(conn, backfill.BACKFILLS['mid_name'], 'transactions', 'job',
+                                segment, 10, progress, stop=stop) == 0
+    assert not any('backfill_progress' in query for query, _ in conn.executed)
+
+
+def test_dimension_keys_batch_sets_every_key_for_pending_rows():
+    conn = FakeConnection()
+    segment = {'segment': 0, 'start_id': 1, 'end_id': 10, 'next_id': 1}
+    progress = backfill.Progress('job', total_ids=10, interval=3600)
+
+    backfill.run_segment(conn, backfill.BACKFILLS['dimension_keys'], 'webhook_events', 'job',
+                         segment, 10, progress)
+
+    [(query, params)] = [(q, p) for q, p in conn.executed if 'dim_bank_key' in q]
+    assert params == (1, 11)
+    for call in ('dim_bank_key(t.bank_name)', 'dim_mid_key(t.mid_id, t.mid_name)',
+                 'dim_merchant_key(t.merchant_id, t.merchant_name)', 'dim_country_key(t.client_country)'):
+        assert call in query
+    assert backfill.DIMENSION_KEYS_PENDING in query
@@ -0,0 +1,78 @@
+"""
+Tests for services/bot_dispatch.py (no Telegram or database access).
+"""
+import sys
+import os
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telebot import types
+
+from services.bot_dispatch import ChatOrderedDispatcher, remaining_time, update_chat_id, update_command
+
+
+def make_update(update_id, chat_id, text):
+    return types.Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'op'},
+            'text': text,
+        },
+    })
+
+
+def test_update_helpers():
+    update = make_update(1, 42, '/stats@PaymentBot week')
+    assert update_chat_id(update) == 42
+    assert update_command(update) == 'stats'
+    assert update_command(make_update(2, 42, 'just a reason')) == ''
+
+
+def test_timeout_for_matches_callback_prefixes():
+    dispatcher = ChatOrderedDispatcher(lambda u: None, timeouts={'stats': 30, 'menu_stats': 30}, default_timeout=15)
+    assert dispatcher.timeout_for('stats') == 30
+    assert dispatcher.timeout_for('menu_stats_week') == 30
+    assert dispatcher.timeout_for('help') == 15
+
+
+def test_same_chat_in_order_other_chats_in_parallel():
+    handled = []
+    slow_started = threading.Event()
+    release = threading.Event()
+    budgets = []
+
+    def handle(update):
+        budgets.append(remaining_time())
+        if update.message.text == 'slow':
+            slow_started.set()
+            release.wait(5)
+        handled.append((update.message.chat.id, update.message.text))
+
+    dispatcher = ChatOrderedDispatcher(handle, workers=2, default_timeout=15)
+    dispatcher.start()
+    try:
+        dispatcher.submit(make_update(1, 1, 'slow'))
+        dispatcher.submit(make_update(2, 1, 'after slow'))
+        assert slow_started.wait(5)
+        dispatcher.submit(make_update(3, 2, 'other chat'))
+
+        deadline = time.monotonic() + 5
+        while (2, 'other chat') not in handled and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Chat 2 was served while chat 1 was blocked; chat 1's second update waited
+        assert handled == [(2, 'other chat')]
+
+        release.set()
+        while len(handled) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert handled[1:] == [(1, 'slow'), (1, 'after slow')]
+        assert all(0 < b <= 15 for b in budgets)
+        assert remaining_time() is None
+    finally:
+        release.set()
+        dispatcher.stop()
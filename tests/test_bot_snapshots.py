@@ -0,0 +1,63 @@
+"""
+Tests for services/bot_snapshots.py SnapshotStore (no database needed:
+builders are plain functions and the connection is a stand-in).
+"""
+import sys
+import os
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.bot_snapshots import SnapshotStore, format_age
+
+
+class FakeConnection:
+    def cursor(self, cursor_factory=None):
+        return None
+
+    def rollback(self):
+        pass
+
+
+@contextmanager
+def get_connection():
+    yield FakeConnection()
+
+
+def test_get_builds_lazily_then_serves_from_memory():
+    calls = []
+    store = SnapshotStore(get_connection, builders={'status': lambda cursor: calls.append(1) or {'n': len(calls)}})
+    data, age = store.get('status')
+    assert data == {'n': 1}
+    assert age >= 0
+    assert store.get('status')[0] == {'n': 1}
+    assert len(calls) == 1
+
+
+def test_failed_refresh_keeps_previous_snapshot():
+    state = {'fail': False}
+
+    def build(cursor):
+        if state['fail']:
+            raise RuntimeError('statement timeout')
+        return 'fresh'
+
+    store = SnapshotStore(get_connection, builders={'stats_week': build})
+    assert store.refresh() == []
+    state['fail'] = True
+    assert store.refresh() == ['stats_week']
+    assert store.get('stats_week')[0] == 'fresh'
+    assert 'statement timeout' in store.errors['stats_week']
+
+
+def test_get_raises_when_never_built():
+    store = SnapshotStore(get_connection, builders={'recovered': lambda cursor: 1 / 0})
+    with pytest.raises(RuntimeError):
+        store.get('recovered')
+
+
+def test_format_age():
+    assert format_age(42.7) == '42s'
+    assert format_age(185) == '3m 5s'
@@ -0,0 +1,139 @@
+"""
+Tests for services/db.py read/write endpoint selection.
+
+No database needed: fake connections answer the lag and replay queries, so
+the tests cover which endpoint a read lands on, not streaming itself
+(scripts/local_replica.sh starts a real primary/replica pair for that).
+"""
+import sys
+import os
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import db
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.queries.append(query)
+        if 'pg_is_in_recovery' in query:
+            self.result = self.conn.lag
+        else:
+            self.result = self.conn.replayed
+
+    def fetchone(self):
+        return (self.result,)
+
+
+class FakeConnection:
+    def __init__(self, config, lag=None, replayed=True):
+        self.config = config
+        self.lag = lag
+        self.replayed = replayed
+        self.queries = []
+        self.closed = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, minconn, maxconn, lag=None, **config):
+        self.config = config
+        self.lag = lag
+        self.returned = []
+
+    def getconn(self):
+        return FakeConnection(self.config, self.lag)
+
+    def putconn(self, conn, close=False):
+        self.returned.append(conn)
+
+    def closeall(self):
+        pass
+
+
+@pytest.fixture
+def replica_env(monkeypatch):
+    monkeypatch.setenv('DB_HOST', 'primary')
+    monkeypatch.setenv('DB_READ_HOST', 'replica')
+    monkeypatch.setenv('DB_READ_PORT', '5433')
+    monkeypatch.setenv('DB_READ_MAX_LAG', '10')
+
+
+def test_read_config_only_with_replica_host(monkeypatch, replica_env):
+    config = db.read_config('monitor')
+    assert (config['host'], config['port']) == ('replica', '5433')
+    assert config['application_name'] == 'payment-webhook/monitor/read'
+    assert db.write_config('monitor')['application_name'] == 'payment-webhook/monitor'
+
+    monkeypatch.delenv('DB_READ_HOST')
+    assert db.read_config('monitor') is None
+
+
+def test_replica_fresh_checks_lag_and_replayed_position(replica_env):
+    assert db.replica_fresh(FakeConnection({}, lag=2.5))
+    assert not db.replica_fresh(FakeConnection({}, lag=30))
+    assert not db.replica_fresh(FakeConnection({}, lag=None))  # a primary, not a replica
+    assert db.replica_fresh(FakeConnection({}, lag=0), min_lsn='0/3000060')
+    assert not db.replica_fresh(FakeConnection({}, lag=0, replayed=False), min_lsn='0/3000060', wait=0)
+
+
+@pytest.mark.parametrize('lag, host', [(1, 'replica'), (60, 'primary')])
+def test_connect_read_falls_back_to_primary_when_replica_lags(monkeypatch, replica_env, lag, host):
+    opened = []
+
+    def connect(**config):
+        conn = FakeConnection(config, lag=lag)
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(db.psycopg2, 'connect', connect)
+    conn = db.connect_read(db.write_config('monitor'), db.read_config('monitor'))
+    assert conn.config['host'] == host
+    if host == 'primary':
+        assert opened[0].closed
+        assert conn.config['options'] == '-c default_transaction_read_only=on'
+
+
+def test_read_pool_checks_lag_once_per_interval_and_returns_to_owner(monkeypatch, replica_env):
+    lags = {'replica': 0, 'primary': None}
+    monkeypatch.setattr(db.psycopg2_pool, 'ThreadedConnectionPool',
+                        lambda minconn, maxconn, **config: FakePool(minconn, maxconn, lags[config['host']], **config))
+    pool = db.ReadPool(db.write_config('report'), db.read_config('report'), 1, 4)
+
+    first, second = pool.getconn(), pool.getconn()
+    assert first.config['host'] == second.config['host'] == 'replica'
+    assert len(first.queries) == 1 and second.queries == []
+
+    # Replica falls behind: once the check expires, reads move to the primary
+    # and stay there until the next check
+    pool._pools['replica'].lag = 60
+    pool._fresh_until = 0
+    third = pool.getconn()
+    assert third.config['host'] == 'primary'
+    replica_returns = len(pool._pools['replica'].returned)
+    assert pool.getconn().config['host'] == 'primary'
+    assert len(pool._pools['replica'].returned) == replica_returns  # replica not even asked
+
+    pool.putconn(first)
+    pool.putconn(third)
+    assert pool._pools['replica'].returned[-1] is first
+    assert pool._pools['primary'].returned == [third]
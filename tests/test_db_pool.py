@@ -0,0 +1,83 @@
+"""
+Tests for app/db_pool.py.
+
+BoundedPool is created with minconn=0 (psycopg2 opens nothing up front) and
+its underlying pool swapped for a fake, so no database is needed.
+"""
+import sys
+import os
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db_pool import BoundedPool, PoolExhausted, pool_size
+
+
+class FakePool:
+    def __init__(self):
+        self.out = 0
+
+    def getconn(self):
+        self.out += 1
+        return object()
+
+    def putconn(self, conn, close=False):
+        self.out -= 1
+
+
+def make_pool(maxconn=2, timeout=0.2, max_waiters=1):
+    pool = BoundedPool(0, maxconn, timeout=timeout, max_waiters=max_waiters, dbname='unused')
+    pool._pool = FakePool()
+    return pool
+
+
+def test_pool_size_shares_max_connections():
+    assert pool_size(100, 4, 20, 10) == 10   # capped
+    assert pool_size(100, 16, 20, 10) == 5   # 80 // 16
+    assert pool_size(30, 64, 20, 10) == 1    # never below 1
+
+
+def test_checkout_times_out_when_all_connections_are_out():
+    pool = make_pool()
+    pool.getconn(), pool.getconn()
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted) as excinfo:
+        pool.getconn()
+    assert excinfo.value.reason == 'timeout'
+    assert time.monotonic() - started >= 0.2
+    assert pool.in_use == 2 and pool.waiting == 0
+
+
+def test_waiter_gets_returned_connection():
+    pool = make_pool(maxconn=1, timeout=5)
+    conn = pool.getconn()
+    threading.Timer(0.05, pool.putconn, (conn,)).start()
+    pool.getconn()
+    assert pool.in_use == 1 and pool._pool.out == 1
+
+
+def test_queue_full_is_rejected_without_waiting():
+    pool = make_pool(maxconn=1, timeout=5, max_waiters=1)
+    conn = pool.getconn()
+    waiter = threading.Thread(target=pool.getconn)
+    waiter.start()
+    while pool.waiting == 0:
+        time.sleep(0.001)
+
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted) as excinfo:
+        pool.getconn()
+    assert excinfo.value.reason == 'queue_full'
+    assert time.monotonic() - started < 1
+
+    pool.putconn(conn)
+    waiter.join()
+    assert pool.in_use == 1
+
+
+def test_pool_opens_no_connection_until_first_checkout():
+    pool = BoundedPool(2, 5, dbname='x', host='/nonexistent')  # would fail to connect
+    assert pool._pool.minconn == 2 and pool._pool._pool == []
@@ -0,0 +1,38 @@
+"""
+Tests for app/dedup.py (pure, no database needed).
+"""
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.dedup import DeliveryCache, delivery_key
+
+
+BASE = {'trans_order': 'T1', 'trans_id': '100', 'reply_code': '000', 'signature': 'abc'}
+
+
+def test_delivery_key_identical_for_retries():
+    retry = dict(BASE, client_email='ignored@example.com')
+    assert delivery_key(BASE) == delivery_key(retry)
+
+
+def test_delivery_key_differs_per_state():
+    assert delivery_key(BASE) != delivery_key(dict(BASE, reply_code='005'))
+    assert delivery_key(BASE) != delivery_key(dict(BASE, signature='def'))
+
+
+def test_delivery_key_treats_missing_and_empty_alike():
+    assert delivery_key({'trans_order': 'T1'}) == delivery_key({'trans_order': 'T1', 'signature': None})
+
+
+def test_cache_evicts_least_recently_used():
+    cache = DeliveryCache(max_size=2)
+    cache.add('a')
+    cache.add('b')
+    assert cache.seen('a')          # 'a' is now most recent
+    cache.add('c')                  # evicts 'b'
+    assert cache.seen('a')
+    assert not cache.seen('b')
+    assert cache.seen('c')
+    assert len(cache) == 2
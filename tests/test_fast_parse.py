@@ -0,0 +1,67 @@
+"""
+Tests for app/fast_parse.py.
+
+The reference is the generic path it replaces: Starlette's form / query
+parsing followed by webhook_app.parse_webhook_data().
+"""
+import asyncio
+import sys
+import os
+
+import pytest
+from starlette.requests import Request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.fast_parse import is_urlencoded, parse_urlencoded
+from app.webhook_app import parse_webhook_data
+
+BODIES = [
+    b'trans_order=ORD-1&trans_id=123&reply_code=000&trans_amount=12.50&MidID=4146',
+    b'reply_desc=Do+not+honor&client_fullname=J%C3%BCrgen+M%C3%BCller&client_email=a%40b.com',
+    b'client_address2=&CP26=&plid&trans_order=ORD-2',
+    b'reply_code=05&reply_code=000',
+    b'X-Extra=kept&unknown+field=v%2Bw&=orphan&&trailing=1&',
+    b'bad=%zz&raw=\xc3\xa7',
+    b'',
+]
+
+
+def generic_form(body):
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+    scope = {'type': 'http', 'method': 'POST', 'query_string': b'',
+             'headers': [(b'content-type', b'application/x-www-form-urlencoded')]}
+    async def read_form():
+        return dict(await Request(scope, receive).form())
+    return parse_webhook_data(asyncio.run(read_form()))
+
+
+def generic_query(query_string):
+    scope = {'type': 'http', 'method': 'GET', 'query_string': query_string, 'headers': []}
+    return parse_webhook_data(dict(Request(scope).query_params))
+
+
+@pytest.mark.parametrize('body', BODIES)
+def test_matches_generic_form_path(body):
+    assert parse_urlencoded(body) == generic_form(body)
+
+
+@pytest.mark.parametrize('body', BODIES)
+def test_matches_generic_query_path(body):
+    assert parse_urlencoded(body) == generic_query(body)
+
+
+def test_values():
+    data = parse_urlencoded(BODIES[1] + b'&client_phone=&trans_amount=1.00')
+    assert data['client_fullname'] == 'Jürgen Müller'
+    assert data['reply_desc'] == 'Do not honor'
+    assert data['client_phone'] is None
+    assert data['trans_amount'] == '1.00'
+
+
+def test_is_urlencoded():
+    assert is_urlencoded('application/x-www-form-urlencoded')
+    assert is_urlencoded('Application/X-WWW-Form-Urlencoded; charset=UTF-8')
+    assert not is_urlencoded('multipart/form-data; boundary=x')
+    assert not is_urlencoded(None)
@@ -0,0 +1,106 @@
+"""
+Tests for app/log_config.py.
+
+configure_logging() installs handlers on the root logger, so every test
+restores the root logger's handlers and level afterwards.
+"""
+import sys
+import os
+import json
+import logging
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import log_config
+
+
+@pytest.fixture
+def root_logger():
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    root.handlers = []
+    yield root
+    log_config.stop_logging()
+    for handler in root.handlers:
+        handler.close()
+    root.handlers = saved_handlers
+    root.setLevel(saved_level)
+
+
+def _record(msg, level=logging.INFO, **extra):
+    record = logging.LogRecord('app.webhook_app', level, __file__, 1, msg, (), None)
+    for key, value in extra.items():
+        setattr(record, key, value)
+    return record
+
+
+# ---------------------------------------------------------------------------
+# Formatters
+# ---------------------------------------------------------------------------
+
+def test_json_formatter_includes_extra_fields():
+    line = log_config.JsonFormatter().format(_record('Webhook processed', trans_order='T1', duration_ms=4.2))
+    entry = json.loads(line)
+    assert entry['level'] == 'INFO'
+    assert entry['logger'] == 'app.webhook_app'
+    assert entry['message'] == 'Webhook processed'
+    assert entry['trans_order'] == 'T1'
+    assert entry['duration_ms'] == 4.2
+
+
+def test_text_formatter_appends_extra_fields():
+    line = log_config.TextFormatter().format(_record('Webhook processed', status='success'))
+    assert ' - app.webhook_app - INFO - Webhook processed status=success' in line
+
+
+# ---------------------------------------------------------------------------
+# Sampling
+# ---------------------------------------------------------------------------
+
+def test_success_sampling_rate_bounds(monkeypatch):
+    monkeypatch.setattr(log_config, 'LOG_SUCCESS_SAMPLE_RATE', 1.0)
+    assert all(log_config.success_sampled() for _ in range(100))
+    monkeypatch.setattr(log_config, 'LOG_SUCCESS_SAMPLE_RATE', 0.0)
+    assert not any(log_config.success_sampled() for _ in range(100))
+
+
+# ---------------------------------------------------------------------------
+# Queue mode
+# ---------------------------------------------------------------------------
+
+def test_queue_mode_writes_through_listener(root_logger, tmp_path):
+    log_file = tmp_path / 'receiver.log'
+    handler = log_config.configure_logging(str(log_file), mode='queue', fmt='json')
+    assert isinstance(handler, log_config.DeferredQueueHandler)
+
+    logging.getLogger('app.webhook_app').info("Webhook processed", extra={'trans_order': 'Q1'})
+    log_config.stop_logging()   # drains the queue
+
+    entry = json.loads(log_file.read_text().strip())
+    assert entry['message'] == 'Webhook processed'
+    assert entry['trans_order'] == 'Q1'
+
+
+def test_full_queue_drops_info_but_keeps_errors():
+    import queue
+
+    class Collect(logging.Handler):
+        def __init__(self):
+            super().__init__()
+            self.records = []
+
+        def emit(self, record):
+            self.records.append(record)
+
+    direct = Collect()
+    handler = log_config.DeferredQueueHandler(queue.Queue(maxsize=1), fallback=[direct])
+    handler.emit(_record('first'))
+    handler.emit(_record('second'))
+    assert handler.queue.qsize() == 1
+    assert handler.dropped == 1
+
+    handler.emit(_record('database down', logging.ERROR))
+    assert handler.dropped == 1
+    assert [r.getMessage() for r in direct.records] == ['database down']
@@ -0,0 +1,64 @@
+"""
+Tests for utils/mapping_import.py CSV handling.
+
+Header resolution and the COPY stream are pure, so no database is needed.
+"""
+import sys
+import os
+import csv
+import io
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.mapping_import import MAPPINGS, CsvRowStream, resolve_headers
+
+
+def _stream(text, mapping):
+    reader = csv.DictReader(io.StringIO(text))
+    headers = resolve_headers(reader.fieldnames, MAPPINGS[mapping])
+    return CsvRowStream(reader, headers, MAPPINGS[mapping])
+
+
+def test_resolve_headers_case_insensitive_aliases():
+    headers = resolve_headers(['MidID', 'Terminal Name'], MAPPINGS['mid'])
+    assert headers == {'mid_id': 'MidID', 'terminal_name': 'Terminal Name'}
+
+
+def test_resolve_headers_missing_column():
+    with pytest.raises(ValueError, match='merchant_id'):
+        resolve_headers(['x', 'y'], MAPPINGS['merchant'])
+
+
+def test_stream_emits_copy_csv_and_skips_incomplete_rows():
+    stream = _stream(
+        'BIN,BankName,CardScheme\n'
+        '540709, Garanti ,MASTERCARD\n'
+        '411111,"Bank, With Comma",VISA\n'
+        '999999,,VISA\n',
+        'bin'
+    )
+    copied = stream.read()
+
+    assert list(csv.reader(io.StringIO(copied))) == [
+        ['1', '540709', 'Garanti', 'MASTERCARD'],
+        ['2', '411111', 'Bank, With Comma', 'VISA'],
+    ]
+    assert stream.read_rows == 3
+    assert len(stream.skipped) == 1
+    assert stream.read() == ''
+
+
+def test_stream_small_reads_reassemble():
+    text = 'Number,Name\n' + ''.join(f'{n},Merchant {n}\n' for n in range(50))
+    whole = _stream(text, 'merchant').read()
+
+    stream = _stream(text, 'merchant')
+    chunks = []
+    while True:
+        chunk = stream.read(7)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    assert ''.join(chunks) == whole
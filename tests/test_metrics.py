@@ -0,0 +1,159 @@
+"""
+Tests for app/metrics.py.
+
+The metrics module has no external dependencies, so these run anywhere.
+Each test registers metrics under its own name because the registry is
+module-global.
+"""
+import sys
+import os
+import json
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import metrics
+
+
+def _lines_for(name):
+    return [line for line in metrics.generate_latest().splitlines() if line.startswith(name)]
+
+
+# ---------------------------------------------------------------------------
+# Counter / Gauge
+# ---------------------------------------------------------------------------
+
+def test_counter_sums_per_thread_shards():
+    counter = metrics.Counter('test_threads_total', 'Per-thread shards', ['status'])
+
+    def work():
+        for _ in range(1000):
+            counter.inc('200')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    counter.inc('500', amount=2)
+
+    assert counter.collect() == {('200',): 4000, ('500',): 2}
+    assert 'test_threads_total{status="200"} 4000' in _lines_for('test_threads_total')
+
+
+def test_exited_threads_shards_are_folded_into_retired_total():
+    counter = metrics.Counter('test_short_threads_total', 'Short-lived threads')
+    histogram = metrics.Histogram('test_short_threads_seconds', 'Short-lived threads', buckets=(1.0,))
+
+    def work():
+        counter.inc()
+        histogram.observe(0.5)
+
+    for _ in range(200):
+        thread = threading.Thread(target=work)
+        thread.start()
+        thread.join()
+
+    assert counter.collect() == {(): 200}
+    assert histogram.collect() == {(): [200, 0, 100.0]}
+    assert len(counter._shards) <= 1 and len(histogram._shards) <= 1
+
+
+def test_gauge_inc_dec_and_function():
+    gauge = metrics.Gauge('test_gauge_in_use', 'Tracked gauge')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.collect() == {(): 1}
+
+    depth = metrics.Gauge('test_gauge_depth', 'Callback gauge')
+    depth.set_function(lambda: 7)
+    assert 'test_gauge_depth 7' in _lines_for('test_gauge_depth')
+
+
+def test_counter_read_from_callback():
+    counter = metrics.Counter('test_callback_total', 'Callback counter')
+    counter.set_function(lambda: 4)
+    assert _lines_for('test_callback_total') == ['test_callback_total 4']
+    assert '# TYPE test_callback_total counter' in metrics.generate_latest().splitlines()
+
+
+def test_label_values_are_escaped():
+    counter = metrics.Counter('test_escape_total', 'Escaping', ['table'])
+    counter.inc('a"b\\c')
+    assert 'test_escape_total{table="a\\"b\\\\c"} 1' in _lines_for('test_escape_total')
+
+
+# ---------------------------------------------------------------------------
+# Histogram
+# ---------------------------------------------------------------------------
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram('test_latency_seconds', 'Latency', ['stage'], buckets=(0.1, 1.0))
+    histogram.observe(0.05, 'parse')
+    histogram.observe(0.1, 'parse')   # upper bound is inclusive
+    histogram.observe(0.5, 'parse')
+    histogram.observe(3.0, 'parse')
+
+    lines = _lines_for('test_latency_seconds')
+    assert 'test_latency_seconds_bucket{stage="parse",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{stage="parse",le="1.0"} 3' in lines
+    assert 'test_latency_seconds_bucket{stage="parse",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{stage="parse"} 4' in lines
+    assert 'test_latency_seconds_sum{stage="parse"} 3.65' in lines
+
+
+def test_histogram_timer_observes_once():
+    histogram = metrics.Histogram('test_timer_seconds', 'Timer')
+    with histogram.time():
+        pass
+    assert 'test_timer_seconds_count 1' in _lines_for('test_timer_seconds')
+
+
+# ---------------------------------------------------------------------------
+# Cross-worker aggregation
+# ---------------------------------------------------------------------------
+
+def test_snapshots_from_other_workers_are_summed(tmp_path, monkeypatch):
+    counter = metrics.Counter('test_multiproc_total', 'Multiprocess', ['status'])
+    gauge = metrics.Gauge('test_multiproc_in_use', 'Multiprocess')
+    histogram = metrics.Histogram('test_multiproc_seconds', 'Multiprocess', buckets=(1.0,))
+    counter.inc('200', amount=3)
+    histogram.observe(0.5)
+
+    gauge.inc()
+
+    # Another worker's snapshot, plus a stale one from a dead worker
+    (tmp_path / '999999.json').write_text(json.dumps({
+        'test_multiproc_total': [[['200'], 10]],
+        'test_multiproc_seconds': [[[], [0, 2, 4.0]]],
+        'test_multiproc_in_use': [[[], 2]],
+    }))
+    stale = tmp_path / '999998.json'
+    stale.write_text(json.dumps({'test_multiproc_total': [[['200'], 1000]],
+                                 'test_multiproc_in_use': [[[], 5]]}))
+    os.utime(stale, (0, 0))
+
+    monkeypatch.setattr(metrics, 'METRICS_MULTIPROC_DIR', str(tmp_path))
+    metrics.write_snapshot()   # own file must not be double counted
+
+    # The dead worker's counter stays in the total; its gauge does not
+    for _ in range(2):  # first scrape retires it, the second reads retired.json
+        assert 'test_multiproc_total{status="200"} 1013' in _lines_for('test_multiproc_total')
+        assert 'test_multiproc_in_use 3' in _lines_for('test_multiproc_in_use')
+    assert not stale.exists() and (tmp_path / 'retired.json').exists()
+    lines = _lines_for('test_multiproc_seconds')
+    assert 'test_multiproc_seconds_bucket{le="1.0"} 1' in lines
+    assert 'test_multiproc_seconds_count 3' in lines
+
+
+def test_multiprocess_writer_starts_once_and_stops(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_MULTIPROC_DIR', str(tmp_path))
+    before = threading.active_count()
+    metrics.start_multiprocess_writer()
+    metrics.start_multiprocess_writer()  # e.g. a second lifespan startup
+    assert threading.active_count() == before + 1
+
+    metrics.stop_multiprocess_writer(timeout=5)
+    assert threading.active_count() == before
+    assert (tmp_path / f"{os.getpid()}.json").exists()
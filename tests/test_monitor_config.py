@@ -0,0 +1,82 @@
+"""
+Tests for services/monitor_config.py and payment_monitor.load_runtime_config
+(no database needed: a fake cursor returns the stored config row).
+"""
+import sys
+import os
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import monitor_config
+from services import payment_monitor as pm
+
+
+class FakeCursor:
+    def __init__(self, row):
+        self._row = row
+
+    def execute(self, *args, **kwargs):
+        pass
+
+    def fetchone(self):
+        return self._row
+
+
+def make_module():
+    return types.SimpleNamespace(
+        THRESHOLDS={'5min': {'min_transactions': 8, 'warning_decline_rate': 60}},
+        SMART_FILTER_CONFIG={'enabled': True, 'min_success_rate_threshold': 0.10},
+        COOLDOWN_MINUTES=1440,
+        EXCLUDED_DECLINE_CODES=['39'],
+        EXCLUDED_DECLINE_DESCRIPTIONS=['insufficient funds'],
+        EXCLUDED_MIDS=['111'],
+        EXCLUDED_MID_NAMES=['test'],
+    )
+
+
+def test_merge_is_nested_and_does_not_mutate():
+    base = {'smart_filter': {'enabled': True, 'min_success_rate_threshold': 0.1}, 'cooldown_minutes': 1440}
+    merged = monitor_config.merge(base, {'smart_filter': {'enabled': False}})
+    assert merged == {'smart_filter': {'enabled': False, 'min_success_rate_threshold': 0.1}, 'cooldown_minutes': 1440}
+    assert base['smart_filter']['enabled'] is True
+
+
+def test_apply_overrides_only_stored_keys_and_restores_defaults():
+    module = make_module()
+    monitor_config.apply_to_module(module, {
+        'smart_filter': {'min_success_rate_threshold': 0.15},
+        'excluded_mids': ['111', '222'],
+        'unknown_key': 1,
+    })
+    assert module.SMART_FILTER_CONFIG == {'enabled': True, 'min_success_rate_threshold': 0.15}
+    assert module.EXCLUDED_MIDS == frozenset({'111', '222'})
+    assert module.THRESHOLDS['5min']['min_transactions'] == 8
+
+    # Next cycle with an empty config falls back to the original constants
+    monitor_config.apply_to_module(module, {})
+    assert module.SMART_FILTER_CONFIG['min_success_rate_threshold'] == 0.10
+    assert module.EXCLUDED_MIDS == frozenset({'111'})
+
+
+def test_monitor_load_runtime_config_applies_active_version():
+    saved = {attr: getattr(pm, attr) for attr in monitor_config.CONFIG_KEYS.values()}
+    try:
+        row = {'version': 7, 'changed_by': 'admin', 'config': {'smart_filter': {'enabled': False}}}
+        assert pm.load_runtime_config(FakeCursor(row), conn=None) == 7
+        assert pm.SMART_FILTER_CONFIG['enabled'] is False
+        assert pm.should_exclude_mid('43110201461', 'Anything') is True
+    finally:
+        for attr, value in saved.items():
+            setattr(pm, attr, value)
+
+
+def test_monitor_effective_keeps_builtin_exclusions_without_stored_config():
+    # What the bot's /test checks when monitor_config has no row yet
+    config = monitor_config.monitor_effective({})
+    assert '43110201461' in config['excluded_mids']
+    assert config['excluded_mid_names'] == list(pm.EXCLUDED_MID_NAMES)
+
+    config = monitor_config.monitor_effective({'excluded_mids': ['999']})
+    assert config['excluded_mids'] == ['999']
+    assert config['excluded_mid_names'] == list(pm.EXCLUDED_MID_NAMES)
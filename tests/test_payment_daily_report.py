@@ -0,0 +1,112 @@
+"""
+Tests for services/payment_daily_report.py daily_alert_stats handling.
+
+No live database is required: the functions under test take a cursor, so a
+fake cursor records what would have been sent to PostgreSQL.
+"""
+import sys
+import os
+import argparse
+from datetime import date
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import payment_daily_report as report
+
+
+class RecordingCursor:
+    """Stands in for a psycopg2 cursor: records execute() calls."""
+
+    def __init__(self, rows=None, rowcount=0):
+        self.rows = rows or []
+        self.rowcount = rowcount
+        self.executed = []
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_populate_daily_stats_passes_range_and_mode():
+    cursor = RecordingCursor(rowcount=3)
+    written = report.populate_daily_stats(cursor, date(2026, 10, 1), date(2026, 10, 3), only_missing=True)
+
+    query, params = cursor.executed[0]
+    assert written == 3
+    assert 'ON CONFLICT (stat_date) DO UPDATE' in query
+    assert params == {'first_day': date(2026, 10, 1), 'last_day': date(2026, 10, 3), 'only_missing': True}
+
+
+def test_get_trend_data_reads_window_ending_on_report_day():
+    rows = [(date(2026, 10, 18), 5), (date(2026, 10, 17), 2)]
+    cursor = RecordingCursor(rows=rows)
+
+    assert report.get_trend_data(cursor, date(2026, 10, 18), days=7) == rows
+    query, params = cursor.executed[0]
+    assert 'FROM daily_alert_stats' in query
+    assert params == (date(2026, 10, 18), 7, date(2026, 10, 18))
+
+
+def test_parse_day():
+    assert report.parse_day('2026-10-18') == date(2026, 10, 18)
+    with pytest.raises(argparse.ArgumentTypeError):
+        report.parse_day('18/10/2026')
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cursors = []
+
+    def cursor(self):
+        cursor = RecordingCursor(rows=[('row',)])
+        self.cursors.append(cursor)
+        return cursor
+
+    def rollback(self):
+        pass
+
+
+class FakePool:
+    """Stands in for psycopg2's ThreadedConnectionPool."""
+    instances = []
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.connections = []
+        self.closed = False
+        FakePool.instances.append(self)
+
+    def getconn(self):
+        conn = FakeConnection()
+        self.connections.append(conn)
+        return conn
+
+    def putconn(self, conn, close=False):
+        pass
+
+    def closeall(self):
+        self.closed = True
+
+
+def test_run_sections_degrades_failed_section_only(monkeypatch):
+    monkeypatch.setattr(report.db.psycopg2_pool, 'ThreadedConnectionPool', FakePool)
+
+    def broken(cursor):
+        raise RuntimeError('canceling statement due to statement timeout')
+
+    results, failed, timings = report.run_sections({
+        'good': (lambda c: c.fetchall(), []),
+        'bad': (broken, ['fallback']),
+    }, workers=2, timeout=5)
+
+    assert results == {'good': [('row',)], 'bad': ['fallback']}
+    assert failed == ['bad']
+    assert set(timings) == {'good', 'bad'}
+
+    pool = FakePool.instances[-1]
+    assert pool.closed
+    for conn in pool.connections:
+        assert conn.cursors[0].executed[0] == ("SET statement_timeout = %s", (5000,))
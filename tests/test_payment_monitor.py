@@ -11,6 +11,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from services import payment_monitor as pm
+from services.matchers import SubstringMatcher, substring_matcher
 
 
 class FakeCursor:
@@ -71,6 +72,55 @@ def test_should_exclude_decline_handles_empty():
     assert pm.should_exclude_decline('') is False
 
 
+# ---------------------------------------------------------------------------
+# services/matchers.py - must agree with the original substring loops
+# ---------------------------------------------------------------------------
+
+def _loop_matches(patterns, text):
+    if not text:
+        return False
+    lowered = text.lower().strip()
+    return any(pattern in lowered for pattern in patterns)
+
+
+MATCHER_SAMPLES = [
+    None, '', '   ', 'Insufficient Funds', '  INSUFFICIENT FUND  ', 'insufficient',
+    "Transaction didn't pass Risk Management System", 'risk management', 'Invalid card number',
+    'Networxpay - LIVE - 3', 'TimeSaver EU', 'Latest Shop', 'tes', 'a.b*c', 'ABC', 'x' * 500,
+]
+
+
+def test_matcher_agrees_with_loop_for_monitor_lists():
+    for patterns in (pm.EXCLUDED_MID_NAMES, pm.EXCLUDED_DECLINE_DESCRIPTIONS):
+        matcher = SubstringMatcher(patterns)
+        for text in MATCHER_SAMPLES:
+            assert matcher.matches(text) == _loop_matches(patterns, text), (patterns, text)
+
+
+def test_matcher_edge_cases_agree_with_loop():
+    pattern_lists = [[], [''], ['a.b*c'], ['b', 'abc'], ['  test'], ['TEST']]
+    for patterns in pattern_lists:
+        matcher = SubstringMatcher(patterns)
+        for text in MATCHER_SAMPLES:
+            assert matcher.matches(text) == _loop_matches(patterns, text), (patterns, text)
+
+
+def test_substring_matcher_follows_replaced_lists():
+    assert substring_matcher(['foo']) is substring_matcher(('foo',))
+    assert substring_matcher(['foo']).matches('FOO bar') is True
+    assert substring_matcher(['bar']).matches('FOO') is False
+
+
+def test_should_exclude_mid_uses_reloaded_names():
+    original = pm.EXCLUDED_MID_NAMES
+    pm.EXCLUDED_MID_NAMES = ['acme']
+    try:
+        assert pm.should_exclude_mid('1', 'ACME Payments') is True
+        assert pm.should_exclude_mid('1', 'Networxpay - LIVE') is False
+    finally:
+        pm.EXCLUDED_MID_NAMES = original
+
+
 # ---------------------------------------------------------------------------
 # check_route_health
 # ---------------------------------------------------------------------------
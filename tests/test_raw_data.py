@@ -0,0 +1,66 @@
+"""
+Tests for app/raw_data.py compact payload storage.
+
+The encoder and decoder are pure; rows are plain dicts standing in for
+RealDictCursor rows.
+"""
+import sys
+import os
+from decimal import Decimal
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.raw_data import FIELDS, compact_raw_data, expand_raw_data, parse_legacy_raw_data
+
+PAYLOAD = {
+    'trans_order': 'ORD-1',
+    'trans_id': '123',
+    'reply_code': '000',
+    'trans_amount': '12.5',
+    'ccBIN': '411111',
+    'MidID': 'MID7',
+    'CP26': None,
+    'X-Extra': 'kept',
+}
+
+
+def row_for(data):
+    """The webhook_events columns insert_webhook_event would store for data"""
+    row = {column: data.get(key) for key, column in FIELDS}
+    row['trans_amount'] = Decimal(data['trans_amount']).quantize(Decimal('0.0001'))
+    return row
+
+
+def test_compact_keeps_only_what_columns_cannot_reproduce():
+    doc = compact_raw_data(PAYLOAD)
+    assert set(doc) == {'_v', '_f', 'trans_amount', 'X-Extra'}
+    assert expand_raw_data(doc, row_for(PAYLOAD)) == PAYLOAD
+
+
+def test_absent_field_stays_absent():
+    data = {'trans_order': 'ORD-2', 'reply_code': '05', 'trans_amount': '1'}
+    expanded = expand_raw_data(compact_raw_data(data), row_for(data))
+    assert expanded == data
+    assert 'MidID' not in expanded
+
+
+def test_row_that_differs_keeps_payload_value():
+    row = row_for(PAYLOAD)
+    row['mid_id'] = None  # column added after this webhook was stored
+    doc = compact_raw_data(PAYLOAD, row)
+    assert doc['MidID'] == 'MID7'
+    assert expand_raw_data(doc, row) == PAYLOAD
+
+
+def test_legacy_repr_and_full_json():
+    assert parse_legacy_raw_data(repr(PAYLOAD)) == PAYLOAD
+    assert parse_legacy_raw_data('{"trans_id": "1"}') == {'trans_id': '1'}
+    assert expand_raw_data(repr(PAYLOAD), {}) == PAYLOAD
+    assert expand_raw_data({'trans_id': '1'}, {}) == {'trans_id': '1'}
+    assert expand_raw_data(None, {}) is None
+    with pytest.raises(ValueError):
+        parse_legacy_raw_data("['not', 'a', 'dict']")
+    with pytest.raises(ValueError):
+        parse_legacy_raw_data("{'broken': ")
@@ -0,0 +1,99 @@
+"""
+Tests for services/route_catalog.py.
+
+No live database is required: RouteCatalog takes a connection factory, so a
+fake connection serves the routes snapshot and records any fallback queries.
+"""
+import sys
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.route_catalog import RouteCatalog
+
+
+ROUTES = [
+    {'mid_id': '100', 'mid_name': 'Networxpay - LIVE - 3', 'bank_name': 'SIPAY ELEKTRONIK PARA', 'last_seen': datetime(2026, 10, 1)},
+    {'mid_id': '100', 'mid_name': 'Networxpay - LIVE - 3', 'bank_name': 'AKBANK T.A.S.', 'last_seen': datetime(2026, 10, 1)},
+    {'mid_id': '200', 'mid_name': 'Sendsco - LIVE - Mastercard 8', 'bank_name': 'SIPAY ELEKTRONIK PARA', 'last_seen': datetime(2026, 10, 1)},
+    # Only seen with BINs missing from bin_bank_mapping
+    {'mid_id': '300', 'mid_name': 'Paynet - LIVE', 'bank_name': None, 'last_seen': datetime(2026, 10, 1)},
+]
+
+
+class FakeConnection:
+    """Returns ROUTES for the snapshot query and `fallback_rows` for anything else."""
+
+    def __init__(self, fallback_rows=()):
+        self.fallback_rows = list(fallback_rows)
+        self.queries = []
+
+    def cursor(self, cursor_factory=None):
+        return self
+
+    def execute(self, sql, params=None):
+        self.queries.append(sql)
+        self._rows = ROUTES if 'ORDER BY mid_name, bank_name' in sql else self.fallback_rows
+
+    def fetchall(self):
+        return self._rows
+
+    def rollback(self):
+        pass
+
+
+def make_catalog(fallback_rows=()):
+    conn = FakeConnection(fallback_rows)
+
+    @contextmanager
+    def get_connection():
+        yield conn
+
+    return RouteCatalog(get_connection, ttl=300), conn
+
+
+def test_search_banks_is_case_insensitive_substring():
+    catalog, conn = make_catalog()
+    assert catalog.search_banks('sipay') == ['SIPAY ELEKTRONIK PARA']
+    assert catalog.search_banks('a', mid_id='100') == ['AKBANK T.A.S.', 'SIPAY ELEKTRONIK PARA']
+    assert len(conn.queries) == 1   # snapshot only, served from memory
+
+
+def test_search_mids_returns_distinct_pairs():
+    catalog, _ = make_catalog()
+    assert catalog.search_mids('live') == [
+        {'mid_id': '100', 'mid_name': 'Networxpay - LIVE - 3'},
+        {'mid_id': '300', 'mid_name': 'Paynet - LIVE'},
+        {'mid_id': '200', 'mid_name': 'Sendsco - LIVE - Mastercard 8'},
+    ]
+
+
+def test_mid_without_mapped_bank_is_found_by_mid_lookups_only():
+    catalog, conn = make_catalog()
+    assert catalog.search_mids('paynet') == [{'mid_id': '300', 'mid_name': 'Paynet - LIVE'}]
+    assert catalog.mid_name('300') == 'Paynet - LIVE'
+    assert catalog.search_banks('a', mid_id='300') == []
+    assert catalog.find_route(mid_id='300') is None
+
+
+def test_find_route_and_exact_lookups():
+    catalog, _ = make_catalog()
+    route = catalog.find_route(mid_text='networx', bank_text='akbank')
+    assert route == {'mid_id': '100', 'mid_name': 'Networxpay - LIVE - 3', 'bank_name': 'AKBANK T.A.S.'}
+    assert catalog.get_route('Sendsco - LIVE - Mastercard 8', 'SIPAY ELEKTRONIK PARA')['mid_id'] == '200'
+    assert catalog.mid_name('200') == 'Sendsco - LIVE - Mastercard 8'
+
+
+def test_miss_falls_back_to_database():
+    catalog, conn = make_catalog(fallback_rows=[{'bank_name': 'SIPAY ELEKTRONIK PARA'}])
+    assert catalog.search_banks('sipya') == ['SIPAY ELEKTRONIK PARA']
+    assert 'similarity' in conn.queries[-1]
+
+
+def test_unknown_route_returns_none():
+    catalog, conn = make_catalog()
+    assert catalog.find_route(mid_id='999') is None
+    assert catalog.mid_name('999') is None
+    assert len(conn.queries) == 3   # snapshot + one fallback query per miss
@@ -0,0 +1,140 @@
+"""
+Tests for app/spool.py (on-disk webhook spool). No database needed: replay
+is driven with a list-appending store_batch, or into MemoryStorage.
+"""
+import sys
+import os
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.spool import HEADER, Spool, SpoolFull, count_pending, encode_frame, iter_frames
+from app.storage import MemoryStorage
+from app.webhook_record import TRANSACTION_COLUMNS, WebhookRecord
+
+
+def entry(n):
+    return {'data': {'trans_order': f'ORD-{n}', 'reply_code': '000'}, 'n': n}
+
+
+def test_frames_roundtrip_and_stop_at_damage():
+    buf = encode_frame(entry(1)) + encode_frame(entry(2))
+    assert [end for _, end in iter_frames(buf)] == [len(buf) // 2, len(buf)]
+
+    # Torn tail: the second frame is cut short
+    assert len(list(iter_frames(buf[:-3]))) == 1
+
+    # Flipped payload byte fails the CRC
+    damaged = bytearray(buf)
+    damaged[HEADER.size + 2] ^= 0xFF
+    assert list(iter_frames(bytes(damaged))) == []
+
+
+def test_replay_in_order_and_resume_after_failed_batch(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=200)
+    for n in range(10):
+        spool.append(entry(n))
+    assert spool.pending == 10
+    assert len(os.listdir(spool.directory)) > 1  # rolled over
+
+    stored = []
+
+    def store_failing_third(batch):
+        if len(stored) == 6:
+            raise ConnectionError('database down')
+        stored.extend(e['n'] for e in batch)
+
+    with pytest.raises(ConnectionError):
+        spool.replay(store_failing_third, batch_size=3)
+    assert stored == [0, 1, 2, 3, 4, 5]
+    assert spool.pending == 4
+
+    spool.replay(lambda batch: stored.extend(e['n'] for e in batch), batch_size=3)
+    assert stored == list(range(10))
+    assert spool.pending == 0
+    # Only the segment being written is left
+    assert [name for name in os.listdir(spool.directory) if name.endswith('.seg')] == [spool.segment]
+
+
+def test_concurrent_appends_are_all_kept(tmp_path):
+    spool = Spool(str(tmp_path))
+    threads = [threading.Thread(target=lambda t=t: [spool.append(entry(t * 100 + i)) for i in range(50)])
+               for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert spool.pending == 400
+    assert count_pending(spool.directory) == 400
+
+
+def test_restart_replays_previous_run_and_skips_torn_tail(tmp_path):
+    spool = Spool(str(tmp_path))
+    spool.append(entry(1))
+    spool.append(entry(2))
+    path = os.path.join(spool.directory, spool.segment)
+    spool.close()
+    with open(path, 'ab') as f:
+        f.write(encode_frame(entry(3))[:-4])  # crash mid-write
+
+    spool = Spool(str(tmp_path))
+    assert spool.slot == 0 and spool.pending == 2
+    stored = []
+    spool.replay(lambda batch: stored.extend(e['n'] for e in batch))
+    assert stored == [1, 2]
+    assert os.path.exists(path + '.corrupt')
+
+
+def test_second_worker_takes_next_slot_and_adopts_orphans(tmp_path):
+    first = Spool(str(tmp_path))
+    second = Spool(str(tmp_path))
+    assert (first.slot, second.slot) == (0, 1)
+
+    second.append(entry(7))
+    second.close()  # worker gone
+    stored = []
+    assert first.replay_orphans(lambda batch: stored.extend(e['n'] for e in batch)) == 1
+    assert stored == [7]
+
+
+def test_full_spool_rejects_append(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=len(encode_frame(entry(1))))
+    spool.append(entry(1))
+    with pytest.raises(SpoolFull):
+        spool.append(entry(2))
+
+
+def test_webhook_record_spool_entry_roundtrip(tmp_path):
+    keys = {'bank_key': 3, 'mid_key': 7, 'merchant_key': None, 'country_key': 1}
+    record = WebhookRecord.build({'trans_order': 'ORD-1', 'ccBIN': '411111'}, 'success',
+                                 'Test Bank', None, 'Sendsco - LIVE', keys, 'abc')
+    spool = Spool(str(tmp_path))
+    spool.append(record.spool_entry())
+    replayed = []
+    spool.replay(lambda batch: replayed.extend(map(WebhookRecord.from_spool_entry, batch)))
+    assert replayed == [record]
+
+
+def test_replay_from_another_slot_keeps_newer_status(tmp_path):
+    # Worker A spools a pending update; worker B, with an empty slot, writes
+    # the later success directly. A's replay must not bring back pending.
+    keys = {'bank_key': None, 'mid_key': None, 'merchant_key': None, 'country_key': None}
+    first, second = Spool(str(tmp_path)), Spool(str(tmp_path))
+    pending = WebhookRecord.build({'trans_order': 'ORD-1', 'reply_code': '553'}, 'pending',
+                                  None, None, None, keys, 'd1')
+    first.append(pending.spool_entry())
+    success = WebhookRecord.build({'trans_order': 'ORD-1', 'reply_code': '000'}, 'success',
+                                  None, None, None, keys, 'd2')
+    assert second.pending == 0
+    storage = MemoryStorage()
+    storage.store(success, [], False)
+
+    first.close()  # worker A gone; B adopts its slot
+    replayed = second.replay_orphans(lambda batch: storage.store_batch(
+        [(WebhookRecord.from_spool_entry(e), [], False) for e in batch]))
+    assert replayed == 1
+    assert len(storage.events) == 2
+    row = dict(zip(TRANSACTION_COLUMNS, storage.transactions['ORD-1']))
+    assert row['status'] == 'success'
@@ -0,0 +1,107 @@
+"""
+Tests for app/storage.py.
+
+The memory and SQLite backends run the same cases; PostgresStorage needs a
+database and is exercised through the receiver instead.
+"""
+import sys
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.storage import MemoryStorage, SQLiteStorage
+from app.webhook_record import TRANSACTION_COLUMNS, WebhookRecord
+
+KEYS = {'bank_key': None, 'mid_key': None, 'merchant_key': None, 'country_key': None}
+ISSUE = {'issue_type': 'missing_optional', 'field_name': 'client_email', 'field_value': None,
+         'error_message': 'Optional but important field client_email is missing'}
+
+
+def record(reply_code='000', status='success', delivery_key='d1'):
+    data = {'trans_order': 'ORD-1', 'trans_id': '123', 'reply_code': reply_code, 'MidID': 'MID7'}
+    return WebhookRecord.build(data, status, 'Test Bank', None, 'Sendsco - LIVE', KEYS, delivery_key)
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def storage(request, tmp_path):
+    if request.param == 'memory':
+        store = MemoryStorage()
+    else:
+        store = SQLiteStorage(str(tmp_path / 'webhooks.sqlite3'))
+    yield store
+    store.close()
+
+
+def transaction(storage):
+    if isinstance(storage, MemoryStorage):
+        return dict(zip(TRANSACTION_COLUMNS, storage.transactions['ORD-1']))
+    with sqlite3.connect(storage.path) as conn:
+        conn.row_factory = sqlite3.Row
+        return dict(conn.execute("SELECT * FROM transactions WHERE trans_order = 'ORD-1'").fetchone())
+
+
+def test_store_writes_event_then_skips_duplicate_delivery(storage):
+    event_id, written = storage.store(record(), [ISSUE], touch_route=True)
+    assert event_id is not None and written
+
+    assert storage.store(record(), [ISSUE], touch_route=True) == (None, False)
+
+
+def test_upsert_keeps_latest_status_and_skips_unchanged(storage):
+    storage.store(record('553', 'pending', 'd1'), [], False)
+    assert storage.store(record('000', 'success', 'd2'), [], False)[1] is True
+    assert transaction(storage)['status'] == 'success'
+
+    # Same values again under a new delivery: event stored, transaction untouched
+    event_id, written = storage.store(record('000', 'success', 'd3'), [], False)
+    assert event_id is not None and written is False
+
+
+def test_store_batch_returns_one_result_per_item(storage):
+    items = [(record(delivery_key='a'), [], True), (record(delivery_key='a'), [], True),
+             (record('005', 'declined', 'b'), [ISSUE], False)]
+    results = storage.store_batch(items)
+    assert [event_id is None for event_id, _ in results] == [False, True, False]
+    assert transaction(storage)['status'] == 'declined'
+
+
+def test_mappings_start_empty(storage):
+    mappings = storage.load_mappings()
+    assert mappings['bins'] == {} and mappings['mid_keys'] == {}
+
+
+def test_memory_storage_serves_seeded_mappings():
+    storage = MemoryStorage({'bins': {'411111': 'Test Bank'}})
+    assert storage.load_mappings()['bins'] == {'411111': 'Test Bank'}
+    assert storage.load_mappings()['merchants'] == {}
+
+
+def test_older_update_never_replaces_newer(storage):
+    # A pending webhook spooled at 12:00 is replayed after the success that
+    # arrived at 12:01 was already written
+    arrived = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    success = record('000', 'success', 'd2')
+    success.received_at = arrived + timedelta(minutes=1)
+    pending = record('553', 'pending', 'd1')
+    pending.received_at = arrived
+    storage.store(success, [], False)
+
+    event_id, written = storage.store(pending, [], False)
+    assert event_id is not None and written is False
+    assert transaction(storage)['status'] == 'success'
+
+
+def test_route_with_unmapped_bank_is_kept_once(storage):
+    data = {'trans_order': 'ORD-2', 'trans_id': '124', 'reply_code': '000', 'MidID': 'MID9'}
+    for delivery_key in ('d1', 'd2'):
+        storage.store(WebhookRecord.build(data, 'success', None, None, 'Paynet', KEYS, delivery_key), [], True)
+    if isinstance(storage, MemoryStorage):
+        assert storage.routes == {('MID9', None): 'Paynet'}
+    else:
+        with sqlite3.connect(storage.path) as conn:
+            assert conn.execute("SELECT mid_id, bank_name, mid_name FROM routes").fetchall() == [
+                ('MID9', None, 'Paynet')]
@@ -0,0 +1,20 @@
+"""
+Tests for services/telegram_bot.py module setup.
+
+The bot module must import without a bot token or a reachable database:
+the pool is opened by main() or on first use.
+"""
+import sys
+import os
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_needs_no_token_or_database():
+    env = dict(os.environ, DB_HOST='/nonexistent', TELEGRAM_BOT_TOKEN='')
+    result = subprocess.run(
+        [sys.executable, '-c', 'import services.telegram_bot as bot; print(bot._db_pool)'],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == 'None'
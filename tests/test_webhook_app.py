@@ -1,21 +1,25 @@
 """
 Tests for app/webhook_app.py business logic.
 
-CAVEAT: importing app.webhook_app opens a real ThreadedConnectionPool to
-Postgres at module import time (see the `_db_pool = ...` line near the top
-of webhook_app.py) - that's existing production behavior, not something
-these tests introduce. As a result, these tests can only run on a machine
-with access to the configured database (e.g. this server), not in an
-isolated/DB-less CI runner. The lookup_* functions themselves don't touch
-the DB directly - they read from the in-memory _mapping_cache dict, which
-we monkeypatch below instead of relying on the real cache contents.
+Importing app.webhook_app opens nothing (the pool, spool and background
+threads are started by the application's lifespan), so these tests need no
+database. The lookup_* functions read from the in-memory _mapping_cache
+dict, which we monkeypatch below instead of relying on the real cache
+contents.
 """
+import asyncio
+import logging
 import sys
 import os
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from app import webhook_app as wa
+from app.storage import MemoryStorage
+from app.webhook_record import TRANSACTION_COLUMNS, WebhookRecord
 
 
 # ---------------------------------------------------------------------------
@@ -110,3 +114,102 @@ def test_lookup_mid_name_hit():
         assert wa.lookup_mid_name('414622153451') == 'Sendsco - LIVE - Mastercard 26'
     finally:
         _restore_cache(original)
+
+
+# ---------------------------------------------------------------------------
+# lookup_dimension_keys
+# ---------------------------------------------------------------------------
+
+def test_lookup_dimension_keys_hit_and_miss():
+    original = {k: dict(v) for k, v in wa._mapping_cache.items()}
+    wa._mapping_cache.update({
+        'bank_keys': {'Test Bank': 3},
+        'mid_keys': {('MID1', 'Sendsco - LIVE'): 7, ('MID1', None): 8},
+        'merchant_keys': {},
+        'country_keys': {'TR': 1},
+    })
+    try:
+        data = {'MidID': 'MID1', 'merchant_id': '1885994', 'client_country': 'TR'}
+        keys = wa.lookup_dimension_keys(data, 'Test Bank', 'Panelix [LIVE]', 'Sendsco - LIVE')
+        # merchant not in the cache yet: left to the insert trigger
+        assert keys == {'bank_key': 3, 'mid_key': 7, 'merchant_key': None, 'country_key': 1}
+        # the key encodes the (mid_id, mid_name) pair as stored on the row
+        assert wa.lookup_dimension_keys(data, 'Test Bank', None, None)['mid_key'] == 8
+    finally:
+        _restore_cache(original)
+
+
+def test_lookup_dimension_keys_absent_values():
+    assert wa.lookup_dimension_keys({}, None, None, None) == {
+        'bank_key': None, 'mid_key': None, 'merchant_key': None, 'country_key': None}
+
+
+# ---------------------------------------------------------------------------
+# store_spooled
+# ---------------------------------------------------------------------------
+
+def test_store_spooled_resolves_names_again_and_keeps_arrival_time(monkeypatch):
+    keys = {'bank_key': None, 'mid_key': None, 'merchant_key': None, 'country_key': None}
+    arrived = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+    # Spooled by a worker whose cache did not know the MID yet
+    spooled = WebhookRecord.build({'trans_order': 'ORD-1', 'reply_code': '000', 'ccBIN': '411111',
+                                   'MidID': 'MID7'}, 'success', 'Old Bank', None, None, keys, 'd1', arrived)
+    storage = MemoryStorage()
+    monkeypatch.setattr(wa, '_storage', storage)
+    original = _with_cache(mids={'MID7': 'Sendsco - LIVE'})
+    try:
+        wa.store_spooled([spooled.spool_entry()])
+    finally:
+        _restore_cache(original)
+
+    row = dict(zip(TRANSACTION_COLUMNS, storage.transactions['ORD-1']))
+    assert row['mid_name'] == 'Sendsco - LIVE'
+    assert row['bank_name'] == 'Old Bank'  # not in the cache: spooled name kept
+    assert storage.events[0][-1] == arrived
+
+
+# ---------------------------------------------------------------------------
+# /health (cached status) and /ready
+# ---------------------------------------------------------------------------
+
+def test_health_status_uses_last_background_ping(monkeypatch):
+    monkeypatch.setattr(wa, '_db_health', {'last_ok': wa.time.time() - 1, 'error': None})
+    status = wa.health_status()
+    assert (status['status'], status['database']) == ('healthy', 'connected')
+    assert status['pool'] is None  # not started
+
+    stale = wa.time.time() - 3 * wa.HEALTH_CHECK_INTERVAL - 1
+    monkeypatch.setattr(wa, '_db_health', {'last_ok': stale, 'error': 'connection refused'})
+    status = wa.health_status()
+    assert (status['status'], status['error']) == ('unhealthy', 'connection refused')
+
+
+def test_ready_waits_for_mapping_cache(monkeypatch):
+    monkeypatch.setattr(wa, '_cache_loaded_at', None)
+    assert asyncio.run(wa.readiness_check()).status_code == 503
+
+    monkeypatch.setattr(wa, '_cache_loaded_at', wa.time.time())
+    assert asyncio.run(wa.readiness_check())['status'] == 'ready'
+
+
+# ---------------------------------------------------------------------------
+# create_app() lifecycle
+# ---------------------------------------------------------------------------
+
+def test_app_starts_and_stops_without_database(monkeypatch, tmp_path):
+    monkeypatch.setattr(wa, 'DB_CONFIG', {'dbname': 'x', 'user': 'x', 'host': str(tmp_path / 'no-socket'),
+                                          'connect_timeout': 1})
+    monkeypatch.setattr(wa, 'SPOOL_DIR', str(tmp_path / 'spool'))
+    monkeypatch.setattr(wa, '_log_handler', logging.NullHandler())
+    monkeypatch.setattr(wa, '_cache_loaded_at', None)
+    monkeypatch.setattr(wa, '_db_health', {'last_ok': None, 'error': None})
+
+    with TestClient(wa.create_app()) as client:
+        assert wa._db_pool.maxconn == wa.DB_POOL_MAX  # max_connections unknown
+        assert client.get('/ready').status_code == 503
+        health = client.get('/health')
+        assert health.status_code == 503
+        assert health.json()['spool_pending'] == 0
+
+    assert wa._db_pool is None and wa._spool is None
+    assert all(not thread.is_alive() for thread in wa._workers)
@@ -0,0 +1,60 @@
+"""
+Tests for app/webhook_record.py.
+"""
+import sys
+import os
+from dataclasses import fields
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.raw_data import FIELD_COLUMNS
+from app.webhook_record import EVENT_COLUMNS, TRANSACTION_COLUMNS, WebhookRecord
+
+PAYLOAD = {
+    'trans_order': 'ORD-1',
+    'trans_id': '123',
+    'reply_code': '000',
+    'trans_amount': '12.50',
+    'ccBIN': '411111',
+    'isRefund': '0',
+    'MidID': 'MID7',
+    'StorageID': None,
+    'X-Extra': 'kept',
+}
+KEYS = {'bank_key': 3, 'mid_key': 7, 'merchant_key': None, 'country_key': 1}
+
+
+def build():
+    return WebhookRecord.build(PAYLOAD, 'success', 'Test Bank', None, 'Sendsco - LIVE', KEYS, 'abc')
+
+
+def test_payload_fields_follow_raw_data_columns():
+    names = [f.name for f in fields(WebhookRecord)]
+    assert tuple(names[:len(FIELD_COLUMNS) + 2]) == FIELD_COLUMNS + ('otrans_amount', 'trans_amount')
+    assert set(EVENT_COLUMNS) <= set(names)
+    assert set(TRANSACTION_COLUMNS) <= set(names)
+
+
+def test_build_maps_payload_keys_to_columns():
+    record = build()
+    assert (record.cc_bin, record.is_refund, record.mid_id) == ('411111', '0', 'MID7')
+    assert record.storage_id is None and record.client_email is None
+    assert (record.status, record.bank_name, record.mid_name) == ('success', 'Test Bank', 'Sendsco - LIVE')
+    assert (record.bank_key, record.merchant_key, record.delivery_key) == (3, None, 'abc')
+    assert record.data is PAYLOAD
+    assert not hasattr(record, '__dict__')
+
+
+def test_params_follow_column_order():
+    record = build()
+    event = record.event_params()
+    assert len(event) == len(EVENT_COLUMNS) + 1
+    by_column = dict(zip(EVENT_COLUMNS, event))
+    assert by_column['cc_bin'] == '411111'
+    assert by_column['delivery_key'] == 'abc'
+    assert event[-1].adapted['X-Extra'] == 'kept'  # raw_data keeps the unmapped field
+
+    transaction = dict(zip(TRANSACTION_COLUMNS, record.transaction_params()))
+    assert transaction['trans_order'] == 'ORD-1'
+    assert transaction['mid_key'] == 7
+    assert len(transaction) == len(TRANSACTION_COLUMNS)
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""
+Derived Column Backfill
+Fills mid_name, bank_name or merchant_name on webhook_events and transactions
+from their mapping tables, and converts webhook_events.raw_data_legacy to the
+compact JSONB raw_data (migration_raw_data_jsonb.sql).
+
+Instead of one UPDATE over the whole table, the id range is split into
+segments and each segment is walked in small id batches, one transaction per
+batch - row locks are held for a batch at a time and autovacuum keeps up with
+the dead tuples. Every batch stores its segment's position in
+backfill_progress in the same transaction, so a stopped run (Ctrl+C, crash,
+deploy) resumes where it left off. Segments run on parallel workers, each
+with its own connection; --sleep throttles every worker between batches.
+
+Usage:
+    python3 utils/backfill.py mid_name
+    python3 utils/backfill.py bank_name --table transactions --workers 4 --sleep 0.2
+    python3 utils/backfill.py merchant_name --overwrite --dry-run
+    python3 utils/backfill.py raw_data --workers 2
+"""
+
+import argparse
+import json
+import math
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.extras import Json, RealDictCursor, execute_values
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.raw_data import FIELD_COLUMNS, compact_raw_data, parse_legacy_raw_data
+from services import db
+
+load_dotenv()
+
+DB_CONFIG = db.write_config('backfill')
+
+# Tables carrying the derived columns; both have a BIGSERIAL id
+TABLES = ('webhook_events', 'transactions')
+
+
+def convert_raw_data_batch(cursor, table, lo, hi):
+    """
+    Rewrite one id batch of raw_data_legacy (Python repr text) as compact
+    JSONB raw_data. Text that cannot be parsed is kept as {"_legacy": text}.
+    Returns rows converted.
+    """
+    read = cursor.connection.cursor(cursor_factory=RealDictCursor)
+    read.execute(f"""
+        SELECT id, raw_data_legacy, {', '.join(FIELD_COLUMNS)}
+        FROM {table}
+        WHERE id >= %s AND id < %s AND raw_data_legacy IS NOT NULL
+    """, (lo, hi))
+    values = []
+    for row in read.fetchall():
+        try:
+            doc = compact_raw_data(parse_legacy_raw_data(row['raw_data_legacy']), row)
+        except ValueError:
+            doc = {'_legacy': row['raw_data_legacy']}
+        values.append((row['id'], Json(doc)))
+    read.close()
+
+    if values:
+        execute_values(cursor, f"""
+            UPDATE {table} t
+            SET raw_data = v.raw_data::jsonb, raw_data_legacy = NULL
+            FROM (VALUES %s) AS v(id, raw_data)
+            WHERE t.id = v.id
+        """, values)
+    return len(values)
+
+
+# Rows with a text value but no dimension key yet (written before
+# migration_create_dimension_keys.sql, which keyed only the last day)
+DIMENSION_KEYS_PENDING = ("((t.bank_key IS NULL AND t.bank_name IS NOT NULL)"
+                          " OR (t.mid_key IS NULL AND t.mid_id IS NOT NULL)"
+                          " OR (t.merchant_key IS NULL AND t.merchant_id IS NOT NULL)"
+                          " OR (t.country_key IS NULL AND t.client_country IS NOT NULL))")
+
+
+def set_dimension_keys_batch(cursor, table, lo, hi):
+    """Set one id batch's dimension keys, adding new values to the dim_* tables. Returns rows updated."""
+    cursor.execute(f"""
+        UPDATE {table} t
+        SET bank_key = dim_bank_key(t.bank_name),
+            mid_key = dim_mid_key(t.mid_id, t.mid_name),
+            merchant_key = dim_merchant_key(t.merchant_id, t.merchant_name),
+            country_key = dim_country_key(t.client_country)
+        WHERE t.id >= %s AND t.id < %s AND {DIMENSION_KEYS_PENDING}
+    """, (lo, hi))
+    return cursor.rowcount
+
+
+# Per derived column: the mapping table it is looked up in, the mapping's key
+# and value columns, and the row column holding the key. Jobs that cannot be
+# a single UPDATE give a `batch` function and the `pending` rows instead.
+BACKFILLS = {
+    'mid_name': {
+        'column': 'mid_name',
+        'source': 'mid_mapping',
+        'source_key': 'mid_id',
+        'source_value': 'terminal_name',
+        'row_key': 'mid_id',
+    },
+    'bank_name': {
+        'column': 'bank_name',
+        'source': 'bin_bank_mapping',
+        'source_key': 'bin',
+        'source_value': 'bank_name',
+        'row_key': 'cc_bin',
+    },
+    'merchant_name': {
+        'column': 'merchant_name',
+        'source': 'merchant_mapping',
+        'source_key': 'merchant_id',
+        'source_value': 'merchant_name',
+        'row_key': 'merchant_id',
+    },
+    'raw_data': {
+        'column': 'raw_data',
+        'source': 'raw_data_legacy',
+        'tables': ('webhook_events',),
+        'pending': 't.raw_data_legacy IS NOT NULL',
+        'batch': convert_raw_data_batch,
+    },
+    'dimension_keys': {
+        'column': 'bank_key/mid_key/merchant_key/country_key',
+        'source': 'dim_* tables',
+        'pending': DIMENSION_KEYS_PENDING,
+        'batch': set_dimension_keys_batch,
+    },
+}
+
+# A batch waiting longer than this on a row lock (e.g. the receiver upserting
+# the same transaction) gives up and is retried after a pause.
+LOCK_TIMEOUT_MS = 2000
+LOCK_RETRIES = 5
+
+PROGRESS_INTERVAL = 10  # seconds between progress lines
+
+
+def job_name(name, table):
+    return f"{name}:{table}"
+
+
+def pending_condition(spec, overwrite=False):
+    """WHERE clause (rows aliased t, mapping aliased src) for rows the backfill would change"""
+    column = spec['column']
+    if overwrite:
+        return f"t.{column} IS DISTINCT FROM src.{spec['source_value']}"
+    return f"t.{column} IS NULL"
+
+
+def update_sql(spec, table, overwrite=False):
+    """UPDATE for one id batch; takes %(lo)s (inclusive) and %(hi)s (exclusive)"""
+    return f"""
+        UPDATE {table} t
+        SET {spec['column']} = src.{spec['source_value']}
+        FROM {spec['source']} src
+        WHERE t.{spec['row_key']} = src.{spec['source_key']}
+          AND {pending_condition(spec, overwrite)}
+          AND t.id >= %(lo)s AND t.id < %(hi)s
+    """
+
+
+def plan_segments(min_id, max_id, segments):
+    """Split [min_id, max_id] into up to `segments` contiguous (start_id, end_id) ranges, both inclusive"""
+    if min_id is None or max_id is None or max_id < min_id:
+        return []
+    span = max_id - min_id + 1
+    segments = max(1, min(segments, span))
+    size = math.ceil(span / segments)
+    return [(start, min(start + size - 1, max_id)) for start in range(min_id, max_id + 1, size)]
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return '?'
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class Progress:
+    """
+    Shared between workers: ids covered and rows updated so far, printed as a
+    progress line with rate and ETA at most every `interval` seconds.
+    """
+
+    def __init__(self, label, total_ids, done_ids=0, rows_updated=0, interval=PROGRESS_INTERVAL, clock=time.monotonic):
+        self.label = label
+        self.total_ids = total_ids
+        self.done_ids = done_ids
+        self.rows_updated = rows_updated
+        self.interval = interval
+        self._clock = clock
+        self._started = clock()
+        self._resumed_from = done_ids
+        self._last_print = self._started
+        self._lock = threading.Lock()
+
+    def advance(self, ids, rows):
+        with self._lock:
+            self.done_ids += ids
+            self.rows_updated += rows
+            now = self._clock()
+            if now - self._last_print >= self.interval:
+                self._last_print = now
+                print(self.line())
+
+    def eta(self):
+        """Seconds left at this run's rate, None before the first batch"""
+        elapsed = self._clock() - self._started
+        covered = self.done_ids - self._resumed_from
+        if covered <= 0 or elapsed <= 0:
+            return None
+        return (self.total_ids - self.done_ids) / (covered / elapsed)
+
+    def line(self):
+        percent = 100.0 * self.done_ids / self.total_ids if self.total_ids else 100.0
+        elapsed = self._clock() - self._started
+        rate = self.rows_updated / elapsed if elapsed > 0 else 0
+        return (f"  {self.label}: {percent:5.1f}% of ids, {self.rows_updated:,} rows updated "
+                f"({rate:,.0f}/s), ETA {format_duration(self.eta())}")
+
+
+def estimate(cursor, spec, table, overwrite=False):
+    """
+    Planner estimates, no table scan: (rows in table, rows the backfill would
+    change). Good enough to size a run; the real count comes from the batches.
+    """
+    cursor.execute("SELECT GREATEST(reltuples, 0)::BIGINT FROM pg_class WHERE oid = %s::regclass", (table,))
+    table_rows = cursor.fetchone()[0]
+    if 'pending' in spec:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} t WHERE {spec['pending']}")
+    else:
+        cursor.execute(f"""
+            EXPLAIN (FORMAT JSON)
+            SELECT 1
+            FROM {table} t
+            JOIN {spec['source']} src ON t.{spec['row_key']} = src.{spec['source_key']}
+            WHERE {pending_condition(spec, overwrite)}
+        """)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return table_rows, int(plan[0]['Plan']['Plan Rows'])
+
+
+def load_segments(conn, job, table, segments, restart=False):
+    """
+    Segments of `job` still to do, as dicts. Resumes an unfinished job's
+    checkpoints; a finished job (or restart=True) is planned again over the
+    table's current id range.
+    """
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT segment, start_id, end_id, next_id, rows_updated, finished_at
+        FROM backfill_progress
+        WHERE job_name = %s
+        ORDER BY segment
+    """, (job,))
+    rows = cursor.fetchall()
+
+    if rows and not restart and any(row[5] is None for row in rows):
+        resumed = True
+    else:
+        resumed = False
+        cursor.execute("DELETE FROM backfill_progress WHERE job_name = %s", (job,))
+        cursor.execute(f"SELECT MIN(id), MAX(id) FROM {table}")
+        min_id, max_id = cursor.fetchone()
+        rows = []
+        for segment, (start_id, end_id) in enumerate(plan_segments(min_id, max_id, segments)):
+            cursor.execute("""
+                INSERT INTO backfill_progress (job_name, segment, start_id, end_id, next_id)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (job, segment, start_id, end_id, start_id))
+            rows.append((segment, start_id, end_id, start_id, 0, None))
+    conn.commit()
+    cursor.close()
+
+    keys = ('segment', 'start_id', 'end_id', 'next_id', 'rows_updated', 'finished_at')
+    return [dict(zip(keys, row)) for row in rows], resumed
+
+
+def run_segment(conn, spec, table, job, segment, batch_size, progress, sleep=0.0, overwrite=False, stop=None):
+    """
+    Walk one segment batch by batch from its checkpoint. Each batch's UPDATE
+    and checkpoint commit together. Returns rows updated by this call; stops
+    early (checkpoint intact) when `stop` is set.
+    """
+    batch = spec.get('batch')
+    sql = None if batch else update_sql(spec, table, overwrite)
+    cursor = conn.cursor()
+    cursor.execute("SET lock_timeout = %s", (LOCK_TIMEOUT_MS,))
+    conn.commit()
+
+    lo, end_id = segment['next_id'], segment['end_id']
+    updated = 0
+    retries = 0
+    while lo <= end_id:
+        if stop is not None and stop.is_set():
+            break
+        hi = min(lo + batch_size, end_id + 1)
+        try:
+            if batch:
+                changed = batch(cursor, table, lo, hi)
+            else:
+                cursor.execute(sql, {'lo': lo, 'hi': hi})
+                changed = cursor.rowcount
+            cursor.execute("""
+                UPDATE backfill_progress
+                SET next_id = %(hi)s,
+                    rows_updated = rows_updated + %(changed)s,
+                    updated_at = NOW(),
+                    finished_at = CASE WHEN %(hi)s > end_id THEN NOW() END
+                WHERE job_name = %(job)s AND segment = %(segment)s
+            """, {'hi': hi, 'changed': changed, 'job': job, 'segment': segment['segment']})
+            conn.commit()
+        except (psycopg2.errors.LockNotAvailable, psycopg2.extensions.TransactionRollbackError):
+            conn.rollback()
+            retries += 1
+            if retries > LOCK_RETRIES:
+                raise
+            time.sleep(min(2 ** retries, 30))
+            continue
+
+        retries = 0
+        updated += changed
+        progress.advance(hi - lo, changed)
+        lo = hi
+        if sleep and lo <= end_id:
+            time.sleep(sleep)
+
+    cursor.close()
+    return updated
+
+
+def run_backfill(name, table, workers=1, batch_size=5000, sleep=0.0, overwrite=False,
+                 dry_run=False, restart=False):
+    """Backfill one derived column of one table; returns True if it ran to completion"""
+    spec = BACKFILLS[name]
+    job = job_name(name, table)
+    print(f"\n=== {spec['column']} on {table} (from {spec['source']}) ===")
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        cursor = conn.cursor()
+        table_rows, pending = estimate(cursor, spec, table, overwrite)
+        cursor.close()
+        conn.rollback()
+        print(f"  ~{table_rows:,} rows in table, ~{pending:,} to update (planner estimate)")
+        if dry_run:
+            return True
+
+        segments, resumed = load_segments(conn, job, table, workers * 4, restart=restart)
+    finally:
+        conn.close()
+
+    if not segments:
+        print("  Table is empty, nothing to do")
+        return True
+
+    total_ids = sum(s['end_id'] - s['start_id'] + 1 for s in segments)
+    done_ids = sum(min(s['next_id'], s['end_id'] + 1) - s['start_id'] for s in segments)
+    done_rows = sum(s['rows_updated'] for s in segments)
+    todo = [s for s in segments if s['next_id'] <= s['end_id']]
+    if resumed:
+        print(f"  Resuming {job}: {len(todo)}/{len(segments)} segments left, {done_rows:,} rows already updated")
+    print(f"  ids {segments[0]['start_id']}..{segments[-1]['end_id']} in {len(segments)} segments, "
+          f"batches of {batch_size:,}, {workers} worker(s)")
+
+    progress = Progress(job, total_ids, done_ids=done_ids, rows_updated=done_rows)
+    pending_segments = queue.Queue()
+    for segment in todo:
+        pending_segments.put(segment)
+    stop = threading.Event()
+
+    def worker():
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            while not stop.is_set():
+                try:
+                    segment = pending_segments.get_nowait()
+                except queue.Empty:
+                    return
+                run_segment(conn, spec, table, job, segment, batch_size, progress,
+                            sleep=sleep, overwrite=overwrite, stop=stop)
+        except Exception:
+            stop.set()
+            raise
+        finally:
+            conn.close()
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(worker) for _ in range(workers)]
+        try:
+            errors = [f.exception() for f in futures]
+        except KeyboardInterrupt:
+            print("\n  Interrupted - finishing current batches, progress is saved")
+            stop.set()
+            errors = [f.exception() for f in futures]
+    errors = [e for e in errors if e is not None]
+
+    print(progress.line())
+    if errors:
+        print(f"✗ {job} stopped: {errors[0]} - rerun to resume")
+        return False
+    if stop.is_set():
+        print(f"  {job} paused after {format_duration(time.monotonic() - started)} - rerun to resume")
+        return False
+    print(f"✓ {job} complete: {progress.rows_updated:,} rows updated "
+          f"in {format_duration(time.monotonic() - started)}")
+    return True
+
+
+def main(argv=None, default_backfill=None):
+    parser = argparse.ArgumentParser(description="Backfill a derived column in id batches, resumably")
+    if default_backfill is None:
+        parser.add_argument('backfill', choices=sorted(BACKFILLS), help="Which derived column to fill")
+    parser.add_argument('--table', choices=TABLES, action='append',
+                        help="Only this table (repeatable; default: every table the job applies to)")
+    parser.add_argument('--workers', type=int, default=1, help="Parallel connections (default 1)")
+    parser.add_argument('--batch-size', type=int, default=5000, help="Ids per batch/transaction (default 5000)")
+    parser.add_argument('--sleep', type=float, default=0.0, help="Seconds each worker pauses between batches")
+    parser.add_argument('--overwrite', action='store_true',
+                        help="Also correct values that differ from the mapping, not just NULLs")
+    parser.add_argument('--dry-run', action='store_true', help="Print planner estimates only, change nothing")
+    parser.add_argument('--restart', action='store_true', help="Ignore saved checkpoints and start over")
+    args = parser.parse_args(argv)
+
+    if args.workers < 1 or args.batch_size < 1:
+        parser.error("--workers and --batch-size must be at least 1")
+
+    name = default_backfill or args.backfill
+    ok = True
+    try:
+        for table in args.table or BACKFILLS[name].get('tables', TABLES):
+            ok = run_backfill(name, table, workers=args.workers, batch_size=args.batch_size,
+                              sleep=args.sleep, overwrite=args.overwrite,
+                              dry_run=args.dry_run, restart=args.restart) and ok
+    except psycopg2.Error as e:
+        print(f"✗ Backfill failed: {e}")
+        return 1
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
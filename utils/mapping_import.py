@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Mapping Importer
+Loads bin_bank_mapping, mid_mapping or merchant_mapping from a CSV export.
+
+The CSV is streamed into a temporary staging table with COPY, then diffed
+against the live table and applied as inserts / updates / deletes in a single
+transaction - the live table is never empty or half-loaded, so the webhook
+receiver's mapping cache can refresh at any moment. On commit a NOTIFY on
+mapping_refresh tells the receivers to reload their caches straight away.
+
+Usage:
+    python3 utils/mapping_import.py bin data/BINS_and_BANKS_List.csv
+    python3 utils/mapping_import.py mid data/mids.csv --dry-run
+    python3 utils/mapping_import.py merchant "data/Merchant - 20251011112853.csv"
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services import db
+
+load_dotenv()
+
+DB_CONFIG = db.write_config('mapping-import')
+
+# Receivers LISTEN here and reload their mapping cache (app/webhook_app.py)
+MAPPING_NOTIFY_CHANNEL = 'mapping_refresh'
+
+# Per mapping: live table, key column, value columns, and the CSV header names
+# (case-insensitive) each column may appear under. delete_missing removes live
+# rows absent from the CSV; mid_mapping also gets rows from migrations, so it
+# only adds and updates unless told otherwise.
+MAPPINGS = {
+    'bin': {
+        'table': 'bin_bank_mapping',
+        'key': 'bin',
+        'columns': ['bank_name', 'card_brand'],
+        'headers': {
+            'bin': ['bin'],
+            'bank_name': ['bankname', 'bank_name', 'bank name'],
+            'card_brand': ['cardscheme', 'card_scheme', 'card scheme', 'card_brand'],
+        },
+        'touch': 'updated_at',
+        'delete_missing': True,
+    },
+    'mid': {
+        'table': 'mid_mapping',
+        'key': 'mid_id',
+        'columns': ['terminal_name'],
+        'headers': {
+            'mid_id': ['midid', 'mid_id', 'mid id', 'mid', 'terminal id'],
+            'terminal_name': ['terminal name', 'terminal_name', 'name', 'merchant name', 'merchant_name'],
+        },
+        'touch': 'updated_at',
+        'delete_missing': False,
+    },
+    'merchant': {
+        'table': 'merchant_mapping',
+        'key': 'merchant_id',
+        'columns': ['merchant_name'],
+        'headers': {
+            'merchant_id': ['number', 'merchant_id', 'merchant id'],
+            'merchant_name': ['name', 'merchant_name', 'merchant name'],
+        },
+        'touch': None,
+        'delete_missing': True,
+        # Stored transactions carry the merchant name too
+        'backfill': """
+            UPDATE transactions t
+            SET merchant_name = m.merchant_name
+            FROM merchant_mapping m
+            WHERE t.merchant_id = m.merchant_id
+              AND m.merchant_id = ANY(%s)
+              AND t.merchant_name IS DISTINCT FROM m.merchant_name
+        """,
+    },
+}
+
+
+def resolve_headers(fieldnames, spec):
+    """Map each mapping column to the CSV header it is read from. Raises ValueError if one is missing."""
+    by_lower = {name.strip().lower(): name for name in fieldnames or []}
+    resolved = {}
+    for column, aliases in spec['headers'].items():
+        header = next((by_lower[alias] for alias in aliases if alias in by_lower), None)
+        if header is None:
+            raise ValueError(f"CSV has no column for {column} (looked for: {', '.join(aliases)}; "
+                             f"found: {', '.join(fieldnames or [])})")
+        resolved[column] = header
+    return resolved
+
+
+class CsvRowStream:
+    """
+    File-like object for cursor.copy_expert(): reads the source CSV lazily and
+    yields COPY-ready CSV lines (line_no, key, columns...). Rows with an empty
+    key or value are skipped and counted, as the per-script importers did.
+    """
+
+    def __init__(self, reader, headers, spec):
+        self._rows = iter(reader)
+        self._fields = [headers[spec['key']]] + [headers[column] for column in spec['columns']]
+        self._buffer = ''
+        self._out = io.StringIO()
+        self._writer = csv.writer(self._out, lineterminator='\n')
+        self.read_rows = 0
+        self.skipped = []
+
+    def _next_line(self):
+        for row in self._rows:
+            self.read_rows += 1
+            values = [(row.get(field) or '').strip() for field in self._fields]
+            if not all(values):
+                self.skipped.append(row)
+                continue
+            self._out.seek(0)
+            self._out.truncate()
+            self._writer.writerow([self.read_rows] + values)
+            return self._out.getvalue()
+        return ''
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            line = self._next_line()
+            if not line:
+                break
+            self._buffer += line
+        if size < 0:
+            chunk, self._buffer = self._buffer, ''
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def import_mapping(conn, name, csv_file, delete_missing=None, dry_run=False):
+    """
+    Sync one mapping table with csv_file. Returns a dict of counts
+    (read, skipped, staged, inserted, updated, deleted, unchanged).
+    Commits and notifies unless dry_run; raises (after rollback) on error.
+    """
+    spec = MAPPINGS[name]
+    table, key, columns = spec['table'], spec['key'], spec['columns']
+    if delete_missing is None:
+        delete_missing = spec['delete_missing']
+
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"""
+            CREATE TEMP TABLE mapping_staging (
+                line_no INTEGER,
+                {key} TEXT,
+                {', '.join(f'{column} TEXT' for column in columns)}
+            ) ON COMMIT DROP
+        """)
+
+        with open(csv_file, 'r', encoding='utf-8-sig', newline='') as f:
+            reader = csv.DictReader(f)
+            headers = resolve_headers(reader.fieldnames, spec)
+            stream = CsvRowStream(reader, headers, spec)
+            cursor.copy_expert(
+                f"COPY mapping_staging (line_no, {key}, {', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+                stream
+            )
+
+        # A key listed twice keeps its last row, as the old row-by-row upserts did
+        cursor.execute(f"""
+            CREATE TEMP TABLE mapping_incoming ON COMMIT DROP AS
+            SELECT DISTINCT ON ({key}) {key}, {', '.join(columns)}
+            FROM mapping_staging
+            ORDER BY {key}, line_no DESC
+        """)
+        cursor.execute("SELECT COUNT(*) FROM mapping_incoming")
+        staged = cursor.fetchone()[0]
+        if staged == 0:
+            raise ValueError(f"{csv_file} has no usable rows - refusing to sync {table}")
+
+        live_values = ', '.join(f'live.{column}' for column in columns)
+        new_values = ', '.join(f's.{column}' for column in columns)
+        touch = f", {spec['touch']} = NOW()" if spec['touch'] else ''
+
+        deleted = 0
+        if delete_missing:
+            cursor.execute(f"""
+                DELETE FROM {table} live
+                WHERE NOT EXISTS (SELECT 1 FROM mapping_incoming s WHERE s.{key} = live.{key})
+            """)
+            deleted = cursor.rowcount
+
+        cursor.execute(f"""
+            UPDATE {table} live
+            SET {', '.join(f'{column} = s.{column}' for column in columns)}{touch}
+            FROM mapping_incoming s
+            WHERE live.{key} = s.{key}
+              AND ({live_values}) IS DISTINCT FROM ({new_values})
+            RETURNING live.{key}
+        """)
+        changed_keys = [row[0] for row in cursor.fetchall()]
+        updated = len(changed_keys)
+
+        cursor.execute(f"""
+            INSERT INTO {table} ({key}, {', '.join(columns)})
+            SELECT s.{key}, {new_values}
+            FROM mapping_incoming s
+            WHERE NOT EXISTS (SELECT 1 FROM {table} live WHERE live.{key} = s.{key})
+            RETURNING {key}
+        """)
+        inserted_keys = [row[0] for row in cursor.fetchall()]
+        changed_keys += inserted_keys
+
+        if spec.get('backfill') and changed_keys:
+            cursor.execute(spec['backfill'], (changed_keys,))
+
+        counts = {
+            'read': stream.read_rows,
+            'skipped': len(stream.skipped),
+            'staged': staged,
+            'inserted': len(inserted_keys),
+            'updated': updated,
+            'deleted': deleted,
+            'unchanged': staged - len(inserted_keys) - updated,
+        }
+
+        if dry_run:
+            conn.rollback()
+        else:
+            if counts['inserted'] or counts['updated'] or counts['deleted']:
+                cursor.execute("SELECT pg_notify(%s, %s)", (MAPPING_NOTIFY_CHANNEL, table))
+            conn.commit()
+        return counts
+
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def run_import(name, csv_file, delete_missing=None, dry_run=False):
+    """CLI wrapper around import_mapping(): prints the result, returns True on success"""
+    table = MAPPINGS[name]['table']
+    print(f"Importing {csv_file} into {table}{' (dry run)' if dry_run else ''}...")
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"✗ Could not connect to database: {e}")
+        return False
+
+    try:
+        counts = import_mapping(conn, name, csv_file, delete_missing=delete_missing, dry_run=dry_run)
+    except (OSError, ValueError, psycopg2.Error) as e:
+        print(f"✗ Import failed, {table} unchanged: {e}")
+        return False
+    finally:
+        conn.close()
+
+    print(f"  Rows read:  {counts['read']} ({counts['skipped']} skipped for missing values)")
+    print(f"  Unique keys: {counts['staged']}")
+    print(f"  Inserted:   {counts['inserted']}")
+    print(f"  Updated:    {counts['updated']}")
+    print(f"  Deleted:    {counts['deleted']}")
+    print(f"  Unchanged:  {counts['unchanged']}")
+    if dry_run:
+        print(f"\n✓ Dry run - nothing written to {table}")
+    else:
+        print(f"\n✓ {table} is in sync with {os.path.basename(csv_file)}")
+    return True
+
+
+def main(argv=None, default_mapping=None):
+    parser = argparse.ArgumentParser(description="Sync a mapping table with a CSV export")
+    if default_mapping is None:
+        parser.add_argument('mapping', choices=sorted(MAPPINGS), help="Which mapping table to load")
+    parser.add_argument('csv_file', help="CSV export to load")
+    parser.add_argument('--dry-run', action='store_true', help="Report the changes without applying them")
+    deletes = parser.add_mutually_exclusive_group()
+    deletes.add_argument('--delete-missing', dest='delete_missing', action='store_true', default=None,
+                         help="Delete rows that are not in the CSV")
+    deletes.add_argument('--keep-missing', dest='delete_missing', action='store_false',
+                         help="Only insert and update, keep rows that are not in the CSV")
+    args = parser.parse_args(argv)
+
+    mapping = default_mapping or args.mapping
+    if not os.path.exists(args.csv_file):
+        print(f"Error: File not found: {args.csv_file}")
+        return 1
+    ok = run_import(mapping, args.csv_file, delete_missing=args.delete_missing, dry_run=args.dry_run)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())